@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Dziennik zmian - instalacja wyzwalaczy i przeglądanie historii.
+
+Przykłady:
+    python audit.py install
+    python audit.py history --vehicle 4
+    python audit.py history --table key_log --row 12
+    python audit.py search --column current_mileage --from 2026-05-01 --operator jan
+    python audit.py archive          # retencja wg audit.retention_days / audit.archive
+    python audit.py archive --before 2025-01-01 --to database/audit_archive.db
+
+Ustawienia: sekcja audit w config.yaml.
+"""
+
+import argparse
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+# Dodaj ścieżkę src do PYTHONPATH
+sys.path.append(str(Path(__file__).parent / 'src'))
+
+from services.audit_service import DEFAULT_TABLES, AuditService, format_changes  # noqa: E402
+from utils import db  # noqa: E402
+from utils.helpers import load_config, setup_logging  # noqa: E402
+
+ACTION_LABELS = {"I": "dodanie", "U": "zmiana", "D": "usunięcie"}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Dziennik zmian danych")
+    parser.add_argument("--db", type=Path, default=Path(__file__).parent / "database" / "fleet.db",
+                        help="ścieżka do bazy danych")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("install", help="utwórz / zaktualizuj wyzwalacze")
+    commands.add_parser("uninstall", help="usuń wyzwalacze (dziennik zostaje)")
+
+    archive = commands.add_parser("archive", help="przenieś starsze wpisy do pliku archiwum")
+    archive.add_argument("--before", type=date.fromisoformat,
+                         help="wpisy sprzed tego dnia (RRRR-MM-DD); domyślnie audit.retention_days")
+    archive.add_argument("--to", type=Path,
+                         help="plik archiwum SQLite; domyślnie audit.archive (puste: wpisy są usuwane)")
+
+    history = commands.add_parser("history", help="historia pojazdu albo jednego wiersza")
+    history.add_argument("--vehicle", type=int, help="id pojazdu (pojazd, kluczyki, przejazdy, tankowania)")
+    history.add_argument("--table", help="tabela (z --row)")
+    history.add_argument("--row", type=int, help="id wiersza (z --table)")
+    history.add_argument("--limit", type=int, default=50, help="liczba wpisów")
+
+    search = commands.add_parser("search", help="wyszukaj zmiany")
+    search.add_argument("--table", help="tabela")
+    search.add_argument("--column", help="tylko zmiany tej kolumny")
+    search.add_argument("--operator", help="operator")
+    search.add_argument("--from", dest="date_from", type=date.fromisoformat, help="od dnia (RRRR-MM-DD)")
+    search.add_argument("--to", dest="date_to", type=date.fromisoformat, help="do dnia (RRRR-MM-DD)")
+    search.add_argument("--limit", type=int, default=50, help="liczba wpisów")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    config = load_config(str(Path(__file__).parent / "config.yaml"))
+    setup_logging(config)
+    db.configure(config.get("database"), base_dir=Path(__file__).parent)
+    settings = config.get("audit") or {}
+
+    if not args.db.exists():
+        print(f"❌ Baza nie istnieje: {args.db}")
+        return 2
+
+    service = AuditService(args.db, settings.get("tables") or DEFAULT_TABLES)
+    with db.connect(args.db) as conn:
+        if args.command == "install":
+            tables = service.install(conn)
+            print(f"✅ Dziennik zmian obejmuje: {', '.join(tables)}")
+            return 0
+        if args.command == "uninstall":
+            print(f"✅ Usunięto wyzwalaczy: {service.uninstall(conn)}")
+            return 0
+        if args.command == "archive":
+            before, archive = args.before, args.to
+            if before is None:
+                retention_days = int(settings.get("retention_days") or 0)
+                if not retention_days:
+                    print("❌ Podaj --before albo ustaw audit.retention_days")
+                    return 2
+                before = date.today() - timedelta(days=retention_days)
+            if archive is None and settings.get("archive"):
+                archive = Path(__file__).parent / settings["archive"]
+            moved = service.archive(conn, before, archive)
+            print(f"✅ Przeniesiono wpisów: {moved}" if archive else f"✅ Usunięto wpisów: {moved}")
+            return 0
+
+        service.ensure_schema(conn)
+        if args.command == "history":
+            if args.vehicle is not None:
+                entries = service.vehicle_history(conn, args.vehicle, args.limit)
+            elif args.table and args.row is not None:
+                entries = service.history(conn, args.table, args.row, args.limit)
+            else:
+                print("❌ Podaj --vehicle albo --table i --row")
+                return 2
+        else:
+            entries = service.search(conn, args.table, args.column, args.operator,
+                                     args.date_from, args.date_to, args.limit)
+
+    for entry in entries:
+        when = entry.changed_at.strftime("%Y-%m-%d %H:%M:%S") if entry.changed_at else "-"
+        print(f"{when}  {entry.operator or '-'}  {entry.table_name}#{entry.row_id}  "
+              f"{ACTION_LABELS.get(entry.action, entry.action)}  {format_changes(entry.changes)}")
+    if not entries:
+        print("Brak zmian.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
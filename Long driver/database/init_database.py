@@ -6,6 +6,8 @@ import sqlite3
 from pathlib import Path
 import logging
 
+logger = logging.getLogger(__name__)
+
 class DatabaseInitializer:
     """Database initializer class"""
     
@@ -40,11 +42,11 @@ class DatabaseInitializer:
             conn.commit()
             conn.close()
             
-            print(f"Database initialized: {self.db_path}")
+            logger.info(f"Database initialized: {self.db_path}")
             return True
             
         except Exception as e:
-            print(f"Database initialization error: {e}")
+            logger.error(f"Database initialization error: {e}")
             raise
     
     def add_sample_data(self, cursor):
@@ -77,7 +79,7 @@ class DatabaseInitializer:
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         ''', vehicles)
         
-        print("Sample data added to database")
+        logger.info("Sample data added to database")
 
 def main():
     """Main initialization function"""
@@ -71,7 +71,7 @@ CREATE TABLE IF NOT EXISTS keys (
 -- =================================================================
 CREATE TABLE IF NOT EXISTS trips (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
-    road_card_number TEXT UNIQUE,
+    trip_number TEXT UNIQUE,
     vehicle_id INTEGER NOT NULL,
     driver_id INTEGER NOT NULL,
     start_time TIMESTAMP NOT NULL,
@@ -111,6 +111,29 @@ CREATE TABLE IF NOT EXISTS fueling_logs (
     FOREIGN KEY (trip_id) REFERENCES trips(id) ON DELETE SET NULL
 );
 
+-- =================================================================
+-- NUMBER SEQUENCES
+-- Per-year counters for road-card numbers (KD/YYYY/NNNN).
+-- Incremented in the same transaction as the row using the number.
+-- =================================================================
+CREATE TABLE IF NOT EXISTS number_sequences (
+    series TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    next_value INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (series, year)
+) WITHOUT ROWID;
+
+-- Blocks of numbers reserved at once (batch imports), used by the gap audit
+CREATE TABLE IF NOT EXISTS number_blocks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    series TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    first_value INTEGER NOT NULL,
+    last_value INTEGER NOT NULL,
+    purpose TEXT,
+    reserved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- =================================================================
 -- INDEXES FOR PERFORMANCE
 -- =================================================================
@@ -121,3 +144,4 @@ CREATE INDEX IF NOT EXISTS idx_trips_vehicle_id ON trips(vehicle_id);
 CREATE INDEX IF NOT EXISTS idx_trips_driver_id ON trips(driver_id);
 CREATE INDEX IF NOT EXISTS idx_trips_status ON trips(status);
 CREATE INDEX IF NOT EXISTS idx_fueling_logs_vehicle_id ON fueling_logs(vehicle_id);
+CREATE INDEX IF NOT EXISTS idx_number_blocks_series_year ON number_blocks(series, year);
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Operacje floty z wiersza poleceń (bez interfejsu graficznego), wynik w JSON.
+
+Przykłady:
+    python fleet.py checkout --vehicle WA100 --employee 5 --mileage 12040 --fuel 38
+    python fleet.py return --vehicle WA100 --mileage 12210 --fuel 25
+    python fleet.py trip-start --vehicle 3 --driver 7 --route "Warszawa - Łódź" --purpose "Dostawa"
+    python fleet.py trip-complete --trip 41 --mileage 12350 --fuel 20
+    python fleet.py fuel --vehicle WA100 --liters 40 --mileage 12360 --price 6.49
+    python fleet.py keys
+    python fleet.py batch < terminal_bramy.ndjson           # jedna komenda JSON na linię
+    python fleet.py batch --atomic --group-size 500 korekty.ndjson
+
+Komenda w trybie batch: {"op": "checkout", "vehicle": "WA100", "employee": 5,
+"mileage": 12040, "fuel": 38, "time": "2026-05-04T07:12:00", "ref": "brama-1/884"}
+(pole "ref" wraca w wyniku bez zmian). Wynik: jedna linia JSON na komendę.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Dodaj ścieżkę src do PYTHONPATH
+sys.path.append(str(Path(__file__).parent / 'src'))
+
+from services.key_service import KeyService  # noqa: E402
+from services.operations_service import (  # noqa: E402
+    DEFAULT_GROUP_SIZE, OPERATIONS, OperationsService,
+)
+from utils import db, fleet_index  # noqa: E402
+from utils.helpers import load_config, setup_logging  # noqa: E402
+
+
+def _option(name: str) -> str:
+    return "--" + name.replace("_", "-")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Operacje floty bez interfejsu graficznego (wynik JSON)")
+    parser.add_argument("--db", type=Path, default=Path(__file__).parent / "database" / "fleet.db",
+                        help="ścieżka do bazy danych")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    # Jedna komenda na operację; pola jak w trybie batch (walidacja w OperationsService)
+    for op, (required, optional) in OPERATIONS.items():
+        command = commands.add_parser(op.replace("_", "-"), help=f"operacja {op}")
+        for name in required:
+            command.add_argument(_option(name), dest=name, required=True)
+        for name in optional:
+            if name == "force":
+                command.add_argument("--force", action="store_true",
+                                     help="wydaj mimo rezerwacji innego pracownika")
+            else:
+                command.add_argument(_option(name), dest=name)
+        command.set_defaults(op=op)
+
+    batch = commands.add_parser("batch", help="komendy JSON (jedna na linię) z pliku lub stdin")
+    batch.add_argument("file", nargs="?", type=Path, help="plik z komendami (domyślnie stdin)")
+    batch.add_argument("--group-size", type=int, default=DEFAULT_GROUP_SIZE,
+                       help=f"komend na transakcję (domyślnie {DEFAULT_GROUP_SIZE})")
+    batch.add_argument("--atomic", action="store_true",
+                       help="wszystko w jednej transakcji - pierwszy błąd wycofuje całość")
+
+    commands.add_parser("keys", help="wydane (niezwrócone) kluczyki")
+    vehicles = commands.add_parser("vehicles", help="stan pojazdów")
+    vehicles.add_argument("--status", help="tylko pojazdy o statusie (np. available)")
+    return parser.parse_args(argv)
+
+
+def emit(record) -> None:
+    print(json.dumps(record, ensure_ascii=False, default=str), flush=True)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    config = load_config(str(Path(__file__).parent / "config.yaml"))
+    # stdout jest zarezerwowane dla wyników JSON - logi tylko do pliku
+    setup_logging({**config, "logging": {**config.get("logging", {}), "console": False}})
+    db.configure(config.get("database"), base_dir=Path(__file__).parent)
+
+    if not args.db.exists():
+        emit({"ok": False, "error": f"Baza nie istnieje: {args.db}"})
+        return 2
+
+    if args.command == "keys":
+        with db.connect(args.db) as conn:
+            for row in KeyService.active_keys(conn):
+                emit(row)
+        return 0
+
+    if args.command == "vehicles":
+        index = fleet_index.get_index(args.db)
+        states = index.with_status(args.status) if args.status else index.all()
+        for state in states:
+            emit(state._asdict())
+        return 0
+
+    service = OperationsService(args.db)
+    if args.command == "batch":
+        if args.group_size < 1:
+            emit({"ok": False, "error": "--group-size musi być >= 1"})
+            return 2
+        handle = open(args.file, encoding="utf-8-sig") if args.file else sys.stdin
+        failed = 0
+        try:
+            for result in service.run_batch(handle, args.group_size, args.atomic):
+                failed += not result.ok
+                emit(result.to_dict())
+        finally:
+            if args.file:
+                handle.close()
+        return 1 if failed else 0
+
+    required, optional = OPERATIONS[args.op]
+    command = {"op": args.op}
+    for name in required + optional:
+        value = getattr(args, name, None)
+        if value not in (None, False):
+            command[name] = value
+    result = service.run(command)
+    emit(result.to_dict())
+    return 0 if result.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
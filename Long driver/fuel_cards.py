@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Wyciągi kart paliwowych - import i uzgadnianie z wpisami tankowań i przejazdami.
+
+Przykłady:
+    python fuel_cards.py import wyciag_2026_05.csv wyciag_2026_05_korekta.xlsx
+    python fuel_cards.py reconcile --from 2026-05-01 --to 2026-05-31 --csv rozbieznosci.csv
+
+Ustawienia domyślne: sekcja fuel_cards w config.yaml.
+"""
+
+import argparse
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+# Dodaj ścieżkę src do PYTHONPATH
+sys.path.append(str(Path(__file__).parent / 'src'))
+
+from services.fuel_card_service import (  # noqa: E402
+    DEFAULT_DUPLICATE_WINDOW_MINUTES, DEFAULT_LITERS_TOLERANCE, DEFAULT_LITERS_TOLERANCE_PCT,
+    DEFAULT_TIME_WINDOW_MINUTES, FuelCardService, write_issues_csv,
+)
+from services.import_service import ImportFileError, write_errors_csv  # noqa: E402
+from utils import db  # noqa: E402
+from utils.helpers import load_config, setup_logging  # noqa: E402
+
+ISSUE_LABELS = {
+    "unknown_vehicle": "transakcje nieznanych pojazdów",
+    "duplicate": "podwójne tankowania",
+    "over_capacity": "tankowania ponad pojemność baku",
+    "unmatched": "transakcje bez wpisu tankowania",
+    "log_without_transaction": "wpisy tankowania bez transakcji kartą",
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Wyciągi kart paliwowych: import i uzgadnianie")
+    parser.add_argument("--db", type=Path, default=Path(__file__).parent / "database" / "fleet.db",
+                        help="ścieżka do bazy danych")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    statement = commands.add_parser("import", help="import wyciągów (CSV / XLSX)")
+    statement.add_argument("files", nargs="+", type=Path, help="pliki wyciągów")
+    statement.add_argument("--errors", type=Path, help="zapisz odrzucone wiersze do pliku CSV")
+
+    reconcile = commands.add_parser("reconcile", help="uzgodnij transakcje z tankowaniami i przejazdami")
+    reconcile.add_argument("--from", dest="date_from", type=date.fromisoformat, help="od dnia (RRRR-MM-DD)")
+    reconcile.add_argument("--to", dest="date_to", type=date.fromisoformat, help="do dnia (RRRR-MM-DD)")
+    reconcile.add_argument("--csv", type=Path, help="zapisz rozbieżności do pliku CSV")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    config = load_config(str(Path(__file__).parent / "config.yaml"))
+    setup_logging(config)
+    db.configure(config.get("database"), base_dir=Path(__file__).parent)
+    settings = config.get("fuel_cards") or {}
+
+    if not args.db.exists():
+        print(f"❌ Baza nie istnieje: {args.db}")
+        return 2
+
+    service = FuelCardService(
+        args.db,
+        time_window_minutes=float(settings.get("time_window_minutes", DEFAULT_TIME_WINDOW_MINUTES)),
+        duplicate_window_minutes=float(settings.get("duplicate_window_minutes",
+                                                    DEFAULT_DUPLICATE_WINDOW_MINUTES)),
+        liters_tolerance=float(settings.get("liters_tolerance", DEFAULT_LITERS_TOLERANCE)),
+        liters_tolerance_pct=float(settings.get("liters_tolerance_pct", DEFAULT_LITERS_TOLERANCE_PCT)),
+    )
+
+    if args.command == "import":
+        errors = []
+        for path in args.files:
+            started = time.perf_counter()
+            try:
+                result = service.import_file(path)
+            except (ImportFileError, OSError) as e:
+                print(f"❌ {path}: {e}")
+                return 2
+            errors.extend(result.errors)
+            print(f"✅ {path.name}: wierszy {result.total}, dodano {result.imported}, "
+                  f"już w bazie {result.repeated}, pozycji niepaliwowych {result.non_fuel}, "
+                  f"odrzucono {len(result.errors)} ({time.perf_counter() - started:.1f} s)")
+            if result.unknown_vehicle:
+                print(f"   ⚠️ transakcji bez rozpoznanego pojazdu: {result.unknown_vehicle}")
+            for error in result.errors[:20]:
+                print(f"   ⚠️ {error}")
+            if len(result.errors) > 20:
+                print(f"   ... oraz {len(result.errors) - 20} kolejnych błędów")
+        if args.errors and errors:
+            write_errors_csv(errors, args.errors)
+            print(f"📄 Lista błędów: {args.errors}")
+        return 1 if errors else 0
+
+    started = time.perf_counter()
+    result = service.reconcile(args.date_from, args.date_to)
+    print(f"✅ Transakcji: {result.transactions}, dopasowanych do tankowań {result.matched}, "
+          f"w trakcie przejazdu {result.within_trip} ({time.perf_counter() - started:.1f} s)")
+    counts = result.counts()
+    for issue, label in ISSUE_LABELS.items():
+        if counts[issue]:
+            print(f"   ⚠️ {label}: {counts[issue]}")
+    if args.csv and result.issues:
+        with db.connect(args.db) as conn:
+            registrations = dict(conn.execute("SELECT id, registration_number FROM vehicles"))
+        write_issues_csv(result, args.csv, registrations)
+        print(f"📄 Rozbieżności: {args.csv}")
+    return 1 if result.issues else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Import masowy pojazdów, pracowników i przejazdów z plików CSV / XLSX.
+
+Przykłady:
+    python import_data.py vehicles pojazdy.csv --dry-run
+    python import_data.py employees pracownicy.xlsx --upsert --errors bledy.csv
+    python import_data.py trips przejazdy.csv --chunk-size 1000
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Dodaj ścieżkę src do PYTHONPATH
+sys.path.append(str(Path(__file__).parent / 'src'))
+
+from services.import_service import (  # noqa: E402
+    DEFAULT_CHUNK_SIZE, ENTITIES, ImportFileError, ImportService, write_errors_csv,
+)
+from utils import db  # noqa: E402
+from utils.helpers import load_config, setup_logging  # noqa: E402
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Import danych do bazy fleet.db")
+    parser.add_argument("entity", choices=sorted(ENTITIES), help="rodzaj danych")
+    parser.add_argument("file", type=Path, help="plik CSV lub XLSX")
+    parser.add_argument("--upsert", action="store_true",
+                        help="aktualizuj istniejące rekordy zamiast je odrzucać")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="tylko sprawdź plik - nic nie zapisuj")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"wierszy na transakcję (domyślnie {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--errors", type=Path, help="zapisz odrzucone wiersze do pliku CSV")
+    parser.add_argument("--db", type=Path, default=Path(__file__).parent / "database" / "fleet.db",
+                        help="ścieżka do bazy danych")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    config = load_config(str(Path(__file__).parent / "config.yaml"))
+    setup_logging(config)
+    db.configure(config.get("database"), base_dir=Path(__file__).parent)
+
+    if not args.db.exists():
+        print(f"❌ Baza nie istnieje: {args.db}")
+        return 2
+
+    def progress(rows):
+        print(f"\r   przetworzono wierszy: {rows}", end="", flush=True)
+
+    try:
+        result = ImportService(args.db).import_file(
+            args.file, args.entity,
+            mode="upsert" if args.upsert else "insert",
+            dry_run=args.dry_run,
+            chunk_size=args.chunk_size,
+            progress=progress,
+        )
+    except (ImportFileError, OSError) as e:
+        print(f"\n❌ {e}")
+        return 2
+    print()
+
+    label = "🔍 Próba (nic nie zapisano)" if result.dry_run else "✅ Import zakończony"
+    print(f"{label}: wierszy {result.total}, dodano {result.inserted}, "
+          f"zaktualizowano {result.updated}, odrzucono {result.skipped}")
+    for note in result.notes:
+        print(f"   ℹ️ {note}")
+    for error in result.errors[:20]:
+        print(f"   ⚠️ {error}")
+    if len(result.errors) > 20:
+        print(f"   ... oraz {len(result.errors) - 20} kolejnych błędów")
+    if args.errors and result.errors:
+        write_errors_csv(result.errors, args.errors)
+        print(f"📄 Lista błędów: {args.errors}")
+    return 0 if result.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,13 +5,16 @@ Główny plik aplikacji - System Ewidencji Pojazdów
 
 import sys
 import os
+import logging
 from pathlib import Path
 import sqlite3
 
 # Dodaj ścieżkę src do PYTHONPATH
 sys.path.append(str(Path(__file__).parent / 'src'))
 
-from PySide6.QtWidgets import QApplication
+from utils import startup_profiler
+
+logger = logging.getLogger("long_driver")
 
 def fix_distance_column_on_startup():
     """
@@ -39,7 +42,7 @@ def fix_distance_column_on_startup():
             conn.close()
             return
 
-        print("⚠️ Wykryto przestarzałą strukturę tabeli 'trips'. Rozpoczynam naprawę kolumny 'distance'...")
+        logger.warning("⚠️ Wykryto przestarzałą strukturę tabeli 'trips'. Rozpoczynam naprawę kolumny 'distance'...")
 
         # Zmień nazwę starej tabeli
         cursor.execute("ALTER TABLE trips RENAME TO trips_old")
@@ -88,67 +91,148 @@ def fix_distance_column_on_startup():
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_trips_vehicle ON trips(vehicle_id);")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_trips_employee ON trips(employee_id);")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_trips_number ON trips(trip_number);")
+        # Indeks częściowy: tylko otwarte przejazdy (tablica stanu floty)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_trips_open ON trips(end_date) WHERE end_date IS NULL;")
 
         conn.commit()
-        print("✅ Struktura tabeli 'trips' została pomyślnie naprawiona.")
+        logger.info("✅ Struktura tabeli 'trips' została pomyślnie naprawiona.")
 
     except sqlite3.Error as e:
-        print(f"❌ Błąd podczas naprawy bazy danych: {e}")
+        logger.error(f"❌ Błąd podczas naprawy bazy danych: {e}")
         if 'conn' in locals() and conn:
             conn.rollback()
     finally:
         if 'conn' in locals() and conn:
             conn.close()
 
+def dodaj_wersje_wierszy():
+    """Kolumny wersji (pojazdy, pracownicy, kluczyki) do zapisu warunkowego formularzy."""
+    from utils import db
+    from services.version_service import VersionService
+
+    db_path = Path(__file__).parent / "database" / "fleet.db"
+    conn = db.connect(db_path)
+    try:
+        VersionService.ensure_schema(conn)
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        logger.error(f"❌ Nie udało się dodać wersji wierszy: {e}")
+    finally:
+        conn.close()
+
+def zainstaluj_dziennik_zmian(config):
+    """Wyzwalacze dziennika zmian (sekcja audit w config.yaml)."""
+    settings = config.get("audit") or {}
+    if not settings.get("enabled", True):
+        return
+    from utils import db
+    from services.audit_service import DEFAULT_TABLES, AuditService, default_operator
+
+    db_path = Path(__file__).parent / "database" / "fleet.db"
+    service = AuditService(db_path, settings.get("tables") or DEFAULT_TABLES)
+    conn = db.connect(db_path)
+    try:
+        service.install(conn)
+        conn.commit()
+        # Każde połączenie aplikacji zapisuje zmiany z operatorem tego stanowiska
+        service.register_operator(settings.get("operator") or default_operator())
+        # Retencja nie działa przy starcie: python audit.py archive
+    except sqlite3.Error as e:
+        conn.rollback()
+        logger.error(f"❌ Nie udało się zainstalować dziennika zmian: {e}")
+    finally:
+        conn.close()
+
 def sprawdz_baze_danych():
     """Sprawdza czy baza danych istnieje i naprawia jej strukturę w razie potrzeby."""
     sciezka_bazy = Path("database/fleet.db")
     if not sciezka_bazy.exists():
-        print("❌ Baza danych nie istnieje!")
-        print("Uruchom: python database\\init_database.py")
+        logger.error("❌ Baza danych nie istnieje!")
+        logger.error("Uruchom: python database\\init_database.py")
         return False
 
     fix_distance_column_on_startup()
     return True
 
-def main():
-    print("=" * 50)
-    print("Uruchamianie Systemu Ewidencji Pojazdów")
-    print("=" * 50)
+def main(argv=None):
+    argv = list(sys.argv if argv is None else argv)
+
+    # --profile-startup: czasy importów i etapów inicjalizacji (jak -X importtime)
+    if "--profile-startup" in argv:
+        argv.remove("--profile-startup")
+        startup_profiler.enable()
+
+    # --kiosk: pełnoekranowy zwrot kluczyków skanerem zamiast głównego okna
+    kiosk = "--kiosk" in argv
+    if kiosk:
+        argv.remove("--kiosk")
+
+    with startup_profiler.stage("konfiguracja i logowanie"):
+        from utils import db
+        from utils.helpers import load_config, setup_logging
+        config = load_config(str(Path(__file__).parent / "config.yaml"))
+        setup_logging(config)
+        db.configure(config.get("database"), base_dir=Path(__file__).parent)
+
+    logger.info("=" * 50)
+    logger.info("Uruchamianie Systemu Ewidencji Pojazdów")
+    logger.info("=" * 50)
     
     # Sprawdź bazę danych
-    if not sprawdz_baze_danych():
-        return 1
+    with startup_profiler.stage("sprawdzenie bazy danych"):
+        if not sprawdz_baze_danych():
+            return 1
+
+    # Przed dziennikiem zmian - jego wyzwalacze pomijają kolumnę wersji
+    with startup_profiler.stage("wersje wierszy"):
+        dodaj_wersje_wierszy()
+
+    with startup_profiler.stage("dziennik zmian"):
+        zainstaluj_dziennik_zmian(config)
     
-    # Załaduj główne okno
+    # Załaduj główne okno (PySide6 importowany dopiero tutaj)
     try:
-        from src.gui.main_window import MainWindow
-        print("✅ Moduły GUI załadowane pomyślnie")
+        with startup_profiler.stage("import modułów GUI"):
+            from PySide6.QtWidgets import QApplication
+            from PySide6.QtCore import QTimer
+            if kiosk:
+                from src.gui.kiosk_window import KioskWindow
+            else:
+                from src.gui.main_window import MainWindow
+        logger.info("✅ Moduły GUI załadowane pomyślnie")
     except ImportError as e:
-        print(f"❌ Błąd importu: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ Błąd importu: {e}")
         return 1
     
     # Uruchom aplikację Qt
     try:
-        app = QApplication(sys.argv)
-        app.setApplicationName("System Ewidencji Pojazdów")
-        app.setApplicationDisplayName("Long Driver - System Zarządzania Pojazdami")
+        with startup_profiler.stage("QApplication"):
+            app = QApplication(argv)
+            app.setApplicationName("System Ewidencji Pojazdów")
+            app.setApplicationDisplayName("Long Driver - System Zarządzania Pojazdami")
         
-        window = MainWindow()
-        window.show()
+        if kiosk:
+            window = KioskWindow()
+            window.showFullScreen()
+        else:
+            with startup_profiler.stage("MainWindow.__init__"):
+                window = MainWindow()
+            with startup_profiler.stage("MainWindow.show"):
+                window.show()
+
+        # Raport po pierwszym obrocie pętli zdarzeń (po załadowaniu 1. zakładki)
+        if startup_profiler.is_enabled():
+            QTimer.singleShot(0, startup_profiler.finish)
         
-        print("\n" + "=" * 50)
-        print("✅ Aplikacja uruchomiona pomyślnie!")
-        print("=" * 50)
+        logger.info("=" * 50)
+        logger.info("✅ Aplikacja uruchomiona pomyślnie!")
+        logger.info("=" * 50)
         
         return app.exec()
         
     except Exception as e:
-        print(f"❌ Błąd aplikacji: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ Błąd aplikacji: {e}")
         return 1
 
 if __name__ == "__main__":
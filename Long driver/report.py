@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""
+Raporty floty z wiersza poleceń (bez interfejsu graficznego).
+
+Przykłady:
+    python report.py list
+    python report.py report --type costs --from 2026-05-01 --to 2026-05-31 --format pdf,xlsx,csv
+    python report.py schedule          # harmonogram nocny (reports.scheduled w config.yaml)
+"""
+
+import sys
+from pathlib import Path
+
+# Dodaj ścieżkę src do PYTHONPATH
+sys.path.append(str(Path(__file__).parent / 'src'))
+
+from reporting.cli import main  # noqa: E402
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Historia zmian pojazdu z dziennika zmian: pojazd, wydania kluczyków,
+przejazdy, tankowania i rezerwacje - kto, kiedy i co zmienił.
+"""
+
+import logging
+
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget, QTableWidgetItem,
+    QHeaderView, QMessageBox
+)
+
+from services.audit_service import AuditService, format_changes
+from utils import db
+
+logger = logging.getLogger(__name__)
+
+TABLE_LABELS = {
+    "vehicles": "Pojazd",
+    "key_log": "Kluczyk",
+    "trips": "Przejazd",
+    "fueling_logs": "Tankowanie",
+    "reservations": "Rezerwacja",
+}
+ACTION_LABELS = {"I": "dodanie", "U": "zmiana", "D": "usunięcie"}
+# Wpisów na stronę (kolejne: "Starsze")
+PAGE_SIZE = 200
+
+
+class AuditHistoryDialog(QDialog):
+    """Historia zmian jednego pojazdu."""
+
+    def __init__(self, db_path, vehicle_id: int, registration: str, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.service = AuditService(db_path)
+        self.vehicle_id = vehicle_id
+        self.last_id = None
+        self.setWindowTitle(f"🕓 Historia zmian - {registration}")
+        self.resize(980, 560)
+        self.init_ui()
+        self.load_more()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(["Data", "Operator", "Obiekt", "Operacja", "Zmiany"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setWordWrap(True)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        self.more_button = QPushButton("Starsze...")
+        self.more_button.clicked.connect(self.load_more)
+        buttons.addWidget(self.more_button)
+        close_button = QPushButton("Zamknij")
+        close_button.clicked.connect(self.accept)
+        buttons.addWidget(close_button)
+        layout.addLayout(buttons)
+
+    def load_more(self):
+        """Kolejna strona historii (od najnowszych)."""
+        try:
+            conn = db.connect(self.db_path)
+            try:
+                self.service.ensure_schema(conn)
+                entries = self.service.vehicle_history(conn, self.vehicle_id, PAGE_SIZE, self.last_id)
+            finally:
+                conn.close()
+        except Exception as e:
+            QMessageBox.critical(self, "Błąd", f"Błąd odczytu historii zmian:\n{e}")
+            return
+
+        for entry in entries:
+            row = self.table.rowCount()
+            self.table.insertRow(row)
+            values = [
+                entry.changed_at.strftime("%d.%m.%Y %H:%M:%S") if entry.changed_at else "",
+                entry.operator or "",
+                f"{TABLE_LABELS.get(entry.table_name, entry.table_name)} #{entry.row_id}",
+                ACTION_LABELS.get(entry.action, entry.action),
+                format_changes(entry.changes),
+            ]
+            for col, value in enumerate(values):
+                self.table.setItem(row, col, QTableWidgetItem(value))
+        if entries:
+            self.last_id = entries[-1].id
+        self.more_button.setEnabled(len(entries) == PAGE_SIZE)
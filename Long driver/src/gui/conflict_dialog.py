@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Konflikt edycji: rekord zmieniono w innym oknie / na innym stanowisku od
+chwili wczytania go do formularza. Dialog pokazuje różnice pole po polu
+(wartość przy wczytaniu, wpisana, aktualna w bazie); dla pól zmienionych
+po obu stronach operator wybiera, którą wartość zapisać.
+"""
+
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox,
+    QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox
+)
+from PySide6.QtGui import QColor
+
+from services.version_service import VERSION_COLUMN, EditConflict
+
+CONFLICT_COLOR = QColor(255, 99, 71, 80)
+KEEP_THEIRS, KEEP_MINE = "Aktualna z bazy", "Moja"
+
+
+def _show(value) -> str:
+    if value is None or value == "":
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.1f}"
+    return str(value)
+
+
+class EditConflictDialog(QDialog):
+    """Różnice pól przy konflikcie zapisu; ``values()`` - wartości do zapisania."""
+
+    def __init__(self, conflict: EditConflict, labels: dict, parent=None):
+        super().__init__(parent)
+        self.conflict = conflict
+        self.labels = labels
+        self.choices = {}
+        self.setWindowTitle("⚠️ Rekord zmieniony w międzyczasie")
+        self.resize(820, 420)
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        info = QLabel(
+            "Ktoś zapisał ten rekord po wczytaniu go do formularza.\n"
+            "Twoje zmiany pól, których nikt inny nie ruszał, zostaną zachowane, a zmiany z bazy - "
+            "przyjęte. Dla pól zmienionych po obu stronach (podświetlone) wybierz wartość."
+        )
+        info.setWordWrap(True)
+        layout.addWidget(info)
+
+        rows = self.conflict.changed
+        self.table = QTableWidget(len(rows), 5)
+        self.table.setHorizontalHeaderLabels(
+            ["Pole", "Przy wczytaniu", "Twoja wartość", "Aktualnie w bazie", "Zapisz"]
+        )
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        for row, diff in enumerate(rows):
+            values = [self.labels.get(diff.column, diff.column), _show(diff.base),
+                      _show(diff.mine), _show(diff.theirs)]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if diff.conflicting:
+                    item.setBackground(CONFLICT_COLOR)
+                self.table.setItem(row, col, item)
+            if diff.conflicting:
+                choice = QComboBox()
+                choice.addItems([KEEP_THEIRS, KEEP_MINE])
+                self.choices[diff.column] = choice
+                self.table.setCellWidget(row, 4, choice)
+            else:
+                text = "Moja (zmiana tylko w formularzu)" if diff.changed_by_me else "Aktualna (zmiana tylko w bazie)"
+                self.table.setItem(row, 4, QTableWidgetItem(text))
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        save_button = QPushButton("💾 Zapisz scalone")
+        save_button.setStyleSheet("background-color: #3498db; color: white; font-weight: bold;")
+        save_button.clicked.connect(self.accept)
+        buttons.addWidget(save_button)
+        cancel_button = QPushButton("Anuluj")
+        cancel_button.clicked.connect(self.reject)
+        buttons.addWidget(cancel_button)
+        layout.addLayout(buttons)
+
+    def values(self) -> dict:
+        """Wartości do zapisania na aktualnej wersji rekordu."""
+        keep_mine = [column for column, choice in self.choices.items() if choice.currentText() == KEEP_MINE]
+        return self.conflict.merged(keep_mine)
+
+
+def save_with_conflict_check(parent, service, conn, table: str, row_id: int, base: dict,
+                             values: dict, labels: dict):
+    """
+    Zapis warunkowy (VersionService.update) z zatwierdzeniem. Przy konflikcie
+    pokazuje różnice i ponawia zapis scalonych wartości na aktualnej wersji.
+    Zwraca zapisany stan wiersza (z nową wersją) albo None - anulowano lub
+    rekord usunięto w międzyczasie.
+    """
+    while True:
+        try:
+            version = service.update(conn, table, row_id, base, values)
+            conn.commit()
+            return {**values, VERSION_COLUMN: version}
+        except EditConflict as conflict:
+            conn.rollback()
+            if conflict.deleted:
+                QMessageBox.warning(parent, "Rekord usunięty",
+                                    "Rekord został w międzyczasie usunięty - zmian nie zapisano.")
+                return None
+            dialog = EditConflictDialog(conflict, labels, parent)
+            if dialog.exec() != QDialog.Accepted:
+                return None
+            base, values = conflict.current_row, dialog.values()
@@ -10,15 +10,53 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QFont, QColor
-import sqlite3
+import bisect
+import json
+import logging
 from pathlib import Path
 
+from utils import db
+from utils.ui_profiler import profile_slot
+
+from services.batch_service import BatchService
+from services.version_service import VersionService
+from .conflict_dialog import save_with_conflict_check
+
+logger = logging.getLogger(__name__)
+
+EMPLOYEE_LIST_SQL = """
+    SELECT id, first_name, last_name, position,
+           department, permissions, email, phone, is_active
+    FROM employees
+"""
+
+# Kolumny zapisywane z formularza (i ich etykiety w dialogu konfliktu)
+EMPLOYEE_FIELDS = {
+    "first_name": "Imię",
+    "last_name": "Nazwisko",
+    "position": "Stanowisko",
+    "department": "Dział",
+    "permissions": "Uprawnienia",
+    "email": "Email",
+    "phone": "Telefon",
+    "is_active": "Aktywny",
+    "notes": "Uwagi",
+}
+
+# Ile operacji zbiorczych można cofnąć
+UNDO_DEPTH = 10
+
 class EmployeeWindow(QWidget):
     """Okno zarządzania pracownikami"""
     
     def __init__(self):
         super().__init__()
         self.db_path = Path(__file__).parent.parent.parent / "database" / "fleet.db"
+        self.batch_service = BatchService(self.db_path)
+        self.versions = VersionService(self.db_path)
+        # Pracownik wczytany do formularza (wartości i wersja) - podstawa zapisu warunkowego
+        self.loaded = None
+        self.undo_stack = []
         self.setup_ui()
         self.load_employees()
     
@@ -125,15 +163,28 @@ class EmployeeWindow(QWidget):
         top_buttons = QHBoxLayout()
         
         self.refresh_button = QPushButton("🔄 Odśwież")
-        self.refresh_button.clicked.connect(self.load_employees)
+        self.refresh_button.clicked.connect(lambda: self.load_employees())
         
         self.delete_button = QPushButton("🗑️ Usuń zaznaczone")
         self.delete_button.setStyleSheet("background-color: #e74c3c; color: white;")
         self.delete_button.clicked.connect(self.delete_selected)
         
+        self.activate_button = QPushButton("✅ Aktywuj zaznaczone")
+        self.activate_button.clicked.connect(lambda: self.batch_set_active(True))
+
+        self.deactivate_button = QPushButton("⛔ Dezaktywuj zaznaczone")
+        self.deactivate_button.clicked.connect(lambda: self.batch_set_active(False))
+
+        self.undo_button = QPushButton("↩️ Cofnij")
+        self.undo_button.setEnabled(False)
+        self.undo_button.clicked.connect(self.undo_last)
+
         top_buttons.addWidget(self.refresh_button)
         top_buttons.addWidget(self.delete_button)
+        top_buttons.addWidget(self.activate_button)
+        top_buttons.addWidget(self.deactivate_button)
         top_buttons.addStretch()
+        top_buttons.addWidget(self.undo_button)
         
         table_layout.addLayout(top_buttons)
         
@@ -180,12 +231,13 @@ class EmployeeWindow(QWidget):
     def get_connection(self):
         """Połączenie z bazą danych"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = db.connect(self.db_path)
             return conn
         except Exception as e:
             QMessageBox.critical(self, "Błąd", f"Nie można połączyć z bazą:\n{str(e)}")
             return None
     
+    @profile_slot
     def load_employees(self):
         """Ładuje pracowników do tabeli"""
         conn = self.get_connection()
@@ -194,30 +246,13 @@ class EmployeeWindow(QWidget):
         
         try:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, first_name, last_name, position, 
-                       department, permissions, email, phone, is_active
-                FROM employees
-                ORDER BY last_name, first_name
-            """)
+            cursor.execute(EMPLOYEE_LIST_SQL + " ORDER BY last_name, first_name")
             
             employees = cursor.fetchall()
             self.table.setRowCount(len(employees))
             
             for row_idx, emp in enumerate(employees):
-                for col_idx, value in enumerate(emp):
-                    item = QTableWidgetItem(str(value))
-                    
-                    # Kolorowanie statusu
-                    if col_idx == 8:  # Kolumna is_active
-                        if value == 1 or value == '1' or value is True:
-                            item.setBackground(QColor(144, 238, 144))  # zielony
-                            item.setText("Aktywny")
-                        else:
-                            item.setBackground(QColor(255, 99, 71))    # czerwony
-                            item.setText("Nieaktywny")
-                    
-                    self.table.setItem(row_idx, col_idx, item)
+                self.fill_row(row_idx, emp)
             
             self.update_statistics(cursor)
             
@@ -226,6 +261,59 @@ class EmployeeWindow(QWidget):
         finally:
             conn.close()
     
+    def fill_row(self, row_idx, emp):
+        """Wypełnia jeden wiersz tabeli danymi pracownika"""
+        for col_idx, value in enumerate(emp):
+            item = QTableWidgetItem(str(value))
+            
+            # Kolorowanie statusu
+            if col_idx == 8:  # Kolumna is_active
+                if value == 1 or value == '1' or value is True:
+                    item.setBackground(QColor(144, 238, 144))  # zielony
+                    item.setText("Aktywny")
+                else:
+                    item.setBackground(QColor(255, 99, 71))    # czerwony
+                    item.setText("Nieaktywny")
+            
+            self.table.setItem(row_idx, col_idx, item)
+    
+    def refresh_rows(self, employee_ids):
+        """Odświeża tylko wskazanych pracowników (zmienieni, usunięci, przywróceni)"""
+        conn = self.get_connection()
+        if not conn:
+            return
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                EMPLOYEE_LIST_SQL + " WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps(sorted(employee_ids)),)
+            )
+            fresh = {emp[0]: emp for emp in cursor.fetchall()}
+            
+            wanted = set(employee_ids)
+            for row_idx in range(self.table.rowCount() - 1, -1, -1):
+                emp_id = int(self.table.item(row_idx, 0).text())
+                if emp_id not in wanted:
+                    continue
+                if emp_id in fresh:
+                    self.fill_row(row_idx, fresh.pop(emp_id))
+                else:
+                    self.table.removeRow(row_idx)
+            
+            # Przywróceni pracownicy wracają na miejsce wg nazwiska i imienia
+            for emp in sorted(fresh.values(), key=lambda e: (e[2], e[1])):
+                keys = [
+                    (self.table.item(i, 2).text(), self.table.item(i, 1).text())
+                    for i in range(self.table.rowCount())
+                ]
+                row_idx = bisect.bisect_left(keys, (emp[2], emp[1]))
+                self.table.insertRow(row_idx)
+                self.fill_row(row_idx, emp)
+            
+            self.update_statistics(cursor)
+        finally:
+            conn.close()
+    
     def update_statistics(self, cursor):
         """Aktualizuje statystyki"""
         try:
@@ -246,7 +334,7 @@ class EmployeeWindow(QWidget):
             self.drivers_label.setText(f"Kierowcy: {drivers}")
             
         except Exception as e:
-            print(f"Błąd statystyk: {e}")
+            logger.warning(f"Błąd statystyk: {e}")
     
     def add_employee(self):
         """Dodaje nowego pracownika"""
@@ -286,9 +374,23 @@ class EmployeeWindow(QWidget):
         finally:
             conn.close()
     
+    def form_values(self):
+        """Wartości formularza (kolumny EMPLOYEE_FIELDS)"""
+        return {
+            "first_name": self.first_name.text().strip(),
+            "last_name": self.last_name.text().strip(),
+            "position": self.position.text().strip(),
+            "department": self.department.currentText(),
+            "permissions": self.permissions.currentText(),
+            "email": self.email.text().strip(),
+            "phone": self.phone.text().strip(),
+            "is_active": 1 if self.is_active.isChecked() else 0,
+            "notes": self.notes.toPlainText().strip(),
+        }
+    
     def update_employee(self):
-        """Aktualizuje pracownika"""
-        if not self.employee_id.text():
+        """Aktualizuje pracownika (zapis warunkowy - konflikt pokazuje różnice pól)"""
+        if not self.employee_id.text() or self.loaded is None:
             QMessageBox.warning(self, "Błąd", "Wybierz pracownika do edycji!")
             return
         
@@ -300,108 +402,151 @@ class EmployeeWindow(QWidget):
             return
         
         try:
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE employees 
-                SET first_name = ?, last_name = ?, position = ?, department = ?,
-                    permissions = ?, email = ?, phone = ?, is_active = ?, notes = ?
-                WHERE id = ?
-            """, (
-                self.first_name.text().strip(),
-                self.last_name.text().strip(),
-                self.position.text().strip(),
-                self.department.currentText(),
-                self.permissions.currentText(),
-                self.email.text().strip(),
-                self.phone.text().strip(),
-                1 if self.is_active.isChecked() else 0,
-                self.notes.toPlainText().strip(),
-                int(self.employee_id.text())
-            ))
-            
-            conn.commit()
+            saved = save_with_conflict_check(
+                self, self.versions, conn, "employees", int(self.employee_id.text()),
+                self.loaded, self.form_values(), EMPLOYEE_FIELDS
+            )
+            if saved is None:
+                return
             QMessageBox.information(self, "Sukces", "Pracownik zaktualizowany!")
             
             self.load_employees()
             self.clear_form()
             
         except Exception as e:
+            conn.rollback()
             QMessageBox.critical(self, "Błąd", f"Błąd aktualizacji:\n{str(e)}")
         finally:
             conn.close()
     
+    def selected_ids(self):
+        """Id pracowników z zaznaczonych wierszy"""
+        return [
+            int(self.table.item(index.row(), 0).text())
+            for index in self.table.selectionModel().selectedRows()
+        ]
+    
     def delete_selected(self):
         """Usuwa zaznaczonych pracowników"""
-        selected_rows = set(index.row() for index in self.table.selectedIndexes())
+        employee_ids = self.selected_ids()
         
-        if not selected_rows:
+        if not employee_ids:
             QMessageBox.warning(self, "Błąd", "Wybierz pracowników do usunięcia!")
             return
         
         reply = QMessageBox.question(
             self, "Potwierdzenie",
-            f"Czy na pewno usunąć {len(selected_rows)} pracowników?",
+            f"Czy na pewno usunąć {len(employee_ids)} pracowników?",
             QMessageBox.Yes | QMessageBox.No
         )
         
         if reply != QMessageBox.Yes:
             return
         
+        self.apply_batch(lambda: self.batch_service.delete(
+            "employees", employee_ids, f"usunięcie {len(employee_ids)} pracowników"
+        ))
+    
+    def batch_set_active(self, active: bool):
+        """Aktywuje / dezaktywuje zaznaczonych pracowników"""
+        employee_ids = self.selected_ids()
+        if not employee_ids:
+            QMessageBox.warning(self, "Błąd", "Zaznacz pracowników w tabeli!")
+            return
+        
+        label = "aktywacja" if active else "dezaktywacja"
+        self.apply_batch(lambda: self.batch_service.update(
+            "employees", employee_ids, {"is_active": 1 if active else 0},
+            f"{label} {len(employee_ids)} pracowników"
+        ))
+    
+    def apply_batch(self, operation):
+        """Wykonuje operację zbiorczą, zapamiętuje migawkę do cofnięcia i odświeża wiersze"""
+        try:
+            snapshot = operation()
+        except Exception as e:
+            QMessageBox.critical(self, "Błąd", f"Błąd operacji zbiorczej:\n{str(e)}")
+            return
+        
+        self.undo_stack.append(snapshot)
+        del self.undo_stack[:-UNDO_DEPTH]
+        self.update_undo_button()
+        self.refresh_rows(snapshot.ids)
+    
+    def undo_last(self):
+        """Cofa ostatnią operację zbiorczą"""
+        if not self.undo_stack:
+            return
+        
+        snapshot = self.undo_stack.pop()
+        self.update_undo_button()
+        try:
+            restored = self.batch_service.undo(snapshot)
+        except Exception as e:
+            QMessageBox.critical(self, "Błąd", f"Nie udało się cofnąć:\n{str(e)}")
+            return
+        
+        self.refresh_rows(snapshot.ids)
+        skipped = len(snapshot.rows) - len(restored)
+        if skipped:
+            QMessageBox.information(
+                self, "Cofnięto częściowo",
+                f"Przywrócono {len(restored)} pracowników. {skipped} zmieniono w międzyczasie - pominięto."
+            )
+    
+    def update_undo_button(self):
+        self.undo_button.setEnabled(bool(self.undo_stack))
+        self.undo_button.setToolTip(
+            f"Cofnij: {self.undo_stack[-1].description}" if self.undo_stack else ""
+        )
+    
+    def load_employee_to_form(self, index):
+        """Ładuje pracownika z bazy (razem z wersją wiersza) do formularza"""
+        employee_id = int(self.table.item(index.row(), 0).text())
         conn = self.get_connection()
         if not conn:
             return
-        
         try:
-            cursor = conn.cursor()
-            
-            for row in selected_rows:
-                emp_id = int(self.table.item(row, 0).text())
-                cursor.execute("DELETE FROM employees WHERE id = ?", (emp_id,))
-            
-            conn.commit()
-            QMessageBox.information(self, "Sukces", "Pracownicy usunięci!")
-            
-            self.load_employees()
-            
+            loaded = self.versions.load(conn, "employees", employee_id, EMPLOYEE_FIELDS)
         except Exception as e:
-            QMessageBox.critical(self, "Błąd", f"Błąd usuwania:\n{str(e)}")
+            QMessageBox.critical(self, "Błąd", f"Błąd odczytu pracownika:\n{str(e)}")
+            return
         finally:
             conn.close()
-    
-    def load_employee_to_form(self, index):
-        """Ładuje dane pracownika do formularza"""
-        row = index.row()
+        if loaded is None:
+            QMessageBox.information(self, "Pracownik", "Pracownik został w międzyczasie usunięty.")
+            self.refresh_rows([employee_id])
+            return
         
-        self.employee_id.setText(self.table.item(row, 0).text())
-        self.first_name.setText(self.table.item(row, 1).text())
-        self.last_name.setText(self.table.item(row, 2).text())
-        self.position.setText(self.table.item(row, 3).text())
+        self.loaded = loaded
+        self.employee_id.setText(str(employee_id))
+        self.first_name.setText(loaded["first_name"] or "")
+        self.last_name.setText(loaded["last_name"] or "")
+        self.position.setText(loaded["position"] or "")
         
         # Ustawienie comboboxów
-        dept = self.table.item(row, 4).text()
+        dept = loaded["department"] or ""
         idx = self.department.findText(dept)
         if idx >= 0:
             self.department.setCurrentIndex(idx)
         else:
             self.department.setCurrentText(dept)
         
-        perm = self.table.item(row, 5).text()
-        idx = self.permissions.findText(perm)
+        idx = self.permissions.findText(loaded["permissions"] or "")
         if idx >= 0:
             self.permissions.setCurrentIndex(idx)
         
-        self.email.setText(self.table.item(row, 6).text())
-        self.phone.setText(self.table.item(row, 7).text())
-        
-        # Status
-        status_text = self.table.item(row, 8).text()
-        self.is_active.setChecked(status_text == "Aktywny")
+        self.email.setText(loaded["email"] or "")
+        self.phone.setText(loaded["phone"] or "")
+        self.is_active.setChecked(bool(loaded["is_active"]))
+        self.notes.setPlainText(loaded["notes"] or "")
         
         self.add_button.setEnabled(False)
         self.update_button.setEnabled(True)
     
     def clear_form(self):
         """Czyści formularz"""
+        self.loaded = None
         self.employee_id.clear()
         self.first_name.clear()
         self.last_name.clear()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Tablica stanu floty na głównym oknie.
+
+Co ``refresh_ms`` panel pyta FleetStatusService o zmiany; gdy nikt nic nie
+zapisał, kosztuje to jedno ``PRAGMA data_version``. Odświeżanie jest
+wstrzymane, gdy okno jest zminimalizowane lub panel niewidoczny.
+"""
+
+import logging
+
+from PySide6.QtWidgets import QGroupBox, QGridLayout, QLabel, QVBoxLayout
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QFont
+
+from services.fleet_status_service import FleetStatusService
+
+logger = logging.getLogger(__name__)
+
+# (klucz, etykieta, kolor gdy > 0 albo None)
+TILES = [
+    ("available", "🟢 Dostępne", None),
+    ("in_use", "🟡 W użyciu", None),
+    ("in_trip", "🚚 W trasie", None),
+    ("service", "🔧 Serwis", None),
+    ("broken", "🔴 Awaria", "#c0392b"),
+    ("open_key_logs", "🔑 Wydane klucze", None),
+    ("active_trips", "🛣️ Aktywne przejazdy", None),
+    ("low_fuel", "⛽ Niski poziom paliwa", "#e67e22"),
+    ("overdue_returns", "⏰ Przeterminowane zwroty", "#c0392b"),
+]
+
+
+class FleetStatusPanel(QGroupBox):
+    """Liczniki floty odświeżane na żywo."""
+
+    def __init__(self, db_path, parent=None, refresh_ms: int = 2000, overdue_hours: float = None):
+        super().__init__("📋 Stan floty", parent)
+        self.service = FleetStatusService(db_path, overdue_hours=overdue_hours)
+        self.values = {}
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        grid = QGridLayout()
+        layout.addLayout(grid)
+
+        value_font = QFont()
+        value_font.setPointSize(18)
+        value_font.setBold(True)
+        for index, (key, label, _color) in enumerate(TILES):
+            value = QLabel("–")
+            value.setFont(value_font)
+            value.setAlignment(Qt.AlignCenter)
+            caption = QLabel(label)
+            caption.setAlignment(Qt.AlignCenter)
+            row, col = divmod(index, 4)
+            grid.addWidget(value, row * 2, col)
+            grid.addWidget(caption, row * 2 + 1, col)
+            self.values[key] = value
+
+        self.updated_label = QLabel()
+        self.updated_label.setStyleSheet("color: #7f8c8d;")
+        self.updated_label.setAlignment(Qt.AlignRight)
+        layout.addWidget(self.updated_label)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(refresh_ms)
+        self.timer.timeout.connect(self.refresh)
+
+    def start(self):
+        """Pierwszy odczyt i start odświeżania"""
+        self.refresh()
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+        self.service.close()
+
+    def refresh(self):
+        """Przepisuje liczniki, jeśli dane w bazie się zmieniły."""
+        if not self.isVisible() or self.window().isMinimized():
+            return
+        try:
+            snapshot = self.service.refresh()
+        except Exception as e:
+            logger.warning(f"Nie udało się odczytać stanu floty: {e}")
+            self.service.close()
+            return
+        if snapshot is None:
+            return
+
+        counters = dict(snapshot.vehicles_by_status)
+        counters.update(
+            open_key_logs=snapshot.open_key_logs,
+            active_trips=snapshot.active_trips,
+            low_fuel=snapshot.low_fuel,
+            overdue_returns=snapshot.overdue_returns,
+        )
+        for key, _label, color in TILES:
+            value = counters.get(key, 0)
+            label = self.values[key]
+            label.setText(str(value))
+            label.setStyleSheet(f"color: {color};" if color and value else "")
+        self.updated_label.setText(
+            f"Pojazdów: {snapshot.vehicles_total} | aktualizacja: "
+            f"{snapshot.taken_at.strftime('%H:%M:%S')}"
+        )
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Okno importu masowego (CSV / XLSX).
+
+Import działa w osobnym wątku (QThread), więc okno główne nie zamarza przy
+tysiącach wierszy; postęp przychodzi po każdej paczce zapisanej w bazie.
+"""
+
+import logging
+from pathlib import Path
+
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QComboBox, QLineEdit,
+    QPushButton, QCheckBox, QLabel, QTableWidget, QTableWidgetItem,
+    QHeaderView, QFileDialog, QMessageBox
+)
+from PySide6.QtCore import QThread, Signal
+
+from services.import_service import (
+    ENTITIES, ImportFileError, ImportService, write_errors_csv
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ImportWorker(QThread):
+    """Uruchamia ImportService poza wątkiem GUI."""
+
+    progress = Signal(int)
+    finished_ok = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, db_path, path, entity, mode, dry_run, parent=None):
+        super().__init__(parent)
+        self.service = ImportService(db_path)
+        self.args = (path, entity, mode, dry_run)
+
+    def run(self):
+        path, entity, mode, dry_run = self.args
+        try:
+            result = self.service.import_file(path, entity, mode=mode, dry_run=dry_run,
+                                              progress=self.progress.emit)
+        except (ImportFileError, OSError) as e:
+            self.failed.emit(str(e))
+            return
+        except Exception as e:
+            logger.exception("Import nie powiódł się")
+            self.failed.emit(f"Nieoczekiwany błąd: {e}")
+            return
+        self.finished_ok.emit(result)
+
+
+class ImportDialog(QDialog):
+    """Wybór pliku, tryb importu, postęp i lista odrzuconych wierszy."""
+
+    # Emitowany po zapisie (nie po próbie), z nazwą tabeli
+    imported = Signal(str)
+
+    def __init__(self, db_path, entity: str = "vehicles", parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.worker = None
+        self.result = None
+        self.setWindowTitle("📥 Import danych")
+        self.resize(720, 520)
+        self.init_ui(entity)
+
+    def init_ui(self, entity):
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        form = QFormLayout()
+        self.entity_combo = QComboBox()
+        for name, spec in ENTITIES.items():
+            self.entity_combo.addItem(spec.label, name)
+        self.entity_combo.setCurrentIndex(max(0, self.entity_combo.findData(entity)))
+        form.addRow("Dane:", self.entity_combo)
+
+        file_row = QHBoxLayout()
+        self.file_edit = QLineEdit()
+        self.file_edit.setPlaceholderText("Plik CSV lub XLSX...")
+        browse_btn = QPushButton("📂 Wybierz...")
+        browse_btn.clicked.connect(self.browse)
+        file_row.addWidget(self.file_edit)
+        file_row.addWidget(browse_btn)
+        form.addRow("Plik:", file_row)
+
+        self.upsert_check = QCheckBox("Aktualizuj istniejące rekordy (nr rejestracyjny / VIN / nr prawa jazdy)")
+        form.addRow("", self.upsert_check)
+        layout.addLayout(form)
+
+        self.status_label = QLabel("Wybierz plik. Pierwszy wiersz musi zawierać nazwy kolumn.")
+        self.status_label.setWordWrap(True)
+        layout.addWidget(self.status_label)
+
+        self.errors_table = QTableWidget(0, 3)
+        self.errors_table.setHorizontalHeaderLabels(["Wiersz", "Pole", "Błąd"])
+        self.errors_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        self.errors_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.errors_table)
+
+        buttons = QHBoxLayout()
+        self.dry_run_btn = QPushButton("🔍 Sprawdź (bez zapisu)")
+        self.dry_run_btn.clicked.connect(lambda: self.start(dry_run=True))
+        self.import_btn = QPushButton("📥 Importuj")
+        self.import_btn.setStyleSheet("background-color: #27ae60; color: white; font-weight: bold;")
+        self.import_btn.clicked.connect(lambda: self.start(dry_run=False))
+        self.save_errors_btn = QPushButton("💾 Zapisz błędy...")
+        self.save_errors_btn.setEnabled(False)
+        self.save_errors_btn.clicked.connect(self.save_errors)
+        close_btn = QPushButton("Zamknij")
+        close_btn.clicked.connect(self.close)
+        buttons.addWidget(self.dry_run_btn)
+        buttons.addWidget(self.import_btn)
+        buttons.addStretch()
+        buttons.addWidget(self.save_errors_btn)
+        buttons.addWidget(close_btn)
+        layout.addLayout(buttons)
+
+    def browse(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Wybierz plik do importu", "", "Dane (*.csv *.xlsx);;Wszystkie pliki (*)"
+        )
+        if path:
+            self.file_edit.setText(path)
+
+    def start(self, dry_run: bool):
+        path = Path(self.file_edit.text().strip())
+        if not path.is_file():
+            QMessageBox.warning(self, "Błąd", "Wybierz istniejący plik CSV lub XLSX.")
+            return
+
+        self.errors_table.setRowCount(0)
+        self.save_errors_btn.setEnabled(False)
+        self.set_busy(True)
+        self.status_label.setText("⏳ Trwa sprawdzanie..." if dry_run else "⏳ Trwa import...")
+
+        self.worker = ImportWorker(
+            self.db_path, path, self.entity_combo.currentData(),
+            "upsert" if self.upsert_check.isChecked() else "insert", dry_run, self,
+        )
+        self.worker.progress.connect(
+            lambda rows: self.status_label.setText(f"⏳ Przetworzono wierszy: {rows}")
+        )
+        self.worker.finished_ok.connect(self.on_finished)
+        self.worker.failed.connect(self.on_failed)
+        self.worker.start()
+
+    def set_busy(self, busy: bool):
+        for widget in (self.dry_run_btn, self.import_btn, self.entity_combo, self.upsert_check):
+            widget.setEnabled(not busy)
+
+    def on_finished(self, result):
+        self.set_busy(False)
+        self.result = result
+        prefix = "🔍 Próba - nic nie zapisano." if result.dry_run else "✅ Import zakończony."
+        self.status_label.setText(
+            f"{prefix} Wierszy: {result.total}, dodano: {result.inserted}, "
+            f"zaktualizowano: {result.updated}, odrzucono: {result.skipped}"
+            + "".join(f"\nℹ️ {note}" for note in result.notes)
+        )
+
+        self.errors_table.setRowCount(len(result.errors))
+        for row, error in enumerate(result.errors):
+            self.errors_table.setItem(row, 0, QTableWidgetItem(str(error.line)))
+            self.errors_table.setItem(row, 1, QTableWidgetItem(error.field or ""))
+            self.errors_table.setItem(row, 2, QTableWidgetItem(error.message))
+        self.save_errors_btn.setEnabled(bool(result.errors))
+
+        if not result.dry_run and (result.inserted or result.updated):
+            self.imported.emit(result.entity)
+
+    def on_failed(self, message):
+        self.set_busy(False)
+        self.status_label.setText(f"❌ {message}")
+        QMessageBox.critical(self, "Błąd importu", message)
+
+    def save_errors(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Zapisz listę błędów", "bledy_importu.csv", "CSV (*.csv)")
+        if path and self.result:
+            write_errors_csv(self.result.errors, Path(path))
+
+    def closeEvent(self, event):
+        if self.worker is not None and self.worker.isRunning():
+            QMessageBox.information(self, "Import", "Poczekaj na zakończenie importu.")
+            event.ignore()
+            return
+        super().closeEvent(event)
@@ -10,9 +10,17 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt, QDateTime
 from PySide6.QtGui import QFont
-import sqlite3
+import logging
+from datetime import timedelta
 from pathlib import Path
 
+from services.key_service import KeyAlreadyOut, KeyService, MileageDecrease
+from services.reservation_service import ReservationService
+from utils import db, fleet_index
+from utils.constants import BUSINESS_RULES
+
+logger = logging.getLogger(__name__)
+
 class KeyCheckoutWindow(QWidget):
     """Okno wydawania kluczyków do pojazdu."""
     
@@ -20,6 +28,9 @@ class KeyCheckoutWindow(QWidget):
         super().__init__()
         self.db_path = Path(__file__).parent.parent.parent / "database" / "fleet.db"
         self.selected_vehicle_tank = 0
+        self.fleet_index = fleet_index.get_index(self.db_path)
+        self.reservations = ReservationService(self.db_path)
+        self.keys = KeyService(self.db_path)
         self.setup_ui()
         self.load_employees()
         self.load_vehicles()
@@ -113,51 +124,31 @@ class KeyCheckoutWindow(QWidget):
     # ==========================
 
     def on_vehicle_selected(self, index):
-        """AUTO-WYPEŁNIA ostatni przebieg i paliwo pojazdu z tabeli vehicles."""
+        """AUTO-WYPEŁNIA ostatni przebieg i paliwo pojazdu (z indeksu stanu floty)."""
         if index == -1:
             return
 
-        conn = self.get_connection()
-        if not conn:
-            return
-
-        try:
-            cursor = conn.cursor()
-            vehicle_id = self.vehicle_combo.currentData()
-
-            cursor.execute(
-                """
-                SELECT current_mileage, current_fuel, tank_capacity, registration_number
-                FROM vehicles WHERE id=?
-                """,
-                (vehicle_id,),
-            )
-
-            row = cursor.fetchone()
-            if row:
-                last_mileage, last_fuel, tank_capacity, reg_number = row
+        state = self.fleet_index.get(self.vehicle_combo.currentData())
+        if state:
+            # Auto-wypełnianie przebiegu
+            if self.checkout_mileage.value() == 0:
+                self.checkout_mileage.setValue(state.current_mileage)
 
-                # Auto-wypełnianie przebiegu
-                if self.checkout_mileage.value() == 0:
-                    self.checkout_mileage.setValue(last_mileage or 0)
+            # Auto-wypełnianie paliwa
+            if self.checkout_fuel.value() == 0:
+                self.checkout_fuel.setValue(state.current_fuel)
 
-                # Auto-wypełnianie paliwa
-                if self.checkout_fuel.value() == 0:
-                    self.checkout_fuel.setValue(last_fuel if last_fuel is not None else 50.0)
+            self.selected_vehicle_tank = state.tank_capacity or 100
+            self.tank_info_label.setText(f"{self.selected_vehicle_tank:.1f} L (max)")
 
-                self.selected_vehicle_tank = tank_capacity or 100
-                self.tank_info_label.setText(f"{self.selected_vehicle_tank:.1f} L (max)")
-
-                tooltip = (
-                    f"Auto-wypełniono:\n"
-                    f"Przebieg: {float(last_mileage or 0):.1f} km\n"
-                    f"Paliwo: {float(last_fuel or 0):.1f} L"
-                )
-                self.checkout_mileage.setToolTip(tooltip)
-                self.checkout_fuel.setToolTip(tooltip)
-                self.validate_fuel_tank()
-        finally:
-            conn.close()
+            tooltip = (
+                f"Auto-wypełniono:\n"
+                f"Przebieg: {state.current_mileage:.1f} km\n"
+                f"Paliwo: {state.current_fuel:.1f} L"
+            )
+            self.checkout_mileage.setToolTip(tooltip)
+            self.checkout_fuel.setToolTip(tooltip)
+            self.validate_fuel_tank()
 
     def validate_fuel_tank(self):
         """Walidacja: paliwo nie może przekroczyć pojemności baku."""
@@ -179,7 +170,7 @@ class KeyCheckoutWindow(QWidget):
 
     def get_connection(self):
         try:
-            return sqlite3.connect(self.db_path)
+            return db.connect(self.db_path)
         except:
             return None
 
@@ -210,32 +201,27 @@ class KeyCheckoutWindow(QWidget):
             conn.close()
 
     def load_vehicles(self):
-        conn = self.get_connection()
-        if not conn:
-            return
-
         try:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT id, registration_number, brand, model, current_fuel, tank_capacity
-                FROM vehicles
-                WHERE status = 'available'
-                ORDER BY registration_number
-                """
-            )
+            vehicles = self.fleet_index.available()
+            now = self.checkout_dt.dateTime().toPython()
+            horizon = now + timedelta(hours=BUSINESS_RULES['RESERVATION_LOOKAHEAD_HOURS'])
+            reserved = self.reservations.in_range(now, horizon)
+        except Exception as e:
+            logger.warning(f"Nie udało się odczytać pojazdów: {e}")
+            return
 
-            rows = cursor.fetchall()
-            self.vehicle_combo.clear()
-            for vid, reg, brand, model, fuel, tank in rows:
-                fuel_text = f"{float(fuel or 0):.1f}L"
-                self.vehicle_combo.addItem(
-                    f"{reg} - {brand} {model} ({fuel_text})", vid
-                )
-        finally:
-            conn.close()
+        self.vehicle_combo.clear()
+        for state in vehicles:
+            label = (f"{state.registration_number} - {state.brand} {state.model} "
+                     f"({state.current_fuel:.1f}L)")
+            if state.id in reserved:
+                label += f" 📅 rez. od {reserved[state.id][0].start_time:%d.%m %H:%M}"
+            self.vehicle_combo.addItem(label, state.id)
 
     def refresh_lists(self):
+        # Ręczne odświeżenie uwzględnia też zmiany z innych stanowisk
+        self.fleet_index.invalidate()
+        self.reservations.invalidate()
         self.load_employees()
         self.load_vehicles()
 
@@ -283,22 +269,27 @@ class KeyCheckoutWindow(QWidget):
             return
 
         try:
-            cursor = conn.cursor()
             employee_id = self.employee_combo.currentData()
             vehicle_id = self.vehicle_combo.currentData()
-            checkout_time = self.checkout_dt.dateTime().toString("yyyy-MM-dd HH:mm:ss")
+            checkout_time = self.checkout_dt.dateTime().toPython()
             checkout_mileage = self.checkout_mileage.value()
             checkout_fuel = self.checkout_fuel.value()
             storage_location = self.storage_location.text().strip()
             notes = self.notes.toPlainText().strip()
 
-            # ✅ BLOKADA 1: Czy pojazd ma już AKTYWNY klucz (status='out')?
-            cursor.execute(
-                "SELECT COUNT(*) FROM key_log WHERE vehicle_id=? AND status='out'",
-                (vehicle_id,),
-            )
-            active_keys = cursor.fetchone()[0]
-            if active_keys > 0:
+            # ✅ BLOKADA 1: Rezerwacja innego pracownika w najbliższych godzinach
+            # (pytanie przed zapisem - okno dialogowe nie trzyma blokady bazy)
+            reservation = self.check_reservation(vehicle_id, employee_id, checkout_time)
+            if reservation is False:
+                return
+
+            # ✅ BLOKADA 2 i 3: aktywny klucz pojazdu, cofnięty licznik (KeyService)
+            try:
+                self.keys.checkout(conn, vehicle_id, employee_id, checkout_mileage, checkout_fuel,
+                                   checkout_time, storage_location, notes)
+                conn.commit()
+            except KeyAlreadyOut:
+                conn.rollback()
                 QMessageBox.warning(
                     self,
                     "🚫 Pojazd już w użytkowaniu",
@@ -308,58 +299,21 @@ class KeyCheckoutWindow(QWidget):
                     f"🚗 Pojazd: {self.vehicle_combo.currentText()}",
                 )
                 return
-
-            # ✅ BLOKADA 2: Czy nowy przebieg >= poprzedniemu?
-            cursor.execute(
-                "SELECT current_mileage FROM vehicles WHERE id=?",
-                (vehicle_id,),
-            )
-            row = cursor.fetchone()
-            current_vehicle_mileage = float(row[0] or 0) if row else 0.0
-
-            if checkout_mileage < current_vehicle_mileage:
+            except MileageDecrease as e:
+                conn.rollback()
                 QMessageBox.warning(
                     self,
                     "🚫 Błąd przebiegu",
                     f"Wpisany przebieg ({checkout_mileage:.1f} km) "
-                    f"jest MNIEJSZY niż zapisany dla pojazdu ({current_vehicle_mileage:.1f} km).\n\n"
+                    f"jest MNIEJSZY niż zapisany dla pojazdu ({e.recorded:.1f} km).\n\n"
                     "⚠️ Licznik nie może się coofać!\n"
                     "Sprawdź odczyt na liczniku lub zmień wartość.",
                 )
                 return
-
-            # ✅ Zapis rekordu w key_log
-            cursor.execute(
-                """
-                INSERT INTO key_log (
-                    vehicle_id, employee_id, checkout_time,
-                    checkout_mileage, checkout_fuel,
-                    storage_location, status, notes
-                )
-                VALUES (?, ?, ?, ?, ?, ?, 'out', ?)
-                """,
-                (
-                    vehicle_id,
-                    employee_id,
-                    checkout_time,
-                    checkout_mileage,
-                    checkout_fuel,
-                    storage_location,
-                    notes,
-                ),
-            )
-
-            # ✅ Aktualizacja pojazdu
-            cursor.execute(
-                """
-                UPDATE vehicles
-                SET status='in_use', current_mileage=?, current_fuel=?
-                WHERE id=?
-                """,
-                (checkout_mileage, checkout_fuel, vehicle_id),
-            )
-
-            conn.commit()
+            fleet_index.notify(self.db_path, vehicle_id, status="in_use",
+                               current_mileage=checkout_mileage, current_fuel=checkout_fuel)
+            if reservation is not None:
+                self.reservations.mark_picked_up(reservation.id)
 
             QMessageBox.information(
                 self,
@@ -376,10 +330,41 @@ class KeyCheckoutWindow(QWidget):
             self.load_vehicles()
 
         except Exception as e:
+            conn.rollback()
             QMessageBox.critical(self, "❌ Błąd bazy danych", str(e))
         finally:
             conn.close()
 
+    def check_reservation(self, vehicle_id, employee_id, checkout_time):
+        """
+        Sprawdza rezerwacje pojazdu od chwili wydania przez RESERVATION_LOOKAHEAD_HOURS.
+
+        Zwraca rezerwację tego pracownika (do oznaczenia jako odebrana), None gdy
+        nic nie koliduje, albo False, gdy użytkownik zrezygnował z wydania.
+        """
+        horizon = checkout_time + timedelta(hours=BUSINESS_RULES['RESERVATION_LOOKAHEAD_HOURS'])
+        bookings = self.reservations.conflicts(vehicle_id, checkout_time, horizon)
+        own = next((r for r in bookings if r.employee_id == employee_id and r.status == "active"), None)
+        others = [r for r in bookings if r.employee_id != employee_id]
+        if not others:
+            return own
+
+        details = "\n".join(
+            f"• {r.start_time:%d.%m %H:%M} - {r.end_time:%d.%m %H:%M} ({r.purpose or 'bez opisu'})"
+            for r in others
+        )
+        reply = QMessageBox.question(
+            self,
+            "📅 Pojazd zarezerwowany",
+            f"Pojazd {self.vehicle_combo.currentText()} jest zarezerwowany "
+            f"dla innej osoby:\n\n{details}\n\nCzy mimo to wydać kluczyk?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No,
+        )
+        if reply != QMessageBox.Yes:
+            return False
+        return own
+
     def clear_form(self):
         self.employee_combo.setCurrentIndex(-1)
         self.vehicle_combo.setCurrentIndex(-1)
@@ -9,15 +9,27 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt, QDateTime
 from PySide6.QtGui import QFont
-import sqlite3
+import logging
 from pathlib import Path
 
+from services.key_service import KeyService, MileageDecrease
+from services.kiosk_service import KioskService, ScanError, parse_scan
+from services.maintenance_service import MaintenanceService
+from services.version_service import StaleVersion
+from utils import db, fleet_index
+
+logger = logging.getLogger(__name__)
+
 class KeyReturnWindow(QWidget):
     """Okno zwrotu kluczyków do pojazdu."""
 
     def __init__(self):
         super().__init__()
         self.db_path = Path(__file__).parent.parent.parent / "database" / "fleet.db"
+        self.keys = KeyService(self.db_path)
+        self.kiosk = KioskService(self.db_path)
+        # key_log id -> wersja wiersza z chwili załadowania listy
+        self.keylog_versions = {}
         self.setup_ui()
         self.load_active_keylogs()
 
@@ -38,6 +50,12 @@ class KeyReturnWindow(QWidget):
         form_group.setLayout(form_layout)
         main_layout.addWidget(form_group)
 
+        # Skaner (klawiatura): kod QR karty drogowej albo zawieszki klucza
+        self.scan_input = QLineEdit()
+        self.scan_input.setPlaceholderText("Zeskanuj kod QR karty drogowej lub kluczyka i naciśnij Enter")
+        self.scan_input.returnPressed.connect(self.apply_scan)
+        form_layout.addRow("Skan:", self.scan_input)
+
         # Aktywne wydania kluczy (status='out')
         self.keylog_combo = QComboBox()
         self.keylog_combo.setPlaceholderText("Wybierz aktywne wydanie klucza")
@@ -88,7 +106,7 @@ class KeyReturnWindow(QWidget):
 
     def get_connection(self):
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = db.connect(self.db_path)
             return conn
         except Exception as e:
             QMessageBox.critical(self, "Błąd", f"Błąd połączenia z bazą:\n{str(e)}")
@@ -104,7 +122,7 @@ class KeyReturnWindow(QWidget):
             cursor.execute("""
                 SELECT kl.id, v.registration_number, v.brand, v.model, 
                        e.first_name, e.last_name, kl.checkout_time, 
-                       kl.checkout_mileage, kl.checkout_fuel
+                       kl.checkout_mileage, kl.checkout_fuel, kl.version
                 FROM key_log kl
                 JOIN vehicles v ON kl.vehicle_id = v.id
                 JOIN employees e ON kl.employee_id = e.id
@@ -113,8 +131,10 @@ class KeyReturnWindow(QWidget):
             """)
             rows = cursor.fetchall()
             self.keylog_combo.clear()
+            self.keylog_versions = {}
             for row in rows:
-                log_id, reg, brand, model, first, last, checkout_time, checkout_mileage, checkout_fuel = row
+                log_id, reg, brand, model, first, last, checkout_time, checkout_mileage, checkout_fuel, version = row
+                self.keylog_versions[log_id] = version
                 label = f"{log_id} | {reg} - {brand} {model} | {first} {last} | start: {checkout_time} | {checkout_mileage or 0:.1f}km, {checkout_fuel or 0:.1f}L"
                 self.keylog_combo.addItem(label, log_id)
         except Exception as e:
@@ -122,6 +142,36 @@ class KeyReturnWindow(QWidget):
         finally:
             conn.close()
 
+    def apply_scan(self):
+        """Wybiera wydanie klucza ze zeskanowanego kodu i wypełnia formularz."""
+        text = self.scan_input.text()
+        self.scan_input.clear()
+        if not text.strip():
+            return
+        conn = self.get_connection()
+        if not conn:
+            return
+        try:
+            target = self.kiosk.resolve(conn, parse_scan(text))
+        except ScanError as e:
+            QMessageBox.warning(self, "Skan", scan_error_message(e))
+            return
+        finally:
+            conn.close()
+
+        index = self.keylog_combo.findData(target.key_log_id)
+        if index == -1:
+            self.load_active_keylogs()
+            index = self.keylog_combo.findData(target.key_log_id)
+        self.keylog_combo.setCurrentIndex(index)
+        self.return_dt.setDateTime(QDateTime.currentDateTime())
+        self.return_mileage.setValue(target.suggested_mileage)
+        self.return_fuel.setValue(target.current_fuel or target.checkout_fuel or 0)
+        if target.storage_location:
+            self.storage_location.setText(target.storage_location)
+        self.return_mileage.setFocus()
+        self.return_mileage.selectAll()
+
     def validate_form(self) -> bool:
         errors = []
         if self.keylog_combo.currentIndex() == -1:
@@ -146,40 +196,44 @@ class KeyReturnWindow(QWidget):
             return
 
         try:
-            cursor = conn.cursor()
             log_id = self.keylog_combo.currentData()
-            return_time = self.return_dt.dateTime().toString("yyyy-MM-dd HH:mm:ss")
+            return_time = self.return_dt.dateTime().toPython()
             return_mileage = self.return_mileage.value()
             return_fuel = self.return_fuel.value()
             storage_location = self.storage_location.text().strip()
             notes = self.notes.toPlainText().strip()
 
-            # Pobierz vehicle_id z key_log
-            cursor.execute("SELECT vehicle_id FROM key_log WHERE id = ?", (log_id,))
-            row = cursor.fetchone()
-            if not row:
-                QMessageBox.critical(self, "Błąd", "Nie znaleziono wpisu w dzienniku kluczy.")
+            # Zamknięcie wpisu w key_log i pojazd -> available (KeyService)
+            try:
+                vehicle_id = self.keys.return_key(conn, log_id, return_mileage, return_fuel,
+                                                  return_time, storage_location, notes,
+                                                  self.keylog_versions.get(log_id))
+                conn.commit()
+            except StaleVersion:
+                conn.rollback()
+                QMessageBox.warning(
+                    self, "Wpis zmieniony",
+                    "To wydanie kluczyka zostało w międzyczasie zmienione lub zwrócone "
+                    "na innym stanowisku (np. w kiosku). Lista została odświeżona.",
+                )
+                self.load_active_keylogs()
                 return
-            vehicle_id = row[0]
-
-            # Zaktualizuj key_log (zwrot)
-            cursor.execute("""
-                UPDATE key_log 
-                SET return_time = ?, return_mileage = ?, return_fuel = ?, 
-                    storage_location = ?, status = 'returned',
-                    notes = COALESCE(notes, ?) || CASE WHEN ? != '' THEN '\n' || ? ELSE '' END
-                WHERE id = ?
-            """, (return_time, return_mileage, return_fuel, storage_location, 
-                  notes, notes, notes, log_id))
-
-            # ZMIANA STATUSU: pojazd -> available + aktualizacja paliwo/przebieg
-            cursor.execute("""
-                UPDATE vehicles 
-                SET status = 'available', current_mileage = ?, current_fuel = ?
-                WHERE id = ?
-            """, (return_mileage, return_fuel, vehicle_id))
-
-            conn.commit()
+            except MileageDecrease as e:
+                conn.rollback()
+                QMessageBox.warning(
+                    self, "🚫 Błąd przebiegu",
+                    f"Przebieg przy zwrocie ({return_mileage:.1f} km) jest MNIEJSZY "
+                    f"niż przy wydaniu ({e.recorded:.1f} km).",
+                )
+                return
+            except ValueError as e:
+                conn.rollback()
+                QMessageBox.critical(self, "Błąd", f"Nie można zarejestrować zwrotu:\n{e}")
+                return
+            fleet_index.notify(self.db_path, vehicle_id, status="available",
+                               current_mileage=return_mileage, current_fuel=return_fuel)
+            # Nowy przebieg - przelicz harmonogram serwisów tego pojazdu
+            MaintenanceService(self.db_path).on_trip_completed(vehicle_id)
             QMessageBox.information(
                 self, "Sukces", 
                 f"✅ Zwrot kluczyka zarejestrowany!\n"
@@ -193,6 +247,7 @@ class KeyReturnWindow(QWidget):
             self.load_active_keylogs()  # Odśwież listę
 
         except Exception as e:
+            conn.rollback()
             QMessageBox.critical(self, "Błąd", f"Błąd rejestracji zwrotu:\n{str(e)}")
         finally:
             conn.close()
@@ -206,6 +261,15 @@ class KeyReturnWindow(QWidget):
         self.notes.clear()
 
 
+def scan_error_message(error: ScanError) -> str:
+    """Komunikat dla operatora dla błędu skanu."""
+    if error.reason == "not_found":
+        return f"Nie znaleziono karty drogowej ani pojazdu dla kodu: {error.code}"
+    if error.reason == "not_out":
+        return f"Kluczyk pojazdu nie jest wydany (kod: {error.code})."
+    return f"Nieznany kod: {error.code.strip()}"
+
+
 if __name__ == "__main__":
     from PySide6.QtWidgets import QApplication
     import sys
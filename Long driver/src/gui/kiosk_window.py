@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Tryb kiosku (stanowisko przy bramie) - zwrot kluczyka skanerem.
+
+Skaner działa jak klawiatura: kod QR karty drogowej albo zawieszki klucza
+i Enter. Po skanie formularz jest wypełniony (przebieg, paliwo), Enter w polu
+przebiegu przechodzi do paliwa, Enter w polu paliwa zatwierdza zwrot, Esc
+wraca do skanowania. Uruchomienie: python main.py --kiosk
+"""
+import logging
+from pathlib import Path
+
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QFont, QKeySequence, QShortcut
+from PySide6.QtWidgets import (
+    QDoubleSpinBox, QFormLayout, QLabel, QLineEdit, QVBoxLayout, QWidget,
+)
+
+from services.key_service import MileageDecrease
+from services.kiosk_service import KioskService, ScanError
+from services.version_service import StaleVersion
+from .key_return_window import scan_error_message
+
+logger = logging.getLogger(__name__)
+
+# Czas wyświetlania komunikatu po zwrocie / błędzie
+MESSAGE_MS = 4000
+
+
+class KioskWindow(QWidget):
+    """Pełnoekranowe okno zwrotu kluczyków sterowane skanerem."""
+
+    def __init__(self):
+        super().__init__()
+        self.db_path = Path(__file__).parent.parent.parent / "database" / "fleet.db"
+        self.kiosk = KioskService(self.db_path)
+        self.target = None
+        self.message_timer = QTimer(self)
+        self.message_timer.setSingleShot(True)
+        self.message_timer.timeout.connect(lambda: self.status.setText(""))
+        self.setup_ui()
+        self.prepare_schema()
+        self.reset()
+
+    def setup_ui(self):
+        self.setWindowTitle("Long Driver - kiosk zwrotu kluczyków")
+        font = QFont()
+        font.setPointSize(22)
+        self.setFont(font)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        header = QLabel("🔑 Zeskanuj kartę drogową lub kluczyk")
+        header_font = QFont()
+        header_font.setPointSize(32)
+        header_font.setBold(True)
+        header.setFont(header_font)
+        header.setAlignment(Qt.AlignCenter)
+        layout.addWidget(header)
+
+        self.scan_input = QLineEdit()
+        self.scan_input.setAlignment(Qt.AlignCenter)
+        self.scan_input.returnPressed.connect(self.handle_scan)
+        layout.addWidget(self.scan_input)
+
+        self.details = QLabel()
+        self.details.setAlignment(Qt.AlignCenter)
+        self.details.setWordWrap(True)
+        layout.addWidget(self.details)
+
+        form = QFormLayout()
+        self.mileage = QDoubleSpinBox()
+        self.mileage.setRange(0, 1_000_000)
+        self.mileage.setDecimals(1)
+        self.mileage.setSuffix(" km")
+        self.mileage.lineEdit().returnPressed.connect(self.focus_fuel)
+        form.addRow("Przebieg:", self.mileage)
+
+        self.fuel = QDoubleSpinBox()
+        self.fuel.setRange(0, 500)
+        self.fuel.setDecimals(1)
+        self.fuel.setSuffix(" L")
+        self.fuel.lineEdit().returnPressed.connect(self.confirm)
+        form.addRow("Paliwo:", self.fuel)
+        layout.addLayout(form)
+
+        self.status = QLabel()
+        self.status.setAlignment(Qt.AlignCenter)
+        self.status.setWordWrap(True)
+        layout.addWidget(self.status)
+        layout.addStretch()
+
+        QShortcut(QKeySequence(Qt.Key_Escape), self, activated=self.reset)
+
+    def prepare_schema(self):
+        """Indeksy wyszukiwania (otwarte wydania, numer karty) - raz przy starcie."""
+        try:
+            conn = self.kiosk.get_connection()
+            try:
+                KioskService.ensure_schema(conn)
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning(f"Nie udało się utworzyć indeksów kiosku: {e}")
+
+    def reset(self):
+        """Powrót do oczekiwania na skan."""
+        self.target = None
+        self.details.setText("")
+        self.mileage.setValue(0)
+        self.fuel.setValue(0)
+        self.mileage.setEnabled(False)
+        self.fuel.setEnabled(False)
+        self.scan_input.clear()
+        self.scan_input.setFocus()
+
+    def show_message(self, text: str, ok: bool):
+        self.status.setStyleSheet("color: #2e7d32;" if ok else "color: #c62828;")
+        self.status.setText(text)
+        self.message_timer.start(MESSAGE_MS)
+
+    def handle_scan(self):
+        text = self.scan_input.text()
+        self.scan_input.clear()
+        if not text.strip():
+            return
+        try:
+            self.target = self.kiosk.resolve_text(text)
+        except ScanError as e:
+            self.show_message(scan_error_message(e), ok=False)
+            self.reset()
+            return
+        except Exception as e:
+            logger.exception("Kiosk: błąd wyszukiwania")
+            self.show_message(f"Błąd bazy danych: {e}", ok=False)
+            self.reset()
+            return
+
+        target = self.target
+        lines = [f"<b>{target.registration_number}</b> {target.vehicle_label}",
+                 f"Kierowca: {target.employee_name or '-'}"]
+        if target.trip_number:
+            lines.append(f"Karta drogowa: {target.trip_number}")
+        if target.checkout_time:
+            lines.append(f"Wydano: {target.checkout_time:%Y-%m-%d %H:%M}, "
+                         f"{target.checkout_mileage or 0:.1f} km")
+        self.details.setText("<br>".join(lines))
+        self.mileage.setEnabled(True)
+        self.fuel.setEnabled(True)
+        self.mileage.setValue(target.suggested_mileage)
+        self.fuel.setValue(target.current_fuel or target.checkout_fuel or 0)
+        self.mileage.setFocus()
+        self.mileage.selectAll()
+
+    def focus_fuel(self):
+        self.fuel.setFocus()
+        self.fuel.selectAll()
+
+    def confirm(self):
+        if self.target is None:
+            return
+        mileage, fuel = self.mileage.value(), self.fuel.value()
+        try:
+            self.kiosk.return_key(self.target, mileage, fuel,
+                                  storage_location=self.target.storage_location)
+        except MileageDecrease as e:
+            self.show_message(f"Przebieg {mileage:.1f} km jest mniejszy niż przy wydaniu "
+                              f"({e.recorded:.1f} km).", ok=False)
+            self.mileage.setFocus()
+            self.mileage.selectAll()
+            return
+        except StaleVersion:
+            self.show_message(f"Kluczyk {self.target.registration_number} został w międzyczasie "
+                              f"zwrócony lub zmieniony na innym stanowisku.", ok=False)
+            self.reset()
+            return
+        except Exception as e:
+            logger.exception("Kiosk: błąd zwrotu")
+            self.show_message(f"Nie można zarejestrować zwrotu: {e}", ok=False)
+            return
+        self.show_message(f"✅ Zwrot zarejestrowany: {self.target.registration_number}, "
+                          f"{mileage:.1f} km, {fuel:.1f} L", ok=True)
+        self.reset()
+
+
+if __name__ == "__main__":
+    from PySide6.QtWidgets import QApplication
+    import sys
+    app = QApplication(sys.argv)
+    window = KioskWindow()
+    window.showFullScreen()
+    sys.exit(app.exec())
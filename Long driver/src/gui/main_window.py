@@ -4,6 +4,7 @@ Główne okno aplikacji
 """
 
 import sys
+import logging
 from pathlib import Path
 
 from PySide6.QtWidgets import (
@@ -11,9 +12,27 @@ from PySide6.QtWidgets import (
     QPushButton, QLabel, QTabWidget, QMessageBox,
     QGridLayout, QGroupBox
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QFont, QAction
 
+from utils import startup_profiler
+from utils.helpers import load_config, get_project_root
+from utils.ui_profiler import profiler as ui_profiler
+
+from .fleet_status_panel import FleetStatusPanel
+
+logger = logging.getLogger(__name__)
+
+
+# Zakładki tworzone leniwie: klucz -> (indeks, moduł, klasa, atrybut, etykieta)
+LAZY_TABS = {
+    "vehicles": (0, "vehicle_window", "VehicleWindow", "vehicle_window", "🚗 Moje pojazdy"),
+    "employees": (1, "employee_window", "EmployeeWindow", "employee_window", "👥 Pracownicy"),
+    "keys": (2, "key_checkout_window", "KeyCheckoutWindow", "key_window", "🔑 Klucze"),
+    "trips": (3, "trip_window", "TripWindow", "trip_window", "🛣️ Przejazdy"),
+    "reports": (4, "reports_window", "ReportsWindow", "reports_window", "📊 Raporty"),
+}
+
 
 class MainWindow(QMainWindow):
     """Główne okno aplikacji System Ewidencji Pojazdów"""
@@ -21,14 +40,25 @@ class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
 
+        self.db_path = get_project_root() / "database" / "fleet.db"
+        self.config = load_config(str(get_project_root() / "config.yaml"))
+
         self.vehicle_window = None
         self.employee_window = None
         self.key_window = None
         self.trip_window = None
         self.reports_window = None
+        self.prewarmer = None
+        self.stall_monitor = None
+        self.fleet_status_panel = None
+        self.profiling_label = None
+        self._first_show_done = False
+
+        ui_profiler.configure(self.config.get('profiling'))
 
         self.setup_ui()
         self.setup_menu()
+        self.setup_profiling()
 
     # ================== UI ==================
 
@@ -54,8 +84,12 @@ class MainWindow(QMainWindow):
         quick_access = self.create_quick_access_panel()
         main_layout.addWidget(quick_access)
 
+        self.fleet_status_panel = FleetStatusPanel(self.db_path, self)
+        main_layout.addWidget(self.fleet_status_panel)
+
         self.tab_widget = QTabWidget()
         self.setup_tabs()
+        self.tab_widget.currentChanged.connect(self.on_tab_changed)
         main_layout.addWidget(self.tab_widget)
 
         self.statusBar().showMessage("✅ System gotowy do pracy")
@@ -72,6 +106,7 @@ class MainWindow(QMainWindow):
                 ("📝 Przeglądaj arkusze", self.new_trip_sheet),
                 ("🔑 Wypożycz klucz", self.checkout_key),
                 ("↩️ Zwróć klucz", self.return_key),
+                ("📅 Rezerwacje", self.show_reservations),
             ],
             "Zarządzanie danymi": [
                 ("🚗 Dodaj pojazd", self.add_new_vehicle),
@@ -106,10 +141,8 @@ class MainWindow(QMainWindow):
     def setup_tabs(self):
         """Konfiguruje zakładki główne"""
 
-        # 0 - Moje pojazdy (od razu VehicleWindow)
-        from .vehicle_window import VehicleWindow
-        self.vehicle_window = VehicleWindow()
-        self.tab_widget.addTab(self.vehicle_window, "🚗 Moje pojazdy")
+        # 0 - Moje pojazdy (VehicleWindow tworzony dopiero po show(), patrz showEvent)
+        self.tab_widget.addTab(QWidget(), "🚗 Moje pojazdy")
 
         # 1 - Pracownicy (załadowani przy pierwszym użyciu)
         self.tab_widget.addTab(QWidget(), "👥 Pracownicy")
@@ -143,6 +176,13 @@ class MainWindow(QMainWindow):
 
         file_menu.addSeparator()
 
+        import_action = QAction("📥 Import danych...", self)
+        import_action.setShortcut("Ctrl+I")
+        import_action.triggered.connect(lambda: self.import_data())
+        file_menu.addAction(import_action)
+
+        file_menu.addSeparator()
+
         exit_action = QAction("🚪 Zamknij", self)
         exit_action.setShortcut("Ctrl+Q")
         exit_action.triggered.connect(self.close)
@@ -159,6 +199,10 @@ class MainWindow(QMainWindow):
         view_employees_action.triggered.connect(self.show_employees)
         view_menu.addAction(view_employees_action)
 
+        view_reservations_action = QAction("Rezerwacje", self)
+        view_reservations_action.triggered.connect(self.show_reservations)
+        view_menu.addAction(view_reservations_action)
+
         # Pomoc
         help_menu = menubar.addMenu("❓ Pomoc")
 
@@ -171,6 +215,115 @@ class MainWindow(QMainWindow):
         about_action.triggered.connect(self.show_about)
         help_menu.addAction(about_action)
 
+    def setup_profiling(self):
+        """Włącza monitor przestojów GUI i odczyt w pasku statusu (z config.yaml)"""
+        if not ui_profiler.enabled:
+            return
+        from PySide6.QtWidgets import QApplication
+        from .stall_monitor import StallMonitor
+
+        self.stall_monitor = StallMonitor(QApplication.instance(), stall_ms=ui_profiler.stall_ms)
+        self.stall_monitor.start()
+
+        if self.config.get('profiling', {}).get('overlay', False):
+            self.profiling_label = QLabel()
+            self.profiling_label.setStyleSheet("color: #7f8c8d; padding: 0 6px;")
+            self.statusBar().addPermanentWidget(self.profiling_label)
+            self.profiling_timer = QTimer(self)
+            self.profiling_timer.setInterval(1000)
+            self.profiling_timer.timeout.connect(self.update_profiling_label)
+            self.profiling_timer.start()
+
+    def update_profiling_label(self):
+        """Odczyt profilera: ostatni slot, liczba i najdłuższy przestój"""
+        summary = ui_profiler.summary()
+        last = summary['last_slot']
+        last_text = f"{last[0]} {last[1]:.0f} ms" if last else "-"
+        self.profiling_label.setText(
+            f"⏱ {last_text} | przestoje: {summary['stall_count']} "
+            f"(max {summary['worst_stall_ms']:.0f} ms)"
+        )
+        if summary['slots']:
+            self.profiling_label.setToolTip("\n".join(
+                f"{name}: {count}x, śr. {avg:.1f} ms, max {peak:.1f} ms"
+                for name, (count, avg, peak) in sorted(
+                    summary['slots'].items(), key=lambda item: item[1][2], reverse=True)
+            ))
+
+    def showEvent(self, event):
+        """Po pierwszym wyświetleniu okna ładuje zakładkę pojazdów."""
+        super().showEvent(event)
+        if not self._first_show_done:
+            self._first_show_done = True
+            # Okno jest już widoczne - import modułu i zapytanie do bazy
+            # wykonają się w pierwszym obrocie pętli zdarzeń
+            QTimer.singleShot(0, self.load_first_tab)
+
+    def load_first_tab(self):
+        """Tworzy i wypełnia pierwszą zakładkę (pojazdy)"""
+        with startup_profiler.stage("pierwsza zakładka (VehicleWindow)"):
+            self.show_vehicles()
+        self.fleet_status_panel.start()
+        self.statusBar().showMessage("✅ System gotowy do pracy")
+        self.start_prewarming()
+
+    def start_prewarming(self):
+        """Uruchamia wstępne tworzenie pozostałych zakładek w czasie bezczynności"""
+        ui_config = self.config.get('ui', {})
+        if not ui_config.get('prewarm_tabs', True):
+            return
+        from .tab_prewarmer import TabPrewarmer
+        order = [key for key in ui_config.get('prewarm_order', []) if key in LAZY_TABS]
+        self.prewarmer = TabPrewarmer(
+            self,
+            order,
+            delay_ms=ui_config.get('prewarm_delay_ms', 800),
+            extra_modules=ui_config.get('prewarm_modules', []),
+        )
+        self.prewarmer.start()
+
+    # ================== Leniwe zakładki ==================
+
+    def tab_module_name(self, key: str) -> str:
+        """Pełna nazwa modułu okna dla danej zakładki"""
+        return f"{__package__}.{LAZY_TABS[key][1]}"
+
+    def is_tab_created(self, key: str) -> bool:
+        return getattr(self, LAZY_TABS[key][3]) is not None
+
+    def ensure_tab(self, key: str):
+        """Tworzy okno zakładki (jeśli jeszcze nie istnieje) bez zmiany bieżącej zakładki"""
+        index, module_name, class_name, attr, label = LAZY_TABS[key]
+        widget = getattr(self, attr)
+        if widget is not None:
+            return widget
+
+        import importlib
+        module = importlib.import_module(self.tab_module_name(key))
+        window_class = getattr(module, class_name)
+        widget = window_class(self.db_path) if key == "trips" else window_class()
+        setattr(self, attr, widget)
+        self.replace_tab(index, widget, label)
+        return widget
+
+    def replace_tab(self, index: int, widget, label: str):
+        """Podmienia zawartość zakładki, zachowując aktualnie wybraną"""
+        current = self.tab_widget.currentIndex()
+        self.tab_widget.blockSignals(True)
+        try:
+            self.tab_widget.removeTab(index)
+            self.tab_widget.insertTab(index, widget, label)
+            self.tab_widget.setCurrentIndex(current)
+        finally:
+            self.tab_widget.blockSignals(False)
+
+    def on_tab_changed(self, index: int):
+        """Kliknięcie w nagłówek zakładki tworzy jej zawartość"""
+        for key, (tab_index, *_rest) in LAZY_TABS.items():
+            if tab_index == index:
+                self.ensure_tab(key)
+                break
+
     # ================== Akcje z przycisków ==================
 
     def add_new_vehicle(self):
@@ -181,25 +334,34 @@ class MainWindow(QMainWindow):
         self.show_employees()
         self.statusBar().showMessage("Dodawanie nowego pracownika...")
 
+    def import_data(self, entity: str = "vehicles"):
+        """Import masowy z CSV / XLSX"""
+        from .import_dialog import ImportDialog
+        dialog = ImportDialog(self.db_path, entity, self)
+        dialog.imported.connect(self.on_data_imported)
+        dialog.exec()
+
+    def on_data_imported(self, entity: str):
+        """Odświeża utworzone zakładki po imporcie"""
+        if entity == "vehicles" and self.vehicle_window is not None:
+            self.vehicle_window.load_vehicles()
+        elif entity == "employees" and self.employee_window is not None:
+            self.employee_window.load_employees()
+        elif entity == "trips" and self.trip_window is not None:
+            self.trip_window.refresh_trips_table()
+        self.statusBar().showMessage("Import zakończony", 5000)
+
     # ================== Zakładki: pojazdy / pracownicy ==================
 
     def show_vehicles(self):
         """Przełącza na zakładkę Moje pojazdy"""
-        if self.vehicle_window is None:
-            from .vehicle_window import VehicleWindow
-            self.vehicle_window = VehicleWindow()
-            self.tab_widget.removeTab(0)
-            self.tab_widget.insertTab(0, self.vehicle_window, "🚗 Moje pojazdy")
+        self.ensure_tab("vehicles")
         self.tab_widget.setCurrentIndex(0)
         self.statusBar().showMessage("Przeglądanie pojazdów")
 
     def show_employees(self):
         """Przełącza na zakładkę pracowników"""
-        if self.employee_window is None:
-            from .employee_window import EmployeeWindow
-            self.employee_window = EmployeeWindow()
-            self.tab_widget.removeTab(1)
-            self.tab_widget.insertTab(1, self.employee_window, "👥 Pracownicy")
+        self.ensure_tab("employees")
         self.tab_widget.setCurrentIndex(1)
         self.statusBar().showMessage("Przeglądanie pracowników")
 
@@ -207,11 +369,7 @@ class MainWindow(QMainWindow):
 
     def checkout_key(self):
         """Moduł wypożyczania kluczy"""
-        if self.key_window is None:
-            from .key_checkout_window import KeyCheckoutWindow
-            self.key_window = KeyCheckoutWindow()
-            self.tab_widget.removeTab(2)
-            self.tab_widget.insertTab(2, self.key_window, "🔑 Klucze")
+        self.ensure_tab("keys")
         self.tab_widget.setCurrentIndex(2)
         self.statusBar().showMessage("Wypożyczanie klucza...")
 
@@ -219,18 +377,13 @@ class MainWindow(QMainWindow):
         """Moduł zwrotu kluczy (ta sama zakładka)"""
         from .key_return_window import KeyReturnWindow
         self.key_window = KeyReturnWindow()
-        self.tab_widget.removeTab(2)
-        self.tab_widget.insertTab(2, self.key_window, "🔑 Klucze")
+        self.replace_tab(2, self.key_window, "🔑 Klucze")
         self.tab_widget.setCurrentIndex(2)
         self.statusBar().showMessage("Zwrot klucza...")
 
     def new_trip(self):
         """Moduł przejazdów"""
-        if self.trip_window is None:
-            from .trip_window import TripWindow
-            self.trip_window = TripWindow()
-            self.tab_widget.removeTab(3)
-            self.tab_widget.insertTab(3, self.trip_window, "🛣️ Przejazdy")
+        self.ensure_tab("trips")
         self.tab_widget.setCurrentIndex(3)
         self.statusBar().showMessage("Tworzenie nowego przejazdu...")
 
@@ -248,13 +401,20 @@ class MainWindow(QMainWindow):
         except ImportError:
             QMessageBox.critical(self, "Błąd", "Nie można załadować modułu arkuszy przejazdów.")
 
+    def show_reservations(self):
+        """Otwiera kalendarz rezerwacji pojazdów"""
+        from .reservation_window import ReservationWindow
+        if not hasattr(self, "reservations_tab_index"):
+            self.reservation_window = ReservationWindow(self.db_path)
+            self.reservations_tab_index = self.tab_widget.addTab(
+                self.reservation_window, "📅 Rezerwacje"
+            )
+        self.tab_widget.setCurrentIndex(self.reservations_tab_index)
+        self.statusBar().showMessage("Kalendarz rezerwacji")
+
     def generate_report(self):
         """Moduł raportów"""
-        if self.reports_window is None:
-            from .reports_window import ReportsWindow
-            self.reports_window = ReportsWindow()
-            self.tab_widget.removeTab(4)
-            self.tab_widget.insertTab(4, self.reports_window, "📊 Raporty")
+        self.ensure_tab("reports")
         self.tab_widget.setCurrentIndex(4)
         self.statusBar().showMessage("Generowanie raportu...")
 
@@ -296,8 +456,10 @@ class MainWindow(QMainWindow):
         reset_layout.addWidget(reset_label)
         reset_layout.addWidget(reset_button)
 
+        from .query_stats_widget import QueryStatsWidget
+        layout.addWidget(QueryStatsWidget(widget), 1)
+
         layout.addWidget(reset_group)
-        layout.addStretch()
 
         return widget
 
@@ -378,7 +540,16 @@ class MainWindow(QMainWindow):
             QMessageBox.No,
         )
         if reply == QMessageBox.Yes:
-            print("🔄 Zamykanie aplikacji...")
+            if self.prewarmer is not None:
+                self.prewarmer.stop()
+            self.fleet_status_panel.stop()
+            if self.stall_monitor is not None:
+                self.stall_monitor.stop()
+                dump_dir = Path(self.config.get('profiling', {}).get('dump_dir', 'logs/profiles'))
+                if not dump_dir.is_absolute():
+                    dump_dir = get_project_root() / dump_dir
+                ui_profiler.dump_profiles(dump_dir)
+            logger.info("Zamykanie aplikacji")
             self.statusBar().showMessage("Zamykanie...")
             event.accept()
         else:
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Okno serwisów pojazdu: najbliższe serwisy, historia, rejestracja wykonanego
+serwisu i dodawanie reguł (interwał km / dni dla floty, modelu lub pojazdu).
+"""
+
+import logging
+from datetime import date
+
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QGroupBox, QComboBox,
+    QDateEdit, QDoubleSpinBox, QSpinBox, QLineEdit, QPushButton, QLabel,
+    QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox
+)
+from PySide6.QtCore import QDate, Signal
+from PySide6.QtGui import QColor
+
+from services.maintenance_service import MaintenanceService
+from utils.constants import SERVICE_STATUS_COLORS, SERVICE_STATUS_DISPLAY
+
+logger = logging.getLogger(__name__)
+
+
+class MaintenanceDialog(QDialog):
+    """Serwisy jednego pojazdu."""
+
+    # Emitowany po zapisie serwisu lub reguły, z id pojazdu
+    changed = Signal(int)
+
+    def __init__(self, db_path, vehicle_id: int, registration: str, brand: str, model: str,
+                 current_mileage: float, parent=None):
+        super().__init__(parent)
+        self.service = MaintenanceService(db_path)
+        self.vehicle_id = vehicle_id
+        self.brand = brand
+        self.model = model
+        self.current_mileage = current_mileage
+        self.setWindowTitle(f"🔧 Serwisy - {registration}")
+        self.resize(820, 620)
+        self.init_ui()
+        self.load()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        layout.addWidget(QLabel("Najbliższe serwisy:"))
+        self.schedule_table = QTableWidget(0, 6)
+        self.schedule_table.setHorizontalHeaderLabels(
+            ["Serwis", "Ostatnio", "Do przebiegu", "Pozostało km", "Termin / prognoza", "Status"]
+        )
+        self.schedule_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.schedule_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.schedule_table)
+
+        layout.addWidget(QLabel("Historia:"))
+        self.history_table = QTableWidget(0, 5)
+        self.history_table.setHorizontalHeaderLabels(["Data", "Serwis", "Przebieg", "Koszt", "Opis"])
+        self.history_table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
+        self.history_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.history_table)
+
+        forms = QHBoxLayout()
+
+        record_group = QGroupBox("Wykonany serwis")
+        record_form = QFormLayout()
+        record_group.setLayout(record_form)
+        self.rule_combo = QComboBox()
+        self.rule_combo.setEditable(True)
+        record_form.addRow("Serwis:", self.rule_combo)
+        self.service_date = QDateEdit(QDate.currentDate())
+        self.service_date.setCalendarPopup(True)
+        record_form.addRow("Data:", self.service_date)
+        self.service_mileage = QDoubleSpinBox()
+        self.service_mileage.setRange(0, 2_000_000)
+        self.service_mileage.setDecimals(0)
+        self.service_mileage.setSuffix(" km")
+        self.service_mileage.setValue(self.current_mileage or 0)
+        record_form.addRow("Przebieg:", self.service_mileage)
+        self.service_cost = QDoubleSpinBox()
+        self.service_cost.setRange(0, 1_000_000)
+        self.service_cost.setSuffix(" zł")
+        record_form.addRow("Koszt:", self.service_cost)
+        self.service_description = QLineEdit()
+        record_form.addRow("Opis:", self.service_description)
+        record_btn = QPushButton("💾 Zapisz serwis")
+        record_btn.clicked.connect(self.record_service)
+        record_form.addRow(record_btn)
+        forms.addWidget(record_group)
+
+        rule_group = QGroupBox("Nowa reguła")
+        rule_form = QFormLayout()
+        rule_group.setLayout(rule_form)
+        self.rule_name = QLineEdit()
+        self.rule_name.setPlaceholderText("Np. Wymiana oleju, Przegląd techniczny")
+        rule_form.addRow("Nazwa:", self.rule_name)
+        self.rule_km = QSpinBox()
+        self.rule_km.setRange(0, 500_000)
+        self.rule_km.setSingleStep(1000)
+        self.rule_km.setSuffix(" km")
+        self.rule_km.setSpecialValueText("—")
+        rule_form.addRow("Co ile km:", self.rule_km)
+        self.rule_days = QSpinBox()
+        self.rule_days.setRange(0, 3650)
+        self.rule_days.setSuffix(" dni")
+        self.rule_days.setSpecialValueText("—")
+        rule_form.addRow("Co ile dni:", self.rule_days)
+        self.rule_scope = QComboBox()
+        self.rule_scope.addItem("Cała flota", "fleet")
+        self.rule_scope.addItem(f"Model: {self.brand} {self.model}", "model")
+        self.rule_scope.addItem("Tylko ten pojazd", "vehicle")
+        rule_form.addRow("Dotyczy:", self.rule_scope)
+        rule_btn = QPushButton("➕ Dodaj regułę")
+        rule_btn.clicked.connect(self.add_rule)
+        rule_form.addRow(rule_btn)
+        forms.addWidget(rule_group)
+
+        layout.addLayout(forms)
+
+        close_btn = QPushButton("Zamknij")
+        close_btn.clicked.connect(self.accept)
+        layout.addWidget(close_btn)
+
+    def load(self):
+        today = date.today()
+        items = self.service.schedule([self.vehicle_id], today=today)
+        self.schedule_table.setRowCount(len(items))
+        for row, item in enumerate(items):
+            status = item.status(today)
+            next_date = item.next_date
+            values = [
+                item.rule_name,
+                f"{item.last_date:%d.%m.%Y}" if item.last_date else "brak historii",
+                "" if item.due_mileage is None else f"{item.due_mileage:.0f} km",
+                "" if item.km_remaining is None else f"{item.km_remaining:.0f} km",
+                f"{next_date:%d.%m.%Y}" if next_date else "",
+                SERVICE_STATUS_DISPLAY[status],
+            ]
+            for col, value in enumerate(values):
+                self.schedule_table.setItem(row, col, QTableWidgetItem(value))
+            self.schedule_table.item(row, 5).setBackground(QColor(SERVICE_STATUS_COLORS[status]))
+
+        history = self.service.history(self.vehicle_id)
+        self.history_table.setRowCount(len(history))
+        for row, record in enumerate(history):
+            for col, value in enumerate(record):
+                self.history_table.setItem(row, col, QTableWidgetItem("" if value is None else str(value)))
+
+        current = self.rule_combo.currentText()
+        self.rule_combo.clear()
+        self.rule_combo.addItems(self.service.rule_names(self.vehicle_id))
+        if current:
+            self.rule_combo.setCurrentText(current)
+
+    def record_service(self):
+        name = self.rule_combo.currentText().strip()
+        if not name:
+            QMessageBox.warning(self, "Błąd", "Podaj nazwę serwisu.")
+            return
+        try:
+            self.service.record_service(
+                self.vehicle_id, name, self.service_date.date().toPython(),
+                mileage=self.service_mileage.value(),
+                cost=self.service_cost.value() or None,
+                description=self.service_description.text().strip(),
+            )
+        except Exception as e:
+            QMessageBox.critical(self, "❌ Błąd bazy danych", str(e))
+            return
+        self.service_description.clear()
+        self.service_cost.setValue(0)
+        self.load()
+        self.changed.emit(self.vehicle_id)
+
+    def add_rule(self):
+        name = self.rule_name.text().strip()
+        if not name:
+            QMessageBox.warning(self, "Błąd", "Podaj nazwę reguły.")
+            return
+        scope = self.rule_scope.currentData()
+        try:
+            self.service.add_rule(
+                name,
+                interval_km=self.rule_km.value() or None,
+                interval_days=self.rule_days.value() or None,
+                vehicle_id=self.vehicle_id if scope == "vehicle" else None,
+                brand=self.brand if scope == "model" else None,
+                model=self.model if scope == "model" else None,
+            )
+        except ValueError:
+            QMessageBox.warning(self, "Błąd", "Podaj interwał w kilometrach lub w dniach.")
+            return
+        except Exception as e:
+            QMessageBox.critical(self, "❌ Błąd bazy danych", str(e))
+            return
+        self.rule_name.clear()
+        self.load()
+        self.changed.emit(self.vehicle_id)
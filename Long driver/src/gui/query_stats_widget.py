@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Podgląd statystyk zapytań SQL (zakładka Ustawienia).
+
+Tabela jest odświeżana cyklicznie tylko wtedy, gdy widget jest widoczny.
+"""
+
+from PySide6.QtWidgets import (
+    QGroupBox, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+    QTableWidget, QTableWidgetItem, QHeaderView
+)
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QColor
+
+from utils import db
+
+COLUMNS = ["Zapytanie", "Liczba", "Śr. [ms]", "p50 [ms]", "p95 [ms]",
+           "Max [ms]", "Łącznie [ms]", "Wiersze"]
+
+
+class QueryStatsWidget(QGroupBox):
+    """Tabela najdroższych zapytań (łączny czas) z histogramów db.stats."""
+
+    def __init__(self, parent=None, refresh_ms: int = 2000, max_rows: int = 200):
+        super().__init__("Statystyki zapytań SQL", parent)
+        self.max_rows = max_rows
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        top = QHBoxLayout()
+        self.summary_label = QLabel()
+        top.addWidget(self.summary_label)
+        top.addStretch()
+        reset_button = QPushButton("Wyczyść statystyki")
+        reset_button.clicked.connect(self.reset_stats)
+        top.addWidget(reset_button)
+        layout.addLayout(top)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setWordWrap(False)
+        layout.addWidget(self.table)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(refresh_ms)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.timer.start()
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        """Przepisuje tabelę z aktualnego stanu rejestru statystyk."""
+        snapshot = db.stats.snapshot()
+        total_count = sum(item["count"] for item in snapshot)
+        total_ms = sum(item["total_ms"] for item in snapshot)
+        self.summary_label.setText(
+            f"Zapytań: {total_count} | różnych: {len(snapshot)} | "
+            f"łącznie: {total_ms:.0f} ms | wolnych (≥ {db.stats.slow_query_ms:.0f} ms): "
+            f"{db.stats.slow_count}"
+        )
+
+        rows = snapshot[:self.max_rows]
+        self.table.setUpdatesEnabled(False)
+        try:
+            self.table.setRowCount(len(rows))
+            for row, item in enumerate(rows):
+                sql_item = QTableWidgetItem(item["sql"])
+                sql_item.setToolTip(item["sql"])
+                self.table.setItem(row, 0, sql_item)
+                values = [item["count"], item["avg_ms"], item["p50_ms"], item["p95_ms"],
+                          item["max_ms"], item["total_ms"], item["rows"]]
+                for col, value in enumerate(values, start=1):
+                    text = f"{value:.2f}" if isinstance(value, float) else str(value)
+                    cell = QTableWidgetItem(text)
+                    cell.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                    self.table.setItem(row, col, cell)
+                if item["max_ms"] >= db.stats.slow_query_ms:
+                    self.table.item(row, 5).setForeground(QColor("#c0392b"))
+        finally:
+            self.table.setUpdatesEnabled(True)
+
+    def reset_stats(self):
+        db.stats.reset()
+        self.refresh()
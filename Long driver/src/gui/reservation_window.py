@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+Kalendarz rezerwacji pojazdów.
+
+Tydzień w układzie pojazdy x dni; każda komórka pokazuje rezerwacje pojazdu
+w danym dniu. Wszystkie odczyty idą przez indeks przedziałów w
+ReservationService, więc przełączanie tygodni i pytanie "kto jest wolny"
+nie wymaga zapytań do bazy.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox,
+    QDateTimeEdit, QLineEdit, QMessageBox, QFormLayout, QGroupBox,
+    QTableWidget, QTableWidgetItem, QHeaderView, QInputDialog
+)
+from PySide6.QtCore import Qt, QDateTime
+from PySide6.QtGui import QColor, QFont
+
+from services.reservation_service import ReservationConflict, ReservationService
+from utils import db, fleet_index
+
+logger = logging.getLogger(__name__)
+
+DAY_NAMES = ["Pn", "Wt", "Śr", "Cz", "Pt", "So", "Nd"]
+
+RESERVED_COLOR = "#f9e79f"
+PICKED_UP_COLOR = "#aed6f1"
+UNAVAILABLE_COLOR = "#e5e8e8"
+
+# Domyślne godziny nowej rezerwacji (po dwukliku w komórkę)
+DEFAULT_START_HOUR = 8
+DEFAULT_END_HOUR = 16
+
+
+class ReservationWindow(QWidget):
+    """Tygodniowy kalendarz rezerwacji z formularzem rezerwacji."""
+
+    def __init__(self, db_path: Path = None):
+        super().__init__()
+        self.db_path = db_path or Path(__file__).parent.parent.parent / "database" / "fleet.db"
+        self.service = ReservationService(self.db_path)
+        self.fleet_index = fleet_index.get_index(self.db_path)
+        self.employees = {}
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.week_start = today - timedelta(days=today.weekday())
+        self.vehicles = []
+        self.setup_ui()
+        self.load_employees()
+        self.refresh()
+
+    # ==========================
+    # UI
+    # ==========================
+
+    def setup_ui(self):
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        header = QLabel("📅 Rezerwacje pojazdów")
+        font = QFont()
+        font.setPointSize(16)
+        font.setBold(True)
+        header.setFont(font)
+        header.setAlignment(Qt.AlignCenter)
+        layout.addWidget(header)
+
+        nav = QHBoxLayout()
+        prev_btn = QPushButton("◀ Poprzedni tydzień")
+        prev_btn.clicked.connect(lambda: self.shift_week(-7))
+        today_btn = QPushButton("Dziś")
+        today_btn.clicked.connect(self.go_today)
+        next_btn = QPushButton("Następny tydzień ▶")
+        next_btn.clicked.connect(lambda: self.shift_week(7))
+        self.week_label = QLabel()
+        self.week_label.setAlignment(Qt.AlignCenter)
+        refresh_btn = QPushButton("🔄 Odśwież")
+        refresh_btn.clicked.connect(self.reload)
+        nav.addWidget(prev_btn)
+        nav.addWidget(today_btn)
+        nav.addWidget(next_btn)
+        nav.addWidget(self.week_label, 1)
+        nav.addWidget(refresh_btn)
+        layout.addLayout(nav)
+
+        self.table = QTableWidget(0, 7)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.cellDoubleClicked.connect(self.prefill_from_cell)
+        layout.addWidget(self.table)
+
+        form_group = QGroupBox("Nowa rezerwacja / wolne pojazdy")
+        form = QFormLayout()
+        form_group.setLayout(form)
+
+        self.vehicle_combo = QComboBox()
+        form.addRow("Pojazd:", self.vehicle_combo)
+
+        self.employee_combo = QComboBox()
+        form.addRow("Pracownik:", self.employee_combo)
+
+        self.start_dt = QDateTimeEdit()
+        self.start_dt.setCalendarPopup(True)
+        self.end_dt = QDateTimeEdit()
+        self.end_dt.setCalendarPopup(True)
+        self.set_interval(self.week_start + timedelta(days=datetime.now().weekday()))
+        period = QHBoxLayout()
+        period.addWidget(self.start_dt)
+        period.addWidget(QLabel("do"))
+        period.addWidget(self.end_dt)
+        form.addRow("Termin:", period)
+
+        self.purpose_edit = QLineEdit()
+        self.purpose_edit.setPlaceholderText("Np. wyjazd do klienta")
+        form.addRow("Cel:", self.purpose_edit)
+
+        self.free_label = QLabel("")
+        self.free_label.setWordWrap(True)
+        form.addRow("Wolne:", self.free_label)
+        layout.addWidget(form_group)
+
+        buttons = QHBoxLayout()
+        free_btn = QPushButton("🔍 Kto jest wolny?")
+        free_btn.clicked.connect(self.show_free_vehicles)
+        reserve_btn = QPushButton("📅 Zarezerwuj")
+        reserve_btn.setStyleSheet("background-color: #27ae60; color: white; font-weight: bold;")
+        reserve_btn.clicked.connect(self.create_reservation)
+        cancel_btn = QPushButton("❌ Anuluj rezerwację")
+        cancel_btn.clicked.connect(self.cancel_reservation)
+        buttons.addWidget(free_btn)
+        buttons.addStretch()
+        buttons.addWidget(cancel_btn)
+        buttons.addWidget(reserve_btn)
+        layout.addLayout(buttons)
+
+    def set_interval(self, day: datetime):
+        start = day.replace(hour=DEFAULT_START_HOUR, minute=0, second=0, microsecond=0)
+        self.start_dt.setDateTime(QDateTime(start))
+        self.end_dt.setDateTime(QDateTime(start.replace(hour=DEFAULT_END_HOUR)))
+
+    def selected_interval(self):
+        start = self.start_dt.dateTime().toPython().replace(second=0, microsecond=0)
+        end = self.end_dt.dateTime().toPython().replace(second=0, microsecond=0)
+        return start, end
+
+    # ==========================
+    # Dane
+    # ==========================
+
+    def load_employees(self):
+        conn = db.connect(self.db_path)
+        try:
+            rows = conn.execute(
+                "SELECT id, first_name || ' ' || last_name FROM employees "
+                "WHERE is_active = 1 ORDER BY last_name, first_name"
+            ).fetchall()
+        finally:
+            conn.close()
+        self.employees = dict(rows)
+        self.employee_combo.clear()
+        self.employee_combo.addItem("(bez przypisania)", None)
+        for emp_id, name in rows:
+            self.employee_combo.addItem(name, emp_id)
+
+    def reload(self):
+        """Pełne odświeżenie (zmiany z innych stanowisk są wykrywane i tak)."""
+        self.fleet_index.invalidate()
+        self.service.invalidate()
+        self.load_employees()
+        self.refresh()
+
+    def shift_week(self, days: int):
+        self.week_start += timedelta(days=days)
+        self.refresh()
+
+    def go_today(self):
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.week_start = today - timedelta(days=today.weekday())
+        self.refresh()
+
+    def refresh(self):
+        """Wypełnia siatkę tygodnia z indeksu rezerwacji."""
+        week_end = self.week_start + timedelta(days=7)
+        self.week_label.setText(
+            f"{self.week_start:%d.%m.%Y} - {week_end - timedelta(days=1):%d.%m.%Y}"
+        )
+        self.table.setHorizontalHeaderLabels([
+            f"{DAY_NAMES[i]} {self.week_start + timedelta(days=i):%d.%m}" for i in range(7)
+        ])
+
+        self.vehicles = self.fleet_index.all()
+        current = self.vehicle_combo.currentData()
+        self.vehicle_combo.clear()
+        for state in self.vehicles:
+            self.vehicle_combo.addItem(f"{state.registration_number} - {state.brand} {state.model}", state.id)
+        if current is not None:
+            self.vehicle_combo.setCurrentIndex(max(0, self.vehicle_combo.findData(current)))
+
+        bookings = self.service.in_range(self.week_start, week_end)
+        self.table.setRowCount(len(self.vehicles))
+        self.table.setVerticalHeaderLabels([s.registration_number for s in self.vehicles])
+        for row, state in enumerate(self.vehicles):
+            reservations = bookings.get(state.id, [])
+            for day in range(7):
+                day_start = self.week_start + timedelta(days=day)
+                day_end = day_start + timedelta(days=1)
+                in_day = [r for r in reservations if r.overlaps(day_start, day_end)]
+                item = QTableWidgetItem("\n".join(self.describe(r, day_start, day_end) for r in in_day))
+                item.setData(Qt.UserRole, [r.id for r in in_day])
+                if in_day:
+                    picked_up = all(r.status == "picked_up" for r in in_day)
+                    item.setBackground(QColor(PICKED_UP_COLOR if picked_up else RESERVED_COLOR))
+                    item.setToolTip("\n".join(r.purpose or "" for r in in_day).strip())
+                elif state.status in ("service", "broken"):
+                    item.setBackground(QColor(UNAVAILABLE_COLOR))
+                self.table.setItem(row, day, item)
+        self.table.resizeRowsToContents()
+
+    def describe(self, reservation, day_start, day_end) -> str:
+        start = max(reservation.start_time, day_start)
+        end = min(reservation.end_time, day_end)
+        who = self.employees.get(reservation.employee_id, "")
+        return f"{start:%H:%M}-{end:%H:%M} {who}".strip()
+
+    # ==========================
+    # Akcje
+    # ==========================
+
+    def prefill_from_cell(self, row: int, column: int):
+        """Dwuklik w komórkę ustawia pojazd i dzień w formularzu."""
+        self.vehicle_combo.setCurrentIndex(self.vehicle_combo.findData(self.vehicles[row].id))
+        self.set_interval(self.week_start + timedelta(days=column))
+
+    def show_free_vehicles(self):
+        start, end = self.selected_interval()
+        if end <= start:
+            QMessageBox.warning(self, "Błąd", "Koniec terminu musi być po jego początku.")
+            return
+        candidates = [s for s in self.vehicles if s.status not in ("service", "broken")]
+        free = set(self.service.free_vehicles([s.id for s in candidates], start, end))
+        names = [s.registration_number for s in candidates if s.id in free]
+        self.free_label.setText(
+            f"{start:%d.%m %H:%M} - {end:%d.%m %H:%M}: "
+            + (", ".join(names) if names else "brak wolnych pojazdów")
+        )
+
+    def create_reservation(self):
+        vehicle_id = self.vehicle_combo.currentData()
+        if vehicle_id is None:
+            QMessageBox.warning(self, "Błąd", "Wybierz pojazd.")
+            return
+        start, end = self.selected_interval()
+        try:
+            self.service.create(vehicle_id, start, end, self.employee_combo.currentData(),
+                                self.purpose_edit.text().strip())
+        except ReservationConflict as e:
+            taken = "\n".join(
+                f"• {r.start_time:%d.%m %H:%M} - {r.end_time:%d.%m %H:%M} "
+                f"{self.employees.get(r.employee_id, '')}"
+                for r in e.conflicts
+            )
+            QMessageBox.warning(self, "🚫 Termin zajęty",
+                                f"Pojazd {self.vehicle_combo.currentText()} jest już zarezerwowany:\n\n{taken}")
+            return
+        except ValueError:
+            QMessageBox.warning(self, "Błąd", "Koniec terminu musi być po jego początku.")
+            return
+        except Exception as e:
+            QMessageBox.critical(self, "❌ Błąd bazy danych", str(e))
+            return
+
+        self.purpose_edit.clear()
+        self.week_start = start.replace(hour=0, minute=0) - timedelta(days=start.weekday())
+        self.refresh()
+
+    def cancel_reservation(self):
+        item = self.table.currentItem()
+        ids = item.data(Qt.UserRole) if item else None
+        if not ids:
+            QMessageBox.information(self, "Rezerwacje", "Zaznacz komórkę z rezerwacją.")
+            return
+
+        reservation_id = ids[0]
+        if len(ids) > 1:
+            labels = item.text().split("\n")
+            label, ok = QInputDialog.getItem(self, "Anuluj rezerwację", "Rezerwacja:", labels, 0, False)
+            if not ok:
+                return
+            reservation_id = ids[labels.index(label)]
+
+        reply = QMessageBox.question(self, "Anuluj rezerwację", "Czy na pewno anulować rezerwację?",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        try:
+            self.service.cancel(reservation_id)
+        except Exception as e:
+            QMessageBox.critical(self, "❌ Błąd bazy danych", str(e))
+            return
+        self.refresh()
+
+    def closeEvent(self, event):
+        self.service.close()
+        super().closeEvent(event)
+
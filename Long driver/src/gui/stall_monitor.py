@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Wykrywanie przestojów pętli zdarzeń Qt.
+
+- ``ActivityEventFilter`` (na QApplication) zapamiętuje ostatnio
+  dostarczane zdarzenie, żeby przestój można było przypisać do przyczyny,
+- ``StallMonitor`` wysyła "puls" z QTimer; gdy puls spóźnia się o więcej
+  niż próg, zapisuje przestój w ``utils.ui_profiler.profiler``,
+- wątek strażnika zrzuca stos wątku GUI, jeśli przestój wciąż trwa
+  (bez podłączania debuggera).
+"""
+
+import sys
+import threading
+import time
+import traceback
+
+from PySide6.QtCore import QObject, QEvent, QTimer
+
+from utils.ui_profiler import profiler
+
+
+class ActivityEventFilter(QObject):
+    """Notuje typ zdarzenia i odbiorcę ostatnio obsługiwanego zdarzenia."""
+
+    # Zdarzenia pomijane - bardzo częste i tanie
+    IGNORED = {QEvent.Timer, QEvent.HoverMove, QEvent.MouseMove, QEvent.UpdateRequest,
+               QEvent.Paint, QEvent.MetaCall}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.last_event = None
+
+    def eventFilter(self, watched, event):
+        event_type = event.type()
+        if event_type not in self.IGNORED:
+            self.last_event = f"{type(watched).__name__}:{event_type.name}"
+        return False
+
+
+class StallMonitor(QObject):
+    """Mierzy opóźnienie pulsu pętli zdarzeń i zapisuje przestoje."""
+
+    def __init__(self, app, stall_ms: float = 100.0, interval_ms: int = 50):
+        super().__init__(app)
+        self.app = app
+        self.stall_ms = stall_ms
+        self.interval_ms = interval_ms
+        self.event_filter = ActivityEventFilter(self)
+
+        self._gui_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._stack_during_stall = None
+        self._stack_activity = None
+        self._stop = threading.Event()
+        self._watchdog = None
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self._beat)
+
+    def start(self):
+        self.app.installEventFilter(self.event_filter)
+        self._last_beat = time.perf_counter()
+        self._timer.start()
+        self._watchdog = threading.Thread(target=self._watch, name="ui-stall-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._timer.stop()
+        self._stop.set()
+        self.app.removeEventFilter(self.event_filter)
+
+    def _activity(self):
+        return profiler.current_activity or self.event_filter.last_event
+
+    def _beat(self):
+        now = time.perf_counter()
+        previous_beat, self._last_beat = self._last_beat, now
+        late_ms = (now - previous_beat) * 1000 - self.interval_ms
+        if late_ms >= self.stall_ms:
+            activity = self._stack_activity
+            last_slot = profiler.last_slot
+            if activity is None and last_slot is not None and last_slot[2] >= previous_beat:
+                # Slot zakończony w trakcie przestoju - najpewniej to on zablokował pętlę
+                activity = last_slot[0]
+            profiler.record_stall(late_ms, activity or self.event_filter.last_event,
+                                  self._stack_during_stall)
+        self._stack_during_stall = None
+        self._stack_activity = None
+
+    def _watch(self):
+        """Wątek strażnika: zrzut stosu wątku GUI w trakcie przestoju."""
+        period = max(self.stall_ms / 2000.0, 0.02)
+        while not self._stop.wait(period):
+            stalled_ms = (time.perf_counter() - self._last_beat) * 1000 - self.interval_ms
+            if stalled_ms < self.stall_ms or self._stack_during_stall is not None:
+                continue
+            frame = sys._current_frames().get(self._gui_thread_id)
+            if frame is None:
+                continue
+            self._stack_activity = self._activity()
+            self._stack_during_stall = "".join(traceback.format_stack(frame, limit=25))
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Wstępne tworzenie zakładek w czasie bezczynności (prewarming).
+
+Po wyświetleniu głównego okna:
+1. wątek w tle importuje moduły zakładek (oraz dodatkowe ciężkie biblioteki
+   z konfiguracji, np. pandas),
+2. na wątku GUI, w kolejnych obrotach pętli zdarzeń, tworzona jest jedna
+   zakładka na raz (wraz z jej początkowym zapytaniem do bazy) - w kolejności
+   priorytetu z config.yaml.
+
+Widgetów Qt nie wolno tworzyć poza wątkiem GUI, dlatego w tle wykonywane są
+wyłącznie importy. Zakładka nie jest tworzona, dopóki użytkownik trzyma
+wciśnięty przycisk myszy albo ma otwarte okno modalne / menu.
+"""
+
+import importlib
+import logging
+import threading
+import time
+
+from PySide6.QtCore import QObject, QTimer
+from PySide6.QtWidgets import QApplication
+
+
+class TabPrewarmer(QObject):
+    """Tworzy zakładki MainWindow w tle, według listy priorytetów."""
+
+    def __init__(self, main_window, order, delay_ms: int = 800,
+                 interval_ms: int = 50, extra_modules=None):
+        super().__init__(main_window)
+        self.main_window = main_window
+        self.order = list(order)
+        self.delay_ms = delay_ms
+        self.extra_modules = list(extra_modules or [])
+        self.logger = logging.getLogger(__name__)
+
+        # Klucze zakładek, których moduły są już zaimportowane (lub import zawiódł)
+        self._imported = set()
+        self._import_thread = None
+        self._stopped = False
+        self.timings = {}
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self._step)
+
+    def start(self):
+        """Startuje prewarming po opóźnieniu (okno zdąży się narysować)."""
+        if not self.order and not self.extra_modules:
+            return
+        QTimer.singleShot(self.delay_ms, self._begin)
+
+    def stop(self):
+        self._stopped = True
+        self._timer.stop()
+
+    @property
+    def finished(self) -> bool:
+        return all(self.main_window.is_tab_created(key) for key in self.order)
+
+    # ----------------------------------------------------------------------
+
+    def _begin(self):
+        if self._stopped:
+            return
+        self._import_thread = threading.Thread(
+            target=self._import_modules, name="tab-prewarm-imports", daemon=True
+        )
+        self._import_thread.start()
+        self._timer.start()
+
+    def _import_modules(self):
+        """Wątek w tle: importuje moduły zakładek w kolejności priorytetu."""
+        for key in self.order:
+            if self._stopped:
+                return
+            try:
+                importlib.import_module(self.main_window.tab_module_name(key))
+            except Exception as e:
+                self.logger.warning(f"Prewarming: import zakładki {key} nieudany: {e}")
+            self._imported.add(key)
+
+        for module_name in self.extra_modules:
+            if self._stopped:
+                return
+            try:
+                importlib.import_module(module_name)
+            except ImportError as e:
+                self.logger.debug(f"Prewarming: pominięto moduł {module_name}: {e}")
+
+    def _user_busy(self) -> bool:
+        """Czy użytkownik jest w trakcie interakcji (nie przeszkadzamy)."""
+        app = QApplication.instance()
+        if app is None:
+            return True
+        return bool(
+            QApplication.mouseButtons()
+            or QApplication.activeModalWidget()
+            or QApplication.activePopupWidget()
+        )
+
+    def _step(self):
+        """Jedna porcja pracy na wątku GUI: co najwyżej jedna zakładka."""
+        if self._stopped:
+            return
+        pending = [key for key in self.order if not self.main_window.is_tab_created(key)]
+        if not pending:
+            self.stop()
+            self.logger.info(
+                "Prewarming zakończony: "
+                + ", ".join(f"{k} {v:.0f} ms" for k, v in self.timings.items())
+            )
+            return
+        if self._user_busy():
+            return
+
+        # Zakładka, której moduł już jest w pamięci; inaczej czekamy na wątek importu
+        key = next((k for k in pending if k in self._imported), None)
+        if key is None:
+            return
+
+        start = time.perf_counter()
+        try:
+            self.main_window.ensure_tab(key)
+        except Exception as e:
+            self.logger.warning(f"Prewarming: nie udało się utworzyć zakładki {key}: {e}")
+            self.order.remove(key)
+            return
+        self.timings[key] = (time.perf_counter() - start) * 1000
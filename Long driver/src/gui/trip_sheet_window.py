@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 """
-Moduł arkuszy przejazdów - widok i (w przyszłości) generowanie PDF
+Moduł kart drogowych - dzienne karty pojazdów, ich sumy i wydruk PDF
 """
 
 from PySide6.QtWidgets import (
@@ -10,16 +10,28 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt, QDate
 from PySide6.QtGui import QFont
-import sqlite3
+import calendar
+import logging
+from datetime import date
 from pathlib import Path
 
+from services.trip_sheet_service import ARCHIVED, CLOSED, OPEN, TripSheetService
+from utils import db
+from utils.constants import TRIP_SHEET_STATUS_DISPLAY
+from utils.helpers import get_project_root, load_config
+
+logger = logging.getLogger(__name__)
+
 
 class TripSheetWindow(QWidget):
-    """Okno arkuszy przejazdów (karta drogowa)"""
+    """Okno kart drogowych (dzienne karty z sumami narastającymi)"""
 
     def __init__(self):
         super().__init__()
         self.db_path = Path(__file__).parent.parent.parent / "database" / "fleet.db"
+        self.config = load_config(str(get_project_root() / "config.yaml"))
+        self.sheets = TripSheetService(self.db_path, self.config.get('fuel_prices'))
+        self.rows = []
         self.setup_ui()
         self.load_data()
 
@@ -29,7 +41,7 @@ class TripSheetWindow(QWidget):
         self.setLayout(main_layout)
 
         # Nagłówek
-        header = QLabel("📝 Arkusze Przejazdów (karta drogowa)")
+        header = QLabel("📝 Karty drogowe")
         header_font = QFont()
         header_font.setPointSize(16)
         header_font.setBold(True)
@@ -47,20 +59,28 @@ class TripSheetWindow(QWidget):
 
         self.date_filter = QDateEdit()
         self.date_filter.setCalendarPopup(True)
+        self.date_filter.setDisplayFormat("MM.yyyy")
         self.date_filter.setDate(QDate.currentDate())
         self.date_filter.setFixedWidth(150)
         self.date_filter.dateChanged.connect(self.load_data)
 
-        self.generate_button = QPushButton("📄 Generuj PDF")
-        self.generate_button.setStyleSheet("background-color: #16a085; color: white; font-weight: bold;")
-        self.generate_button.clicked.connect(self.generate_pdf_report)
-
         filter_layout.addWidget(QLabel("Pojazd:"))
         filter_layout.addWidget(self.vehicle_filter)
         filter_layout.addWidget(QLabel("Miesiąc:"))
         filter_layout.addWidget(self.date_filter)
         filter_layout.addSpacerItem(QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum))
-        filter_layout.addWidget(self.generate_button)
+
+        self.close_button = QPushButton("🔒 Zamknij kartę")
+        self.close_button.clicked.connect(lambda: self.change_status(CLOSED))
+        self.reopen_button = QPushButton("🔓 Otwórz ponownie")
+        self.reopen_button.clicked.connect(lambda: self.change_status(OPEN))
+        self.archive_button = QPushButton("🗄️ Archiwizuj")
+        self.archive_button.clicked.connect(lambda: self.change_status(ARCHIVED))
+        self.generate_button = QPushButton("📄 Generuj PDF")
+        self.generate_button.setStyleSheet("background-color: #16a085; color: white; font-weight: bold;")
+        self.generate_button.clicked.connect(self.generate_pdf_report)
+        for button in (self.close_button, self.reopen_button, self.archive_button, self.generate_button):
+            filter_layout.addWidget(button)
 
         main_layout.addLayout(filter_layout)
 
@@ -68,14 +88,14 @@ class TripSheetWindow(QWidget):
         self.table = QTableWidget()
         self.table.setColumnCount(11)
         self.table.setHorizontalHeaderLabels([
-            "ID", "Nr rej.", "Kierowca", "Data", "Cel",
-            "Przebieg start", "Przebieg koniec", "Dystans",
-            "Paliwo zużyte", "Śr. spalanie", "Uwagi"
+            "Nr karty", "Data", "Nr rej.", "Kierowca", "Status", "Przejazdy",
+            "Przebieg start", "Przebieg koniec", "Dystans", "Paliwo", "Koszt"
         ])
         header = self.table.horizontalHeader()
         header.setSectionResizeMode(QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(10, QHeaderView.Stretch)
+        header.setSectionResizeMode(3, QHeaderView.Stretch)
         self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setSelectionMode(QTableWidget.SingleSelection)
         self.table.setEditTriggers(QTableWidget.NoEditTriggers)
 
         main_layout.addWidget(self.table)
@@ -86,14 +106,19 @@ class TripSheetWindow(QWidget):
     def get_connection(self):
         """Połączenie z bazą"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = db.connect(self.db_path)
             return conn
         except Exception as e:
             QMessageBox.critical(self, "Błąd", f"Błąd połączenia:\n{str(e)}")
             return None
 
+    def month_range(self):
+        selected = self.date_filter.date()
+        last_day = calendar.monthrange(selected.year(), selected.month())[1]
+        return date(selected.year(), selected.month(), 1), date(selected.year(), selected.month(), last_day)
+
     def load_data(self):
-        """Ładuje dane do tabeli"""
+        """Ładuje karty miesiąca (sumy zapisane na kartach - przejazdy nie są przeliczane)"""
         conn = self.get_connection()
         if not conn:
             return
@@ -113,77 +138,100 @@ class TripSheetWindow(QWidget):
                 for vid, reg, brand, model in vehicles:
                     self.vehicle_filter.addItem(f"{reg} - {brand} {model}", vid)
 
-            # Buduj zapytanie SQL
-            query = """
-                SELECT
-                    t.id,
-                    v.registration_number,
-                    e.first_name || ' ' || e.last_name,
-                    strftime('%d.%m.%Y', t.start_date),
-                    t.purpose,
-                    t.start_mileage,
-                    t.end_mileage,
-                    t.distance,
-                    t.fuel_used,
-                    CASE
-                        WHEN t.distance > 0 AND t.fuel_used > 0
-                        THEN (t.fuel_used / t.distance) * 100
-                        ELSE NULL
-                    END as avg_consumption,
-                    t.notes
-                FROM trips t
-                JOIN vehicles v ON t.vehicle_id = v.id
-                JOIN employees e ON t.employee_id = e.id
-                WHERE strftime('%Y-%m', t.start_date) = ?
-            """
-            params = [self.date_filter.date().toString("yyyy-MM")]
-
-            if self.vehicle_filter.currentIndex() > 0:
-                query += " AND t.vehicle_id = ?"
-                params.append(self.vehicle_filter.currentData())
-
-            query += " ORDER BY t.start_date"
-
-            cursor.execute(query, params)
-            trips = cursor.fetchall()
-
-            self.table.setRowCount(len(trips))
-            for row_idx, trip in enumerate(trips):
-                for col_idx, value in enumerate(trip):
-                    item = QTableWidgetItem(str(value) if value is not None else "")
-
-                    # Formatowanie liczb
-                    if col_idx in [5, 6, 7] and value is not None:
-                        try:
-                            item.setText(f"{float(value):.1f} km")
-                        except Exception:
-                            pass
-                    elif col_idx == 8 and value is not None:
-                        try:
-                            item.setText(f"{float(value):.2f} L")
-                        except Exception:
-                            pass
-                    elif col_idx == 9 and value is not None:
-                        try:
-                            item.setText(f"{float(value):.2f} L/100km")
-                        except Exception:
-                            pass
-
-                    self.table.setItem(row_idx, col_idx, item)
+            date_from, date_to = self.month_range()
+            # Przejazdy spoza TripService (jeszcze bez karty) - tylko brakujące
+            if self.sheets.sync(conn, date_from, date_to):
+                conn.commit()
+
+            vehicle_id = self.vehicle_filter.currentData() if self.vehicle_filter.currentIndex() > 0 else None
+            self.rows = self.sheets.sheets(conn, date_from, date_to, vehicle_id)
+            registrations = dict(conn.execute("SELECT id, registration_number FROM vehicles"))
+            people = self.sheets.costs.layout(conn)["people"]
+            names = {pid: f"{first} {last}"
+                     for pid, first, last in conn.execute(f"SELECT id, first_name, last_name FROM {people}")}
+
+            self.table.setRowCount(len(self.rows))
+            for row_idx, sheet in enumerate(self.rows):
+                values = [
+                    sheet.sheet_number,
+                    sheet.date.strftime('%d.%m.%Y'),
+                    registrations.get(sheet.vehicle_id, ""),
+                    names.get(sheet.employee_id, ""),
+                    TRIP_SHEET_STATUS_DISPLAY.get(sheet.status, sheet.status),
+                    str(sheet.trips_count),
+                    f"{sheet.start_mileage:.1f} km",
+                    f"{sheet.end_mileage:.1f} km" if sheet.end_mileage is not None else "",
+                    f"{sheet.total_km:.1f} km",
+                    f"{sheet.total_fuel:.2f} L",
+                    f"{sheet.total_cost:.2f} zł",
+                ]
+                for col_idx, value in enumerate(values):
+                    self.table.setItem(row_idx, col_idx, QTableWidgetItem(value))
 
         except Exception as e:
+            conn.rollback()
             QMessageBox.critical(self, "Błąd", f"Błąd ładowania danych:\n{str(e)}")
         finally:
             conn.close()
 
+    def selected_sheet(self):
+        row = self.table.currentRow()
+        if row < 0 or row >= len(self.rows):
+            QMessageBox.information(self, "Informacja", "Wybierz kartę drogową z listy.")
+            return None
+        return self.rows[row]
+
+    def change_status(self, status: str):
+        """Zamknięcie / ponowne otwarcie / archiwizacja wybranej karty"""
+        sheet = self.selected_sheet()
+        if sheet is None:
+            return
+        conn = self.get_connection()
+        if not conn:
+            return
+        try:
+            self.sheets.set_status(conn, sheet.id, status)
+            conn.commit()
+        except ValueError as e:
+            conn.rollback()
+            QMessageBox.warning(self, "Karta drogowa", f"Nie można zmienić statusu karty:\n{e}")
+            return
+        except Exception as e:
+            conn.rollback()
+            QMessageBox.critical(self, "Błąd", f"Błąd zmiany statusu:\n{str(e)}")
+            return
+        finally:
+            conn.close()
+        self.load_data()
+
     def generate_pdf_report(self):
-        """Generuje raport PDF (placeholder)"""
-        QMessageBox.information(
-            self,
-            "Informacja",
-            "Funkcja generowania raportów PDF jest w trakcie przygotowania.\n"
-            "Dane karty drogowej widzisz w tabeli powyżej."
-        )
+        """Generuje PDF wybranej karty (SM-102) z kodem QR"""
+        sheet = self.selected_sheet()
+        if sheet is None:
+            return
+        conn = self.get_connection()
+        if not conn:
+            return
+        try:
+            vehicle, employee = self.sheets.parties(conn, sheet)
+            lines = self.sheets.lines(conn, sheet.id)
+        except Exception as e:
+            QMessageBox.critical(self, "Błąd", f"Błąd odczytu karty:\n{str(e)}")
+            return
+        finally:
+            conn.close()
+
+        try:
+            from services.pdf_service import PDFService
+            path = PDFService(self.config).generate_trip_sheet_pdf(sheet, vehicle, employee, lines)
+        except ImportError as e:
+            QMessageBox.warning(self, "PDF", f"Brak biblioteki do generowania PDF:\n{e}")
+            return
+        except Exception as e:
+            logger.exception("Błąd generowania karty drogowej PDF")
+            QMessageBox.critical(self, "Błąd", f"Błąd generowania PDF:\n{str(e)}")
+            return
+        QMessageBox.information(self, "PDF", f"✅ Karta drogowa zapisana:\n{path}")
 
 
 if __name__ == "__main__":
@@ -192,7 +240,7 @@ if __name__ == "__main__":
 
     app = QApplication(sys.argv)
     window = TripSheetWindow()
-    window.setWindowTitle("Test - Arkusze Przejazdów")
+    window.setWindowTitle("Test - Karty drogowe")
     window.resize(1200, 700)
     window.show()
     sys.exit(app.exec())
@@ -16,10 +16,14 @@ from PySide6.QtCore import Qt, QDateTime
 from PySide6.QtGui import QFont, QColor
 from pathlib import Path
 
-from ..services.trip_service import TripService
-from ..services.vehicle_service import VehicleService
-from ..services.driver_service import DriverService
-from ..models.vehicle import Vehicle
+from services.trip_service import TripService
+from services.vehicle_service import VehicleService
+from services.driver_service import DriverService
+from services.maintenance_service import MaintenanceService
+from services.monthly_cube_service import MonthlyCubeService
+from utils import fleet_index
+from utils.fleet_index import VehicleState
+from utils.ui_profiler import profile_slot
 
 class TripWindow(QWidget):
     """The main window for trip management."""
@@ -32,8 +36,12 @@ class TripWindow(QWidget):
         self.vehicle_service = VehicleService(self.db_path)
         self.trip_service = TripService(self.db_path, self.vehicle_service)
         self.driver_service = DriverService(self.db_path)
+        self.maintenance_service = MaintenanceService(self.db_path)
+        self.cube_service = MonthlyCubeService(self.db_path)
 
-        self.selected_vehicle: Vehicle | None = None
+        self.fleet_index = fleet_index.get_index(self.db_path)
+
+        self.selected_vehicle: VehicleState | None = None
 
         self.setup_ui()
         self.load_initial_data()
@@ -108,8 +116,8 @@ class TripWindow(QWidget):
             for driver in active_drivers:
                 self.driver_combo.addItem(f"{driver.first_name} {driver.last_name}", driver.id)
 
-            # Load available vehicles
-            available_vehicles = self.vehicle_service.get_all_vehicles(status_filter='available')
+            # Load available vehicles (from the in-memory fleet index)
+            available_vehicles = self.fleet_index.available()
             self.vehicle_combo.clear()
             for vehicle in available_vehicles:
                 self.vehicle_combo.addItem(
@@ -129,7 +137,7 @@ class TripWindow(QWidget):
             return
 
         vehicle_id = self.vehicle_combo.currentData()
-        self.selected_vehicle = self.vehicle_service.get_vehicle_by_id(vehicle_id)
+        self.selected_vehicle = self.fleet_index.get(vehicle_id)
 
         if self.selected_vehicle:
             self.start_mileage_label.setText(f"{self.selected_vehicle.current_mileage:.1f} km")
@@ -156,7 +164,7 @@ class TripWindow(QWidget):
         try:
             new_trip = self.trip_service.start_new_trip(vehicle_id, driver_id, route, purpose)
             if new_trip:
-                QMessageBox.information(self, "Success", f"Trip #{new_trip.id} started successfully!")
+                QMessageBox.information(self, "Success", f"Trip #{new_trip.id} started successfully!\nRoad card: {new_trip.trip_number}")
                 self.load_initial_data() # Refresh vehicle list
                 self.refresh_trips_table()
             else:
@@ -164,6 +172,7 @@ class TripWindow(QWidget):
         except Exception as e:
             QMessageBox.critical(self, "Error", f"An error occurred: {e}")
 
+    @profile_slot
     def refresh_trips_table(self):
         """Reloads the data in the trips table."""
         try:
@@ -233,6 +242,9 @@ class TripWindow(QWidget):
         try:
             completed_trip = self.trip_service.complete_trip(trip_id, end_mileage, end_fuel)
             if completed_trip:
+                # Only this vehicle's service schedule changes
+                self.maintenance_service.on_trip_completed(completed_trip.vehicle_id)
+                self.cube_service.on_trip_completed(completed_trip.id)
                 QMessageBox.information(self, "Success", f"Trip #{completed_trip.id} completed successfully!")
                 self.load_initial_data()
                 self.refresh_trips_table()
@@ -11,9 +11,59 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QFont, QColor
+import bisect
+import json
+import logging
 import sqlite3
 from pathlib import Path
 
+from utils import db, fleet_index
+from utils.constants import FUEL_LEVEL_THRESHOLDS, SERVICE_STATUS_COLORS, SERVICE_STATUS_DISPLAY
+from utils.ui_profiler import profile_slot
+
+from services.batch_service import BatchService
+from services.maintenance_service import MaintenanceService
+from services.version_service import VersionService
+from .conflict_dialog import save_with_conflict_check
+
+logger = logging.getLogger(__name__)
+
+VEHICLE_LIST_SQL = """
+    SELECT id, registration_number, brand, model, fuel_type,
+           fuel_consumption, current_mileage, current_fuel, status,
+           tank_capacity, notes
+    FROM vehicles
+"""
+
+STATUS_COLORS = {
+    "available": QColor(144, 238, 144, 100),
+    "in_use": QColor(255, 255, 0, 100),
+    "service": QColor(135, 206, 250, 100),
+    "broken": QColor(255, 99, 71, 100),
+}
+
+# Kolumny zapisywane z formularza (i ich etykiety w dialogu konfliktu)
+VEHICLE_FIELDS = {
+    "registration_number": "Nr rejestracyjny",
+    "brand": "Marka",
+    "model": "Model",
+    "fuel_type": "Rodzaj paliwa",
+    "fuel_consumption": "Średnie spalanie",
+    "current_mileage": "Przebieg aktualny",
+    "current_fuel": "Poziom paliwa",
+    "status": "Status",
+    "tank_capacity": "Pojemność baku",
+    "vin": "VIN",
+    "production_year": "Rok produkcji",
+    "notes": "Uwagi",
+}
+
+# Ile operacji zbiorczych można cofnąć
+UNDO_DEPTH = 10
+
+# Kolumna z najpilniejszym serwisem (poza danymi z VEHICLE_LIST_SQL)
+SERVICE_COLUMN = 11
+
 
 class FuelProgressBar(QProgressBar):
     """Pasek paliwa z kolorami (zielony→żółty→czerwony)."""
@@ -27,11 +77,11 @@ class FuelProgressBar(QProgressBar):
 
     def update_style(self, fuel_percent: float):
         """Zmienia kolor w zależności od poziomu paliwa."""
-        if fuel_percent >= 70:
+        if fuel_percent >= FUEL_LEVEL_THRESHOLDS['GOOD']:
             color = "#27ae60"  # zielony
-        elif fuel_percent >= 40:
+        elif fuel_percent >= FUEL_LEVEL_THRESHOLDS['MEDIUM']:
             color = "#f39c12"  # pomarańczowy
-        elif fuel_percent >= 20:
+        elif fuel_percent >= FUEL_LEVEL_THRESHOLDS['LOW']:
             color = "#f1c40f"  # żółty
         else:
             color = "#e74c3c"  # czerwony
@@ -70,6 +120,12 @@ class VehicleWindow(QWidget):
     def __init__(self):
         super().__init__()
         self.db_path = Path(__file__).parent.parent.parent / "database" / "fleet.db"
+        self.batch_service = BatchService(self.db_path)
+        self.maintenance_service = MaintenanceService(self.db_path)
+        self.versions = VersionService(self.db_path)
+        # Pojazd wczytany do formularza (wartości i wersja) - podstawa zapisu warunkowego
+        self.loaded = None
+        self.undo_stack = []
         self.setup_ui()
         self.load_vehicles()
         self.resize(1400, 750)
@@ -161,7 +217,7 @@ class VehicleWindow(QWidget):
         self.production_year.setValue(2020)
 
         self.status = QComboBox()
-        self.status.addItems(["available", "in_use", "service", "broken"])
+        self.status.addItems(["available", "in_use", "in_trip", "service", "broken"])
 
         self.notes = QTextEdit()
         self.notes.setPlaceholderText("Uwagi o pojeździe...")
@@ -204,10 +260,20 @@ class VehicleWindow(QWidget):
         self.clear_button.setStyleSheet("background-color: #95a5a6; color: white;")
         self.clear_button.clicked.connect(self.clear_form)
 
+        self.service_button = QPushButton("🔧 Serwisy")
+        self.service_button.setToolTip("Harmonogram i historia serwisów zaznaczonego pojazdu")
+        self.service_button.clicked.connect(self.show_maintenance)
+
+        self.history_button = QPushButton("🕓 Historia zmian")
+        self.history_button.setToolTip("Kto i kiedy zmienił przebieg, paliwo, status ... zaznaczonego pojazdu")
+        self.history_button.clicked.connect(self.show_history)
+
         buttons_layout.addWidget(self.add_button)
         buttons_layout.addWidget(self.update_button)
         buttons_layout.addWidget(self.delete_button)
         buttons_layout.addWidget(self.clear_button)
+        buttons_layout.addWidget(self.service_button)
+        buttons_layout.addWidget(self.history_button)
 
         form_layout.addRow(buttons_layout)
 
@@ -221,11 +287,44 @@ class VehicleWindow(QWidget):
         table_layout = QVBoxLayout()
         table_group.setLayout(table_layout)
 
+        # --- Operacje zbiorcze na zaznaczonych wierszach ---
+        batch_layout = QHBoxLayout()
+        batch_layout.addWidget(QLabel("Zaznaczone:"))
+
+        self.batch_status = QComboBox()
+        self.batch_status.addItems(["available", "in_use", "service", "broken"])
+        batch_status_btn = QPushButton("Ustaw status")
+        batch_status_btn.clicked.connect(self.batch_set_status)
+
+        self.batch_fuel_type = QComboBox()
+        self.batch_fuel_type.addItems(["Benzyna", "Diesel", "LPG", "Hybryda", "Elektryk"])
+        batch_fuel_btn = QPushButton("Ustaw paliwo")
+        batch_fuel_btn.clicked.connect(self.batch_set_fuel_type)
+
+        self.batch_consumption = QDoubleSpinBox()
+        self.batch_consumption.setRange(0, 30)
+        self.batch_consumption.setDecimals(1)
+        self.batch_consumption.setValue(7.5)
+        self.batch_consumption.setSuffix(" L/100km")
+        batch_consumption_btn = QPushButton("Ustaw spalanie")
+        batch_consumption_btn.clicked.connect(self.batch_set_consumption)
+
+        self.undo_button = QPushButton("↩️ Cofnij")
+        self.undo_button.setEnabled(False)
+        self.undo_button.clicked.connect(self.undo_last)
+
+        for widget in (self.batch_status, batch_status_btn, self.batch_fuel_type, batch_fuel_btn,
+                       self.batch_consumption, batch_consumption_btn):
+            batch_layout.addWidget(widget)
+        batch_layout.addStretch()
+        batch_layout.addWidget(self.undo_button)
+        table_layout.addLayout(batch_layout)
+
         self.table = QTableWidget()
-        self.table.setColumnCount(11)
+        self.table.setColumnCount(12)
         self.table.setHorizontalHeaderLabels([
             "ID", "Nr rej.", "Marka", "Model", "Paliwo", "Spalanie",
-            "Przebieg", "Stan paliwa", "Status", "Bak", "Uwagi"
+            "Przebieg", "Stan paliwa", "Status", "Bak", "Uwagi", "Serwis"
         ])
 
         header = self.table.horizontalHeader()
@@ -256,76 +355,126 @@ class VehicleWindow(QWidget):
     # ==========================
     def get_connection(self):
         try:
-            return sqlite3.connect(self.db_path)
+            return db.connect(self.db_path)
         except Exception as e:
             QMessageBox.critical(self, "Błąd", f"Błąd połączenia:\n{str(e)}")
             return None
 
+    @profile_slot
     def load_vehicles(self):
         conn = self.get_connection()
         if not conn:
             return
         try:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, registration_number, brand, model, fuel_type,
-                       fuel_consumption, current_mileage, current_fuel, status,
-                       tank_capacity, notes
-                FROM vehicles
-                ORDER BY registration_number
-            """)
+            cursor.execute(VEHICLE_LIST_SQL + " ORDER BY registration_number")
             rows = cursor.fetchall()
             self.table.setRowCount(len(rows))
 
             for row_idx, row in enumerate(rows):
-                for col_idx, value in enumerate(row):
-                    if col_idx in (5, 6, 7, 9):  # spalanie, przebieg, paliwo, bak
-                        try:
-                            num = float(value or 0)
-                            if col_idx == 5:
-                                text = f"{num:.1f} L/100km"
-                            elif col_idx == 6:
-                                text = f"{num:.1f} km"
-                            else:
-                                text = f"{num:.1f} L"
-                            item = QTableWidgetItem(text)
-                        except Exception:
-                            item = QTableWidgetItem(str(value))
+                self.fill_row(row_idx, row)
+        finally:
+            conn.close()
+        self.load_service_status()
+
+    def load_service_status(self):
+        """Kolumna 'Serwis': najpilniejszy serwis każdego pojazdu (z zapisanego harmonogramu)."""
+        try:
+            worst = self.maintenance_service.vehicle_status()
+        except Exception as e:
+            logger.warning(f"Nie udało się odczytać harmonogramu serwisów: {e}")
+            return
+        for row_idx in range(self.table.rowCount()):
+            item = worst.get(int(self.table.item(row_idx, 0).text()))
+            if item is None:
+                self.table.setItem(row_idx, SERVICE_COLUMN, QTableWidgetItem(""))
+                continue
+            status = item.status()
+            cell = QTableWidgetItem(f"{SERVICE_STATUS_DISPLAY[status]}: {item.rule_name}")
+            cell.setBackground(QColor(SERVICE_STATUS_COLORS[status]))
+            details = []
+            if item.km_remaining is not None:
+                details.append(f"Pozostało: {item.km_remaining:.0f} km")
+            if item.next_date:
+                details.append(f"Termin: {item.next_date:%d.%m.%Y}")
+            cell.setToolTip("\n".join(details))
+            self.table.setItem(row_idx, SERVICE_COLUMN, cell)
+
+    def fill_row(self, row_idx, row):
+        """Wypełnia jeden wiersz tabeli danymi pojazdu."""
+        for col_idx, value in enumerate(row):
+            if col_idx in (5, 6, 7, 9):  # spalanie, przebieg, paliwo, bak
+                try:
+                    num = float(value or 0)
+                    if col_idx == 5:
+                        text = f"{num:.1f} L/100km"
+                    elif col_idx == 6:
+                        text = f"{num:.1f} km"
                     else:
-                        item = QTableWidgetItem(str(value) if value is not None else "")
-
-                    # status – kolor tła
-                    if col_idx == 8:
-                        status = str(value)
-                        colors = {
-                            "available": QColor(144, 238, 144, 100),
-                            "in_use": QColor(255, 255, 0, 100),
-                            "service": QColor(135, 206, 250, 100),
-                            "broken": QColor(255, 99, 71, 100),
-                        }
-                        if status in colors:
-                            item.setBackground(colors[status])
-
-                    # Stan paliwa – kolor w zależności od % baku
-                    if col_idx == 7 and row[9]:
-                        try:
-                            fuel_percent = min(
-                                100,
-                                max(0, (float(value or 0) / float(row[9])) * 100)
-                            )
-                            item.setBackground(QColor(
-                                max(0, 255 - int(fuel_percent * 2.55)),
-                                int(fuel_percent * 2.55),
-                                0,
-                                100
-                            ))
-                        except Exception:
-                            pass
-
-                    self.table.setItem(row_idx, col_idx, item)
+                        text = f"{num:.1f} L"
+                    item = QTableWidgetItem(text)
+                except Exception:
+                    item = QTableWidgetItem(str(value))
+            else:
+                item = QTableWidgetItem(str(value) if value is not None else "")
+
+            # status – kolor tła
+            if col_idx == 8 and str(value) in STATUS_COLORS:
+                item.setBackground(STATUS_COLORS[str(value)])
+
+            # Stan paliwa – kolor w zależności od % baku
+            if col_idx == 7 and row[9]:
+                try:
+                    fuel_percent = min(
+                        100,
+                        max(0, (float(value or 0) / float(row[9])) * 100)
+                    )
+                    item.setBackground(QColor(
+                        max(0, 255 - int(fuel_percent * 2.55)),
+                        int(fuel_percent * 2.55),
+                        0,
+                        100
+                    ))
+                except Exception:
+                    pass
+
+            self.table.setItem(row_idx, col_idx, item)
+
+    def refresh_rows(self, vehicle_ids):
+        """
+        Odświeża tylko wskazane pojazdy: zmienione wiersze są przepisywane,
+        usunięte znikają, przywrócone wracają na miejsce wg nr rejestracyjnego.
+        """
+        conn = self.get_connection()
+        if not conn:
+            return
+        try:
+            rows = conn.execute(
+                VEHICLE_LIST_SQL + " WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps(sorted(vehicle_ids)),),
+            ).fetchall()
         finally:
             conn.close()
 
+        fresh = {row[0]: row for row in rows}
+        wanted = set(vehicle_ids)
+        # od końca, żeby usuwanie nie przesuwało kolejnych indeksów
+        for row_idx in range(self.table.rowCount() - 1, -1, -1):
+            vehicle_id = int(self.table.item(row_idx, 0).text())
+            if vehicle_id not in wanted:
+                continue
+            if vehicle_id in fresh:
+                self.fill_row(row_idx, fresh.pop(vehicle_id))
+            else:
+                self.table.removeRow(row_idx)
+
+        for row in sorted(fresh.values(), key=lambda r: r[1]):
+            keys = [self.table.item(i, 1).text() for i in range(self.table.rowCount())]
+            row_idx = bisect.bisect_left(keys, row[1])
+            self.table.insertRow(row_idx)
+            self.fill_row(row_idx, row)
+        self.load_service_status()
+
     # ==========================
     # Operacje na pojazdach
     # ==========================
@@ -359,6 +508,7 @@ class VehicleWindow(QWidget):
                 self.notes.toPlainText().strip()
             ))
             conn.commit()
+            fleet_index.refresh(self.db_path, conn, cursor.lastrowid)
             QMessageBox.information(self, "Sukces", "🚗 Pojazd dodany!")
             self.load_vehicles()
             self.clear_form()
@@ -369,8 +519,29 @@ class VehicleWindow(QWidget):
         finally:
             conn.close()
 
+    def form_values(self) -> dict:
+        """Wartości formularza (kolumny VEHICLE_FIELDS)."""
+        return {
+            "registration_number": self.reg_number.text().strip().upper(),
+            "brand": self.brand.text().strip(),
+            "model": self.model.text().strip(),
+            "fuel_type": self.fuel_type.currentText(),
+            "fuel_consumption": self.fuel_consumption.value(),
+            "current_mileage": self.current_mileage.value(),
+            "current_fuel": self.current_fuel.value(),
+            "status": self.status.currentText(),
+            "tank_capacity": self.tank_capacity.value() if self.tank_capacity.value() > 0 else None,
+            "vin": self.vin.text().strip() or None,
+            "production_year": self.production_year.value(),
+            "notes": self.notes.toPlainText().strip(),
+        }
+
     def update_vehicle(self):
-        if not self.vehicle_id.text():
+        """
+        Zapis warunkowy (wersja wiersza): jeśli pojazd zmieniono od wczytania
+        (np. zakończony przejazd zapisał przebieg), pokazuje różnice pól.
+        """
+        if not self.vehicle_id.text() or self.loaded is None:
             QMessageBox.warning(self, "Błąd", "Wybierz pojazd do edycji!")
             return
         if not self.validate_form():
@@ -378,116 +549,194 @@ class VehicleWindow(QWidget):
         conn = self.get_connection()
         if not conn:
             return
+        vehicle_id = int(self.vehicle_id.text())
         try:
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE vehicles
-                SET registration_number=?, brand=?, model=?, fuel_type=?,
-                    fuel_consumption=?, current_mileage=?, current_fuel=?, status=?,
-                    tank_capacity=?, vin=?, production_year=?, notes=?
-                WHERE id=?
-            """, (
-                self.reg_number.text().strip().upper(),
-                self.brand.text().strip(),
-                self.model.text().strip(),
-                self.fuel_type.currentText(),
-                self.fuel_consumption.value(),
-                self.current_mileage.value(),
-                self.current_fuel.value(),
-                self.status.currentText(),
-                self.tank_capacity.value() if self.tank_capacity.value() > 0 else None,
-                self.vin.text().strip() or None,
-                self.production_year.value(),
-                self.notes.toPlainText().strip(),
-                int(self.vehicle_id.text())
-            ))
-            conn.commit()
+            saved = save_with_conflict_check(self, self.versions, conn, "vehicles", vehicle_id,
+                                             self.loaded, self.form_values(), VEHICLE_FIELDS)
+            if saved is None:
+                return
+            fleet_index.refresh(self.db_path, conn, vehicle_id)
             QMessageBox.information(self, "Sukces", "🚗 Pojazd zaktualizowany!")
             self.load_vehicles()
             self.clear_form()
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            QMessageBox.warning(self, "Błąd", "Nr rejestracyjny już istnieje!")
         except Exception as e:
+            conn.rollback()
             QMessageBox.critical(self, "Błąd", str(e))
         finally:
             conn.close()
 
+    def show_maintenance(self):
+        """Okno serwisów pojazdu z zaznaczonego wiersza."""
+        row = self.table.currentRow()
+        if row < 0:
+            QMessageBox.information(self, "Serwisy", "Zaznacz pojazd na liście.")
+            return
+        from .maintenance_dialog import MaintenanceDialog
+        dialog = MaintenanceDialog(
+            self.db_path,
+            int(self.table.item(row, 0).text()),
+            self.table.item(row, 1).text(),
+            self.table.item(row, 2).text(),
+            self.table.item(row, 3).text(),
+            float(self.table.item(row, 6).text().split()[0] or 0),
+            self,
+        )
+        dialog.changed.connect(lambda _vehicle_id: self.load_service_status())
+        dialog.exec()
+
+    def show_history(self):
+        """Historia zmian pojazdu z zaznaczonego wiersza (dziennik zmian)."""
+        row = self.table.currentRow()
+        if row < 0:
+            QMessageBox.information(self, "Historia zmian", "Zaznacz pojazd na liście.")
+            return
+        from .audit_history_dialog import AuditHistoryDialog
+        AuditHistoryDialog(self.db_path, int(self.table.item(row, 0).text()),
+                           self.table.item(row, 1).text(), self).exec()
+
+    def selected_ids(self):
+        """Id pojazdów z zaznaczonych wierszy."""
+        return [
+            int(self.table.item(index.row(), 0).text())
+            for index in self.table.selectionModel().selectedRows()
+        ]
+
     def delete_selected(self):
-        selected_rows = set(index.row() for index in self.table.selectedIndexes())
-        if not selected_rows:
+        vehicle_ids = self.selected_ids()
+        if not vehicle_ids:
             QMessageBox.warning(self, "Błąd", "Wybierz pojazdy!")
             return
 
         reply = QMessageBox.question(
             self, "Potwierdź",
-            f"Usunąć {len(selected_rows)} pojazdów?",
+            f"Usunąć {len(vehicle_ids)} pojazdów?",
             QMessageBox.Yes | QMessageBox.No
         )
         if reply != QMessageBox.Yes:
             return
 
+        self.apply_batch(
+            lambda: self.batch_service.delete(
+                "vehicles", vehicle_ids, f"usunięcie {len(vehicle_ids)} pojazdów"
+            )
+        )
+
+    def batch_set_status(self):
+        self.batch_update({"status": self.batch_status.currentText()}, "status")
+
+    def batch_set_fuel_type(self):
+        self.batch_update({"fuel_type": self.batch_fuel_type.currentText()}, "rodzaj paliwa")
+
+    def batch_set_consumption(self):
+        self.batch_update({"fuel_consumption": self.batch_consumption.value()}, "spalanie")
+
+    def batch_update(self, changes, label):
+        vehicle_ids = self.selected_ids()
+        if not vehicle_ids:
+            QMessageBox.warning(self, "Błąd", "Zaznacz pojazdy w tabeli!")
+            return
+        value = next(iter(changes.values()))
+        self.apply_batch(
+            lambda: self.batch_service.update(
+                "vehicles", vehicle_ids, changes,
+                f"{label} = {value} dla {len(vehicle_ids)} pojazdów"
+            )
+        )
+
+    def apply_batch(self, operation):
+        """Wykonuje operację zbiorczą, zapamiętuje migawkę do cofnięcia i odświeża wiersze."""
+        try:
+            snapshot = operation()
+        except Exception as e:
+            QMessageBox.critical(self, "Błąd", str(e))
+            return
+        self.undo_stack.append(snapshot)
+        del self.undo_stack[:-UNDO_DEPTH]
+        self.update_undo_button()
+        self.refresh_rows(snapshot.ids)
+        if snapshot.skipped:
+            QMessageBox.information(
+                self, "Pominięto pojazdy",
+                f"Zmieniono {len(snapshot.rows)} pojazdów. Pominięto {len(snapshot.skipped)} w trasie "
+                f"lub z wydanym kluczykiem (id: {', '.join(map(str, snapshot.skipped))}) - "
+                f"ich status zmieni zwrot kluczyka lub zakończenie przejazdu."
+            )
+
+    def undo_last(self):
+        if not self.undo_stack:
+            return
+        snapshot = self.undo_stack.pop()
+        self.update_undo_button()
+        try:
+            restored = self.batch_service.undo(snapshot)
+        except Exception as e:
+            QMessageBox.critical(self, "Błąd", f"Nie udało się cofnąć:\n{str(e)}")
+            return
+        self.refresh_rows(snapshot.ids)
+        skipped = len(snapshot.rows) - len(restored)
+        if skipped:
+            QMessageBox.information(
+                self, "Cofnięto częściowo",
+                f"Przywrócono {len(restored)} pojazdów. {skipped} zmieniono w międzyczasie - pominięto."
+            )
+
+    def update_undo_button(self):
+        self.undo_button.setEnabled(bool(self.undo_stack))
+        self.undo_button.setToolTip(
+            f"Cofnij: {self.undo_stack[-1].description}" if self.undo_stack else ""
+        )
+
+    def load_vehicle_to_form(self, index):
+        """Wczytuje pojazd z bazy (nie z tabeli) razem z wersją wiersza."""
+        vehicle_id = int(self.table.item(index.row(), 0).text())
         conn = self.get_connection()
         if not conn:
             return
         try:
-            cursor = conn.cursor()
-            for row in selected_rows:
-                vehicle_id = int(self.table.item(row, 0).text())
-                cursor.execute("DELETE FROM vehicles WHERE id=?", (vehicle_id,))
-            conn.commit()
-            QMessageBox.information(self, "Sukces", f"🗑️ Usunięto {len(selected_rows)} pojazdów!")
-            self.load_vehicles()
+            loaded = self.versions.load(conn, "vehicles", vehicle_id, VEHICLE_FIELDS)
+        except Exception as e:
+            QMessageBox.critical(self, "Błąd", f"Błąd odczytu pojazdu:\n{str(e)}")
+            return
         finally:
             conn.close()
+        if loaded is None:
+            QMessageBox.information(self, "Pojazd", "Pojazd został w międzyczasie usunięty.")
+            self.refresh_rows([vehicle_id])
+            return
 
-    def load_vehicle_to_form(self, index):
-        row = index.row()
-        self.vehicle_id.setText(self.table.item(row, 0).text())
-        self.reg_number.setText(self.table.item(row, 1).text())
-        self.brand.setText(self.table.item(row, 2).text())
-        self.model.setText(self.table.item(row, 3).text())
-
-        fuel_type = self.table.item(row, 4).text()
-        idx = self.fuel_type.findText(fuel_type)
+        self.loaded = loaded
+        self.vehicle_id.setText(str(vehicle_id))
+        self.reg_number.setText(loaded["registration_number"] or "")
+        self.brand.setText(loaded["brand"] or "")
+        self.model.setText(loaded["model"] or "")
+
+        idx = self.fuel_type.findText(loaded["fuel_type"] or "")
         if idx >= 0:
             self.fuel_type.setCurrentIndex(idx)
 
-        try:
-            self.fuel_consumption.setValue(
-                float(self.table.item(row, 5).text().split()[0])
-            )
-        except Exception:
-            pass
-
-        try:
-            self.current_mileage.setValue(
-                float(self.table.item(row, 6).text().split()[0])
-            )
-        except Exception:
-            pass
+        self.fuel_consumption.setValue(float(loaded["fuel_consumption"] or 0))
+        self.current_mileage.setValue(float(loaded["current_mileage"] or 0))
+        # Najpierw bak - pole paliwa nie może go przekroczyć w walidacji
+        self.tank_capacity.setValue(float(loaded["tank_capacity"] or 0))
+        self.current_fuel.setValue(float(loaded["current_fuel"] or 0))
 
-        try:
-            fuel_text = self.table.item(row, 7).text().split()[0]
-            self.current_fuel.setValue(float(fuel_text))
-        except Exception:
-            pass
-
-        status_text = self.table.item(row, 8).text()
-        idx = self.status.findText(status_text)
+        idx = self.status.findText(loaded["status"] or "")
         if idx >= 0:
             self.status.setCurrentIndex(idx)
 
-        try:
-            self.tank_capacity.setValue(
-                float(self.table.item(row, 9).text().split()[0])
-            )
-        except Exception:
-            pass
-
-        self.notes.setText(self.table.item(row, 10).text())
+        self.vin.setText(loaded["vin"] or "")
+        if loaded["production_year"]:
+            self.production_year.setValue(int(loaded["production_year"]))
+        self.notes.setText(loaded["notes"] or "")
         self.update_fuel_bar()
         self.add_button.setEnabled(False)
         self.update_button.setEnabled(True)
 
     def clear_form(self):
+        self.loaded = None
         self.vehicle_id.clear()
         self.reg_number.clear()
         self.brand.clear()
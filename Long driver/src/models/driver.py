@@ -1,13 +1,15 @@
 """
 Data model for a Driver.
 """
-from dataclasses import dataclass, field
+from dataclasses import dataclass
 from datetime import date
 
-@dataclass
+from models.rows import row_factory, to_date
+
+@dataclass(slots=True)
 class Driver:
     """Represents a driver in the system."""
-    id: int = field(init=False)
+    id: int | None  # None until the driver is saved
     first_name: str
     last_name: str
     license_number: str
@@ -15,3 +17,12 @@ class Driver:
     license_expiry: date
     phone_number: str | None = None
     status: str = "active"
+
+
+# SELECT driver_from_row.select FROM drivers ... -> Driver
+driver_from_row = row_factory(
+    Driver,
+    ("id", "first_name", "last_name", "license_number", "license_category",
+     "license_expiry", "phone_number", "status"),
+    {"license_expiry": to_date},
+)
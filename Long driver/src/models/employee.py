@@ -5,7 +5,7 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
-@dataclass
+@dataclass(slots=True)
 class Employee:
     """Klasa reprezentująca pracownika"""
     id: Optional[int] = None
@@ -1,13 +1,15 @@
 """
 Data model for a Fueling Log entry.
 """
-from dataclasses import dataclass, field
+from dataclasses import dataclass
 from datetime import datetime
 
-@dataclass
+from models.rows import row_factory, to_datetime
+
+@dataclass(slots=True)
 class FuelingLog:
     """Represents a fueling event for a vehicle."""
-    id: int = field(init=False)
+    id: int | None  # None until the entry is saved
     vehicle_id: int
     fueling_time: datetime
     mileage_at_fueling: float
@@ -16,3 +18,12 @@ class FuelingLog:
     price_per_liter: float | None = None
     total_cost: float | None = None
     notes: str | None = None
+
+
+# SELECT fueling_log_from_row.select FROM fueling_logs ... -> FuelingLog
+fueling_log_from_row = row_factory(
+    FuelingLog,
+    ("id", "vehicle_id", "fueling_time", "mileage_at_fueling", "liters_added",
+     "trip_id", "price_per_liter", "total_cost", "notes"),
+    {"fueling_time": to_datetime},
+)
@@ -8,7 +8,10 @@ from typing import Optional, List
 from dataclasses import dataclass
 from datetime import datetime
 
-@dataclass
+from models.rows import row_factory, to_datetime
+from utils import db
+
+@dataclass(slots=True)
 class Vehicle:
     """Model pojazdu z pełną obsługą paliwa i statusów"""
     id: Optional[int] = None
@@ -24,7 +27,7 @@ class Vehicle:
     vin: Optional[str] = None
     production_year: int = 2020
     notes: str = ""
-    created_at: Optional[str] = None
+    created_at: Optional[datetime] = None
 
     def calculate_fuel_usage(self, distance_km: float) -> float:
         """Oblicza zużycie paliwa na podstawie średniego spalania"""
@@ -40,6 +43,16 @@ class Vehicle:
         self.current_fuel = end_fuel
         self.status = "available"
 
+# Kolumny w kolejności odczytu - zamiast polegać na kolejności pól w Vehicle(*row)
+vehicle_from_row = row_factory(
+    Vehicle,
+    ("id", "registration_number", "brand", "model", "fuel_type", "fuel_consumption",
+     "current_mileage", "current_fuel", "status", "tank_capacity", "vin",
+     "production_year", "notes", "created_at"),
+    {"created_at": to_datetime},
+)
+
+
 class VehicleRepository:
     """Repozytorium pojazdów - operacje CRUD"""
     
@@ -48,7 +61,7 @@ class VehicleRepository:
 
     def get_connection(self) -> sqlite3.Connection:
         """Pobiera połączenie z bazą"""
-        return sqlite3.connect(self.db_path)
+        return db.connect(self.db_path)
 
     def create_vehicle(self, vehicle: Vehicle) -> bool:
         """Tworzy nowy pojazd"""
@@ -83,20 +96,24 @@ class VehicleRepository:
         finally:
             conn.close()
 
-    def update_vehicle(self, vehicle: Vehicle) -> bool:
-        """Aktualizuje pojazd"""
+    def update_vehicle(self, vehicle: Vehicle, version: Optional[int] = None) -> bool:
+        """
+        Aktualizuje pojazd. Z ``version`` (wersja wiersza z chwili odczytu)
+        zapis jest warunkowy - False, jeśli pojazd zmieniono w międzyczasie.
+        """
         if not vehicle.id:
             return False
             
+        guard = "" if version is None else " AND version=?"
         conn = self.get_connection()
         try:
             cursor = conn.cursor()
-            cursor.execute("""
+            cursor.execute(f"""
                 UPDATE vehicles SET 
                 registration_number=?, brand=?, model=?, fuel_type=?,
                 fuel_consumption=?, current_mileage=?, current_fuel=?,
                 status=?, tank_capacity=?, vin=?, production_year=?, notes=?
-                WHERE id=?
+                WHERE id=?{guard}
             """, [
                 vehicle.registration_number.upper().strip(),
                 vehicle.brand.strip(),
@@ -111,7 +128,7 @@ class VehicleRepository:
                 vehicle.production_year,
                 vehicle.notes.strip(),
                 vehicle.id
-            ])
+            ] + ([] if version is None else [version]))
             conn.commit()
             return cursor.rowcount > 0
         finally:
@@ -133,16 +150,11 @@ class VehicleRepository:
         conn = self.get_connection()
         try:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, registration_number, brand, model, fuel_type,
-                       fuel_consumption, current_mileage, current_fuel,
-                       status, tank_capacity, vin, production_year, notes, created_at
-                FROM vehicles WHERE id=?
-            """, (vehicle_id,))
-            row = cursor.fetchone()
-            if row:
-                return Vehicle(*row)
-            return None
+            cursor.row_factory = vehicle_from_row
+            cursor.execute(
+                f"SELECT {vehicle_from_row.select} FROM vehicles WHERE id=?", (vehicle_id,)
+            )
+            return cursor.fetchone()
         finally:
             conn.close()
 
@@ -151,12 +163,8 @@ class VehicleRepository:
         conn = self.get_connection()
         try:
             cursor = conn.cursor()
-            query = """
-                SELECT id, registration_number, brand, model, fuel_type,
-                       fuel_consumption, current_mileage, current_fuel,
-                       status, tank_capacity, vin, production_year, notes, created_at
-                FROM vehicles
-            """
+            cursor.row_factory = vehicle_from_row
+            query = f"SELECT {vehicle_from_row.select} FROM vehicles"
             params = []
             
             if status_filter:
@@ -165,11 +173,7 @@ class VehicleRepository:
                 
             query += " ORDER BY registration_number"
             cursor.execute(query, params)
-            
-            vehicles = []
-            for row in cursor.fetchall():
-                vehicles.append(Vehicle(*row))
-            return vehicles
+            return cursor.fetchall()
         finally:
             conn.close()
 
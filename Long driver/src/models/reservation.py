@@ -0,0 +1,31 @@
+"""
+Data model for a vehicle Reservation.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+
+from models.rows import row_factory, to_datetime
+
+@dataclass(slots=True)
+class Reservation:
+    """A booking of one vehicle for the half-open interval [start_time, end_time)."""
+    id: int | None
+    vehicle_id: int
+    start_time: datetime
+    end_time: datetime
+    employee_id: int | None = None
+    purpose: str = ""
+    # 'active', 'picked_up' (keys issued against it) or 'cancelled'
+    status: str = "active"
+    created_at: datetime | None = None
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        return self.start_time < end and start < self.end_time
+
+
+# SELECT reservation_from_row.select FROM reservations ... -> Reservation
+reservation_from_row = row_factory(
+    Reservation,
+    ("id", "vehicle_id", "start_time", "end_time", "employee_id", "purpose", "status", "created_at"),
+    {"start_time": to_datetime, "end_time": to_datetime, "created_at": to_datetime},
+)
@@ -0,0 +1,70 @@
+"""
+Positional row factories for the data models.
+
+Instead of ``sqlite3.Row`` -> ``dict(row)`` -> ``Model(**...)`` every query
+gets a factory compiled once per (model, column list): a generated function
+that reads the cursor tuple by index, converts timestamp/date columns
+explicitly and calls the model constructor directly. Used as
+``cursor.row_factory``, it turns each fetched row straight into a model.
+"""
+from dataclasses import fields
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Sequence
+
+
+def to_datetime(value: Any) -> Optional[datetime]:
+    """SQLite TIMESTAMP text (``YYYY-MM-DD HH:MM[:SS[.ffffff]]``) -> datetime."""
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return datetime.fromisoformat(value)
+
+
+def to_date(value: Any) -> Optional[date]:
+    """SQLite DATE text (or a timestamp) -> date."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value[:10])
+
+
+def to_bool(value: Any) -> Optional[bool]:
+    return None if value is None else bool(value)
+
+
+def row_factory(model: type, columns: Sequence[str],
+                converters: Optional[Dict[str, Callable[[Any], Any]]] = None) -> Callable:
+    """
+    Compiles ``factory(cursor, row) -> model`` for rows selected as ``columns``.
+
+    The query must select exactly ``columns`` in this order - use
+    ``factory.select`` to build the column list. Converters apply only to
+    the columns that have one; other values are passed through unchanged.
+    """
+    converters = converters or {}
+    init_fields = {f.name for f in fields(model) if f.init}
+    unknown = [c for c in columns if c not in init_fields]
+    if unknown:
+        raise ValueError(f"{model.__name__} has no constructor fields: {', '.join(unknown)}")
+
+    namespace: Dict[str, Any] = {"model": model}
+    args = []
+    for position, column in enumerate(columns):
+        converter = converters.get(column)
+        if converter is None:
+            args.append(f"{column}=row[{position}]")
+        else:
+            namespace[f"convert_{column}"] = converter
+            args.append(f"{column}=convert_{column}(row[{position}])")
+    source = f"def factory(cursor, row):\n    return model({', '.join(args)})\n"
+    exec(compile(source, f"<row_factory {model.__name__}>", "exec"), namespace)
+
+    factory = namespace["factory"]
+    factory.__name__ = f"{model.__name__.lower()}_from_row"
+    factory.columns = tuple(columns)
+    factory.select = ", ".join(columns)
+    return factory
@@ -1,10 +1,12 @@
 """
 Data model for a Trip (Road Card).
 """
-from dataclasses import dataclass, field
+from dataclasses import dataclass
 from datetime import datetime
 
-@dataclass
+from models.rows import row_factory, to_datetime
+
+@dataclass(slots=True)
 class Trip:
     """Represents a trip record in the system."""
     id: int # FIX: Made 'id' a regular constructor argument
@@ -16,7 +18,7 @@ class Trip:
     start_fuel: float
     route: str
     purpose: str
-    road_card_number: str | None = None
+    trip_number: str | None = None
     end_time: datetime | None = None
     end_mileage: float | None = None
     end_fuel: float | None = None
@@ -26,3 +28,13 @@ class Trip:
     # 'active', 'completed', 'cancelled'
     status: str = "active"
     notes: str | None = None
+
+
+# SELECT trip_from_row.select FROM trips ... -> Trip
+trip_from_row = row_factory(
+    Trip,
+    ("id", "vehicle_id", "driver_id", "start_time", "start_mileage", "start_fuel", "route",
+     "purpose", "trip_number", "end_time", "end_mileage", "end_fuel", "distance",
+     "fuel_consumed_calculated", "status", "notes"),
+    {"start_time": to_datetime, "end_time": to_datetime},
+)
@@ -5,7 +5,9 @@ from dataclasses import dataclass
 from datetime import datetime, date
 from typing import Optional
 
-@dataclass
+from models.rows import row_factory, to_date, to_datetime
+
+@dataclass(slots=True)
 class TripSheet:
     """Karta drogowa SM-102"""
     id: Optional[int] = None
@@ -14,19 +16,31 @@ class TripSheet:
     date: Optional[date] = None
     status: str = "otwarta"  # otwarta, zamknięta, archiwum
     created_at: Optional[datetime] = None
-    
+    # Pojazd, kierowca i sumy narastające (aktualizowane przy każdym przejeździe)
+    vehicle_id: Optional[int] = None
+    employee_id: Optional[int] = None
+    start_mileage: float = 0.0
+    end_mileage: Optional[float] = None
+    trips_count: int = 0
+    total_km: float = 0.0
+    total_fuel: float = 0.0
+    total_cost: float = 0.0
+    closed_at: Optional[datetime] = None
+
     def __post_init__(self):
         """Walidacja danych"""
         if self.status not in ["otwarta", "zamknięta", "archiwum"]:
             raise ValueError("Nieprawidłowy status karty")
         if self.date is None:
             self.date = date.today()
-    
+        if self.start_mileage is None:
+            self.start_mileage = 0.0
+
     @property
     def is_open(self) -> bool:
         """Sprawdza czy karta jest otwarta"""
         return self.status == "otwarta"
-    
+
     def to_dict(self) -> dict:
         """Konwertuje do słownika"""
         return {
@@ -35,5 +49,37 @@ class TripSheet:
             'sheet_number': self.sheet_number,
             'date': self.date.isoformat() if self.date else None,
             'status': self.status,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
\ No newline at end of file
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'vehicle_id': self.vehicle_id,
+            'employee_id': self.employee_id,
+            'start_mileage': self.start_mileage,
+            'end_mileage': self.end_mileage,
+            'trips_count': self.trips_count,
+            'total_km': self.total_km,
+            'total_fuel': self.total_fuel,
+            'total_cost': self.total_cost,
+            'closed_at': self.closed_at.isoformat() if self.closed_at else None
+        }
+
+
+@dataclass(slots=True)
+class TripSheetLine:
+    """Przejazd na karcie drogowej (wiersz tabeli przejazdów w PDF)"""
+    trip_id: int
+    start_time: Optional[datetime]
+    end_time: Optional[datetime]
+    from_location: str = ""
+    to_location: str = ""
+    purpose: str = ""
+    distance: Optional[float] = None
+    notes: Optional[str] = None
+
+
+# SELECT trip_sheet_from_row.select FROM trip_sheets ... -> TripSheet
+trip_sheet_from_row = row_factory(
+    TripSheet,
+    ("id", "key_log_id", "sheet_number", "date", "status", "created_at", "vehicle_id",
+     "employee_id", "start_mileage", "end_mileage", "trips_count", "total_km", "total_fuel",
+     "total_cost", "closed_at"),
+    {"date": to_date, "created_at": to_datetime, "closed_at": to_datetime},
+)
@@ -4,7 +4,9 @@ Data model for a Vehicle.
 from dataclasses import dataclass, field
 from datetime import datetime
 
-@dataclass
+from models.rows import row_factory, to_datetime
+
+@dataclass(slots=True)
 class Vehicle:
     """Represents a vehicle in the system, holding its current state."""
     id: int  # FIX: Made 'id' a regular constructor argument
@@ -21,4 +23,14 @@ class Vehicle:
     current_fuel: float = 0.0
     # 'available', 'in_trip', or 'maintenance'
     status: str = "available"
-    last_updated: datetime = field(default_factory=datetime.now)
+    last_updated: datetime | None = field(default_factory=datetime.now)
+
+
+# SELECT vehicle_from_row.select FROM vehicles ... -> Vehicle
+vehicle_from_row = row_factory(
+    Vehicle,
+    ("id", "registration_number", "brand", "model", "normative_consumption", "vin",
+     "production_year", "fuel_type", "tank_capacity", "current_mileage", "current_fuel",
+     "status", "last_updated"),
+    {"last_updated": to_datetime},
+)
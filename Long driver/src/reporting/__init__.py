@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""
+Raporty floty bez interfejsu graficznego: zapytania (ReportEngine), eksport
+CSV / XLSX / PDF, harmonogram nocny i CLI (python -m reporting).
+"""
+
+from reporting.engine import ReportEngine
+from reporting.exporters import EXPORTERS, export_report, report_filename
+from reporting.reports import (
+    REPORT_TYPES, REPORTS, report_summary, report_table, resolve_report_type,
+)
+from reporting.scheduler import NightlyScheduler, ScheduledReport, period_range, run_jobs
+
+__all__ = [
+    "EXPORTERS", "NightlyScheduler", "REPORTS", "REPORT_TYPES", "ReportEngine", "ScheduledReport",
+    "export_report", "period_range", "report_filename", "report_summary", "report_table",
+    "resolve_report_type", "run_jobs",
+]
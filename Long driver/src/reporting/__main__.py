@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""python -m reporting (z katalogu src) - zob. reporting/cli.py"""
+
+import sys
+
+from reporting.cli import main
+
+# Procesy robocze (spawn) importują ten moduł ponownie - bez uruchamiania CLI
+if __name__ == "__main__":
+    sys.exit(main())
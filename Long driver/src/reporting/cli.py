@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Raporty z wiersza poleceń.
+
+Przykłady (z katalogu głównego projektu):
+    python report.py list
+    python report.py report --type costs --from 2026-05-01 --to 2026-05-31 --format pdf,xlsx,csv
+    python report.py report --type monthly --period previous_month
+    python report.py schedule --once
+    python report.py schedule
+
+Z katalogu src to samo uruchamia: python -m reporting ...
+"""
+
+import argparse
+from datetime import date
+from pathlib import Path
+
+from utils import db
+from utils.helpers import get_project_root, load_config, setup_logging
+
+from reporting.engine import ReportEngine
+from reporting.exporters import EXPORTERS, export_report
+from reporting.reports import REPORTS, report_summary, resolve_report_type
+from reporting.scheduler import PERIODS, NightlyScheduler, period_range
+
+
+def parse_args(argv=None):
+    root = get_project_root()
+    parser = argparse.ArgumentParser(prog="report.py", description="Raporty floty bez interfejsu graficznego")
+    parser.add_argument("--db", type=Path, default=root / "database" / "fleet.db",
+                        help="ścieżka do bazy danych")
+    parser.add_argument("--config", type=Path, default=root / "config.yaml", help="plik konfiguracji")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="dostępne raporty i okresy")
+
+    report = commands.add_parser("report", help="wygeneruj jeden raport")
+    report.add_argument("--type", required=True, help=f"raport: {', '.join(REPORTS)} (lub nazwa)")
+    report.add_argument("--from", dest="date_from", type=date.fromisoformat, help="początek okresu RRRR-MM-DD")
+    report.add_argument("--to", dest="date_to", type=date.fromisoformat, help="koniec okresu RRRR-MM-DD")
+    report.add_argument("--period", choices=PERIODS, help="okres względem dzisiaj (zamiast --from/--to)")
+    report.add_argument("--format", help=f"formaty po przecinku: {', '.join(EXPORTERS)} "
+                                         "(domyślnie reports.formats)")
+    report.add_argument("--out", type=Path, help="katalog wyników (domyślnie reports.save_location)")
+
+    schedule = commands.add_parser("schedule", help="harmonogram nocny (reports.scheduled)")
+    schedule.add_argument("--once", action="store_true", help="uruchom raporty zaplanowane na dziś i zakończ")
+    schedule.add_argument("--date", type=date.fromisoformat, help="dzień uruchomienia dla --once")
+    schedule.add_argument("--workers", type=int, help="liczba procesów (domyślnie reports.workers)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    config = load_config(str(args.config))
+    setup_logging(config)
+    root = get_project_root()
+    db.configure(config.get("database"), base_dir=root)
+    reports_config = config.get("reports") or {}
+
+    if args.command == "list":
+        for slug, title in REPORTS.items():
+            print(f"  {slug:<10} {title}")
+        print(f"Okresy: {', '.join(PERIODS)}")
+        return 0
+
+    if not args.db.exists():
+        print(f"❌ Baza nie istnieje: {args.db}")
+        return 2
+
+    if args.command == "report":
+        try:
+            report_type = resolve_report_type(args.type)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 2
+        if args.period:
+            date_from, date_to = period_range(args.period, date.today())
+        elif args.date_from and args.date_to:
+            date_from, date_to = args.date_from, args.date_to
+        else:
+            print("❌ Podaj --from i --to albo --period")
+            return 2
+        formats = args.format.split(",") if args.format else reports_config.get("formats", ["pdf"])
+        out_dir = args.out or root / reports_config.get("save_location", "reports/")
+
+        data = ReportEngine(args.db, config.get("fuel_prices")).generate(report_type, date_from, date_to)
+        try:
+            paths = export_report(data, formats, out_dir)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 2
+        except ImportError as e:
+            print(f"❌ Brak biblioteki do eksportu ({e.name}) - zainstaluj: pip install {e.name}")
+            return 2
+        for title, lines in report_summary(data):
+            print(f"{title}:")
+            for line in lines:
+                print(f"   {line}")
+        for path in paths:
+            print(f"📄 {path}")
+        return 0
+
+    try:
+        scheduler = NightlyScheduler(reports_config, args.db, root, config.get("fuel_prices"))
+    except (ValueError, KeyError) as e:
+        print(f"❌ Błędna sekcja reports.scheduled: {e}")
+        return 2
+    if args.workers:
+        scheduler.workers = args.workers
+    if not scheduler.jobs:
+        print("ℹ️ Brak raportów w reports.scheduled (config.yaml)")
+        return 0
+
+    if args.once:
+        results = scheduler.run_due(args.date or date.today())
+        for result in results:
+            if result.ok:
+                print(f"✅ {result.report_type}: {', '.join(result.paths)}")
+            else:
+                print(f"❌ {result.report_type}: {result.error}")
+        return 0 if all(r.ok for r in results) else 1
+
+    print(f"⏰ Harmonogram raportów: codziennie o {scheduler.run_at[0]:02d}:{scheduler.run_at[1]:02d} "
+          f"-> {scheduler.out_dir} (Ctrl+C kończy)")
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
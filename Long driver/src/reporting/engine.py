@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Silnik raportów bez interfejsu graficznego.
+
+ReportEngine wykonuje zapytania raportów (te same dla okna raportów, CLI i
+harmonogramu nocnego) i zapamiętuje wyniki w ReportCache.
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from services.cost_service import CostService
+from services.fleet_status_service import FleetStatusService
+from services.maintenance_service import STATUS_OK, MaintenanceService
+from services.monthly_cube_service import MonthlyCubeService, shift_month
+from services.report_cache_service import SCOPE_RANGE, SCOPE_SNAPSHOT, ReportCache
+from utils import db
+from utils.app_logging import log_operation
+from utils.constants import BUSINESS_RULES, FUEL_LEVEL_THRESHOLDS, SERVICE_STATUS_DISPLAY
+
+from reporting.reports import resolve_report_type
+
+logger = logging.getLogger(__name__)
+
+DateLike = Union[str, date]
+
+
+def _iso(value: DateLike) -> str:
+    return value.isoformat() if isinstance(value, date) else str(value)
+
+
+class ReportEngine:
+    """Zapytania raportów floty z pamięcią podręczną wyników."""
+
+    def __init__(self, db_path: Path, fuel_prices: Optional[Dict[str, float]] = None):
+        self.db_path = Path(db_path)
+        self.fuel_prices = fuel_prices
+        self.cost_service = CostService(self.db_path, self.fuel_prices)
+        self.cube_service = MonthlyCubeService(self.db_path, self.fuel_prices)
+        # Podgląd, zmiana i eksport tego samego raportu liczą go tylko raz
+        self.report_cache = ReportCache()
+
+    def generate(self, report_type: str, date_from: DateLike, date_to: DateLike) -> Dict[str, Any]:
+        """
+        Dane raportu wraz z opisem (typ, okres, data wygenerowania).
+
+        Args:
+            report_type: Nazwa z REPORT_TYPES lub jej skrót (np. "costs")
+            date_from: Początek okresu
+            date_to: Koniec okresu (włącznie)
+        """
+        report_type = resolve_report_type(report_type)
+        date_from, date_to = _iso(date_from), _iso(date_to)
+
+        # Raporty stanu bieżącego unieważnia każda zmiana pojazdów/pracowników,
+        # pozostałe tylko zmiany przejazdów i wypożyczeń z wybranego okresu
+        snapshot = "Przegląd ogólny" in report_type or "Harmonogram serwisów" in report_type
+        watch_from = None
+        if "Miesięczny przegląd" in report_type:
+            watch_from = f"{shift_month(date_from[:7], -12)}-01"
+
+        conn = db.connect(self.db_path)
+        try:
+            with log_operation("report.query", logger, report_type=report_type,
+                               date_from=date_from, date_to=date_to) as op:
+                misses = self.report_cache.stats.misses
+                data = self.report_cache.get(
+                    conn, report_type, date_from, date_to,
+                    lambda: self.query(conn.cursor(), report_type, date_from, date_to),
+                    options={'fuel_prices': self.fuel_prices},
+                    scope=SCOPE_SNAPSHOT if snapshot else SCOPE_RANGE,
+                    watch_from=watch_from,
+                )
+                op["cached"] = self.report_cache.stats.misses == misses
+                op["rows"] = sum(len(v) for v in data.values() if isinstance(v, list))
+        finally:
+            conn.close()
+
+        data['report_type'] = report_type
+        data['period'] = f"{date_from} - {date_to}"
+        data['generated_date'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return data
+
+    def query(self, cursor, report_type, date_from, date_to):
+        """Wykonuje zapytania wybranego raportu (daty jako tekst RRRR-MM-DD)"""
+        data = {}
+
+        if "Przegląd ogólny" in report_type:
+            # Wszystkie liczniki floty jednym zapytaniem (jak tablica stanu floty)
+            snapshot = FleetStatusService.query_snapshot(
+                cursor.connection,
+                overdue_before=datetime.now() - timedelta(hours=BUSINESS_RULES['MAX_HOURS_PER_DAY']),
+                low_fuel_percent=FUEL_LEVEL_THRESHOLDS['LOW'],
+            )
+            data['vehicle_stats'] = [
+                (status, count) for status, count in snapshot.vehicles_by_status.items() if count
+            ]
+            if snapshot.vehicles_other:
+                data['vehicle_stats'].append(('inne', snapshot.vehicles_other))
+            data['employee_stats'] = [
+                ('Aktywni', snapshot.employees_active),
+                ('Nieaktywni', snapshot.employees_inactive),
+            ]
+            data['active_checkouts'] = snapshot.open_key_logs
+            data['active_trips'] = snapshot.active_trips
+
+        elif "Aktywność pojazdów" in report_type:
+            cursor.execute("""
+                SELECT 
+                    v.registration_number,
+                    v.brand,
+                    v.model,
+                    COUNT(DISTINCT t.id) as trip_count,
+                    SUM(t.distance) as total_distance,
+                    COUNT(DISTINCT kl.id) as checkout_count
+                FROM vehicles v
+                LEFT JOIN trips t ON v.id = t.vehicle_id 
+                    AND t.start_date BETWEEN ? AND ?
+                LEFT JOIN key_logs kl ON v.id = kl.vehicle_id 
+                    AND kl.checkout_date BETWEEN ? AND ?
+                GROUP BY v.id
+                ORDER BY trip_count DESC
+            """, (date_from, date_to, date_from, date_to))
+            data['vehicle_activity'] = cursor.fetchall()
+
+        elif "Aktywność kierowców" in report_type:
+            cursor.execute("""
+                SELECT 
+                    e.first_name,
+                    e.last_name,
+                    e.position,
+                    COUNT(DISTINCT t.id) as trip_count,
+                    SUM(t.distance) as total_distance,
+                    COUNT(DISTINCT kl.id) as checkout_count
+                FROM employees e
+                LEFT JOIN trips t ON e.id = t.employee_id 
+                    AND t.start_date BETWEEN ? AND ?
+                LEFT JOIN key_logs kl ON e.id = kl.employee_id 
+                    AND kl.checkout_date BETWEEN ? AND ?
+                WHERE e.is_active = 1
+                GROUP BY e.id
+                ORDER BY trip_count DESC
+            """, (date_from, date_to, date_from, date_to))
+            data['driver_activity'] = cursor.fetchall()
+
+        elif "Historia wypożyczeń" in report_type:
+            cursor.execute("""
+                SELECT 
+                    kl.checkout_date,
+                    kl.return_date,
+                    v.registration_number,
+                    v.brand,
+                    v.model,
+                    e.first_name,
+                    e.last_name,
+                    CASE 
+                        WHEN kl.return_date IS NULL THEN 'Aktywne'
+                        ELSE 'Zakończone'
+                    END as status
+                FROM key_logs kl
+                JOIN vehicles v ON kl.vehicle_id = v.id
+                JOIN employees e ON kl.employee_id = e.id
+                WHERE kl.checkout_date BETWEEN ? AND ?
+                ORDER BY kl.checkout_date DESC
+            """, (date_from, date_to))
+            data['key_history'] = cursor.fetchall()
+
+        elif "Raport przejazdów" in report_type:
+            cursor.execute("""
+                SELECT 
+                    t.start_date,
+                    t.end_date,
+                    v.registration_number,
+                    e.first_name,
+                    e.last_name,
+                    t.distance,
+                    t.purpose,
+                    t.notes
+                FROM trips t
+                JOIN vehicles v ON t.vehicle_id = v.id
+                JOIN employees e ON t.employee_id = e.id
+                WHERE t.start_date BETWEEN ? AND ?
+                ORDER BY t.start_date DESC
+            """, (date_from, date_to))
+            data['trips_report'] = cursor.fetchall()
+
+        elif "Harmonogram serwisów" in report_type:
+            # Wyniki silnika są zapisane w bazie - przeliczane są tylko pojazdy,
+            # których przebieg zmienił się od ostatniego odczytu
+            today = date.today()
+            horizon = datetime.strptime(date_to, "%Y-%m-%d").date()
+            items = MaintenanceService(self.db_path).query_schedule(cursor.connection, today=today)
+            rows = []
+            counts = {}
+            for item in items:
+                status = item.status(today)
+                counts[status] = counts.get(status, 0) + 1
+                if status == STATUS_OK and (item.next_date is None or item.next_date > horizon):
+                    continue
+                rows.append((
+                    item.registration_number,
+                    item.rule_name,
+                    round(item.current_mileage),
+                    None if item.km_remaining is None else round(item.km_remaining),
+                    item.due_date,
+                    item.projected_date,
+                    SERVICE_STATUS_DISPLAY[status],
+                ))
+            data['service_schedule'] = rows
+            data['service_stats'] = [
+                (SERVICE_STATUS_DISPLAY[status], counts.get(status, 0)) for status in SERVICE_STATUS_DISPLAY
+            ]
+
+        elif "Koszty eksploatacji" in report_type:
+            # Zamknięte miesiące są czytane z cost_facts, bieżący przeliczany
+            report = self.cost_service.query_report(
+                cursor.connection,
+                datetime.strptime(date_from, "%Y-%m-%d").date(),
+                datetime.strptime(date_to, "%Y-%m-%d").date(),
+            )
+
+            def cost_row(totals, prefix=""):
+                return (
+                    f"{prefix}{totals.label}",
+                    round(totals.km),
+                    round(totals.fuel, 2),
+                    round(totals.estimated, 2),
+                    round(totals.tolls, 2),
+                    round(totals.other, 2),
+                    round(totals.service, 2),
+                    round(totals.total, 2),
+                    None if totals.cost_per_km is None else round(totals.cost_per_km, 2),
+                )
+
+            data['operating_costs'] = [cost_row(t) for t in report.by_vehicle]
+            data['operating_costs_employees'] = [cost_row(t, "Pracownik: ") for t in report.by_employee]
+            data['cost_stats'] = [
+                ('Razem', report.fleet),
+                *((f"Dział: {t.label}", t) for t in report.by_department),
+                *((f"Miesiąc: {t.label}", t) for t in report.by_month),
+            ]
+            data['cost_cached_months'] = report.cached_months
+
+        elif "Miesięczny przegląd" in report_type:
+            # Kostka miesięczna (pojazd × pracownik × miesiąc) - porównanie
+            # rok do roku czyta wiersze kostki, nie przejazdy
+            conn = cursor.connection
+            first, last = date_from[:7], date_to[:7]
+
+            def change(current, previous):
+                if not previous:
+                    return None
+                return round((current - previous) / previous * 100, 1)
+
+            rows = []
+            for cell, year_ago in self.cube_service.monthly_overview(conn, first, last):
+                rows.append((
+                    cell.key[0],
+                    cell.trips,
+                    round(cell.km),
+                    round(cell.litres, 1),
+                    round(cell.cost, 2),
+                    round(cell.hours, 1),
+                    cell.vehicles,
+                    cell.employees,
+                    round(year_ago.km) if year_ago else None,
+                    change(cell.km, year_ago.km if year_ago else 0),
+                    round(year_ago.cost, 2) if year_ago else None,
+                    change(cell.cost, year_ago.cost if year_ago else 0),
+                ))
+            data['monthly_overview'] = rows
+            vehicles = dict(cursor.execute("SELECT id, registration_number FROM vehicles").fetchall())
+            data['monthly_stats'] = [
+                ('Razem', *self.cube_service.query(conn, (), first, last)),
+                ('Rok wcześniej', *self.cube_service.query(
+                    conn, (), shift_month(first, -12), shift_month(last, -12))),
+            ]
+            top = sorted(self.cube_service.query(conn, ("vehicle",), first, last), key=lambda c: -c.km)[:5]
+            data['monthly_stats'] += [
+                (f"Pojazd {vehicles.get(cell.key[0], cell.key[0])}", cell) for cell in top
+            ]
+
+        return data
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Eksport danych raportu do CSV, XLSX i PDF - bez okien dialogowych.
+
+pandas (XLSX) i ReportLab (PDF) są importowane dopiero przy eksporcie.
+"""
+
+import csv
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List
+
+from utils.app_logging import log_operation
+
+from reporting.reports import report_slug, report_summary, report_table
+
+logger = logging.getLogger(__name__)
+
+
+def _cell(value) -> str:
+    return "" if value is None else str(value)
+
+
+def export_csv(data: Dict[str, Any], path: Path) -> Path:
+    """Tabela raportu jako CSV (średnik, UTF-8 z BOM - otwiera się w Excelu)."""
+    columns, rows = report_table(data, full=True)
+    with open(path, "w", newline="", encoding="utf-8-sig") as handle:
+        writer = csv.writer(handle, delimiter=";")
+        if columns is None:
+            # Raport bez tabeli (np. przegląd ogólny) - samo podsumowanie
+            writer.writerow(["sekcja", "wartość"])
+            for title, lines in report_summary(data):
+                for line in lines:
+                    writer.writerow([title, line])
+        else:
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow([_cell(value) for value in row])
+    return path
+
+
+def export_xlsx(data: Dict[str, Any], path: Path) -> Path:
+    """Tabela raportu jako arkusz Excel."""
+    # pandas ładowany dopiero przy eksporcie (kosztowny import)
+    import pandas as pd
+
+    columns, rows = report_table(data, full=True)
+    if columns is None:
+        rows = [(title, line) for title, lines in report_summary(data) for line in lines]
+        columns = ["Sekcja", "Wartość"]
+    pd.DataFrame(rows, columns=columns).to_excel(path, index=False)
+    return path
+
+
+def _register_font(default: str) -> str:
+    """Czcionka z polskimi znakami (DejaVu), jeśli jest dostępna."""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    for candidate in ("C:\\Windows\\Fonts\\DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"):
+        try:
+            pdfmetrics.registerFont(TTFont("DejaVuSans", candidate))
+            return "DejaVuSans"
+        except Exception:
+            continue
+    return default
+
+
+def export_pdf(data: Dict[str, Any], path: Path, font: str = "Helvetica") -> Path:
+    """Raport jako PDF: nagłówek, tabela i podsumowanie."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    font = _register_font(font)
+    styles = getSampleStyleSheet()
+    for style in styles.byName.values():
+        style.fontName = font
+
+    story = [
+        Paragraph(data.get('report_type', 'Raport'), styles['Title']),
+        Paragraph(f"Okres: {data.get('period', '')} &nbsp; Wygenerowano: {data.get('generated_date', '')}",
+                  styles['Normal']),
+        Spacer(1, 0.5 * cm),
+    ]
+
+    columns, rows = report_table(data, full=True)
+    if columns is not None:
+        table = Table([columns] + [[_cell(value) for value in row] for row in rows], repeatRows=1)
+        table.setStyle(TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), font),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f4f6f7')]),
+        ]))
+        story += [table, Spacer(1, 0.5 * cm)]
+
+    for title, lines in report_summary(data):
+        story.append(Paragraph(f"<b>{title}</b>", styles['Normal']))
+        story += [Paragraph(line, styles['Normal']) for line in lines]
+        story.append(Spacer(1, 0.2 * cm))
+
+    doc = SimpleDocTemplate(str(path), pagesize=landscape(A4),
+                            leftMargin=1.5 * cm, rightMargin=1.5 * cm, topMargin=1.5 * cm, bottomMargin=1.5 * cm)
+    doc.build(story)
+    return path
+
+
+EXPORTERS: Dict[str, Callable[[Dict[str, Any], Path], Path]] = {
+    "csv": export_csv,
+    "xlsx": export_xlsx,
+    "pdf": export_pdf,
+}
+
+
+def report_filename(data: Dict[str, Any], extension: str) -> str:
+    """Np. raport_costs_2026-05-01_2026-05-31.pdf"""
+    period = data.get('period', '').replace(' - ', '_')
+    return f"raport_{report_slug(data.get('report_type', ''))}_{period}.{extension}"
+
+
+def export_report(data: Dict[str, Any], formats: Iterable[str], directory: Path) -> List[Path]:
+    """
+    Zapisuje raport w podanych formatach do katalogu.
+
+    Raises:
+        ValueError: Nieznany format
+    """
+    formats = [f.strip().lower() for f in formats if f.strip()]
+    unknown = [f for f in formats if f not in EXPORTERS]
+    if unknown:
+        raise ValueError(f"Nieznany format: {', '.join(unknown)} (dostępne: {', '.join(EXPORTERS)})")
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for extension in formats:
+        path = directory / report_filename(data, extension)
+        with log_operation(f"report.export_{extension}", logger,
+                           report_type=data.get('report_type'), path=str(path)):
+            paths.append(EXPORTERS[extension](data, path))
+    return paths
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Definicje raportów: nazwy, skróty dla CLI, kolumny tabel i podsumowania.
+
+Wspólne dla okna raportów (podgląd), eksporterów i harmonogramu nocnego.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from utils.helpers import format_currency
+
+# Skrót (CLI / config.yaml) -> nazwa wyświetlana w oknie raportów
+REPORTS = {
+    "overview": "📋 Przegląd ogólny",
+    "vehicles": "🚗 Aktywność pojazdów",
+    "drivers": "👤 Aktywność kierowców",
+    "fuel": "⛽ Zużycie paliwa",
+    "costs": "💰 Koszty eksploatacji",
+    "services": "🔧 Harmonogram serwisów",
+    "keys": "🔑 Historia wypożyczeń",
+    "trips": "🛣️ Raport przejazdów",
+    "monthly": "📆 Miesięczny przegląd",
+}
+
+REPORT_TYPES = list(REPORTS.values())
+
+COST_COLUMNS = [
+    'Pojazd / pracownik', 'km', 'Paliwo', 'w tym szacowane', 'Opłaty drogowe',
+    'Inne', 'Serwis', 'Razem', 'zł/km'
+]
+
+MONTHLY_COLUMNS = [
+    'Miesiąc', 'Przejazdy', 'km', 'Paliwo [l]', 'Koszt', 'Godziny', 'Pojazdy', 'Kierowcy',
+    'km rok temu', 'Zmiana km %', 'Koszt rok temu', 'Zmiana kosztu %'
+]
+
+# Klucz danych raportu -> kolumny tabeli (kolejność = kolejność sprawdzania)
+TABLES = {
+    'vehicle_activity': ['Nr rej.', 'Marka', 'Model', 'Przejazdy', 'Dystans', 'Wypożyczenia'],
+    'driver_activity': ['Imię', 'Nazwisko', 'Stanowisko', 'Przejazdy', 'Dystans', 'Wypożyczenia'],
+    'key_history': ['Wypożyczenie', 'Zwrot', 'Nr rej.', 'Marka', 'Model', 'Imię', 'Nazwisko', 'Status'],
+    'trips_report': ['Start', 'Koniec', 'Nr rej.', 'Kierowca', 'Nazwisko', 'Dystans', 'Cel', 'Uwagi'],
+    'service_schedule': ['Nr rej.', 'Serwis', 'Przebieg', 'Pozostało km', 'Termin', 'Prognoza', 'Status'],
+    'monthly_overview': MONTHLY_COLUMNS,
+    'operating_costs': COST_COLUMNS,
+}
+
+# Wiersze dołączane do tabeli przy eksporcie (w podglądzie pomijane)
+EXPORT_EXTRA_ROWS = {
+    'operating_costs': 'operating_costs_employees',
+}
+
+
+def resolve_report_type(name: str) -> str:
+    """
+    Zamienia skrót ("costs") lub nazwę bez ikony ("Koszty eksploatacji") na
+    pełną nazwę raportu.
+
+    Raises:
+        ValueError: Nieznany raport
+    """
+    if name in REPORTS:
+        return REPORTS[name]
+    wanted = name.strip().lower()
+    for title in REPORT_TYPES:
+        if wanted and wanted in title.lower():
+            return title
+    raise ValueError(f"Nieznany raport: {name} (dostępne: {', '.join(REPORTS)})")
+
+
+def report_slug(report_type: str) -> str:
+    """Skrót raportu do nazw plików."""
+    for slug, title in REPORTS.items():
+        if title == report_type:
+            return slug
+    return "raport"
+
+
+def report_table(data: Dict[str, Any], full: bool = False) -> Tuple[Optional[List[str]], List[Sequence]]:
+    """
+    Kolumny i wiersze tabeli raportu; (None, []) gdy raport nie ma tabeli.
+
+    Args:
+        full: Dołącz wiersze dodatkowe (np. koszty pracowników) - dla eksportu
+    """
+    for key, columns in TABLES.items():
+        if key in data:
+            rows = list(data[key])
+            if full and EXPORT_EXTRA_ROWS.get(key) in data:
+                rows += data[EXPORT_EXTRA_ROWS[key]]
+            return columns, rows
+    return None, []
+
+
+def report_summary(data: Dict[str, Any]) -> List[Tuple[str, List[str]]]:
+    """Sekcje podsumowania raportu: (tytuł, linie)."""
+    sections = []
+
+    if 'vehicle_stats' in data:
+        sections.append(("Statystyki pojazdów", [f"{status}: {count}" for status, count in data['vehicle_stats']]))
+
+    if 'employee_stats' in data:
+        sections.append(("Statystyki pracowników",
+                         [f"{status}: {count}" for status, count in data['employee_stats']]))
+
+    counters = []
+    if 'active_checkouts' in data:
+        counters.append(f"Aktywne wypożyczenia: {data['active_checkouts']}")
+    if 'active_trips' in data:
+        counters.append(f"Aktywne przejazdy: {data['active_trips']}")
+    if counters:
+        sections.append(("Bieżąca aktywność", counters))
+
+    if 'service_stats' in data:
+        sections.append(("Serwisy (cała flota)", [f"{status}: {count}" for status, count in data['service_stats']]))
+
+    if 'monthly_stats' in data:
+        sections.append(("Miesięczny przegląd", [
+            f"{label}: {cell.trips} przejazdów, {cell.km:.0f} km, "
+            f"{format_currency(cell.cost)}, {cell.hours:.0f} h"
+            for label, cell in data['monthly_stats']
+        ]))
+
+    if 'cost_stats' in data:
+        lines = []
+        for label, totals in data['cost_stats']:
+            per_km = "" if totals.cost_per_km is None else f" ({totals.cost_per_km:.2f} zł/km)"
+            lines.append(f"{label}: {format_currency(totals.total)}{per_km}")
+        if data.get('cost_cached_months'):
+            lines.append(f"Z pamięci podręcznej: {', '.join(data['cost_cached_months'])}")
+        sections.append(("Koszty eksploatacji", lines))
+
+    return sections
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Nocne generowanie raportów.
+
+Raporty do wygenerowania są opisane w config.yaml (reports.scheduled); o
+godzinie reports.schedule_time harmonogram zapisuje je do
+reports.save_location, kilka raportów naraz w osobnych procesach
+(reports.workers). Dla każdego raportu obok raportów zapisywany jest
+ostatni dzień, za który powstał poprawnie: po restarcie raporty z danego
+dnia nie powstają drugi raz, terminy pominięte (komputer był wyłączony
+1. dnia miesiąca albo w poniedziałek) są nadrabiane przy najbliższym
+uruchomieniu, a raport, który się nie udał, jest ponawiany.
+"""
+
+import json
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.app_logging import log_operation
+
+from reporting.reports import report_slug, resolve_report_type
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCHEDULE_TIME = "02:00"
+DEFAULT_WORKERS = 2
+STATE_FILE = ".harmonogram.json"
+# Najwięcej nadrabianych terminów jednego raportu (np. raporty dzienne po urlopie)
+MAX_CATCH_UP = 31
+
+EVERY = ("daily", "weekly", "monthly")
+PERIODS = ("yesterday", "previous_week", "previous_month", "month_to_date", "year_to_date",
+           "previous_year", "next_30_days")
+
+
+def period_range(period: str, today: date) -> Tuple[date, date]:
+    """
+    Okres raportu względem dnia uruchomienia.
+
+    Raises:
+        ValueError: Nieznany okres
+    """
+    first_of_month = today.replace(day=1)
+    if period == "yesterday":
+        day = today - timedelta(days=1)
+        return day, day
+    if period == "previous_week":
+        monday = today - timedelta(days=today.weekday() + 7)
+        return monday, monday + timedelta(days=6)
+    if period == "previous_month":
+        last = first_of_month - timedelta(days=1)
+        return last.replace(day=1), last
+    if period == "month_to_date":
+        return first_of_month, today
+    if period == "year_to_date":
+        return today.replace(month=1, day=1), today
+    if period == "previous_year":
+        return date(today.year - 1, 1, 1), date(today.year - 1, 12, 31)
+    if period == "next_30_days":
+        return today, today + timedelta(days=30)
+    raise ValueError(f"Nieznany okres: {period}")
+
+
+@dataclass
+class ScheduledReport:
+    """Jeden raport z reports.scheduled."""
+    report_type: str
+    period: str = "previous_month"
+    formats: List[str] = field(default_factory=lambda: ["pdf"])
+    # daily / weekly (poniedziałki) / monthly (pierwszy dzień miesiąca)
+    every: str = "daily"
+
+    @property
+    def key(self) -> str:
+        """Klucz raportu w pliku stanu harmonogramu."""
+        return f"{report_slug(self.report_type)}/{self.period}/{self.every}"
+
+    def is_due(self, day: date) -> bool:
+        if self.every == "weekly":
+            return day.weekday() == 0
+        if self.every == "monthly":
+            return day.day == 1
+        return True
+
+    def due_dates(self, after: Optional[date], today: date) -> List[date]:
+        """
+        Terminy w przedziale (after, today], od najstarszego (najwyżej
+        MAX_CATCH_UP ostatnich). Bez after (raport jeszcze nie powstał) -
+        tylko ostatni termin.
+        """
+        days = []
+        day = today
+        while (after is None or day > after) and len(days) < (1 if after is None else MAX_CATCH_UP):
+            if self.is_due(day):
+                days.append(day)
+            elif after is None and day <= today - timedelta(days=31):
+                break
+            day -= timedelta(days=1)
+        return days[::-1]
+
+
+@dataclass
+class JobResult:
+    report_type: str
+    paths: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    # Termin (dzień uruchomienia), za który powstał raport
+    day: Optional[date] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def load_schedule(reports_config: Dict[str, Any]) -> List[ScheduledReport]:
+    """
+    Raporty z sekcji reports config.yaml.
+
+    Raises:
+        ValueError: Nieznany raport, okres lub częstotliwość
+    """
+    default_formats = reports_config.get("formats") or ["pdf"]
+    jobs = []
+    for entry in reports_config.get("scheduled") or []:
+        job = ScheduledReport(
+            report_type=resolve_report_type(entry["type"]),
+            period=entry.get("period", "previous_month"),
+            formats=list(entry.get("formats") or default_formats),
+            every=entry.get("every", "daily"),
+        )
+        if job.every not in EVERY:
+            raise ValueError(f"Nieznana częstotliwość: {job.every} (dostępne: {', '.join(EVERY)})")
+        if job.period not in PERIODS:
+            raise ValueError(f"Nieznany okres: {job.period} (dostępne: {', '.join(PERIODS)})")
+        jobs.append(job)
+    return jobs
+
+
+def _run_job(db_path: str, fuel_prices: Optional[Dict[str, float]], job: ScheduledReport,
+             out_dir: str, day: date) -> JobResult:
+    """Generuje jeden raport (także w procesie roboczym - funkcja modułu, nie metoda)."""
+    from reporting.engine import ReportEngine
+    from reporting.exporters import export_report
+
+    try:
+        date_from, date_to = period_range(job.period, day)
+        data = ReportEngine(Path(db_path), fuel_prices).generate(job.report_type, date_from, date_to)
+        paths = export_report(data, job.formats, Path(out_dir))
+        return JobResult(job.report_type, [str(p) for p in paths], day=day)
+    except Exception as e:
+        logger.exception(f"Raport {job.report_type} nie powstał")
+        return JobResult(job.report_type, error=str(e), day=day)
+
+
+def run_pending(pending: List[Tuple[ScheduledReport, date]], db_path: Path, out_dir: Path,
+                workers: int = DEFAULT_WORKERS,
+                fuel_prices: Optional[Dict[str, float]] = None) -> List[JobResult]:
+    """Generuje raporty (raport, termin); przy workers > 1 równolegle w osobnych procesach."""
+    if not pending:
+        return []
+    with log_operation("report.schedule_run", logger, jobs=len(pending), workers=workers) as op:
+        if workers <= 1 or len(pending) == 1:
+            results = [_run_job(str(db_path), fuel_prices, job, str(out_dir), day) for job, day in pending]
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+                futures = [pool.submit(_run_job, str(db_path), fuel_prices, job, str(out_dir), day)
+                           for job, day in pending]
+                results = [future.result() for future in futures]
+        op["failed"] = sum(1 for r in results if not r.ok)
+    return results
+
+
+def run_jobs(jobs: List[ScheduledReport], db_path: Path, out_dir: Path, day: Optional[date] = None,
+             workers: int = DEFAULT_WORKERS, fuel_prices: Optional[Dict[str, float]] = None) -> List[JobResult]:
+    """Generuje raporty za jeden dzień; przy workers > 1 równolegle w osobnych procesach."""
+    day = day or date.today()
+    return run_pending([(job, day) for job in jobs], db_path, out_dir, workers, fuel_prices)
+
+
+class NightlyScheduler:
+    """Uruchamia zaplanowane raporty raz dziennie o ustalonej godzinie."""
+
+    def __init__(self, reports_config: Dict[str, Any], db_path: Path, base_dir: Path,
+                 fuel_prices: Optional[Dict[str, float]] = None):
+        self.jobs = load_schedule(reports_config)
+        self.db_path = Path(db_path)
+        self.out_dir = Path(base_dir) / reports_config.get("save_location", "reports/")
+        self.workers = int(reports_config.get("workers", DEFAULT_WORKERS))
+        self.fuel_prices = fuel_prices
+        hours, minutes = str(reports_config.get("schedule_time", DEFAULT_SCHEDULE_TIME)).split(":")
+        self.run_at = (int(hours), int(minutes))
+
+    @property
+    def state_path(self) -> Path:
+        return self.out_dir / STATE_FILE
+
+    def _state(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def last_run(self) -> Optional[date]:
+        """Dzień ostatniego uruchomienia harmonogramu (udanego lub nie)."""
+        try:
+            return date.fromisoformat(self._state()["last_run"])
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def job_markers(self) -> Dict[str, date]:
+        """Raport -> ostatni termin, za który powstał poprawnie."""
+        state = self._state()
+        markers = {}
+        for key, value in (state.get("jobs") or {}).items():
+            try:
+                markers[key] = date.fromisoformat(value)
+            except (TypeError, ValueError):
+                continue
+        # Stary plik stanu (jedna data dla wszystkich raportów)
+        if not markers and self.last_run() is not None:
+            markers = {job.key: self.last_run() for job in self.jobs}
+        return markers
+
+    def pending(self, day: date) -> List[Tuple[ScheduledReport, date]]:
+        """Raporty i terminy do wygenerowania: (ostatni poprawny termin, day]."""
+        markers = self.job_markers()
+        return [(job, due) for job in self.jobs for due in job.due_dates(markers.get(job.key), day)]
+
+    def run_due(self, day: Optional[date] = None) -> List[JobResult]:
+        """
+        Raporty zaplanowane na dany dzień i wszystkie zaległe. Znacznik raportu
+        przesuwa się tylko do ostatniego terminu, do którego wszystkie się
+        udały - nieudane są ponawiane przy następnym uruchomieniu.
+        """
+        day = day or date.today()
+        pending = self.pending(day)
+        results = run_pending(pending, self.db_path, self.out_dir, self.workers, self.fuel_prices)
+
+        markers = {key: value.isoformat() for key, value in self.job_markers().items()}
+        failed = set()
+        for (job, due), result in zip(pending, results):
+            if not result.ok:
+                failed.add(job.key)
+                # Raport jeszcze nigdy nie powstał - ponawiany od tego terminu
+                markers.setdefault(job.key, (due - timedelta(days=1)).isoformat())
+            elif job.key not in failed:
+                markers[job.key] = due.isoformat()
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.state_path.write_text(json.dumps({"last_run": day.isoformat(), "jobs": markers}), encoding="utf-8")
+        for result in results:
+            if result.ok:
+                logger.info(f"Raport {report_slug(result.report_type)} ({result.day}): {', '.join(result.paths)}")
+        return results
+
+    def next_run(self, now: datetime) -> datetime:
+        """Najbliższe uruchomienie; zaległe (dziś po godzinie, bez uruchomienia) - od razu."""
+        today_run = now.replace(hour=self.run_at[0], minute=self.run_at[1], second=0, microsecond=0)
+        last = self.last_run()
+        if now >= today_run:
+            if last is None or last < now.date():
+                return now
+            return today_run + timedelta(days=1)
+        return today_run
+
+    def run_forever(self, now: Callable[[], datetime] = datetime.now,
+                    sleep: Callable[[float], None] = time.sleep):
+        """Pętla harmonogramu (przerywana Ctrl+C)."""
+        while True:
+            current = now()
+            wait = (self.next_run(current) - current).total_seconds()
+            if wait > 0:
+                # Krótsze drzemki - zmiana czasu / uśpienie komputera nie przesuwa uruchomienia
+                sleep(min(wait, 300))
+                continue
+            self.run_due(current.date())
@@ -0,0 +1,331 @@
+"""
+Service layer for the change audit log.
+
+Every insert, update and delete on the audited tables is recorded by SQLite
+triggers into ``audit_log``, inside the writing transaction: no extra round
+trip from Python, nothing recorded for a rolled-back change, and writes from
+any code path (GUI windows, services, imports, CLI) are covered alike.
+
+A record is compact: only the changed columns, as a JSON object
+``{"column": [old, new]}`` (inserts / deletes: the non-empty values). The
+triggers work on any connection - scripts and external tools included - and
+leave the operator empty. A connection that knows its operator fills it in
+with a TEMP trigger of its own (``set_operator``), so each write is
+attributed to the desk that made it, also when several desks share the
+file; ``register_operator`` does this for every connection the application
+opens. ``audit_log`` itself is append-only: its own triggers reject deletes
+and any update except filling in an empty operator; ``archive`` is the only
+way entries leave it - a maintenance step (``python audit.py archive``), not
+part of the startup.
+
+Triggers are generated from the current columns of each table; ``install``
+is idempotent and recreates only the triggers whose definition changed
+(e.g. after a column was added).
+"""
+import getpass
+import json
+import logging
+import sqlite3
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from models.rows import to_datetime
+from utils import db
+from utils.app_logging import log_operation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TABLES = ("vehicles", "employees", "drivers", "key_log", "trips", "fueling_logs", "reservations")
+# Touched by every write - noise in the log (version: services.version_service)
+IGNORED_COLUMNS = {"last_updated", "version"}
+TRIGGER_PREFIX = "audit_"
+ACTIONS = {"INSERT": "I", "UPDATE": "U", "DELETE": "D"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS audit_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    -- The vehicle the row belongs to (vehicles, key_log, trips, fueling_logs ...)
+    vehicle_id INTEGER,
+    -- I, U, D
+    action TEXT NOT NULL,
+    changes TEXT NOT NULL,
+    operator TEXT,
+    changed_at TIMESTAMP NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+);
+CREATE INDEX IF NOT EXISTS idx_audit_log_row ON audit_log(table_name, row_id, id);
+CREATE INDEX IF NOT EXISTS idx_audit_log_vehicle ON audit_log(vehicle_id, id);
+CREATE INDEX IF NOT EXISTS idx_audit_log_changed_at ON audit_log(changed_at)
+"""
+
+# Trigger bodies contain ";" - executed one by one, not split like SCHEMA.
+# Only an empty operator may be filled in (see set_operator).
+NO_UPDATE = ("CREATE TRIGGER audit_log_no_update BEFORE UPDATE OF "
+             "id, table_name, row_id, vehicle_id, action, changes, changed_at ON audit_log "
+             "BEGIN SELECT RAISE(ABORT, 'audit_log is append-only'); END")
+NO_OPERATOR_CHANGE = ("CREATE TRIGGER audit_log_operator_once BEFORE UPDATE OF operator ON audit_log "
+                      "WHEN OLD.operator IS NOT NULL "
+                      "BEGIN SELECT RAISE(ABORT, 'audit_log is append-only'); END")
+NO_DELETE = ("CREATE TRIGGER audit_log_no_delete BEFORE DELETE ON audit_log "
+             "BEGIN SELECT RAISE(ABORT, 'audit_log is append-only'); END")
+APPEND_ONLY = {
+    "audit_log_no_update": NO_UPDATE,
+    "audit_log_operator_once": NO_OPERATOR_CHANGE,
+    "audit_log_no_delete": NO_DELETE,
+}
+
+# Per connection: fills in the operator of the entries written on it
+OPERATOR_TRIGGER = "audit_log_operator"
+
+
+def default_operator() -> str:
+    """The OS user - the operator when none is configured."""
+    try:
+        return getpass.getuser()
+    except Exception:
+        return "system"
+
+
+@dataclass
+class AuditEntry:
+    id: int
+    table_name: str
+    row_id: int
+    vehicle_id: Optional[int]
+    action: str                          # I, U, D
+    changes: Dict[str, Tuple[Any, Any]]  # column -> (old, new)
+    operator: Optional[str]
+    changed_at: Optional[datetime]
+
+
+def _entry(row) -> AuditEntry:
+    entry_id, table, row_id, vehicle_id, action, changes, operator, changed_at = row
+    parsed = {column: tuple(values) for column, values in json.loads(changes).items()}
+    return AuditEntry(entry_id, table, row_id, vehicle_id, action, parsed, operator, to_datetime(changed_at))
+
+
+def format_changes(changes: Dict[str, Tuple[Any, Any]]) -> str:
+    """``column: old → new; ...`` (empty side shown as ``-``)."""
+    def show(value):
+        return "-" if value is None else str(value)
+    return "; ".join(f"{column}: {show(old)} → {show(new)}" for column, (old, new) in changes.items())
+
+
+ENTRY_COLUMNS = "id, table_name, row_id, vehicle_id, action, changes, operator, changed_at"
+
+
+def trigger_sql(table: str, event: str, columns: List[str], vehicle_column: Optional[str]) -> str:
+    """CREATE TRIGGER statement recording ``event`` on ``table``."""
+    row = "OLD" if event == "DELETE" else "NEW"
+    if event != "UPDATE":
+        # The row id is stored in its own column
+        columns = [c for c in columns if c != "id"]
+    if event == "UPDATE":
+        pairs = [(f"OLD.\"{c}\" IS NOT NEW.\"{c}\"", f"json_array(OLD.\"{c}\", NEW.\"{c}\")", c)
+                 for c in columns]
+    elif event == "INSERT":
+        pairs = [(f"NEW.\"{c}\" IS NOT NULL", f"json_array(NULL, NEW.\"{c}\")", c) for c in columns]
+    else:
+        pairs = [(f"OLD.\"{c}\" IS NOT NULL", f"json_array(OLD.\"{c}\", NULL)", c) for c in columns]
+    # '{' || "col":[old,new], ... || '}' - only the columns that qualify
+    parts = " || ".join(f"CASE WHEN {test} THEN '\"{c}\":' || {value} || ',' ELSE '' END"
+                        for test, value, c in pairs)
+    changes = f"'{{' || rtrim({parts}, ',') || '}}'" if pairs else "'{}'"
+    vehicle = f"{row}.\"{vehicle_column}\"" if vehicle_column else "NULL"
+    when = f"\n    WHEN {' OR '.join(test for test, _, _ in pairs)}" if event == "UPDATE" and pairs else ""
+    return (
+        f"CREATE TRIGGER {TRIGGER_PREFIX}{table}_{event.lower()} AFTER {event} ON \"{table}\"{when}\n"
+        f"BEGIN\n"
+        f"    INSERT INTO audit_log (table_name, row_id, vehicle_id, action, changes, operator)\n"
+        f"    VALUES ('{table}', {row}.rowid, {vehicle}, '{ACTIONS[event]}', {changes}, NULL);\n"
+        f"END"
+    )
+
+
+class AuditService:
+    """Installs the audit triggers and queries the change history."""
+
+    def __init__(self, db_path: Path, tables: Iterable[str] = DEFAULT_TABLES):
+        self.db_path = db_path
+        self.tables = tuple(tables)
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Establishes a database connection."""
+        return db.connect(self.db_path)
+
+    @staticmethod
+    def ensure_schema(conn: sqlite3.Connection):
+        """Creates the audit table and its append-only guards (updated when they differ)."""
+        db.execute_schema(conn, SCHEMA)
+        existing = dict(conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'audit_log'"
+        ).fetchall())
+        for name, sql in APPEND_ONLY.items():
+            if existing.get(name) != sql:
+                conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+                conn.execute(sql)
+
+    @staticmethod
+    def set_operator(conn: sqlite3.Connection, name: Optional[str]):
+        """
+        Operator recorded for the changes made on ``conn`` from now on (None:
+        unknown). Other connections are not affected. Nothing happens while
+        the audit log is not installed.
+        """
+        conn.execute(f"DROP TRIGGER IF EXISTS temp.{OPERATOR_TRIGGER}")
+        name = (name or "").strip()
+        if not name or not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'audit_log'"
+        ).fetchone():
+            return
+        literal = name.replace("'", "''")
+        conn.execute(
+            f"CREATE TEMP TRIGGER {OPERATOR_TRIGGER} AFTER INSERT ON main.audit_log "
+            f"WHEN NEW.operator IS NULL "
+            f"BEGIN UPDATE audit_log SET operator = '{literal}' WHERE id = NEW.id; END"
+        )
+
+    def register_operator(self, name: Optional[str]):
+        """``set_operator`` for every connection ``db.connect`` opens to this database from now on."""
+        if (name or "").strip():
+            db.on_connect(self.db_path, OPERATOR_TRIGGER, lambda conn: self.set_operator(conn, name))
+        else:
+            db.on_connect(self.db_path, OPERATOR_TRIGGER, None)
+
+    # ------------------------------------------------------------------
+    # Triggers
+    # ------------------------------------------------------------------
+
+    def install(self, conn: sqlite3.Connection) -> List[str]:
+        """
+        Creates / updates the triggers of the audited tables that exist.
+        Returns the audited tables.
+        """
+        with log_operation("audit.install", logger) as op:
+            self.ensure_schema(conn)
+            existing = dict(conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE ?",
+                (TRIGGER_PREFIX + "%",),
+            ).fetchall())
+            audited, changed = [], 0
+            for table in self.tables:
+                info = conn.execute(f"PRAGMA table_info(\"{table}\")").fetchall()
+                if not info:
+                    continue
+                columns = [c[1] for c in info if c[1] not in IGNORED_COLUMNS and (c[2] or "").upper() != "BLOB"]
+                names = {c[1] for c in info}
+                vehicle_column = "id" if table == "vehicles" else ("vehicle_id" if "vehicle_id" in names else None)
+                for event in ACTIONS:
+                    name = f"{TRIGGER_PREFIX}{table}_{event.lower()}"
+                    sql = trigger_sql(table, event, columns, vehicle_column)
+                    if existing.get(name) == sql:
+                        continue
+                    conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+                    conn.execute(sql)
+                    changed += 1
+                audited.append(table)
+            op["tables"] = len(audited)
+            op["changed"] = changed
+        return audited
+
+    def uninstall(self, conn: sqlite3.Connection) -> int:
+        """Drops the audit triggers of the tables (the log is kept). Returns their number."""
+        names = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE ? AND tbl_name != 'audit_log'",
+            (TRIGGER_PREFIX + "%",),
+        )]
+        for name in names:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        return len(names)
+
+    # ------------------------------------------------------------------
+    # Retention
+    # ------------------------------------------------------------------
+
+    def archive(self, conn: sqlite3.Connection, before: date, archive_path: Optional[Path] = None) -> int:
+        """
+        Moves the entries changed before ``before`` out of ``audit_log``:
+        appended to ``audit_log`` in the SQLite file ``archive_path`` or, without
+        it, dropped. Runs in its own transaction (commits the caller's one
+        first). Returns the number of entries moved.
+        """
+        self.ensure_schema(conn)
+        conn.commit()
+        cutoff = before.isoformat()
+        if archive_path is not None:
+            conn.execute("ATTACH DATABASE ? AS audit_archive", (str(archive_path),))
+        try:
+            with log_operation("audit.archive", logger, before=cutoff) as op:
+                # Explicit: DROP TRIGGER alone would not open a transaction
+                conn.execute("BEGIN")
+                try:
+                    if archive_path is not None:
+                        conn.execute("CREATE TABLE IF NOT EXISTS audit_archive.audit_log AS "
+                                     "SELECT * FROM main.audit_log WHERE 0")
+                        conn.execute("INSERT INTO audit_archive.audit_log "
+                                     "SELECT * FROM main.audit_log WHERE changed_at < ?", (cutoff,))
+                    # The append-only guard is lifted only inside this transaction
+                    conn.execute("DROP TRIGGER audit_log_no_delete")
+                    cursor = conn.execute("DELETE FROM main.audit_log WHERE changed_at < ?", (cutoff,))
+                    conn.execute(NO_DELETE)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                op["rows"] = cursor.rowcount
+        finally:
+            if archive_path is not None:
+                conn.execute("DETACH DATABASE audit_archive")
+        return cursor.rowcount
+
+    # ------------------------------------------------------------------
+    # Queries (newest first; ``before_id`` continues after the last entry)
+    # ------------------------------------------------------------------
+
+    def history(self, conn: sqlite3.Connection, table: str, row_id: int, limit: int = 100,
+                before_id: Optional[int] = None) -> List[AuditEntry]:
+        """Changes of one row."""
+        return self._select(conn, "table_name = ? AND row_id = ?", [table, row_id], limit, before_id)
+
+    def vehicle_history(self, conn: sqlite3.Connection, vehicle_id: int, limit: int = 100,
+                        before_id: Optional[int] = None) -> List[AuditEntry]:
+        """Changes of the vehicle and of its key logs, trips, fuelings ..."""
+        return self._select(conn, "vehicle_id = ?", [vehicle_id], limit, before_id)
+
+    def search(self, conn: sqlite3.Connection, table: Optional[str] = None, column: Optional[str] = None,
+               operator: Optional[str] = None, date_from: Optional[date] = None,
+               date_to: Optional[date] = None, limit: int = 100,
+               before_id: Optional[int] = None) -> List[AuditEntry]:
+        """Changes matching all the given filters (``column``: entries that changed it)."""
+        where, params = [], []
+        if table:
+            where.append("table_name = ?")
+            params.append(table)
+        if column:
+            where.append("json_type(changes, '$.\"' || ? || '\"') IS NOT NULL")
+            params.append(column)
+        if operator:
+            where.append("operator = ?")
+            params.append(operator)
+        if date_from:
+            where.append("changed_at >= ?")
+            params.append(date_from.isoformat())
+        if date_to:
+            where.append("changed_at < ?")
+            params.append((date_to + timedelta(days=1)).isoformat())
+        return self._select(conn, " AND ".join(where) or "1", params, limit, before_id)
+
+    @staticmethod
+    def _select(conn: sqlite3.Connection, where: str, params: list, limit: int,
+                before_id: Optional[int]) -> List[AuditEntry]:
+        if before_id is not None:
+            where += " AND id < ?"
+            params = params + [before_id]
+        rows = conn.execute(
+            f"SELECT {ENTRY_COLUMNS} FROM audit_log WHERE {where} ORDER BY id DESC LIMIT ?",
+            params + [limit],
+        ).fetchall()
+        return [_entry(row) for row in rows]
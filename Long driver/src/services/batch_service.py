@@ -0,0 +1,240 @@
+"""
+Service layer for batch operations on many selected records at once.
+
+Each operation is a single set-based statement (``... WHERE id IN (SELECT
+value FROM json_each(?))``) executed in one transaction together with the
+snapshot of the affected rows. The ids travel as one JSON parameter, so the
+statement does not depend on the selection size or on SQLite's host
+parameter limit. The returned ``UndoSnapshot`` restores the previous state.
+
+A bulk status change leaves out vehicles that are out on the road (an open
+key log or an active trip): their status belongs to the checkout / trip
+and is set back when the key is returned or the trip completed.
+"""
+import json
+import logging
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from services.fleet_status_service import VEHICLE_STATUSES
+from utils import db, fleet_index
+from utils.app_logging import log_operation
+from utils.constants import FUEL_TYPES
+
+logger = logging.getLogger(__name__)
+
+IDS_SUBQUERY = "SELECT value FROM json_each(?)"
+
+# Vehicles that are out, per source table (used if the table exists)
+BUSY_VEHICLES = {
+    "key_log": "SELECT vehicle_id FROM key_log WHERE status = 'out'",
+    "trips": "SELECT vehicle_id FROM trips WHERE status = 'active'",
+}
+
+
+def _check_status(value):
+    if value not in VEHICLE_STATUSES:
+        raise ValueError(f"Unknown vehicle status: {value!r}")
+
+
+def _check_fuel_type(value):
+    if value not in FUEL_TYPES:
+        raise ValueError(f"Unknown fuel type: {value!r}")
+
+
+def _check_consumption(value):
+    if value is None or not 0 <= float(value) <= 30:
+        raise ValueError(f"Fuel consumption out of range: {value!r}")
+
+
+def _check_flag(value):
+    if value not in (0, 1):
+        raise ValueError(f"Expected 0 or 1, got {value!r}")
+
+
+# Columns that may be changed in bulk, with their validators
+BATCH_COLUMNS = {
+    "vehicles": {
+        "status": _check_status,
+        "fuel_type": _check_fuel_type,
+        "fuel_consumption": _check_consumption,
+    },
+    "employees": {
+        "is_active": _check_flag,
+    },
+}
+
+
+@dataclass
+class UndoSnapshot:
+    """State of the affected rows taken right before a batch operation."""
+    table: str
+    action: str  # "update" or "delete"
+    description: str
+    columns: List[str]
+    rows: List[Tuple]
+    # For updates: the values written, so undo skips rows changed since then
+    changes: Dict[str, Any] = field(default_factory=dict)
+    # Selected ids left unchanged (vehicles out on the road for a status change)
+    skipped: List[int] = field(default_factory=list)
+    taken_at: datetime = field(default_factory=datetime.now)
+
+    @property
+    def ids(self) -> List[int]:
+        return [row[0] for row in self.rows]
+
+
+def _ids_param(ids: Iterable[int]) -> str:
+    return json.dumps(sorted({int(i) for i in ids}))
+
+
+class BatchService:
+    """Set-based delete / update of many vehicles or employees."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Establishes a database connection."""
+        return db.connect(self.db_path)
+
+    @staticmethod
+    def _check_table(table: str):
+        if table not in BATCH_COLUMNS:
+            raise ValueError(f"Batch operations are not available for {table!r}")
+
+    @staticmethod
+    def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+        return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+    @staticmethod
+    def _busy_vehicles_sql(conn: sqlite3.Connection) -> str:
+        """Subquery of vehicles with an open key log or an active trip ("" if neither table exists)."""
+        present = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        return " UNION ".join(sql for table, sql in BUSY_VEHICLES.items() if table in present)
+
+    def update(self, table: str, ids: Sequence[int], changes: Dict[str, Any],
+               description: str = "") -> UndoSnapshot:
+        """
+        Sets ``changes`` (column -> value) on all ``ids`` with one UPDATE.
+        A vehicle status change skips vehicles that are out (open key log or
+        active trip); their ids are in ``UndoSnapshot.skipped``.
+
+        Raises ValueError for columns that cannot be changed in bulk or invalid values.
+        """
+        self._check_table(table)
+        if not changes:
+            raise ValueError("Nothing to change.")
+        for column, value in changes.items():
+            validator = BATCH_COLUMNS[table].get(column)
+            if validator is None:
+                raise ValueError(f"Column {column!r} cannot be changed in bulk")
+            validator(value)
+
+        columns = ["id"] + list(changes)
+        ids_json = _ids_param(ids)
+        conn = self.get_connection()
+        try:
+            with log_operation("batch.update", logger, table=table, columns=list(changes)) as op:
+                where, skipped = f"id IN ({IDS_SUBQUERY})", []
+                busy = self._busy_vehicles_sql(conn) if table == "vehicles" and "status" in changes else ""
+                if busy:
+                    skipped = [row[0] for row in conn.execute(
+                        f"SELECT id FROM vehicles WHERE {where} AND id IN ({busy}) ORDER BY id", (ids_json,)
+                    )]
+                    where += f" AND id NOT IN ({busy})"
+                rows = conn.execute(
+                    f"SELECT {', '.join(columns)} FROM {table} WHERE {where}", (ids_json,)
+                ).fetchall()
+                assignments = ", ".join(f"{column} = ?" for column in changes)
+                cursor = conn.execute(
+                    f"UPDATE {table} SET {assignments} WHERE {where}",
+                    (*changes.values(), ids_json),
+                )
+                conn.commit()
+                op["rows"] = cursor.rowcount
+                op["skipped"] = len(skipped)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        if table == "vehicles" and "status" in changes:
+            for row in rows:
+                fleet_index.notify(self.db_path, row[0], status=changes["status"])
+        return UndoSnapshot(table, "update", description, columns, [tuple(r) for r in rows], dict(changes),
+                            skipped)
+
+    def delete(self, table: str, ids: Sequence[int], description: str = "") -> UndoSnapshot:
+        """Deletes all ``ids`` with one DELETE, keeping full rows for undo."""
+        self._check_table(table)
+        ids_json = _ids_param(ids)
+        conn = self.get_connection()
+        try:
+            with log_operation("batch.delete", logger, table=table) as op:
+                columns = self._table_columns(conn, table)
+                rows = conn.execute(
+                    f"SELECT {', '.join(columns)} FROM {table} WHERE id IN ({IDS_SUBQUERY})",
+                    (ids_json,),
+                ).fetchall()
+                cursor = conn.execute(f"DELETE FROM {table} WHERE id IN ({IDS_SUBQUERY})", (ids_json,))
+                conn.commit()
+                op["rows"] = cursor.rowcount
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        if table == "vehicles":
+            fleet_index.invalidate(self.db_path)
+        return UndoSnapshot(table, "delete", description, columns, [tuple(r) for r in rows])
+
+    def undo(self, snapshot: UndoSnapshot) -> List[int]:
+        """
+        Restores the rows of ``snapshot`` in one transaction.
+
+        Deleted rows are re-inserted with their original ids. Updated rows are
+        reverted only if they still hold the values written by the batch, so a
+        later edit made by someone else is not overwritten. Returns restored ids.
+        """
+        conn = self.get_connection()
+        restored = []
+        try:
+            with log_operation("batch.undo", logger, table=snapshot.table, action=snapshot.action) as op:
+                if snapshot.action == "delete":
+                    columns = snapshot.columns
+                    conn.executemany(
+                        f"INSERT OR IGNORE INTO {snapshot.table} ({', '.join(columns)}) "
+                        f"VALUES ({', '.join('?' * len(columns))})",
+                        snapshot.rows,
+                    )
+                    present = conn.execute(
+                        f"SELECT id FROM {snapshot.table} WHERE id IN ({IDS_SUBQUERY})",
+                        (_ids_param(snapshot.ids),),
+                    )
+                    restored = [row[0] for row in present]
+                else:
+                    changed = snapshot.columns[1:]
+                    sql = (
+                        f"UPDATE {snapshot.table} SET {', '.join(f'{c} = ?' for c in changed)} "
+                        f"WHERE id = ? AND {' AND '.join(f'{c} IS ?' for c in changed)}"
+                    )
+                    new_values = tuple(snapshot.changes[c] for c in changed)
+                    cursor = conn.cursor()
+                    for row in snapshot.rows:
+                        cursor.execute(sql, (*row[1:], row[0], *new_values))
+                        if cursor.rowcount:
+                            restored.append(row[0])
+                conn.commit()
+                op["rows"] = len(restored)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        if snapshot.table == "vehicles":
+            fleet_index.invalidate(self.db_path)
+        return restored
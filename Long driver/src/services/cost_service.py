@@ -0,0 +1,427 @@
+"""
+Service layer for operating costs ("Koszty eksploatacji").
+
+All cost sources are read by one statement - a UNION ALL of cost lines
+grouped by month, vehicle, employee and category:
+
+- fuel: ``trips.fuel_cost``; when it is missing, litres (``fuel_used`` /
+  calculated consumption / distance x average consumption) x fuel price,
+- fuel fills: ``fueling_logs.total_cost`` (or litres x price) - when that
+  table exists, fills are the fuel source and trips only contribute km,
+- ``trips.toll_costs`` / ``trips.other_costs`` (added by update_schema.py),
+- ``service_history.cost``.
+
+Only the sources and columns present in the database are used, so the same
+engine runs on ``fleet.db`` and on the ``schema.sql`` database. Fuel prices
+come from ``constants.DEFAULT_FUEL_PRICES`` overridden by ``fuel_prices`` in
+config.yaml. The grouped rows ("facts") of every closed month are stored in
+``cost_facts``; a later report over that month reads them back instead of
+scanning the sources, unless the prices changed or a source row of the
+month was inserted, updated or deleted since: triggers on the sources bump
+a per-month counter in ``cost_month_changes`` (a corrected toll or a
+cancelled trip in May recomputes May). Per-vehicle / employee / department / month totals are
+rolled up from the facts in a single loop.
+"""
+import json
+import logging
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils import db
+from utils.app_logging import log_operation
+from utils.constants import DEFAULT_FUEL_PRICES
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cost_facts (
+    month TEXT NOT NULL,
+    vehicle_id INTEGER NOT NULL,
+    -- 0 = not assigned to an employee (e.g. a service)
+    employee_id INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    amount REAL NOT NULL,
+    -- Part of amount estimated from consumption x price
+    estimated REAL NOT NULL,
+    km REAL NOT NULL,
+    PRIMARY KEY (month, vehicle_id, employee_id, category)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS cost_periods (
+    month TEXT PRIMARY KEY,
+    signature TEXT NOT NULL,
+    prices TEXT NOT NULL,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS cost_month_changes (
+    month TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+) WITHOUT ROWID
+"""
+
+# Dated cost sources: table -> candidate date columns (first existing wins)
+SOURCE_TABLES = {
+    "trips": ("start_date", "start_time"),
+    "fueling_logs": ("fueling_time",),
+    "service_history": ("service_date",),
+}
+
+CATEGORIES = ("fuel", "tolls", "other", "service")
+
+# Used when the fuel type has no price
+FALLBACK_PRICE = DEFAULT_FUEL_PRICES["Diesel"]
+
+NO_DEPARTMENT = "(bez działu)"
+
+
+@dataclass
+class CostTotals:
+    """Costs of one group (vehicle, employee, department or month)."""
+    key: object
+    label: str
+    fuel: float = 0.0
+    tolls: float = 0.0
+    other: float = 0.0
+    service: float = 0.0
+    estimated: float = 0.0
+    km: float = 0.0
+
+    @property
+    def total(self) -> float:
+        return self.fuel + self.tolls + self.other + self.service
+
+    @property
+    def cost_per_km(self) -> Optional[float]:
+        return self.total / self.km if self.km else None
+
+    def add(self, category: str, amount: float, estimated: float, km: float):
+        setattr(self, category, getattr(self, category) + amount)
+        self.estimated += estimated
+        self.km += km
+
+
+@dataclass
+class CostReport:
+    """Costs of a period rolled up four ways."""
+    date_from: date
+    date_to: date
+    fleet: CostTotals
+    by_vehicle: List[CostTotals] = field(default_factory=list)
+    by_employee: List[CostTotals] = field(default_factory=list)
+    by_department: List[CostTotals] = field(default_factory=list)
+    by_month: List[CostTotals] = field(default_factory=list)
+    # Months read from cost_facts instead of the sources
+    cached_months: List[str] = field(default_factory=list)
+
+
+def _change_triggers(conn: sqlite3.Connection) -> Dict[str, str]:
+    """Triggers bumping the month counter of every written source row, by name."""
+    triggers = {}
+    for table, candidates in SOURCE_TABLES.items():
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        column = next((c for c in candidates if c in columns), None)
+        if column is None:
+            continue
+        for event, rows in (("INSERT", ("NEW",)), ("DELETE", ("OLD",)), ("UPDATE", ("OLD", "NEW"))):
+            bumps = " ".join(
+                f"INSERT INTO cost_month_changes (month, version) "
+                f"VALUES (COALESCE(strftime('%Y-%m', {row}.{column}), ''), 1) "
+                f"ON CONFLICT(month) DO UPDATE SET version = version + 1;"
+                for row in rows
+            )
+            name = f"cost_changes_{table}_{event.lower()}"
+            triggers[name] = f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table} BEGIN {bumps} END"
+    return triggers
+
+
+def month_ranges(date_from: date, date_to: date) -> List[Tuple[str, date, date, bool]]:
+    """
+    Splits [date_from, date_to] into (month, start, end_exclusive, whole_month).
+    """
+    ranges = []
+    start = date_from
+    while start <= date_to:
+        next_month = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        end = min(next_month, date.fromordinal(date_to.toordinal() + 1))
+        whole = start.day == 1 and end == next_month
+        ranges.append((f"{start:%Y-%m}", start, end, whole))
+        start = next_month
+    return ranges
+
+
+class CostService:
+    """Aggregates operating costs of the fleet."""
+
+    def __init__(self, db_path: Path, fuel_prices: Optional[Dict[str, float]] = None):
+        self.db_path = db_path
+        self.fuel_prices = dict(DEFAULT_FUEL_PRICES)
+        self.fuel_prices.update(fuel_prices or {})
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Establishes a database connection."""
+        return db.connect(self.db_path)
+
+    @staticmethod
+    def ensure_schema(conn: sqlite3.Connection):
+        """Creates the cost cache tables and the change triggers of the sources present."""
+        db.execute_schema(conn, SCHEMA)
+        present = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'cost_changes_%'")}
+        for name, sql in _change_triggers(conn).items():
+            if name not in present:
+                conn.execute(sql)
+
+    @property
+    def prices_key(self) -> str:
+        return json.dumps(self.fuel_prices, sort_keys=True)
+
+    # ------------------------------------------------------------------
+    # Sources
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _columns(conn: sqlite3.Connection, table: str) -> set:
+        return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+    def layout(self, conn: sqlite3.Connection) -> Dict[str, object]:
+        """Which tables / columns of the cost sources exist in this database."""
+        trips = self._columns(conn, "trips")
+        vehicles = self._columns(conn, "vehicles")
+        people = "employees" if "employee_id" in trips else "drivers"
+        return {
+            "trips": trips,
+            "vehicle_fuel_type": "fuel_type" in vehicles,
+            "trip_date": "start_date" if "start_date" in trips else "start_time",
+            "trip_end": "end_date" if "end_date" in trips else "end_time",
+            "trip_employee": "employee_id" if "employee_id" in trips else "driver_id",
+            "consumption": "fuel_consumption" if "fuel_consumption" in vehicles else "normative_consumption",
+            "fills": bool(self._columns(conn, "fueling_logs")),
+            "services": bool(self._columns(conn, "service_history")),
+            "people": people,
+            "people_department": "department" in self._columns(conn, people),
+        }
+
+    def _price_sql(self, fuel_type_sql: str) -> str:
+        return f"COALESCE(json_extract(:prices, '$.\"' || {fuel_type_sql} || '\"'), :fallback_price)"
+
+    def trip_fuel_sql(self, layout: Dict[str, object]) -> Tuple[str, str, str]:
+        """
+        SQL expressions over ``trips t LEFT JOIN vehicles v`` for (litres, recorded
+        fuel cost, estimated fuel cost). They use the :prices and
+        :fallback_price parameters (see ``price_params``).
+        """
+        trips = layout["trips"]
+        # Minimal vehicles tables (tests, old copies) have no fuel type: fallback price
+        vehicle_fuel_type = "v.fuel_type" if layout.get("vehicle_fuel_type", True) else "NULL"
+        fuel_type = f"COALESCE(t.fuel_type, {vehicle_fuel_type})" if "fuel_type" in trips else vehicle_fuel_type
+        consumption = f"COALESCE(t.avg_consumption, v.{layout['consumption']})" \
+            if "avg_consumption" in trips else f"v.{layout['consumption']}"
+        litres = [f"t.{c}" for c in ("fuel_used", "calculated_fuel", "fuel_consumed_calculated") if c in trips]
+        litres.append(f"t.distance * {consumption} / 100")
+        litres_sql = f"COALESCE({', '.join(litres)}, 0)"
+        # fleet.db trips carry 0 when no price was entered
+        recorded = "NULLIF(t.fuel_cost, 0)" if "fuel_cost" in trips else "NULL"
+        return litres_sql, recorded, f"{litres_sql} * {self._price_sql(fuel_type)}"
+
+    def price_params(self) -> Dict[str, object]:
+        return {"prices": json.dumps(self.fuel_prices), "fallback_price": FALLBACK_PRICE}
+
+    def _source_sql(self, layout: Dict[str, object]) -> str:
+        """UNION ALL of cost lines: at, vehicle_id, employee_id, category, amount, estimated, km."""
+        trips = layout["trips"]
+        trip_date = f"t.{layout['trip_date']}"
+        employee = f"COALESCE(t.{layout['trip_employee']}, 0)"
+        in_range = f"{trip_date} >= :start AND {trip_date} < :end AND t.status IS NOT 'cancelled'"
+        _, recorded, estimate = self.trip_fuel_sql(layout)
+
+        parts = []
+        if layout["fills"]:
+            # Fuel is paid at the pump; trips only bring the kilometres
+            parts.append(f"""
+                SELECT {trip_date} AS at, t.vehicle_id, {employee} AS employee_id, 'fuel' AS category,
+                       0 AS amount, 0 AS estimated, COALESCE(t.distance, 0) AS km
+                FROM trips t WHERE {in_range}""")
+            fill_price = self._price_sql("v.fuel_type")
+            parts.append(f"""
+                SELECT f.fueling_time, f.vehicle_id, COALESCE(tr.{layout['trip_employee']}, 0), 'fuel',
+                       COALESCE(f.total_cost, f.liters_added * COALESCE(f.price_per_liter, {fill_price})),
+                       CASE WHEN f.total_cost IS NULL AND f.price_per_liter IS NULL
+                            THEN f.liters_added * {fill_price} ELSE 0 END,
+                       0
+                FROM fueling_logs f
+                LEFT JOIN vehicles v ON v.id = f.vehicle_id
+                LEFT JOIN trips tr ON tr.id = f.trip_id
+                WHERE f.fueling_time >= :start AND f.fueling_time < :end""")
+        else:
+            parts.append(f"""
+                SELECT {trip_date} AS at, t.vehicle_id, {employee} AS employee_id, 'fuel' AS category,
+                       COALESCE({recorded}, {estimate}) AS amount,
+                       CASE WHEN {recorded} IS NULL THEN {estimate} ELSE 0 END AS estimated,
+                       COALESCE(t.distance, 0) AS km
+                FROM trips t LEFT JOIN vehicles v ON v.id = t.vehicle_id
+                WHERE {in_range}""")
+        for column, category in (("toll_costs", "tolls"), ("other_costs", "other")):
+            if column in trips:
+                parts.append(f"""
+                    SELECT {trip_date}, t.vehicle_id, {employee}, '{category}', t.{column}, 0, 0
+                    FROM trips t WHERE {in_range} AND t.{column} > 0""")
+        if layout["services"]:
+            parts.append("""
+                SELECT s.service_date, s.vehicle_id, 0, 'service', s.cost, 0, 0
+                FROM service_history s
+                WHERE s.service_date >= :start AND s.service_date < :end AND s.cost > 0""")
+        return " UNION ALL ".join(parts)
+
+    def _query_facts(self, conn: sqlite3.Connection, layout, start: date, end: date) -> List[tuple]:
+        """(month, vehicle_id, employee_id, category, amount, estimated, km) for [start, end)."""
+        sql = f"""
+            SELECT strftime('%Y-%m', at) AS month, vehicle_id, employee_id, category,
+                   TOTAL(amount), TOTAL(estimated), TOTAL(km)
+            FROM ({self._source_sql(layout)})
+            GROUP BY month, vehicle_id, employee_id, category
+        """
+        return conn.execute(sql, {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            **self.price_params(),
+        }).fetchall()
+
+    @staticmethod
+    def _signature(conn: sqlite3.Connection, month: str) -> str:
+        """Change counter of the month (bumped by the source triggers)."""
+        row = conn.execute("SELECT version FROM cost_month_changes WHERE month = ?", (month,)).fetchone()
+        return f"v{row[0] if row else 0}"
+
+    # ------------------------------------------------------------------
+    # Facts with the monthly cache
+    # ------------------------------------------------------------------
+
+    def facts(self, conn: sqlite3.Connection, date_from: date, date_to: date,
+              today: Optional[date] = None) -> Tuple[List[tuple], List[str]]:
+        """
+        Facts for [date_from, date_to] and the months served from the cache.
+
+        Whole months that ended before the current month are cached; the
+        current month and partial months at the edges are always queried.
+        """
+        today = today or date.today()
+        self.ensure_schema(conn)
+        layout = self.layout(conn)
+        prices = self.prices_key
+        first_open = date(today.year, today.month, 1)
+
+        facts: List[tuple] = []
+        cached: List[str] = []
+        for month, start, end, whole in month_ranges(date_from, date_to):
+            if not (whole and end <= first_open):
+                facts.extend(self._query_facts(conn, layout, start, end))
+                continue
+
+            signature = self._signature(conn, month)
+            stored = conn.execute(
+                "SELECT signature, prices FROM cost_periods WHERE month = ?", (month,)
+            ).fetchone()
+            if stored == (signature, prices):
+                facts.extend(conn.execute(
+                    "SELECT month, vehicle_id, employee_id, category, amount, estimated, km "
+                    "FROM cost_facts WHERE month = ?", (month,)
+                ))
+                cached.append(month)
+                continue
+
+            month_facts = self._query_facts(conn, layout, start, end)
+            conn.execute("DELETE FROM cost_facts WHERE month = ?", (month,))
+            conn.executemany("INSERT INTO cost_facts VALUES (?, ?, ?, ?, ?, ?, ?)", month_facts)
+            conn.execute(
+                "INSERT OR REPLACE INTO cost_periods (month, signature, prices, computed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (month, signature, prices, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+            )
+            conn.commit()
+            facts.extend(month_facts)
+        return facts, cached
+
+    def invalidate(self, months: Optional[Iterable[str]] = None):
+        """Drops cached months (all when ``months`` is None), e.g. after correcting old trips."""
+        conn = self.get_connection()
+        try:
+            self.ensure_schema(conn)
+            if months is None:
+                conn.execute("DELETE FROM cost_facts")
+                conn.execute("DELETE FROM cost_periods")
+            else:
+                months_json = json.dumps(list(months))
+                conn.execute("DELETE FROM cost_facts WHERE month IN (SELECT value FROM json_each(?))",
+                             (months_json,))
+                conn.execute("DELETE FROM cost_periods WHERE month IN (SELECT value FROM json_each(?))",
+                             (months_json,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Report
+    # ------------------------------------------------------------------
+
+    def query_report(self, conn: sqlite3.Connection, date_from: date, date_to: date,
+                     today: Optional[date] = None) -> CostReport:
+        """Costs of [date_from, date_to] per vehicle, employee, department and month."""
+        with log_operation("costs.report", logger, date_from=str(date_from), date_to=str(date_to)) as op:
+            facts, cached = self.facts(conn, date_from, date_to, today)
+            layout = self.layout(conn)
+            vehicles = dict(conn.execute("SELECT id, registration_number FROM vehicles"))
+            department_sql = "department" if layout["people_department"] else "NULL"
+            people = {
+                row[0]: (row[1], row[2])
+                for row in conn.execute(
+                    f"SELECT id, first_name || ' ' || last_name, {department_sql} FROM {layout['people']}"
+                )
+            }
+
+            fleet = CostTotals("fleet", "Cała flota")
+            by_vehicle: Dict[int, CostTotals] = {}
+            by_employee: Dict[int, CostTotals] = {}
+            by_department: Dict[str, CostTotals] = {}
+            by_month: Dict[str, CostTotals] = {}
+            for month, vehicle_id, employee_id, category, amount, estimated, km in facts:
+                name, department = people.get(employee_id, (None, None))
+                department = department or NO_DEPARTMENT
+                groups = (
+                    fleet,
+                    by_vehicle.setdefault(vehicle_id, CostTotals(
+                        vehicle_id, vehicles.get(vehicle_id, f"#{vehicle_id}"))),
+                    by_month.setdefault(month, CostTotals(month, month)),
+                )
+                for totals in groups:
+                    totals.add(category, amount, estimated, km)
+                # Services are not driven by anyone - only vehicle / month / fleet totals
+                if employee_id:
+                    by_employee.setdefault(employee_id, CostTotals(
+                        employee_id, name or f"#{employee_id}")).add(category, amount, estimated, km)
+                    by_department.setdefault(department, CostTotals(
+                        department, department)).add(category, amount, estimated, km)
+            op["rows"] = len(facts)
+            op["cached_months"] = len(cached)
+
+        def ranked(groups):
+            return sorted(groups.values(), key=lambda t: -t.total)
+
+        return CostReport(
+            date_from, date_to, fleet,
+            by_vehicle=ranked(by_vehicle),
+            by_employee=ranked(by_employee),
+            by_department=ranked(by_department),
+            by_month=sorted(by_month.values(), key=lambda t: t.key),
+            cached_months=cached,
+        )
+
+    def report(self, date_from: date, date_to: date, today: Optional[date] = None) -> CostReport:
+        conn = self.get_connection()
+        try:
+            return self.query_report(conn, date_from, date_to, today)
+        finally:
+            conn.close()
@@ -3,7 +3,8 @@ Service layer for managing drivers.
 """
 import sqlite3
 from pathlib import Path
-from models.driver import Driver
+from models.driver import Driver, driver_from_row
+from utils import db
 from typing import List
 
 class DriverService:
@@ -14,9 +15,7 @@ class DriverService:
 
     def get_connection(self) -> sqlite3.Connection:
         """Establishes a database connection."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        return db.connect(self.db_path, row_factory=sqlite3.Row)
 
     def get_all_active_drivers(self) -> List[Driver]:
         """
@@ -24,9 +23,12 @@ class DriverService:
         """
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM drivers WHERE status = 'active' ORDER BY last_name, first_name")
-            rows = cursor.fetchall()
-            return [Driver(**dict(row)) for row in rows]
+            cursor.row_factory = driver_from_row
+            cursor.execute(
+                f"SELECT {driver_from_row.select} FROM drivers "
+                "WHERE status = 'active' ORDER BY last_name, first_name"
+            )
+            return cursor.fetchall()
 
     def get_driver_by_id(self, driver_id: int) -> Driver | None:
         """
@@ -34,11 +36,9 @@ class DriverService:
         """
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM drivers WHERE id = ?", (driver_id,))
-            row = cursor.fetchone()
-            if row:
-                return Driver(**dict(row))
-        return None
+            cursor.row_factory = driver_from_row
+            cursor.execute(f"SELECT {driver_from_row.select} FROM drivers WHERE id = ?", (driver_id,))
+            return cursor.fetchone()
 
     def create_driver(self, driver: Driver) -> Driver:
         """
@@ -0,0 +1,167 @@
+"""
+Service layer for the live fleet status board.
+
+All counters come from a single statement (one round trip, one read
+transaction) over the production ``fleet.db`` schema. The board keeps one
+long-lived connection and checks ``PRAGMA data_version`` before
+re-running it: the pragma changes only when another connection commits, so
+an idle refresh costs a single pragma call. The open-trips counter relies
+on the partial index ``idx_trips_open``, created when the board connects.
+"""
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+from utils import db
+from utils.constants import BUSINESS_RULES, FUEL_LEVEL_THRESHOLDS
+
+VEHICLE_STATUSES = ("available", "in_use", "in_trip", "service", "broken")
+
+# Only the few open trips are indexed - the 2 s poll does not scan all trips
+SCHEMA = """
+CREATE INDEX IF NOT EXISTS idx_trips_open ON trips(end_date) WHERE end_date IS NULL
+"""
+
+SNAPSHOT_SQL = """
+WITH
+    v AS (
+        SELECT
+            COUNT(*) AS total,
+            COALESCE(SUM(status = 'available'), 0) AS available,
+            COALESCE(SUM(status = 'in_use'), 0) AS in_use,
+            COALESCE(SUM(status = 'in_trip'), 0) AS in_trip,
+            COALESCE(SUM(status = 'service'), 0) AS service,
+            COALESCE(SUM(status = 'broken'), 0) AS broken,
+            COALESCE(SUM(tank_capacity > 0
+                         AND COALESCE(current_fuel, 0) * 100.0 / tank_capacity < :low_fuel_percent), 0)
+                AS low_fuel
+        FROM vehicles
+    ),
+    k AS (
+        SELECT
+            COUNT(*) AS open_keys,
+            COALESCE(SUM(checkout_time < :overdue_before), 0) AS overdue
+        FROM key_log
+        WHERE status = 'out'
+    ),
+    t AS (
+        SELECT COUNT(*) AS active_trips FROM trips WHERE end_date IS NULL
+    ),
+    e AS (
+        SELECT
+            COALESCE(SUM(is_active = 1), 0) AS active,
+            COALESCE(SUM(is_active IS NOT 1), 0) AS inactive
+        FROM employees
+    )
+SELECT v.total, v.available, v.in_use, v.in_trip, v.service, v.broken, v.low_fuel,
+       k.open_keys, k.overdue, t.active_trips, e.active, e.inactive
+FROM v, k, t, e
+"""
+
+
+@dataclass
+class FleetSnapshot:
+    """Fleet counters at one point in time."""
+    vehicles_by_status: Dict[str, int] = field(default_factory=dict)
+    vehicles_total: int = 0
+    low_fuel: int = 0
+    open_key_logs: int = 0
+    overdue_returns: int = 0
+    active_trips: int = 0
+    employees_active: int = 0
+    employees_inactive: int = 0
+    taken_at: datetime = field(default_factory=datetime.now)
+
+    @property
+    def vehicles_other(self) -> int:
+        """Vehicles with a status outside VEHICLE_STATUSES (legacy values)."""
+        return self.vehicles_total - sum(self.vehicles_by_status.values())
+
+
+class FleetStatusService:
+    """Computes fleet snapshots and tells whether they need recomputing."""
+
+    def __init__(self, db_path: Path, overdue_hours: float = None,
+                 low_fuel_percent: float = None, max_age_seconds: float = 60.0):
+        self.db_path = db_path
+        self.overdue_hours = overdue_hours or BUSINESS_RULES['MAX_HOURS_PER_DAY']
+        self.low_fuel_percent = low_fuel_percent or FUEL_LEVEL_THRESHOLDS['LOW']
+        # "Overdue" depends on the clock, so recompute at least this often
+        self.max_age_seconds = max_age_seconds
+        self._conn: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._computed_at = 0.0
+        self.snapshot: Optional[FleetSnapshot] = None
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Establishes a database connection."""
+        return db.connect(self.db_path)
+
+    @staticmethod
+    def ensure_schema(conn: sqlite3.Connection):
+        """Creates the open-trips index if it does not exist."""
+        db.execute_schema(conn, SCHEMA)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @staticmethod
+    def query_snapshot(conn: sqlite3.Connection, overdue_before: datetime,
+                       low_fuel_percent: float) -> FleetSnapshot:
+        """Runs the single snapshot statement on ``conn``."""
+        row = conn.execute(
+            SNAPSHOT_SQL,
+            {
+                "overdue_before": overdue_before.strftime("%Y-%m-%d %H:%M:%S"),
+                "low_fuel_percent": low_fuel_percent,
+            },
+        ).fetchone()
+        (total, available, in_use, in_trip, service, broken, low_fuel,
+         open_keys, overdue, active_trips, active, inactive) = row
+        return FleetSnapshot(
+            vehicles_by_status={
+                "available": available,
+                "in_use": in_use,
+                "in_trip": in_trip,
+                "service": service,
+                "broken": broken,
+            },
+            vehicles_total=total,
+            low_fuel=low_fuel,
+            open_key_logs=open_keys,
+            overdue_returns=overdue,
+            active_trips=active_trips,
+            employees_active=active,
+            employees_inactive=inactive,
+        )
+
+    def get_snapshot(self) -> FleetSnapshot:
+        """Computes a fresh snapshot."""
+        if self._conn is None:
+            self._conn = self.get_connection()
+            self.ensure_schema(self._conn)
+            self._conn.commit()
+        conn = self._conn
+        self._data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        overdue_before = datetime.now() - timedelta(hours=self.overdue_hours)
+        self.snapshot = self.query_snapshot(conn, overdue_before, self.low_fuel_percent)
+        self._computed_at = time.monotonic()
+        return self.snapshot
+
+    def refresh(self) -> Optional[FleetSnapshot]:
+        """
+        Returns a new snapshot if anything changed, otherwise None.
+
+        Unchanged data and a recent snapshot cost one ``PRAGMA data_version``.
+        """
+        if self._conn is not None and self.snapshot is not None:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            fresh = time.monotonic() - self._computed_at < self.max_age_seconds
+            if version == self._data_version and fresh:
+                return None
+        return self.get_snapshot()
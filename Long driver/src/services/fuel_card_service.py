@@ -0,0 +1,510 @@
+"""
+Service layer for fuel card statements.
+
+``import_file`` reads a provider's statement (CSV / XLSX, Polish or English
+headers) into ``fuel_card_transactions``. Each transaction has a unique key
+(the provider's transaction number, or card + time + litres + amount), so
+overlapping statements and re-imports do not duplicate rows. Non-fuel
+items (car wash, AdBlue, tolls) are skipped.
+
+``reconcile`` matches the transactions of a period with ``fueling_logs``
+(same vehicle, time within ``time_window``, litres within the tolerance)
+and with the trip the vehicle was on. All three sources are read sorted by
+(vehicle, time) and merged in one pass - a sliding window per vehicle, not
+a nested loop - so a statement of a few hundred thousand lines reconciles
+in seconds with flat memory. It reports:
+
+- unmatched transactions - no fueling log (without a ``fueling_logs`` table:
+  outside any trip of the vehicle),
+- fueling logs without a card transaction,
+- duplicates - a second fill of the same vehicle within ``duplicate_window``,
+- over-capacity fills - more litres than ``tank_capacity`` (plus tolerance),
+- transactions of unknown vehicles.
+
+The result of the last reconciliation is kept on the transaction rows
+(``fueling_log_id``, ``trip_id``, ``issue``).
+"""
+import csv
+import functools
+import logging
+import sqlite3
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from itertools import groupby, islice
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from models.rows import to_datetime
+from services.import_service import (
+    ImportFileError, RowError, _float, _text, _timestamp, _upper, iter_rows, normalize_header,
+)
+from utils import db
+from utils.app_logging import log_operation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5000
+FETCH_SIZE = 5000
+DEFAULT_TIME_WINDOW_MINUTES = 120
+DEFAULT_DUPLICATE_WINDOW_MINUTES = 30
+DEFAULT_LITERS_TOLERANCE = 0.5
+DEFAULT_LITERS_TOLERANCE_PCT = 2.0
+# Filler neck and the pump's cut-off take a little more than the nominal tank
+CAPACITY_TOLERANCE = 0.05
+
+ISSUES = ("unknown_vehicle", "duplicate", "over_capacity", "unmatched")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fuel_card_transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    -- provider's transaction number, or card|time|litres|amount
+    tx_key TEXT NOT NULL UNIQUE,
+    card_number TEXT,
+    registration_number TEXT,
+    vehicle_id INTEGER REFERENCES vehicles(id) ON DELETE SET NULL,
+    tx_time TIMESTAMP NOT NULL,
+    liters REAL NOT NULL,
+    amount REAL,
+    product TEXT,
+    station TEXT,
+    source TEXT,
+    -- result of the last reconciliation
+    fueling_log_id INTEGER,
+    trip_id INTEGER,
+    issue TEXT,
+    imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_fuel_card_vehicle_time ON fuel_card_transactions(vehicle_id, tx_time)
+"""
+
+# Reconciliation reads the logs in (vehicle, time) order
+LOGS_INDEX = "CREATE INDEX IF NOT EXISTS idx_fueling_logs_vehicle_time ON fueling_logs(vehicle_id, fueling_time)"
+
+# Statement column -> accepted headers (after normalize_header)
+COLUMNS = {
+    "tx_time": ("data_transakcji", "data_i_godzina", "data", "transaction_time", "tx_time", "date"),
+    "tx_hour": ("godzina", "hour"),
+    "card_number": ("numer_karty", "nr_karty", "karta", "card_number", "card"),
+    "registration_number": ("nr_rejestracyjny", "numer_rejestracyjny", "rejestracja", "pojazd",
+                            "registration_number", "vehicle"),
+    "liters": ("ilosc", "ilosc_l", "litry", "liters", "litres", "quantity", "volume"),
+    "amount": ("kwota_brutto", "wartosc_brutto", "kwota", "wartosc", "amount", "gross_amount"),
+    "product": ("produkt", "towar", "product"),
+    "station": ("stacja", "miejsce", "station"),
+    "tx_ref": ("nr_transakcji", "numer_transakcji", "id_transakcji", "transaction_id", "ref"),
+}
+
+# Statement items that are not fuel in the vehicle's tank (normalised product name contains)
+NON_FUEL_PRODUCTS = ("myjnia", "wash", "adblue", "oplata", "toll", "autostrada", "parking", "sklep", "shop")
+
+
+@functools.lru_cache(maxsize=1024)
+def _is_fuel(product: str) -> bool:
+    # A statement repeats a handful of product names - normalise each once
+    name = normalize_header(product)
+    return not any(word in name for word in NON_FUEL_PRODUCTS)
+
+
+def _statement_time(value: Any) -> Optional[str]:
+    """
+    Transaction time as TIMESTAMP text. ISO and ``DD.MM.YYYY HH:MM`` (the
+    usual statement formats) take a fast path; anything else goes through
+    the import parser.
+    """
+    if isinstance(value, str):
+        text = value.strip()
+        if len(text) >= 10 and text[2] == "." and text[5] == ".":
+            text = f"{text[6:10]}-{text[3:5]}-{text[0:2]}{text[10:]}"
+        try:
+            return datetime.fromisoformat(text).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+    return _timestamp(value)
+
+
+@dataclass
+class StatementImportResult:
+    """Summary of one statement import."""
+    source: str
+    total: int = 0
+    imported: int = 0
+    repeated: int = 0
+    non_fuel: int = 0
+    unknown_vehicle: int = 0
+    errors: List[RowError] = field(default_factory=list)
+
+
+@dataclass
+class CardIssue:
+    """One reconciliation finding."""
+    issue: str
+    transaction_id: Optional[int]
+    vehicle_id: Optional[int]
+    time: datetime
+    liters: float
+    fueling_log_id: Optional[int] = None
+    trip_id: Optional[int] = None
+    detail: str = ""
+
+
+@dataclass
+class ReconciliationResult:
+    transactions: int = 0
+    matched: int = 0
+    within_trip: int = 0
+    issues: List[CardIssue] = field(default_factory=list)
+
+    def of(self, issue: str) -> List[CardIssue]:
+        return [i for i in self.issues if i.issue == issue]
+
+    def counts(self) -> Dict[str, int]:
+        counts = dict.fromkeys(ISSUES + ("log_without_transaction",), 0)
+        for item in self.issues:
+            counts[item.issue] += 1
+        return counts
+
+
+def _fetch(cursor: sqlite3.Cursor) -> Iterator[Tuple]:
+    """Rows of a large result in fetchmany batches (one instrumented call per batch, not per row)."""
+    while rows := cursor.fetchmany(FETCH_SIZE):
+        yield from rows
+
+
+def _merge_by_vehicle(*streams: Iterable[Tuple]) -> Iterator[Tuple[int, List[List[Tuple]]]]:
+    """
+    Merge join of row streams sorted by vehicle id (first column): yields
+    ``(vehicle_id, [rows of stream 1, rows of stream 2, ...])``.
+    """
+    groups = [groupby(stream, key=itemgetter(0)) for stream in streams]
+    heads = [next(group, None) for group in groups]
+    while True:
+        keys = [head[0] for head in heads if head is not None]
+        if not keys:
+            return
+        key = min(keys)
+        rows = []
+        for position, head in enumerate(heads):
+            if head is not None and head[0] == key:
+                rows.append(list(head[1]))
+                heads[position] = next(groups[position], None)
+            else:
+                rows.append([])
+        yield key, rows
+
+
+class FuelCardService:
+    """Imports fuel card statements and reconciles them with fueling logs and trips."""
+
+    def __init__(self, db_path: Path, time_window_minutes: float = DEFAULT_TIME_WINDOW_MINUTES,
+                 duplicate_window_minutes: float = DEFAULT_DUPLICATE_WINDOW_MINUTES,
+                 liters_tolerance: float = DEFAULT_LITERS_TOLERANCE,
+                 liters_tolerance_pct: float = DEFAULT_LITERS_TOLERANCE_PCT):
+        self.db_path = db_path
+        self.time_window = timedelta(minutes=time_window_minutes)
+        self.duplicate_window = timedelta(minutes=duplicate_window_minutes)
+        self.liters_tolerance = liters_tolerance
+        self.liters_tolerance_pct = liters_tolerance_pct
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Establishes a database connection."""
+        return db.connect(self.db_path)
+
+    @staticmethod
+    def ensure_schema(conn: sqlite3.Connection):
+        """Creates the transaction table (and the fueling log index) if they do not exist."""
+        db.execute_schema(conn, SCHEMA)
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'fueling_logs'").fetchone():
+            conn.execute(LOGS_INDEX)
+
+    # ------------------------------------------------------------------
+    # Import
+    # ------------------------------------------------------------------
+
+    def import_file(self, path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> StatementImportResult:
+        """Imports a statement file. Raises ImportFileError when the file is unusable."""
+        path = Path(path)
+        with log_operation("fuel_cards.import", logger, file=path.name) as op:
+            result = self.import_rows(iter_rows(path), path.name, chunk_size)
+            op.update(rows=result.total, imported=result.imported, repeated=result.repeated,
+                      errors=len(result.errors))
+        return result
+
+    def import_rows(self, rows: Iterable[Tuple[int, Dict[str, Any]]], source: str,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> StatementImportResult:
+        """Same as import_file, for rows already read (``(line, {header: value})``)."""
+        result = StatementImportResult(source=source)
+        conn = self.get_connection()
+        try:
+            self.ensure_schema(conn)
+            conn.commit()
+            vehicles = {reg.replace(" ", "").upper(): vid for vid, reg in
+                        conn.execute("SELECT id, registration_number FROM vehicles") if reg}
+            # Statements without registrations: the card's vehicle from earlier transactions
+            cards = dict(conn.execute(
+                "SELECT card_number, vehicle_id FROM fuel_card_transactions "
+                "WHERE card_number IS NOT NULL AND vehicle_id IS NOT NULL ORDER BY tx_time"))
+            rows = iter(rows)
+            header: Optional[Dict[str, str]] = None
+            while True:
+                chunk = list(islice(rows, max(1, chunk_size)))
+                if not chunk:
+                    break
+                if header is None:
+                    header = self._map_header(chunk[0][1])
+                records = []
+                for line, raw in chunk:
+                    result.total += 1
+                    record = self._parse_row(line, raw, header, result)
+                    if record is None:
+                        continue
+                    card, registration = record[1], record[2]
+                    vehicle_id = vehicles.get(registration) if registration else cards.get(card)
+                    if vehicle_id is None:
+                        result.unknown_vehicle += 1
+                    elif card:
+                        cards[card] = vehicle_id
+                    records.append(record[:3] + (vehicle_id,) + record[3:] + (source,))
+                before = conn.total_changes
+                try:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO fuel_card_transactions (tx_key, card_number, "
+                        "registration_number, vehicle_id, tx_time, liters, amount, product, station, source) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        records,
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                imported = conn.total_changes - before
+                result.imported += imported
+                result.repeated += len(records) - imported
+        finally:
+            conn.close()
+        return result
+
+    @staticmethod
+    def _map_header(raw: Dict[str, Any]) -> Dict[str, str]:
+        """File header -> column name; checks the required columns."""
+        aliases = {alias: name for name, names in COLUMNS.items() for alias in names}
+        header = {}
+        for name in raw:
+            column = aliases.get(normalize_header(name))
+            if column and column not in header.values():
+                header[name] = column
+        present = set(header.values())
+        missing = [name for name in ("tx_time", "liters") if name not in present]
+        if not present & {"card_number", "registration_number"}:
+            missing.append("card_number / registration_number")
+        if missing:
+            raise ImportFileError(f"Brak wymaganych kolumn: {', '.join(missing)}")
+        return header
+
+    @staticmethod
+    def _parse_row(line: int, raw: Dict[str, Any], header: Dict[str, str],
+                   result: StatementImportResult) -> Optional[Tuple]:
+        """(tx_key, card, registration, time, litres, amount, product, station) or None."""
+        values = {column: raw.get(name) for name, column in header.items()}
+        product = _text(values.get("product"))
+        if product and not _is_fuel(product):
+            result.non_fuel += 1
+            return None
+        try:
+            tx_time = _statement_time(values.get("tx_time"))
+            hour = _text(values.get("tx_hour"))
+            if tx_time and hour and tx_time.endswith(" 00:00:00"):
+                # Date and time in separate columns
+                tx_time = _statement_time(f"{tx_time[:10]} {hour}")
+            liters = _float(values.get("liters"))
+            amount = _float(values.get("amount"))
+        except ValueError as e:
+            result.errors.append(RowError(line, None, str(e)))
+            return None
+        if liters is None:
+            # Service items without a quantity
+            result.non_fuel += 1
+            return None
+        if tx_time is None:
+            result.errors.append(RowError(line, "tx_time", "pole wymagane"))
+            return None
+        if liters < 0:
+            # Corrections / refunds are not fills
+            result.errors.append(RowError(line, "liters", "ujemna ilość (korekta) - pominięto"))
+            return None
+        card, registration = _upper(values.get("card_number")), _upper(values.get("registration_number"))
+        if not card and not registration:
+            result.errors.append(RowError(line, "card_number", "brak numeru karty i nr rejestracyjnego"))
+            return None
+        ref = _text(values.get("tx_ref"))
+        key = ref or f"{card or registration}|{tx_time}|{liters:.2f}|{'' if amount is None else f'{amount:.2f}'}"
+        return key, card, registration, tx_time, liters, amount, product, _text(values.get("station"))
+
+    # ------------------------------------------------------------------
+    # Reconciliation
+    # ------------------------------------------------------------------
+
+    def _liters_match(self, card_liters: float, log_liters: float) -> bool:
+        return abs(card_liters - log_liters) <= max(self.liters_tolerance,
+                                                    card_liters * self.liters_tolerance_pct / 100)
+
+    def reconcile(self, date_from: Optional[date] = None, date_to: Optional[date] = None) -> ReconciliationResult:
+        """Reconciles transactions of ``[date_from, date_to]`` (whole days; None = open)."""
+        start = datetime.combine(date_from, datetime.min.time()) if date_from else datetime.min
+        end = datetime.combine(date_to + timedelta(days=1), datetime.min.time()) if date_to else datetime.max
+        # Logs / trips reach one window past the period, matched transactions may sit at its edge
+        margin = max(self.time_window, self.duplicate_window)
+        window_start = start - margin if date_from else start
+        window_end = end + margin if date_to else end
+
+        def text(moment: datetime) -> str:
+            return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+        result = ReconciliationResult()
+        conn = self.get_connection()
+        try:
+            self.ensure_schema(conn)
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            trip_columns = {row[1] for row in conn.execute("PRAGMA table_info(trips)")}
+            trip_start = "start_date" if "start_date" in trip_columns else "start_time"
+            trip_end = "end_date" if "end_date" in trip_columns else "end_time"
+            has_logs = "fueling_logs" in tables
+            tanks = dict(conn.execute("SELECT id, tank_capacity FROM vehicles"))
+
+            with log_operation("fuel_cards.reconcile", logger,
+                               date_from=date_from, date_to=date_to) as op:
+                # Transactions of unknown vehicles cannot be joined
+                for tx_id, moment, liters, card, registration in conn.execute(
+                        "SELECT id, tx_time, liters, card_number, registration_number "
+                        "FROM fuel_card_transactions WHERE vehicle_id IS NULL AND tx_time >= ? AND tx_time < ?",
+                        (text(start), text(end))):
+                    result.transactions += 1
+                    result.issues.append(CardIssue("unknown_vehicle", tx_id, None, to_datetime(moment), liters,
+                                                   detail=registration or card or ""))
+
+                transactions = conn.execute(
+                    "SELECT vehicle_id, id, tx_time, liters, fueling_log_id, trip_id, issue "
+                    "FROM fuel_card_transactions "
+                    "WHERE vehicle_id IS NOT NULL AND tx_time >= ? AND tx_time < ? ORDER BY vehicle_id, tx_time, id",
+                    (text(start), text(end)),
+                )
+                logs = conn.execute(
+                    "SELECT vehicle_id, id, fueling_time, liters_added FROM fueling_logs "
+                    "WHERE fueling_time >= ? AND fueling_time < ? ORDER BY vehicle_id, fueling_time, id",
+                    (text(window_start), text(window_end)),
+                ) if has_logs else iter(())
+                trips = conn.execute(
+                    f"SELECT vehicle_id, id, {trip_start}, {trip_end} FROM trips "
+                    f"WHERE {trip_start} < ? AND ({trip_end} IS NULL OR {trip_end} >= ?) "
+                    f"AND status != 'cancelled' ORDER BY vehicle_id, {trip_start}",
+                    (text(window_end), text(window_start)),
+                )
+                updates = []
+                for vehicle_id, (vehicle_tx, vehicle_logs, vehicle_trips) in _merge_by_vehicle(
+                        _fetch(transactions), _fetch(logs) if has_logs else logs, _fetch(trips)):
+                    self._reconcile_vehicle(vehicle_id, vehicle_tx, vehicle_logs, vehicle_trips,
+                                            tanks.get(vehicle_id), has_logs, start, end, result, updates)
+
+                # Only changed results are written; the stored issue is the
+                # first applicable one (ISSUES order)
+                conn.executemany(
+                    "UPDATE fuel_card_transactions SET fueling_log_id = ?, trip_id = ?, issue = ? WHERE id = ?",
+                    updates)
+                conn.executemany(
+                    "UPDATE fuel_card_transactions SET fueling_log_id = NULL, trip_id = NULL, "
+                    "issue = 'unknown_vehicle' WHERE id = ? AND issue IS NOT 'unknown_vehicle'",
+                    [(item.transaction_id,) for item in result.of("unknown_vehicle")])
+                conn.commit()
+                op.update(transactions=result.transactions, matched=result.matched, issues=len(result.issues))
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return result
+
+    def _reconcile_vehicle(self, vehicle_id: int, transactions: List[Tuple], logs: List[Tuple],
+                           trips: List[Tuple], tank: Optional[float], has_logs: bool,
+                           start: datetime, end: datetime, result: ReconciliationResult,
+                           updates: List[Tuple]):
+        """Sliding-window match of one vehicle's time-ordered transactions, logs and trips."""
+        logs = [(log_id, to_datetime(moment), liters) for _, log_id, moment, liters in logs]
+        trips = [(trip_id, to_datetime(started), to_datetime(ended) if ended else datetime.max)
+                 for _, trip_id, started, ended in trips]
+        window: deque = deque()       # logs within time_window of the current transaction
+        next_log = next_trip = 0
+        previous: Optional[Tuple[int, datetime]] = None
+
+        for _, tx_id, moment, liters, *stored in transactions:
+            moment = to_datetime(moment)
+            result.transactions += 1
+            issues = []
+
+            # Logs: slide the window, logs left behind stay unmatched
+            while next_log < len(logs) and logs[next_log][1] <= moment + self.time_window:
+                window.append(logs[next_log])
+                next_log += 1
+            while window and window[0][1] < moment - self.time_window:
+                self._log_left(vehicle_id, window.popleft(), start, end, result)
+            candidates = [log for log in window if self._liters_match(liters, log[2])]
+            log = min(candidates, key=lambda log: abs(log[1] - moment)) if candidates else None
+            if log is not None:
+                window.remove(log)
+                result.matched += 1
+
+            # Trips never overlap for one vehicle: skip the ones that ended before
+            while next_trip < len(trips) and trips[next_trip][2] < moment:
+                next_trip += 1
+            trip_id = None
+            if next_trip < len(trips) and trips[next_trip][1] <= moment:
+                trip_id = trips[next_trip][0]
+                result.within_trip += 1
+
+            if previous is not None and moment - previous[1] <= self.duplicate_window:
+                issues.append(CardIssue("duplicate", tx_id, vehicle_id, moment, liters, detail=str(previous[0])))
+            if tank and liters > tank * (1 + CAPACITY_TOLERANCE):
+                issues.append(CardIssue("over_capacity", tx_id, vehicle_id, moment, liters, detail=f"{tank:g}"))
+            if log is None and (has_logs or trip_id is None):
+                issues.append(CardIssue("unmatched", tx_id, vehicle_id, moment, liters))
+            for item in issues:
+                item.fueling_log_id = log[0] if log else None
+                item.trip_id = trip_id
+            result.issues.extend(issues)
+            outcome = (log[0] if log else None, trip_id, issues[0].issue if issues else None)
+            if list(outcome) != stored:
+                updates.append(outcome + (tx_id,))
+            previous = (tx_id, moment)
+
+        for log in list(window) + logs[next_log:]:
+            self._log_left(vehicle_id, log, start, end, result)
+
+    @staticmethod
+    def _log_left(vehicle_id: int, log: Tuple[int, datetime, float], start: datetime, end: datetime,
+                  result: ReconciliationResult):
+        log_id, moment, liters = log
+        # Logs in the margin around the period belong to the neighbouring period
+        if start <= moment < end:
+            result.issues.append(CardIssue("log_without_transaction", None, vehicle_id, moment, liters,
+                                           fueling_log_id=log_id))
+
+
+def write_issues_csv(result: ReconciliationResult, path: Path, registrations: Dict[int, str]):
+    """Saves the reconciliation findings for the accounting department."""
+    labels = {
+        "unknown_vehicle": "nieznany pojazd",
+        "duplicate": "podwójne tankowanie",
+        "over_capacity": "ponad pojemność baku",
+        "unmatched": "brak wpisu tankowania",
+        "log_without_transaction": "tankowanie bez transakcji kartą",
+    }
+    with open(path, "w", newline="", encoding="utf-8-sig") as handle:
+        writer = csv.writer(handle, delimiter=";")
+        writer.writerow(["problem", "transakcja", "pojazd", "czas", "litry", "tankowanie", "przejazd", "uwagi"])
+        for item in sorted(result.issues, key=lambda i: (i.time, i.transaction_id or 0)):
+            writer.writerow([
+                labels.get(item.issue, item.issue), item.transaction_id or "",
+                registrations.get(item.vehicle_id, item.vehicle_id or ""),
+                item.time.strftime("%Y-%m-%d %H:%M"), f"{item.liters:.2f}".replace(".", ","),
+                item.fueling_log_id or "", item.trip_id or "", item.detail,
+            ])
@@ -0,0 +1,772 @@
+"""
+Service layer for bulk imports (CSV / XLSX) into the production ``fleet.db``.
+
+Files are read as a stream and processed in chunks of ``chunk_size`` rows:
+every chunk is validated row by row, existing records are resolved with a
+few ``IN (...)`` lookups, and the chunk is written with ``executemany`` in a
+single transaction. A bad row never stops the import - it is reported as a
+``RowError`` with its line number and the rest of the chunk goes in.
+
+Modes:
+
+* ``insert`` - rows whose key already exists in the database are rejected,
+* ``upsert`` - such rows update the existing record (only the columns
+  present in the file are touched).
+
+Keys: vehicles - registration number or VIN, employees - driving licence
+number, trips - trip (road-card) number. With ``dry_run=True`` every chunk
+is executed and rolled back, so constraint errors are reported too; schema
+changes the import needs are made inside that transaction and rolled back
+with it, and listed in ``ImportResult.notes``.
+"""
+import csv
+import logging
+import sqlite3
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from services.fleet_status_service import VEHICLE_STATUSES
+from services.numbering_service import RoadCardNumbering
+from utils import db, fleet_index
+from utils.app_logging import log_operation
+from utils.constants import FUEL_TYPES, PERMISSION_LEVELS
+
+logger = logging.getLogger(__name__)
+
+MODES = ("insert", "upsert")
+DEFAULT_CHUNK_SIZE = 500
+# Stay well below SQLITE_MAX_VARIABLE_NUMBER (999 in older builds)
+LOOKUP_BATCH = 400
+
+SCHEMA = """
+CREATE INDEX IF NOT EXISTS idx_vehicles_vin ON vehicles(vin);
+CREATE INDEX IF NOT EXISTS idx_employees_license ON employees(license_number);
+"""
+
+ADD_LICENSE_COLUMN = "ALTER TABLE employees ADD COLUMN license_number TEXT"
+
+
+class ImportFileError(ValueError):
+    """The file cannot be imported at all (format, headers, missing module)."""
+
+
+@dataclass
+class RowError:
+    """A rejected row: line number in the source file, field and reason."""
+    line: int
+    field: Optional[str]
+    message: str
+
+    def __str__(self) -> str:
+        where = f"wiersz {self.line}"
+        if self.field:
+            where += f", pole '{self.field}'"
+        return f"{where}: {self.message}"
+
+
+@dataclass
+class ImportResult:
+    """Summary of one import run."""
+    entity: str
+    mode: str = "insert"
+    dry_run: bool = False
+    total: int = 0
+    inserted: int = 0
+    updated: int = 0
+    errors: List[RowError] = field(default_factory=list)
+    # Validation notes that are not row errors (e.g. schema changes a dry run skipped)
+    notes: List[str] = field(default_factory=list)
+
+    @property
+    def skipped(self) -> int:
+        return self.total - self.inserted - self.updated
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+# ----------------------------------------------------------------------
+# Value parsers - raise ValueError with a user-facing (Polish) message
+# ----------------------------------------------------------------------
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    text = str(value).strip()
+    return text or None
+
+
+def _upper(value: Any) -> Optional[str]:
+    text = _text(value)
+    return text.replace(" ", "").upper() if text else None
+
+
+def _float(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = _text(value)
+    if text is None:
+        return None
+    try:
+        return float(text.replace(" ", "").replace(",", "."))
+    except ValueError:
+        raise ValueError(f"'{text}' nie jest liczbą")
+
+
+def _non_negative(value: Any) -> Optional[float]:
+    number = _float(value)
+    if number is not None and number < 0:
+        raise ValueError("wartość nie może być ujemna")
+    return number
+
+
+def _int(value: Any) -> Optional[int]:
+    number = _float(value)
+    if number is None:
+        return None
+    if number != int(number):
+        raise ValueError(f"'{value}' nie jest liczbą całkowitą")
+    return int(number)
+
+
+_TRUE = {"1", "tak", "t", "true", "yes", "y", "x", "aktywny"}
+_FALSE = {"0", "nie", "n", "false", "no", "nieaktywny"}
+
+
+def _bool(value: Any) -> Optional[int]:
+    if isinstance(value, bool):
+        return int(value)
+    text = _text(value)
+    if text is None:
+        return None
+    text = text.lower()
+    if text in _TRUE:
+        return 1
+    if text in _FALSE:
+        return 0
+    raise ValueError(f"'{value}' - oczekiwano tak/nie")
+
+
+_DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d",
+                 "%d.%m.%Y %H:%M", "%d.%m.%Y", "%Y-%m-%dT%H:%M:%S")
+
+
+def _timestamp(value: Any) -> Optional[str]:
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d 00:00:00")
+    text = _text(value)
+    if text is None:
+        return None
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            continue
+    raise ValueError(f"'{text}' nie jest datą (RRRR-MM-DD [GG:MM])")
+
+
+def _choice(values: Iterable[str]) -> Callable[[Any], Optional[str]]:
+    canonical = {v.lower(): v for v in values}
+
+    def parse(value: Any) -> Optional[str]:
+        text = _text(value)
+        if text is None:
+            return None
+        try:
+            return canonical[text.lower()]
+        except KeyError:
+            raise ValueError(f"'{text}' - dozwolone: {', '.join(canonical.values())}")
+    return parse
+
+
+def _vin(value: Any) -> Optional[str]:
+    vin = _upper(value)
+    if vin is None:
+        return None
+    if len(vin) != 17 or not vin.isalnum() or set(vin) & set("IOQ"):
+        raise ValueError("VIN musi mieć 17 znaków (bez I, O, Q)")
+    return vin
+
+
+def _year(value: Any) -> Optional[int]:
+    year = _int(value)
+    if year is not None and not 1900 <= year <= datetime.now().year + 1:
+        raise ValueError(f"nieprawidłowy rok {year}")
+    return year
+
+
+def _email(value: Any) -> Optional[str]:
+    email = _text(value)
+    if email is not None and ("@" not in email or " " in email):
+        raise ValueError(f"'{email}' nie jest adresem e-mail")
+    return email
+
+
+def normalize_header(name: Any) -> str:
+    """``'Nr rejestracyjny'`` -> ``'nr_rejestracyjny'`` (no diacritics, snake case)."""
+    text = str(name or "").strip().lower().replace("ł", "l")
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    for ch in " -./":
+        text = text.replace(ch, "_")
+    return "_".join(part for part in text.split("_") if part)
+
+
+# ----------------------------------------------------------------------
+# Entity specifications
+# ----------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Column:
+    """One importable column of the target table."""
+    name: str
+    parse: Callable[[Any], Any] = _text
+    aliases: Tuple[str, ...] = ()
+    required: bool = False
+    default: Any = None
+    # False for helper columns that are resolved, not stored (e.g. registration for trips)
+    stored: bool = True
+
+
+@dataclass(frozen=True)
+class EntitySpec:
+    """Target table, its columns and the keys used to find existing rows."""
+    name: str
+    table: str
+    label: str
+    columns: Tuple[Column, ...]
+    keys: Tuple[str, ...]
+
+    def column(self, name: str) -> Column:
+        return next(c for c in self.columns if c.name == name)
+
+    def header_map(self) -> Dict[str, str]:
+        """Normalized header or alias -> column name."""
+        mapping = {}
+        for column in self.columns:
+            for alias in (column.name,) + column.aliases:
+                mapping[normalize_header(alias)] = column.name
+        return mapping
+
+
+VEHICLES = EntitySpec(
+    name="vehicles",
+    table="vehicles",
+    label="Pojazdy",
+    keys=("registration_number", "vin"),
+    columns=(
+        Column("registration_number", _upper, ("nr_rejestracyjny", "rejestracja", "numer_rejestracyjny"), required=True),
+        Column("brand", _text, ("marka",), required=True),
+        Column("model", _text, (), required=True),
+        Column("fuel_type", _choice(FUEL_TYPES), ("paliwo", "rodzaj_paliwa"), default=FUEL_TYPES[0]),
+        Column("fuel_consumption", _non_negative, ("spalanie", "srednie_spalanie"), default=0.0),
+        Column("current_mileage", _non_negative, ("przebieg",), default=0.0),
+        Column("current_fuel", _non_negative, ("stan_paliwa", "paliwo_l"), default=0.0),
+        Column("status", _choice(VEHICLE_STATUSES), (), default="available"),
+        Column("tank_capacity", _non_negative, ("pojemnosc_baku", "bak")),
+        Column("vin", _vin, ("nr_vin",)),
+        Column("production_year", _year, ("rok_produkcji", "rok")),
+        Column("notes", _text, ("uwagi",)),
+    ),
+)
+
+EMPLOYEES = EntitySpec(
+    name="employees",
+    table="employees",
+    label="Pracownicy",
+    keys=("license_number",),
+    columns=(
+        Column("first_name", _text, ("imie",), required=True),
+        Column("last_name", _text, ("nazwisko",), required=True),
+        Column("position", _text, ("stanowisko",), required=True),
+        Column("department", _text, ("dzial",)),
+        Column("permissions", _choice(PERMISSION_LEVELS.values()), ("uprawnienia",),
+               default=PERMISSION_LEVELS['EMPLOYEE']),
+        Column("license_number", _upper, ("nr_prawa_jazdy", "prawo_jazdy", "licence_number")),
+        Column("email", _email, ("e_mail",)),
+        Column("phone", _text, ("telefon",)),
+        Column("is_active", _bool, ("aktywny",), default=1),
+        Column("notes", _text, ("uwagi",)),
+    ),
+)
+
+TRIPS = EntitySpec(
+    name="trips",
+    table="trips",
+    label="Przejazdy",
+    keys=("trip_number",),
+    columns=(
+        Column("trip_number", _text, ("nr_karty", "karta_drogowa", "numer_karty")),
+        Column("registration_number", _upper, ("nr_rejestracyjny", "pojazd"), required=True, stored=False),
+        Column("license_number", _upper, ("nr_prawa_jazdy", "prawo_jazdy"), stored=False),
+        Column("driver", _text, ("kierowca", "pracownik"), stored=False),
+        Column("start_date", _timestamp, ("data_wyjazdu", "wyjazd"), required=True),
+        Column("end_date", _timestamp, ("data_powrotu", "powrot")),
+        Column("start_location", _text, ("miejsce_wyjazdu",)),
+        Column("end_location", _text, ("miejsce_powrotu",)),
+        Column("destination", _text, ("cel", "cel_podrozy")),
+        Column("purpose", _text, ("opis",)),
+        Column("ordered_by", _text, ("zlecajacy",)),
+        Column("start_mileage", _non_negative, ("przebieg_poczatkowy", "licznik_start")),
+        Column("end_mileage", _non_negative, ("przebieg_koncowy", "licznik_koniec")),
+        Column("distance", _non_negative, ("dystans", "km")),
+        Column("start_fuel", _non_negative, ("paliwo_start",)),
+        Column("end_fuel", _non_negative, ("paliwo_koniec",)),
+        Column("fuel_used", _non_negative, ("zuzyte_paliwo",)),
+        Column("fuel_cost", _non_negative, ("koszt_paliwa",)),
+        Column("fuel_type", _choice(FUEL_TYPES), ("paliwo", "rodzaj_paliwa")),
+        Column("status", _choice(("active", "completed", "cancelled")), ()),
+        Column("notes", _text, ("uwagi",)),
+    ),
+)
+
+ENTITIES: Dict[str, EntitySpec] = {spec.name: spec for spec in (VEHICLES, EMPLOYEES, TRIPS)}
+
+
+# ----------------------------------------------------------------------
+# Streaming readers
+# ----------------------------------------------------------------------
+
+def iter_csv_rows(path: Path) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yields ``(line_number, {header: value})``; delimiter ``;``, ``,`` or tab is sniffed."""
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        sample = handle.read(4096)
+        handle.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(handle, dialect)
+        header = next(reader, None)
+        if not header:
+            raise ImportFileError("Plik jest pusty.")
+        for values in reader:
+            if not any(v.strip() for v in values):
+                continue
+            yield reader.line_num, dict(zip(header, values))
+
+
+def iter_xlsx_rows(path: Path) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yields rows of the first sheet; openpyxl in read-only mode keeps memory flat."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFileError("Import z XLSX wymaga biblioteki openpyxl (pip install openpyxl).")
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            raise ImportFileError("Arkusz jest pusty.")
+        for line, values in enumerate(rows, start=2):
+            if all(v is None or str(v).strip() == "" for v in values):
+                continue
+            yield line, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def iter_rows(path: Path) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Picks the reader by file extension."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in (".csv", ".txt"):
+        return iter_csv_rows(path)
+    if suffix in (".xlsx", ".xlsm"):
+        return iter_xlsx_rows(path)
+    raise ImportFileError(f"Nieobsługiwany format pliku: {suffix or path.name}")
+
+
+def write_errors_csv(errors: Iterable[RowError], path: Path):
+    """Saves rejected rows so they can be fixed and imported again."""
+    with open(path, "w", newline="", encoding="utf-8-sig") as handle:
+        writer = csv.writer(handle, delimiter=";")
+        writer.writerow(["wiersz", "pole", "błąd"])
+        for error in errors:
+            writer.writerow([error.line, error.field or "", error.message])
+
+
+# ----------------------------------------------------------------------
+# Service
+# ----------------------------------------------------------------------
+
+@dataclass
+class _Row:
+    line: int
+    values: Dict[str, Any]
+    existing_id: Optional[int] = None
+
+
+class ImportService:
+    """Imports vehicles, employees and trips from CSV/XLSX files."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Establishes a database connection."""
+        return db.connect(self.db_path)
+
+    @staticmethod
+    def has_license_column(conn: sqlite3.Connection) -> bool:
+        return "license_number" in {row[1] for row in conn.execute("PRAGMA table_info(employees)")}
+
+    @staticmethod
+    def ensure_schema(conn: sqlite3.Connection):
+        """Adds ``employees.license_number`` (the employee import key) and lookup indexes."""
+        if not ImportService.has_license_column(conn):
+            conn.execute(ADD_LICENSE_COLUMN)
+        db.execute_schema(conn, SCHEMA)
+        conn.commit()
+
+    def import_file(self, path: Path, entity: str, mode: str = "insert", dry_run: bool = False,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    progress: Optional[Callable[[int], None]] = None) -> ImportResult:
+        """
+        Imports ``path`` into the ``entity`` table.
+
+        ``progress`` is called after every chunk with the number of rows read so far.
+        Raises ImportFileError when the file as a whole is unusable.
+        """
+        rows = iter_rows(path)
+        with log_operation("import.file", logger, entity=entity, mode=mode,
+                           dry_run=dry_run, file=Path(path).name) as op:
+            result = self.import_rows(rows, entity, mode, dry_run, chunk_size, progress)
+            op.update(rows=result.total, inserted=result.inserted,
+                      updated=result.updated, errors=len(result.errors))
+        return result
+
+    def import_rows(self, rows: Iterable[Tuple[int, Dict[str, Any]]], entity: str,
+                    mode: str = "insert", dry_run: bool = False,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    progress: Optional[Callable[[int], None]] = None) -> ImportResult:
+        """Same as import_file, for rows already read (``(line, {header: value})``)."""
+        if entity not in ENTITIES:
+            raise ImportFileError(f"Nieznany typ danych: {entity}")
+        if mode not in MODES:
+            raise ImportFileError(f"Nieznany tryb importu: {mode}")
+        spec = ENTITIES[entity]
+        result = ImportResult(entity=entity, mode=mode, dry_run=dry_run)
+
+        conn = self.get_connection()
+        try:
+            add_license_column = False
+            if not dry_run:
+                self.ensure_schema(conn)
+            elif not self.has_license_column(conn):
+                # Added per chunk inside the rolled-back transaction (see _ImportJob.begin)
+                add_license_column = True
+                result.notes.append("Brak kolumny employees.license_number - zostanie dodana przy imporcie "
+                                    "(próba nie zmienia struktury bazy)")
+            job = _ImportJob(conn, spec, mode, dry_run, result, add_license_column)
+            rows = iter(rows)
+            while True:
+                chunk = list(islice(rows, max(1, chunk_size)))
+                if not chunk:
+                    break
+                job.process_chunk(chunk)
+                if progress:
+                    progress(result.total)
+        finally:
+            conn.close()
+        if entity == "vehicles" and not dry_run and (result.inserted or result.updated):
+            fleet_index.invalidate(self.db_path)
+        return result
+
+
+class _ImportJob:
+    """State of one import run: header mapping, seen keys, lookup caches."""
+
+    def __init__(self, conn: sqlite3.Connection, spec: EntitySpec, mode: str,
+                 dry_run: bool, result: ImportResult, add_license_column: bool = False):
+        self.conn = conn
+        self.spec = spec
+        self.mode = mode
+        self.dry_run = dry_run
+        self.result = result
+        self.add_license_column = add_license_column
+        self.columns: Optional[Dict[str, str]] = None  # file header -> column name
+        self.present: Tuple[str, ...] = ()
+        self.seen_keys: Dict[Tuple[str, Any], int] = {}
+        self._vehicles: Optional[Dict[str, int]] = None
+        self._employees_by_license: Optional[Dict[str, int]] = None
+        self._employees_by_name: Optional[Dict[str, Optional[int]]] = None
+        self.numbering = RoadCardNumbering()
+
+    # -- header -----------------------------------------------------------
+
+    def map_header(self, raw: Dict[str, Any]):
+        aliases = self.spec.header_map()
+        self.columns = {}
+        for header in raw:
+            name = aliases.get(normalize_header(header))
+            if name and name not in self.columns.values():
+                self.columns[header] = name
+        self.present = tuple(self.columns.values())
+        missing = [c.name for c in self.spec.columns if c.required and c.name not in self.present]
+        if missing:
+            raise ImportFileError(f"Brak wymaganych kolumn: {', '.join(missing)}")
+
+    # -- validation ---------------------------------------------------------
+
+    def validate(self, line: int, raw: Dict[str, Any]) -> Optional[_Row]:
+        values = {}
+        errors = []
+        for header, name in self.columns.items():
+            column = self.spec.column(name)
+            try:
+                values[name] = column.parse(raw.get(header))
+            except ValueError as e:
+                errors.append(RowError(line, name, str(e)))
+        for column in self.spec.columns:
+            if column.required and values.get(column.name) is None \
+                    and not any(e.field == column.name for e in errors):
+                errors.append(RowError(line, column.name, "pole wymagane"))
+        if not errors:
+            errors = self.check_row(line, values)
+        if errors:
+            self.result.errors.extend(errors)
+            return None
+        return _Row(line, values)
+
+    def check_row(self, line: int, v: Dict[str, Any]) -> List[RowError]:
+        """Cross-field rules (same ones the edit forms enforce)."""
+        errors = []
+        if self.spec is VEHICLES:
+            tank, fuel = v.get("tank_capacity"), v.get("current_fuel")
+            if tank and fuel and fuel > tank:
+                errors.append(RowError(line, "current_fuel", "paliwo większe niż pojemność baku"))
+        elif self.spec is TRIPS:
+            start, end = v.get("start_mileage"), v.get("end_mileage")
+            if start is not None and end is not None and end < start:
+                errors.append(RowError(line, "end_mileage", "przebieg końcowy mniejszy niż początkowy"))
+            if v.get("end_date") and v["end_date"] < v["start_date"]:
+                errors.append(RowError(line, "end_date", "data powrotu przed datą wyjazdu"))
+            if not v.get("license_number") and not v.get("driver"):
+                errors.append(RowError(line, "driver", "podaj kierowcę (nr prawa jazdy lub imię i nazwisko)"))
+        return errors
+
+    def check_duplicates(self, row: _Row) -> bool:
+        """Rejects a row whose key already appeared earlier in the file."""
+        for key in self.spec.keys:
+            value = row.values.get(key)
+            if value is None:
+                continue
+            first = self.seen_keys.get((key, value))
+            if first is not None:
+                self.result.errors.append(
+                    RowError(row.line, key, f"'{value}' powtórzone w pliku (pierwszy raz w wierszu {first})"))
+                return False
+        for key in self.spec.keys:
+            if row.values.get(key) is not None:
+                self.seen_keys[(key, row.values[key])] = row.line
+        return True
+
+    # -- trips: references ----------------------------------------------------
+
+    def resolve_references(self, row: _Row) -> bool:
+        """Turns registration / driver into vehicle_id / employee_id."""
+        v = row.values
+        if self._vehicles is None:
+            self._vehicles = {reg.replace(" ", "").upper(): vid for vid, reg in
+                              self.conn.execute("SELECT id, registration_number FROM vehicles")}
+            self._employees_by_license = {}
+            self._employees_by_name = {}
+            for eid, first, last, lic in self.conn.execute(
+                    "SELECT id, first_name, last_name, license_number FROM employees"):
+                if lic:
+                    self._employees_by_license[lic.replace(" ", "").upper()] = eid
+                name = normalize_header(f"{first} {last}")
+                # The same name twice is ambiguous - require the licence number then
+                self._employees_by_name[name] = None if name in self._employees_by_name else eid
+
+        vehicle_id = self._vehicles.get(v["registration_number"])
+        if vehicle_id is None:
+            self.result.errors.append(RowError(
+                row.line, "registration_number", f"brak pojazdu {v['registration_number']} w bazie"))
+            return False
+        if v.get("license_number"):
+            employee_id = self._employees_by_license.get(v["license_number"])
+            problem = f"brak pracownika z prawem jazdy {v['license_number']}"
+            field_name = "license_number"
+        else:
+            key = normalize_header(v["driver"])
+            employee_id = self._employees_by_name.get(key)
+            problem = (f"kierowca '{v['driver']}' niejednoznaczny - podaj nr prawa jazdy"
+                       if key in self._employees_by_name else f"brak pracownika '{v['driver']}'")
+            field_name = "driver"
+        if employee_id is None:
+            self.result.errors.append(RowError(row.line, field_name, problem))
+            return False
+
+        v["vehicle_id"] = vehicle_id
+        v["employee_id"] = employee_id
+        if v.get("distance") is None and v.get("end_mileage") is not None and v.get("start_mileage") is not None:
+            v["distance"] = v["end_mileage"] - v["start_mileage"]
+        if v.get("status") is None:
+            v["status"] = "completed" if v.get("end_date") else "active"
+        return True
+
+    # -- existing rows -----------------------------------------------------
+
+    def find_existing(self, rows: List[_Row]) -> Dict[Tuple[str, Any], int]:
+        """Key value -> id of the record already in the database (batched IN lookups)."""
+        found = {}
+        for key in self.spec.keys:
+            values = list({r.values[key] for r in rows if r.values.get(key) is not None})
+            for start in range(0, len(values), LOOKUP_BATCH):
+                batch = values[start:start + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                for record_id, value in self.conn.execute(
+                        f"SELECT id, {key} FROM {self.spec.table} WHERE {key} IN ({placeholders})", batch):
+                    found[(key, value)] = record_id
+        return found
+
+    def match_existing(self, row: _Row, existing: Dict[Tuple[str, Any], int]) -> bool:
+        ids = {existing[(key, row.values[key])] for key in self.spec.keys
+               if (key, row.values.get(key)) in existing}
+        if not ids:
+            return True
+        if len(ids) > 1:
+            self.result.errors.append(RowError(
+                row.line, None, "klucze wskazują na różne rekordy w bazie (nr rejestracyjny / VIN)"))
+            return False
+        if self.mode == "insert":
+            key = next(k for k in self.spec.keys if (k, row.values.get(k)) in existing)
+            self.result.errors.append(RowError(
+                row.line, key, f"'{row.values[key]}' już istnieje w bazie (użyj trybu aktualizacji)"))
+            return False
+        row.existing_id = ids.pop()
+        return True
+
+    # -- writing ------------------------------------------------------------
+
+    def stored_columns(self, present_only: bool) -> List[str]:
+        """Insert columns, or (``present_only``) the columns an update may touch."""
+        names = [c.name for c in self.spec.columns if c.stored]
+        if self.spec is TRIPS:
+            names += ["vehicle_id", "employee_id"]
+        if not present_only:
+            return names
+        wanted = set(self.present)
+        if self.spec is TRIPS:
+            wanted |= {"vehicle_id", "employee_id"}
+            if {"start_mileage", "end_mileage"} <= wanted:
+                wanted.add("distance")
+            if "end_date" in wanted:
+                wanted.add("status")
+        return [n for n in names if n in wanted]
+
+    def insert_params(self, row: _Row, columns: List[str]) -> Tuple:
+        params = []
+        for name in columns:
+            value = row.values.get(name)
+            if value is None:
+                column = next((c for c in self.spec.columns if c.name == name), None)
+                value = column.default if column else None
+            params.append(value)
+        return tuple(params)
+
+    def assign_trip_numbers(self, inserts: List[_Row]) -> List[_Row]:
+        """Fills missing trip numbers from one reserved block per year."""
+        by_year: Dict[int, List[_Row]] = {}
+        for row in inserts:
+            if not row.values.get("trip_number"):
+                by_year.setdefault(int(row.values["start_date"][:4]), []).append(row)
+        for year, rows in by_year.items():
+            block = self.numbering.reserve_block(self.conn, len(rows), year, purpose="import")
+            for row, number in zip(rows, block):
+                row.values["trip_number"] = number
+        return [row for rows in by_year.values() for row in rows]
+
+    def write(self, inserts: List[_Row], updates: List[_Row]):
+        """Writes one chunk in one transaction (rolled back in dry-run mode)."""
+        insert_columns = self.stored_columns(present_only=False)
+        insert_sql = (f"INSERT INTO {self.spec.table} ({', '.join(insert_columns)}) "
+                      f"VALUES ({', '.join('?' * len(insert_columns))})")
+        # An empty cell leaves the stored value alone
+        update_columns = self.stored_columns(present_only=True)
+        update_sql = (f"UPDATE {self.spec.table} SET "
+                      f"{', '.join(f'{c} = COALESCE(?, {c})' for c in update_columns)} WHERE id = ?")
+
+        def insert_params(row):
+            return self.insert_params(row, insert_columns)
+
+        def update_params(row):
+            return tuple(row.values.get(c) for c in update_columns) + (row.existing_id,)
+
+        numbered = []
+        try:
+            if self.spec is TRIPS:
+                numbered = self.assign_trip_numbers(inserts)
+            self.conn.executemany(insert_sql, [insert_params(r) for r in inserts])
+            if updates and update_columns:
+                self.conn.executemany(update_sql, [update_params(r) for r in updates])
+            inserted, updated = len(inserts), len(updates)
+        except sqlite3.IntegrityError:
+            # A constraint we do not pre-check (or a concurrent writer) - retry row by row
+            self.conn.rollback()
+            self.begin()
+            for row in numbered:
+                row.values["trip_number"] = None
+            if numbered:
+                self.assign_trip_numbers(numbered)
+            inserted = updated = 0
+            for row in inserts:
+                if self._write_row(row, insert_sql, insert_params(row)):
+                    inserted += 1
+            for row in updates:
+                if update_columns and self._write_row(row, update_sql, update_params(row)):
+                    updated += 1
+
+        if self.dry_run:
+            self.conn.rollback()
+        else:
+            self.conn.commit()
+        self.result.inserted += inserted
+        self.result.updated += updated
+
+    def _write_row(self, row: _Row, sql: str, params: Tuple) -> bool:
+        try:
+            self.conn.execute(sql, params)
+            return True
+        except sqlite3.IntegrityError as e:
+            self.result.errors.append(RowError(row.line, None, f"błąd zapisu: {e}"))
+            return False
+
+    def begin(self):
+        """Dry run: opens the chunk's transaction with the schema changes the real import makes."""
+        if self.dry_run and self.add_license_column and not self.conn.in_transaction:
+            # Explicit: DDL alone would not open a transaction
+            self.conn.execute("BEGIN")
+            self.conn.execute(ADD_LICENSE_COLUMN)
+
+    def process_chunk(self, chunk: List[Tuple[int, Dict[str, Any]]]):
+        self.begin()
+        if self.columns is None:
+            self.map_header(chunk[0][1])
+        self.result.total += len(chunk)
+
+        rows = []
+        for line, raw in chunk:
+            row = self.validate(line, raw)
+            if row is None or not self.check_duplicates(row):
+                continue
+            if self.spec is TRIPS and not self.resolve_references(row):
+                continue
+            rows.append(row)
+
+        existing = self.find_existing(rows)
+        inserts, updates = [], []
+        for row in rows:
+            if self.match_existing(row, existing):
+                (updates if row.existing_id else inserts).append(row)
+        if inserts or updates:
+            self.write(inserts, updates)
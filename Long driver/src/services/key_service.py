@@ -0,0 +1,182 @@
+"""
+Service layer for issuing and returning vehicle keys (the key_log table).
+
+Both operations run on the caller's connection and do not commit: the key
+windows commit each one on its own, the operations CLI may group many of
+them into one transaction. Notifying the fleet index and the other caches
+is left to the caller, after the commit.
+"""
+import sqlite3
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from services.version_service import StaleVersion
+from utils import db
+from utils.app_logging import log_operation
+
+logger = logging.getLogger(__name__)
+
+
+def _ts(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+class KeyAlreadyOut(ValueError):
+    """The vehicle already has an issued key (status 'out')."""
+
+    def __init__(self, vehicle_id: int, key_log_id: int):
+        self.vehicle_id = vehicle_id
+        self.key_log_id = key_log_id
+        super().__init__(f"Vehicle {vehicle_id} already has an issued key (key log {key_log_id}).")
+
+
+class MileageDecrease(ValueError):
+    """The entered mileage is lower than the one already recorded."""
+
+    def __init__(self, vehicle_id: int, mileage: float, recorded: float):
+        self.vehicle_id = vehicle_id
+        self.mileage = mileage
+        self.recorded = recorded
+        super().__init__(
+            f"Mileage {mileage:.1f} km is lower than the recorded {recorded:.1f} km (vehicle {vehicle_id})."
+        )
+
+
+class KeyService:
+    """Issues and takes back vehicle keys."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Establishes a database connection."""
+        return db.connect(self.db_path)
+
+    @staticmethod
+    def active_key(conn: sqlite3.Connection, vehicle_id: int) -> Optional[int]:
+        """Id of the key_log entry still 'out' for the vehicle, if any."""
+        row = conn.execute(
+            "SELECT id FROM key_log WHERE vehicle_id = ? AND status = 'out' ORDER BY checkout_time DESC LIMIT 1",
+            (vehicle_id,),
+        ).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def active_keys(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+        """Keys not returned yet, newest first."""
+        cursor = conn.execute(
+            """
+            SELECT kl.id AS key_log_id, kl.vehicle_id, v.registration_number, kl.employee_id,
+                   kl.checkout_time, kl.checkout_mileage, kl.checkout_fuel, kl.storage_location
+            FROM key_log kl
+            LEFT JOIN vehicles v ON v.id = kl.vehicle_id
+            WHERE kl.status = 'out'
+            ORDER BY kl.checkout_time DESC
+            """
+        )
+        columns = [c[0] for c in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def checkout(self, conn: sqlite3.Connection, vehicle_id: int, employee_id: int,
+                 mileage: float, fuel: float, checkout_time: Optional[datetime] = None,
+                 storage_location: str = "", notes: str = "") -> int:
+        """
+        Issues the key: a new key_log entry and the vehicle marked 'in_use'.
+
+        Returns the key_log id. Raises KeyAlreadyOut, MileageDecrease or
+        ValueError (unknown vehicle, fuel above the tank capacity).
+        """
+        vehicle = conn.execute(
+            "SELECT current_mileage, tank_capacity FROM vehicles WHERE id = ?", (vehicle_id,)
+        ).fetchone()
+        if not vehicle:
+            raise ValueError(f"Vehicle {vehicle_id} not found.")
+        recorded, tank = float(vehicle[0] or 0), vehicle[1]
+        if fuel < 0:
+            raise ValueError("Fuel cannot be negative.")
+        if tank and fuel > tank:
+            raise ValueError(f"Fuel {fuel:.1f} L exceeds the tank capacity ({tank:.1f} L).")
+
+        active = self.active_key(conn, vehicle_id)
+        if active is not None:
+            raise KeyAlreadyOut(vehicle_id, active)
+        if mileage < recorded:
+            raise MileageDecrease(vehicle_id, mileage, recorded)
+
+        with log_operation("key.checkout", logger, vehicle_id=vehicle_id, employee_id=employee_id) as op:
+            cursor = conn.execute(
+                """
+                INSERT INTO key_log (
+                    vehicle_id, employee_id, checkout_time,
+                    checkout_mileage, checkout_fuel,
+                    storage_location, status, notes
+                )
+                VALUES (?, ?, ?, ?, ?, ?, 'out', ?)
+                """,
+                (vehicle_id, employee_id, _ts(checkout_time or datetime.now()),
+                 mileage, fuel, storage_location, notes),
+            )
+            op["key_log_id"] = key_log_id = cursor.lastrowid
+            conn.execute(
+                "UPDATE vehicles SET status = 'in_use', current_mileage = ?, current_fuel = ? WHERE id = ?",
+                (mileage, fuel, vehicle_id),
+            )
+            op["rows"] = 2
+        return key_log_id
+
+    def return_key(self, conn: sqlite3.Connection, key_log_id: int, mileage: float, fuel: float,
+                   return_time: Optional[datetime] = None, storage_location: str = "",
+                   notes: str = "", version: Optional[int] = None) -> int:
+        """
+        Closes the key_log entry and makes the vehicle 'available' again.
+
+        ``version`` is the entry's row version as shown to the operator; when
+        given, the entry must not have changed since. Returns the vehicle id.
+        Raises ValueError (unknown or already returned entry, negative fuel),
+        MileageDecrease or StaleVersion.
+        """
+        row = conn.execute(
+            "SELECT vehicle_id, checkout_mileage, status FROM key_log WHERE id = ?", (key_log_id,)
+        ).fetchone()
+        if not row:
+            raise ValueError(f"Key log entry {key_log_id} not found.")
+        vehicle_id, checkout_mileage, status = row
+        if status != 'out':
+            raise ValueError(f"Key log entry {key_log_id} is already returned.")
+        if fuel < 0:
+            raise ValueError("Fuel cannot be negative.")
+        if checkout_mileage is not None and mileage < checkout_mileage:
+            raise MileageDecrease(vehicle_id, mileage, checkout_mileage)
+
+        # Guarded update: a second desk (kiosk) returning the same key meanwhile
+        # must not be overwritten
+        if version is None:
+            guard, guard_params, bump = "", (), ""
+        else:
+            guard, guard_params, bump = " AND version = ?", (version,), ", version = version + 1"
+        with log_operation("key.return", logger, key_log_id=key_log_id, vehicle_id=vehicle_id) as op:
+            cursor = conn.execute(
+                f"""
+                UPDATE key_log
+                SET return_time = ?, return_mileage = ?, return_fuel = ?,
+                    storage_location = ?, status = 'returned',
+                    notes = COALESCE(notes, ?) || CASE WHEN ? != '' THEN '\n' || ? ELSE '' END{bump}
+                WHERE id = ? AND status = 'out'{guard}
+                """,
+                (_ts(return_time or datetime.now()), mileage, fuel, storage_location,
+                 notes, notes, notes, key_log_id, *guard_params),
+            )
+            op["rows"] = cursor.rowcount
+            if not cursor.rowcount:
+                if version is None:
+                    raise ValueError(f"Key log entry {key_log_id} is already returned.")
+                current = conn.execute("SELECT version FROM key_log WHERE id = ?", (key_log_id,)).fetchone()
+                raise StaleVersion("key_log", key_log_id, version, current[0] if current else None)
+            cursor = conn.execute(
+                "UPDATE vehicles SET status = 'available', current_mileage = ?, current_fuel = ? WHERE id = ?",
+                (mileage, fuel, vehicle_id),
+            )
+            op["rows"] += cursor.rowcount
+        return vehicle_id
@@ -0,0 +1,270 @@
+"""
+Service layer for the gate kiosk: scanned code -> open key log -> return.
+
+A keyboard-wedge scanner types the code followed by Enter. Accepted codes:
+
+- ``KARTA_DROGOWA:<number>:<YYYYMMDD>`` - the QR code printed on the road
+  card (see PDFService.create_footer),
+- ``KLUCZ:<registration number or vehicle id>`` - the key tag,
+- a bare road card number (``KD/2026/0001``) or registration number.
+
+Scanners set to another keyboard layout send ``;`` or ``Ż`` for ``:``, so
+these are accepted as separators as well.
+
+``resolve`` finds the trip by its number (unique index) and the open key log
+of the vehicle through a partial index on ``key_log(vehicle_id) WHERE
+status = 'out'`` - a lookup of a few pages whatever the size of the key
+history. ``return_key`` closes the key log with KeyService and refreshes
+the caches, like the key return window.
+"""
+import logging
+import re
+import sqlite3
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Optional
+
+from models.rows import to_datetime
+from services.key_service import KeyService
+from services.maintenance_service import MaintenanceService
+from utils import db, fleet_index
+from utils.app_logging import log_operation
+
+logger = logging.getLogger(__name__)
+
+ROAD_CARD_PREFIX = "KARTA_DROGOWA"
+KEY_TAG_PREFIX = "KLUCZ"
+# Road card numbers (KD/2026/0001) tell a bare scan from a registration number
+ROAD_CARD_NUMBER = re.compile(r"^[A-Z]{1,4}/\d{4}/\d+$")
+_SEPARATORS = re.compile(r"[;Ż]")
+
+OPEN_KEYS_INDEX = "CREATE INDEX IF NOT EXISTS idx_key_log_open ON key_log(vehicle_id, checkout_time) " \
+                  "WHERE status = 'out'"
+
+
+class ScanError(ValueError):
+    """
+    A scanned code that cannot be used. ``reason``: ``format`` (not a known
+    code), ``not_found`` (no such road card / vehicle), ``not_out`` (the
+    vehicle has no issued key).
+    """
+
+    def __init__(self, reason: str, code: str, message: str):
+        self.reason = reason
+        self.code = code
+        super().__init__(message)
+
+
+@dataclass(frozen=True)
+class ScanCode:
+    kind: str                    # "road_card" or "key_tag"
+    value: str                   # road card number, registration number or vehicle id
+    day: Optional[date] = None   # date printed in the road card QR code
+
+
+@dataclass
+class ReturnTarget:
+    """Everything the return form is pre-filled with."""
+    key_log_id: int
+    vehicle_id: int
+    registration_number: str
+    vehicle_label: str
+    employee_name: str
+    checkout_time: Optional[datetime]
+    checkout_mileage: Optional[float]
+    checkout_fuel: Optional[float]
+    storage_location: str
+    current_mileage: Optional[float]
+    current_fuel: Optional[float]
+    trip_id: Optional[int] = None
+    trip_number: Optional[str] = None
+    version: Optional[int] = None  # key_log row version (services.version_service)
+
+    @property
+    def suggested_mileage(self) -> float:
+        # The vehicle's odometer may already be ahead (tracker readings)
+        return max(self.checkout_mileage or 0, self.current_mileage or 0)
+
+
+def parse_scan(text: str) -> ScanCode:
+    """Scanner input -> ScanCode. Raises ScanError (reason ``format``)."""
+    raw = text
+    text = _SEPARATORS.sub(":", text.strip()).upper()
+    if not text:
+        raise ScanError("format", raw, "Empty scan.")
+    prefix, _, rest = text.partition(":")
+    if prefix == ROAD_CARD_PREFIX and rest:
+        number, _, day = rest.rpartition(":")
+        if not number:
+            number, day = rest, ""
+        try:
+            parsed = datetime.strptime(day, "%Y%m%d").date() if day else None
+        except ValueError:
+            raise ScanError("format", raw, f"Invalid date in road card code: {day!r}.")
+        return ScanCode("road_card", number.strip(), parsed)
+    if prefix == KEY_TAG_PREFIX and rest:
+        return ScanCode("key_tag", rest.replace(" ", ""))
+    if ":" in text:
+        raise ScanError("format", raw, f"Unknown code: {raw.strip()!r}.")
+    if ROAD_CARD_NUMBER.match(text):
+        return ScanCode("road_card", text)
+    return ScanCode("key_tag", text.replace(" ", ""))
+
+
+class KioskService:
+    """Resolves scanned codes to open key logs and registers returns."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self.keys = KeyService(db_path)
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Establishes a database connection."""
+        return db.connect(self.db_path)
+
+    @staticmethod
+    def ensure_schema(conn: sqlite3.Connection):
+        """Creates the lookup indexes (open keys, trip number) if they are missing."""
+        conn.execute(OPEN_KEYS_INDEX)
+        column = KioskService._trip_number_column(conn)
+        indexed = {
+            info[2]
+            for index in conn.execute("PRAGMA index_list(trips)")
+            for info in conn.execute(f"PRAGMA index_info({index[1]})")
+            if info[0] == 0
+        }
+        if column and column not in indexed:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_trips_{column} ON trips({column})")
+
+    @staticmethod
+    def _trip_number_column(conn: sqlite3.Connection) -> Optional[str]:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(trips)")}
+        return "trip_number" if "trip_number" in columns else None
+
+    def resolve(self, conn: sqlite3.Connection, code: ScanCode) -> ReturnTarget:
+        """Open key log for the scanned code. Raises ScanError."""
+        with log_operation("kiosk.resolve", logger, kind=code.kind, code=code.value) as op:
+            trip_id = trip_number = key_log_id = None
+            if code.kind == "road_card":
+                trip_id, trip_number, vehicle_id, key_log_id = self._find_trip(conn, code)
+            else:
+                vehicle_id = self._find_vehicle(conn, code.value)
+
+            if key_log_id is None:
+                row = conn.execute(
+                    "SELECT id FROM key_log WHERE vehicle_id = ? AND status = 'out' "
+                    "ORDER BY checkout_time DESC LIMIT 1",
+                    (vehicle_id,),
+                ).fetchone()
+                if row is None:
+                    raise ScanError("not_out", code.value, f"Vehicle {vehicle_id} has no issued key.")
+                key_log_id = row[0]
+            op["key_log_id"] = key_log_id
+            return self._target(conn, key_log_id, trip_id, trip_number)
+
+    def resolve_text(self, text: str) -> ReturnTarget:
+        """parse_scan + resolve on a connection of its own."""
+        code = parse_scan(text)
+        conn = self.get_connection()
+        try:
+            return self.resolve(conn, code)
+        finally:
+            conn.close()
+
+    def _find_trip(self, conn: sqlite3.Connection, code: ScanCode):
+        column = self._trip_number_column(conn)
+        if column is None:
+            raise ScanError("not_found", code.value, "Trips have no road card number.")
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(trips)")}
+        start = "start_date" if "start_date" in columns else "start_time"
+        key_log = "key_log_id" if "key_log_id" in columns else "NULL"
+        # Numbers restart every year in some series: the date on the card decides
+        row = conn.execute(
+            f"SELECT id, {column}, vehicle_id, {key_log} FROM trips WHERE {column} = ? "
+            f"ORDER BY date({start}) = ? DESC, id DESC LIMIT 1",
+            (code.value, code.day.isoformat() if code.day else None),
+        ).fetchone()
+        if row is None and conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'trip_sheets'").fetchone():
+            # Daily trip sheet number (services.trip_sheet_service)
+            sheet = conn.execute(
+                "SELECT NULL, sheet_number, vehicle_id, key_log_id FROM trip_sheets WHERE sheet_number = ?",
+                (code.value,),
+            ).fetchone()
+            row = sheet
+        if row is None:
+            raise ScanError("not_found", code.value, f"No trip with road card {code.value}.")
+        trip_id, number, vehicle_id, key_log_id = row
+        if key_log_id is not None:
+            status = conn.execute("SELECT status FROM key_log WHERE id = ?", (key_log_id,)).fetchone()
+            if status is None or status[0] != "out":
+                key_log_id = None
+        return trip_id, number, vehicle_id, key_log_id
+
+    @staticmethod
+    def _find_vehicle(conn: sqlite3.Connection, value: str) -> int:
+        row = None
+        if value.isdigit():
+            row = conn.execute("SELECT id FROM vehicles WHERE id = ?", (int(value),)).fetchone()
+        if row is None:
+            row = conn.execute(
+                "SELECT id FROM vehicles WHERE UPPER(REPLACE(registration_number, ' ', '')) = ?", (value,)
+            ).fetchone()
+        if row is None:
+            raise ScanError("not_found", value, f"No vehicle {value}.")
+        return row[0]
+
+    @staticmethod
+    def _target(conn: sqlite3.Connection, key_log_id: int, trip_id: Optional[int],
+                trip_number: Optional[str]) -> ReturnTarget:
+        people = "employees" if conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'employees'").fetchone() else "drivers"
+        columns = {c[1] for c in conn.execute("PRAGMA table_info(key_log)")}
+        version = "kl.version" if "version" in columns else "NULL"
+        row = conn.execute(
+            f"""
+            SELECT kl.id, kl.vehicle_id, v.registration_number, v.brand, v.model,
+                   p.first_name, p.last_name, kl.checkout_time, kl.checkout_mileage, kl.checkout_fuel,
+                   kl.storage_location, v.current_mileage, v.current_fuel, {version}
+            FROM key_log kl
+            JOIN vehicles v ON v.id = kl.vehicle_id
+            LEFT JOIN {people} p ON p.id = kl.employee_id
+            WHERE kl.id = ?
+            """,
+            (key_log_id,),
+        ).fetchone()
+        (log_id, vehicle_id, registration, brand, model, first, last, checkout_time,
+         checkout_mileage, checkout_fuel, location, mileage, fuel, row_version) = row
+        return ReturnTarget(
+            key_log_id=log_id, vehicle_id=vehicle_id, registration_number=registration or "",
+            vehicle_label=" ".join(part for part in (brand, model) if part),
+            employee_name=" ".join(part for part in (first, last) if part),
+            checkout_time=to_datetime(checkout_time), checkout_mileage=checkout_mileage,
+            checkout_fuel=checkout_fuel, storage_location=location or "",
+            current_mileage=mileage, current_fuel=fuel, trip_id=trip_id, trip_number=trip_number,
+            version=row_version,
+        )
+
+    def return_key(self, target: ReturnTarget, mileage: float, fuel: float,
+                   return_time: Optional[datetime] = None, storage_location: str = "",
+                   notes: str = "") -> int:
+        """
+        Registers the return (one transaction) and refreshes the fleet index
+        and the service schedule. Raises MileageDecrease / ValueError
+        (StaleVersion: the entry changed since it was scanned).
+        """
+        conn = self.get_connection()
+        try:
+            vehicle_id = self.keys.return_key(conn, target.key_log_id, mileage, fuel,
+                                              return_time, storage_location, notes, target.version)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        fleet_index.notify(self.db_path, vehicle_id, status="available",
+                           current_mileage=mileage, current_fuel=fuel)
+        MaintenanceService(self.db_path).on_trip_completed(vehicle_id)
+        return vehicle_id
@@ -0,0 +1,457 @@
+"""
+Service layer for the service / inspection schedule.
+
+Rules (``service_rules``) define an interval in kilometres and/or days for
+all vehicles, for a brand/model, or for one vehicle; the most specific rule
+of a given name wins. Performed services go to ``service_history``.
+
+The engine keeps its output in ``service_schedule`` - one row per vehicle
+and rule with the due mileage, the due date and the date projected from
+the vehicle's recent daily distance. ``service_schedule_state`` records
+the mileage each vehicle was computed at, so a read recomputes only the
+vehicles whose mileage changed (or whose trend is older than
+TREND_REFRESH_DAYS). Completed trips and recorded services refresh their
+vehicle right away. Whether an item is due or overdue depends on today's
+date and is decided when reading, so the stored rows stay valid.
+"""
+import json
+import logging
+import sqlite3
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from models.rows import to_date
+from utils import db
+from utils.app_logging import log_operation
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS service_rules (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    -- Scope: one vehicle, a brand/model, or the whole fleet (all NULL)
+    vehicle_id INTEGER REFERENCES vehicles(id) ON DELETE CASCADE,
+    brand TEXT,
+    model TEXT,
+    interval_km REAL,
+    interval_days INTEGER,
+    warn_km REAL NOT NULL DEFAULT 1000,
+    warn_days INTEGER NOT NULL DEFAULT 14,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    CHECK (interval_km > 0 OR interval_days > 0)
+);
+
+CREATE TABLE IF NOT EXISTS service_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    vehicle_id INTEGER NOT NULL REFERENCES vehicles(id) ON DELETE CASCADE,
+    -- Rule name, not id: history survives replacing a rule with a more specific one
+    rule_name TEXT NOT NULL,
+    service_date DATE NOT NULL,
+    mileage REAL,
+    cost REAL,
+    description TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_service_history_vehicle
+    ON service_history(vehicle_id, rule_name, service_date);
+
+CREATE TABLE IF NOT EXISTS service_schedule (
+    vehicle_id INTEGER NOT NULL,
+    rule_id INTEGER NOT NULL,
+    last_date DATE,
+    last_mileage REAL,
+    due_mileage REAL,
+    due_date DATE,
+    projected_date DATE,
+    PRIMARY KEY (vehicle_id, rule_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS service_schedule_state (
+    vehicle_id INTEGER PRIMARY KEY,
+    mileage REAL,
+    daily_km REAL,
+    computed_on DATE
+)
+"""
+
+# Daily distance = km driven in the last TREND_DAYS / TREND_DAYS
+TREND_DAYS = 60
+# Projections are redone at least this often even if the mileage did not change
+TREND_REFRESH_DAYS = 7
+
+STATUS_OK = "ok"
+STATUS_DUE = "due"
+STATUS_OVERDUE = "overdue"
+_STATUS_RANK = {STATUS_OVERDUE: 0, STATUS_DUE: 1, STATUS_OK: 2}
+
+SCHEDULE_SQL = """
+    SELECT s.vehicle_id, v.registration_number, r.name, v.current_mileage,
+           s.last_date, s.last_mileage, s.due_mileage, s.due_date, s.projected_date,
+           r.warn_km, r.warn_days
+    FROM service_schedule s
+    JOIN vehicles v ON v.id = s.vehicle_id
+    JOIN service_rules r ON r.id = s.rule_id AND r.is_active = 1
+"""
+
+
+@dataclass
+class ServiceRule:
+    """An interval rule; ``vehicle_id`` / ``brand`` / ``model`` narrow its scope."""
+    id: int
+    name: str
+    vehicle_id: Optional[int]
+    brand: Optional[str]
+    model: Optional[str]
+    interval_km: Optional[float]
+    interval_days: Optional[int]
+    warn_km: float
+    warn_days: int
+
+    def specificity(self, vehicle_id: int, brand: str, model: str) -> int:
+        """How closely the rule targets the vehicle; -1 when it does not apply."""
+        if self.vehicle_id is not None:
+            return 3 if self.vehicle_id == vehicle_id else -1
+        if self.brand is not None and self.brand.lower() != (brand or "").lower():
+            return -1
+        if self.model is not None and self.model.lower() != (model or "").lower():
+            return -1
+        return (self.brand is not None) + (self.model is not None)
+
+
+@dataclass
+class ScheduleItem:
+    """Next occurrence of one service for one vehicle."""
+    vehicle_id: int
+    registration_number: str
+    rule_name: str
+    current_mileage: float
+    last_date: Optional[date]
+    last_mileage: Optional[float]
+    due_mileage: Optional[float]
+    due_date: Optional[date]
+    projected_date: Optional[date]
+    warn_km: float
+    warn_days: int
+
+    @property
+    def km_remaining(self) -> Optional[float]:
+        if self.due_mileage is None:
+            return None
+        return self.due_mileage - (self.current_mileage or 0)
+
+    @property
+    def next_date(self) -> Optional[date]:
+        """Earlier of the time limit and the mileage projection."""
+        dates = [d for d in (self.due_date, self.projected_date) if d is not None]
+        return min(dates) if dates else None
+
+    def status(self, today: Optional[date] = None) -> str:
+        today = today or date.today()
+        remaining = self.km_remaining
+        if (remaining is not None and remaining <= 0) or (self.due_date and self.due_date < today):
+            return STATUS_OVERDUE
+        if remaining is not None and remaining <= self.warn_km:
+            return STATUS_DUE
+        next_date = self.next_date
+        if next_date and next_date <= today + timedelta(days=self.warn_days):
+            return STATUS_DUE
+        return STATUS_OK
+
+
+def _iso(value: Optional[date]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _ids_param(ids: Iterable[int]) -> str:
+    return json.dumps(sorted({int(i) for i in ids}))
+
+
+class MaintenanceService:
+    """Service rules, service history and the due/overdue engine."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Establishes a database connection."""
+        return db.connect(self.db_path)
+
+    @staticmethod
+    def ensure_schema(conn: sqlite3.Connection):
+        """Creates the maintenance tables if they do not exist."""
+        db.execute_schema(conn, SCHEMA)
+
+    # ------------------------------------------------------------------
+    # Rules and history
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def active_rules(conn: sqlite3.Connection) -> List[ServiceRule]:
+        rows = conn.execute(
+            "SELECT id, name, vehicle_id, brand, model, interval_km, interval_days, warn_km, warn_days "
+            "FROM service_rules WHERE is_active = 1 ORDER BY id"
+        ).fetchall()
+        return [ServiceRule(*row) for row in rows]
+
+    def add_rule(self, name: str, interval_km: Optional[float] = None,
+                 interval_days: Optional[int] = None, vehicle_id: Optional[int] = None,
+                 brand: Optional[str] = None, model: Optional[str] = None,
+                 warn_km: float = 1000, warn_days: int = 14) -> int:
+        """
+        Adds a rule; the schedule of the whole fleet is recomputed on the next read.
+
+        Raises ValueError when neither interval is given.
+        """
+        if not (interval_km or interval_days):
+            raise ValueError("A service rule needs an interval in km or in days.")
+        conn = self.get_connection()
+        try:
+            self.ensure_schema(conn)
+            cursor = conn.execute(
+                "INSERT INTO service_rules (name, vehicle_id, brand, model, interval_km, "
+                "interval_days, warn_km, warn_days) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (name.strip(), vehicle_id, brand, model, interval_km, interval_days, warn_km, warn_days),
+            )
+            rule_id = cursor.lastrowid
+            self.rebuild(conn)
+            conn.commit()
+            return rule_id
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def deactivate_rule(self, rule_id: int):
+        conn = self.get_connection()
+        try:
+            conn.execute("UPDATE service_rules SET is_active = 0 WHERE id = ?", (rule_id,))
+            self.rebuild(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def rule_names(self, vehicle_id: int) -> List[str]:
+        """Names of the rules applying to the vehicle."""
+        conn = self.get_connection()
+        try:
+            self.ensure_schema(conn)
+            vehicle = conn.execute("SELECT brand, model FROM vehicles WHERE id = ?", (vehicle_id,)).fetchone()
+            if vehicle is None:
+                return []
+            names = {
+                rule.name for rule in self.active_rules(conn)
+                if rule.specificity(vehicle_id, *vehicle) >= 0
+            }
+            return sorted(names)
+        finally:
+            conn.close()
+
+    def record_service(self, vehicle_id: int, rule_name: str, service_date: date,
+                       mileage: Optional[float] = None, cost: Optional[float] = None,
+                       description: str = "") -> int:
+        """Stores a performed service and refreshes the vehicle's schedule."""
+        conn = self.get_connection()
+        try:
+            with log_operation("maintenance.record", logger, vehicle_id=vehicle_id, rule=rule_name) as op:
+                self.ensure_schema(conn)
+                cursor = conn.execute(
+                    "INSERT INTO service_history (vehicle_id, rule_name, service_date, mileage, cost, description) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (vehicle_id, rule_name.strip(), service_date.isoformat(), mileage, cost, description),
+                )
+                op["history_id"] = cursor.lastrowid
+                self.compute(conn, [vehicle_id])
+                conn.commit()
+            return op["history_id"]
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def history(self, vehicle_id: int) -> List[tuple]:
+        """(service_date, rule_name, mileage, cost, description), newest first."""
+        conn = self.get_connection()
+        try:
+            self.ensure_schema(conn)
+            return conn.execute(
+                "SELECT service_date, rule_name, mileage, cost, description FROM service_history "
+                "WHERE vehicle_id = ? ORDER BY service_date DESC, id DESC",
+                (vehicle_id,),
+            ).fetchall()
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Engine
+    # ------------------------------------------------------------------
+
+    def compute(self, conn: sqlite3.Connection, vehicle_ids: Sequence[int],
+                today: Optional[date] = None) -> int:
+        """
+        Recomputes the schedule rows of ``vehicle_ids`` inside the caller's
+        transaction. Rules, last services and trends are read with one
+        query each, whatever the number of vehicles. Returns rows written.
+        """
+        if not vehicle_ids:
+            return 0
+        today = today or date.today()
+        ids_json = _ids_param(vehicle_ids)
+        rules = self.active_rules(conn)
+
+        vehicles = conn.execute(
+            "SELECT id, brand, model, COALESCE(current_mileage, 0), created_at FROM vehicles "
+            "WHERE id IN (SELECT value FROM json_each(?))",
+            (ids_json,),
+        ).fetchall()
+        last_services = {
+            (vehicle_id, name): (to_date(service_date), mileage)
+            for vehicle_id, name, service_date, mileage in conn.execute(
+                """
+                SELECT vehicle_id, rule_name, service_date, mileage FROM (
+                    SELECT vehicle_id, rule_name, service_date, mileage,
+                           ROW_NUMBER() OVER (PARTITION BY vehicle_id, rule_name
+                                              ORDER BY service_date DESC, id DESC) AS rn
+                    FROM service_history
+                    WHERE vehicle_id IN (SELECT value FROM json_each(?))
+                ) WHERE rn = 1
+                """,
+                (ids_json,),
+            )
+        }
+        trend_from = datetime.combine(today - timedelta(days=TREND_DAYS), datetime.min.time())
+        daily_km = {
+            vehicle_id: km / TREND_DAYS
+            for vehicle_id, km in conn.execute(
+                "SELECT vehicle_id, SUM(distance) FROM trips "
+                "WHERE vehicle_id IN (SELECT value FROM json_each(?)) "
+                "AND end_date >= ? AND distance > 0 GROUP BY vehicle_id",
+                (ids_json, trend_from.strftime("%Y-%m-%d %H:%M:%S")),
+            )
+        }
+
+        schedule_rows = []
+        state_rows = []
+        for vehicle_id, brand, model, mileage, created_at in vehicles:
+            # Most specific rule of each name
+            chosen: Dict[str, tuple] = {}
+            for rule in rules:
+                rank = rule.specificity(vehicle_id, brand, model)
+                if rank >= 0 and rank >= chosen.get(rule.name, (-1, None))[0]:
+                    chosen[rule.name] = (rank, rule)
+
+            rate = daily_km.get(vehicle_id)
+            for _, rule in chosen.values():
+                last_date, last_mileage = last_services.get((vehicle_id, rule.name), (None, None))
+                # No history: counted from 0 km and from the day the vehicle was registered
+                base_date = last_date or to_date(created_at) or today
+                due_mileage = (last_mileage or 0) + rule.interval_km if rule.interval_km else None
+                due_date = base_date + timedelta(days=rule.interval_days) if rule.interval_days else None
+                projected = None
+                if due_mileage is not None and rate:
+                    projected = today + timedelta(days=max(0.0, (due_mileage - mileage) / rate))
+                schedule_rows.append((
+                    vehicle_id, rule.id, _iso(last_date), last_mileage,
+                    due_mileage, _iso(due_date), _iso(projected),
+                ))
+            state_rows.append((vehicle_id, mileage, rate, today.isoformat()))
+
+        conn.execute("DELETE FROM service_schedule WHERE vehicle_id IN (SELECT value FROM json_each(?))",
+                     (ids_json,))
+        conn.executemany("INSERT INTO service_schedule VALUES (?, ?, ?, ?, ?, ?, ?)", schedule_rows)
+        conn.execute("DELETE FROM service_schedule_state WHERE vehicle_id IN (SELECT value FROM json_each(?))",
+                     (ids_json,))
+        conn.executemany("INSERT INTO service_schedule_state VALUES (?, ?, ?, ?)", state_rows)
+        return len(schedule_rows)
+
+    def stale_vehicle_ids(self, conn: sqlite3.Connection, today: Optional[date] = None) -> List[int]:
+        """Vehicles never computed, with a changed mileage or an old trend."""
+        today = today or date.today()
+        rows = conn.execute(
+            """
+            SELECT v.id FROM vehicles v
+            LEFT JOIN service_schedule_state s ON s.vehicle_id = v.id
+            WHERE s.vehicle_id IS NULL
+               OR s.mileage IS NOT COALESCE(v.current_mileage, 0)
+               OR s.computed_on < ?
+            """,
+            ((today - timedelta(days=TREND_REFRESH_DAYS)).isoformat(),),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def refresh_stale(self, conn: sqlite3.Connection, today: Optional[date] = None) -> int:
+        """Brings the stored schedule up to date; returns the number of vehicles recomputed."""
+        self.ensure_schema(conn)
+        stale = self.stale_vehicle_ids(conn, today)
+        if stale:
+            with log_operation("maintenance.refresh", logger, vehicles=len(stale)) as op:
+                op["rows"] = self.compute(conn, stale, today)
+            conn.commit()
+        return len(stale)
+
+    def rebuild(self, conn: sqlite3.Connection):
+        """Forgets all computed rows (after rule changes); the next read recomputes the fleet."""
+        self.ensure_schema(conn)
+        conn.execute("DELETE FROM service_schedule_state")
+        conn.execute("DELETE FROM service_schedule")
+
+    def on_trip_completed(self, vehicle_id: int):
+        """Refreshes one vehicle after its mileage changed (trip end / key return)."""
+        conn = self.get_connection()
+        try:
+            self.ensure_schema(conn)
+            self.compute(conn, [vehicle_id])
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            # The next read finds the vehicle stale and recomputes it anyway
+            logger.warning(f"Service schedule refresh failed: {e}", extra={"vehicle_id": vehicle_id})
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def query_schedule(self, conn: sqlite3.Connection, vehicle_ids: Optional[Sequence[int]] = None,
+                       today: Optional[date] = None) -> List[ScheduleItem]:
+        """Schedule items (most urgent first) after refreshing stale vehicles."""
+        today = today or date.today()
+        self.refresh_stale(conn, today)
+        sql, params = SCHEDULE_SQL, ()
+        if vehicle_ids is not None:
+            sql += " WHERE s.vehicle_id IN (SELECT value FROM json_each(?))"
+            params = (_ids_param(vehicle_ids),)
+        items = []
+        for row in conn.execute(sql, params):
+            (vehicle_id, registration, name, mileage, last_date, last_mileage,
+             due_mileage, due_date, projected, warn_km, warn_days) = row
+            items.append(ScheduleItem(
+                vehicle_id, registration, name, mileage or 0, to_date(last_date), last_mileage,
+                due_mileage, to_date(due_date), to_date(projected), warn_km, warn_days,
+            ))
+        items.sort(key=lambda i: (_STATUS_RANK[i.status(today)], i.next_date or date.max,
+                                  i.registration_number))
+        return items
+
+    def schedule(self, vehicle_ids: Optional[Sequence[int]] = None,
+                 today: Optional[date] = None) -> List[ScheduleItem]:
+        conn = self.get_connection()
+        try:
+            return self.query_schedule(conn, vehicle_ids, today)
+        finally:
+            conn.close()
+
+    def vehicle_status(self, today: Optional[date] = None) -> Dict[int, ScheduleItem]:
+        """The most urgent item per vehicle (for the vehicle list)."""
+        worst: Dict[int, ScheduleItem] = {}
+        for item in self.schedule(today=today):
+            worst.setdefault(item.vehicle_id, item)
+        return worst
@@ -0,0 +1,358 @@
+"""
+Service layer for the monthly fleet cube ("Miesięczny przegląd").
+
+``monthly_cube`` holds one row per month x vehicle x employee with the number
+of finished trips, km, litres, fuel/toll/other cost and hours in use. A month
+is built from ``trips`` when it is first needed. Triggers on ``trips`` mark
+the cells of every inserted, corrected or deleted trip in
+``monthly_cube_dirty`` - in any month, so imports and edits of old trips are
+picked up too - and the next read refills only those cells. A completed trip
+updates its own cell right away (``on_trip_completed``). Reports and
+year-over-year comparisons read the cube - a few thousand rows - instead of
+re-scanning trips.
+
+Fuel cost and litres use the same expressions as the operating cost engine
+(recorded ``fuel_cost``, otherwise consumption x price), so the cube agrees
+with "Koszty eksploatacji" for trips.
+"""
+import json
+import logging
+import sqlite3
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from services.cost_service import CostService
+from utils import db
+from utils.app_logging import log_operation
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS monthly_cube (
+    month TEXT NOT NULL,
+    vehicle_id INTEGER NOT NULL,
+    -- 0 = trip without an employee
+    employee_id INTEGER NOT NULL,
+    trips INTEGER NOT NULL,
+    km REAL NOT NULL,
+    litres REAL NOT NULL,
+    cost REAL NOT NULL,
+    hours REAL NOT NULL,
+    PRIMARY KEY (month, vehicle_id, employee_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS monthly_cube_months (
+    month TEXT PRIMARY KEY,
+    -- 1 = built after the month ended
+    closed INTEGER NOT NULL,
+    -- fuel prices of the build, other prices rebuild the month
+    signature TEXT NOT NULL,
+    built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Cells whose trips changed since they were filled (written by triggers)
+CREATE TABLE IF NOT EXISTS monthly_cube_dirty (
+    month TEXT NOT NULL,
+    vehicle_id INTEGER NOT NULL,
+    employee_id INTEGER NOT NULL,
+    PRIMARY KEY (month, vehicle_id, employee_id)
+) WITHOUT ROWID
+"""
+
+# Dimension name -> SQL over monthly_cube c LEFT JOIN <people> e
+DIMENSIONS = {
+    "month": "c.month",
+    "year": "substr(c.month, 1, 4)",
+    "vehicle": "c.vehicle_id",
+    "employee": "c.employee_id",
+    "department": "e.department",
+}
+
+
+@dataclass(slots=True)
+class CubeCell:
+    """Totals of one slice of the cube; ``key`` follows the requested dimensions."""
+    key: Tuple
+    trips: int
+    km: float
+    litres: float
+    cost: float
+    hours: float
+    vehicles: int
+    employees: int
+
+    @property
+    def cost_per_km(self) -> Optional[float]:
+        return self.cost / self.km if self.km else None
+
+
+def _dirty_triggers(conn: sqlite3.Connection) -> Dict[str, str]:
+    """Triggers marking the cube cell of every written trip row as dirty, by name."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(trips)")}
+    if not columns:
+        return {}
+    trip_date = "start_date" if "start_date" in columns else "start_time"
+    employee = "employee_id" if "employee_id" in columns else "driver_id"
+    triggers = {}
+    for event, rows in (("INSERT", ("NEW",)), ("DELETE", ("OLD",)), ("UPDATE", ("OLD", "NEW"))):
+        marks = " ".join(
+            f"INSERT OR IGNORE INTO monthly_cube_dirty (month, vehicle_id, employee_id) "
+            f"SELECT strftime('%Y-%m', {row}.{trip_date}), {row}.vehicle_id, COALESCE({row}.{employee}, 0) "
+            f"WHERE strftime('%Y-%m', {row}.{trip_date}) IS NOT NULL AND {row}.vehicle_id IS NOT NULL;"
+            for row in rows
+        )
+        name = f"cube_dirty_trips_{event.lower()}"
+        triggers[name] = f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON trips BEGIN {marks} END"
+    return triggers
+
+
+def month_key(day: date) -> str:
+    return f"{day:%Y-%m}"
+
+
+def month_bounds(month: str) -> Tuple[date, date]:
+    """First day of the month and first day of the next one."""
+    year, number = int(month[:4]), int(month[5:7])
+    return date(year, number, 1), date(year + number // 12, number % 12 + 1, 1)
+
+
+def months_between(first: str, last: str) -> List[str]:
+    months = []
+    while first <= last:
+        months.append(first)
+        first = month_key(month_bounds(first)[1])
+    return months
+
+
+def shift_month(month: str, months: int) -> str:
+    index = int(month[:4]) * 12 + int(month[5:7]) - 1 + months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+class MonthlyCubeService:
+    """Builds and slices the month x vehicle x employee cube."""
+
+    def __init__(self, db_path: Path, fuel_prices: Optional[Dict[str, float]] = None):
+        self.db_path = db_path
+        self.costs = CostService(db_path, fuel_prices)
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Establishes a database connection."""
+        return db.connect(self.db_path)
+
+    @staticmethod
+    def ensure_schema(conn: sqlite3.Connection):
+        """Creates the cube tables and the trips triggers if they do not exist."""
+        db.execute_schema(conn, SCHEMA)
+        present = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+        for name, sql in _dirty_triggers(conn).items():
+            if name not in present:
+                conn.execute(sql)
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def _fill(self, conn: sqlite3.Connection, layout, month: str,
+              vehicle_id: Optional[int] = None, employee_id: Optional[int] = None) -> int:
+        """Replaces the cube rows of a month (or of one cell) from trips."""
+        start, end = month_bounds(month)
+        trip_start = f"t.{layout['trip_date']}"
+        trip_end = f"t.{layout['trip_end']}"
+        employee = f"COALESCE(t.{layout['trip_employee']}, 0)"
+        litres, recorded, estimate = self.costs.trip_fuel_sql(layout)
+        extra_cost = "".join(
+            f" + COALESCE(t.{column}, 0)" for column in ("toll_costs", "other_costs") if column in layout["trips"]
+        )
+        cell_filter, cell_params = "", {}
+        if vehicle_id is not None:
+            cell_filter = f" AND t.vehicle_id = :vehicle_id AND {employee} = :employee_id"
+            cell_params = {"vehicle_id": vehicle_id, "employee_id": employee_id or 0}
+            conn.execute("DELETE FROM monthly_cube WHERE month = ? AND vehicle_id = ? AND employee_id = ?",
+                         (month, vehicle_id, employee_id or 0))
+        else:
+            conn.execute("DELETE FROM monthly_cube WHERE month = ?", (month,))
+
+        cursor = conn.execute(f"""
+            INSERT INTO monthly_cube (month, vehicle_id, employee_id, trips, km, litres, cost, hours)
+            SELECT :month, t.vehicle_id, {employee}, COUNT(*),
+                   TOTAL(t.distance), TOTAL({litres}),
+                   TOTAL(COALESCE({recorded}, {estimate}){extra_cost}),
+                   TOTAL(MAX(0, (julianday({trip_end}) - julianday({trip_start})) * 24))
+            FROM trips t LEFT JOIN vehicles v ON v.id = t.vehicle_id
+            WHERE {trip_start} >= :start AND {trip_start} < :end
+              AND {trip_end} IS NOT NULL AND t.status IS NOT 'cancelled'{cell_filter}
+            GROUP BY t.vehicle_id, {employee}
+        """, {"month": month, "start": start.isoformat(), "end": end.isoformat(),
+              **cell_params, **self.costs.price_params()})
+        return cursor.rowcount
+
+    def build_month(self, conn: sqlite3.Connection, month: str, today: Optional[date] = None,
+                    layout=None) -> int:
+        """Rebuilds one month; it is marked closed when it ended before ``today``."""
+        today = today or date.today()
+        layout = layout or self.costs.layout(conn)
+        with log_operation("cube.build_month", logger, month=month) as op:
+            op["rows"] = self._fill(conn, layout, month)
+            conn.execute("DELETE FROM monthly_cube_dirty WHERE month = ?", (month,))
+            conn.execute(
+                "INSERT OR REPLACE INTO monthly_cube_months (month, closed, signature, built_at) "
+                "VALUES (?, ?, ?, ?)",
+                (month, int(month < month_key(today)), self.costs.prices_key,
+                 datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+            )
+        return op["rows"]
+
+    def refresh(self, conn: sqlite3.Connection, first: Optional[str] = None, last: Optional[str] = None,
+                today: Optional[date] = None) -> List[str]:
+        """
+        Builds the months of [first, last] that are missing or were built with
+        other fuel prices, and refills the dirty cells of the others. Returns
+        the months that changed.
+        """
+        today = today or date.today()
+        self.ensure_schema(conn)
+        layout = self.costs.layout(conn)
+        current = month_key(today)
+        if first is None:
+            oldest = conn.execute(f"SELECT MIN({layout['trip_date']}) FROM trips").fetchone()[0]
+            first = oldest[:7] if oldest else current
+        last = min(last or current, current)
+
+        built = dict(conn.execute(
+            "SELECT month, signature FROM monthly_cube_months WHERE month BETWEEN ? AND ?", (first, last)
+        ))
+        dirty: Dict[str, List[Tuple[int, int]]] = {}
+        for month, vehicle_id, employee_id in conn.execute(
+            "SELECT month, vehicle_id, employee_id FROM monthly_cube_dirty WHERE month BETWEEN ? AND ?",
+            (first, last),
+        ):
+            dirty.setdefault(month, []).append((vehicle_id, employee_id))
+
+        rebuilt = []
+        for month in months_between(first, last):
+            if built.get(month) != self.costs.prices_key:
+                self.build_month(conn, month, today, layout)
+            elif month in dirty:
+                for vehicle_id, employee_id in dirty[month]:
+                    self._fill(conn, layout, month, vehicle_id, employee_id)
+                conn.execute("DELETE FROM monthly_cube_dirty WHERE month = ?", (month,))
+            else:
+                continue
+            rebuilt.append(month)
+        if rebuilt:
+            conn.commit()
+        return rebuilt
+
+    def rebuild(self, months: Optional[Iterable[str]] = None, today: Optional[date] = None) -> List[str]:
+        """Rebuilds the given months (all built months when None) from scratch."""
+        conn = self.get_connection()
+        try:
+            self.ensure_schema(conn)
+            if months is None:
+                months = [row[0] for row in conn.execute("SELECT month FROM monthly_cube_months")]
+            months = sorted(months)
+            layout = self.costs.layout(conn)
+            for month in months:
+                self.build_month(conn, month, today, layout)
+            conn.commit()
+            return months
+        finally:
+            conn.close()
+
+    def on_trip_completed(self, trip_id: int):
+        """Updates the cube cell of a finished trip (current or any earlier month)."""
+        conn = self.get_connection()
+        try:
+            self.ensure_schema(conn)
+            layout = self.costs.layout(conn)
+            trip = conn.execute(
+                f"SELECT {layout['trip_date']}, vehicle_id, {layout['trip_employee']} FROM trips WHERE id = ?",
+                (trip_id,),
+            ).fetchone()
+            if trip is None or trip[0] is None:
+                return
+            month = str(trip[0])[:7]
+            if conn.execute("SELECT 1 FROM monthly_cube_months WHERE month = ?", (month,)).fetchone():
+                self._fill(conn, layout, month, trip[1], trip[2])
+                conn.execute(
+                    "DELETE FROM monthly_cube_dirty WHERE month = ? AND vehicle_id = ? AND employee_id = ?",
+                    (month, trip[1], trip[2] or 0),
+                )
+                conn.commit()
+            # A month that was never built is built in full on first read
+        except Exception as e:
+            conn.rollback()
+            logger.warning(f"Monthly cube update failed: {e}", extra={"trip_id": trip_id})
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def query(self, conn: sqlite3.Connection, by: Sequence[str] = ("month",),
+              first: Optional[str] = None, last: Optional[str] = None,
+              vehicle_ids: Optional[Sequence[int]] = None,
+              employee_ids: Optional[Sequence[int]] = None,
+              departments: Optional[Sequence[str]] = None,
+              today: Optional[date] = None) -> List[CubeCell]:
+        """
+        Cube totals grouped by ``by`` (any of DIMENSIONS; empty = one grand
+        total), for months [first, last] and the optional filters.
+        """
+        unknown = set(by) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown cube dimensions: {sorted(unknown)}")
+        with log_operation("cube.query", logger, by=",".join(by), first=first, last=last) as op:
+            self.refresh(conn, first, last, today)
+            layout = self.costs.layout(conn)
+            people = layout["people"]
+            department = "department" if layout["people_department"] else "NULL"
+
+            where, params = ["1 = 1"], []
+            if first is not None:
+                where.append("c.month >= ?")
+                params.append(first)
+            if last is not None:
+                where.append("c.month <= ?")
+                params.append(last)
+            for column, values in (("c.vehicle_id", vehicle_ids), ("c.employee_id", employee_ids),
+                                   ("e.department", departments)):
+                if values is not None:
+                    where.append(f"{column} IN (SELECT value FROM json_each(?))")
+                    params.append(json.dumps(list(values)))
+
+            keys = [DIMENSIONS[name] for name in by]
+            select_keys = "".join(f"{key}, " for key in keys)
+            group_by = f"GROUP BY {', '.join(keys)} ORDER BY {', '.join(keys)}" if keys else ""
+            rows = conn.execute(f"""
+                SELECT {select_keys}TOTAL(c.trips), TOTAL(c.km), TOTAL(c.litres), TOTAL(c.cost),
+                       TOTAL(c.hours), COUNT(DISTINCT c.vehicle_id),
+                       COUNT(DISTINCT NULLIF(c.employee_id, 0))
+                FROM monthly_cube c
+                LEFT JOIN (SELECT id, {department} AS department FROM {people}) e ON e.id = c.employee_id
+                WHERE {' AND '.join(where)}
+                {group_by}
+            """, params).fetchall()
+            op["rows"] = len(rows)
+
+        width = len(keys)
+        return [
+            CubeCell(tuple(row[:width]), int(row[width]), *row[width + 1:width + 5],
+                     row[width + 5], row[width + 6])
+            for row in rows
+        ]
+
+    def monthly_overview(self, conn: sqlite3.Connection, first: str, last: str,
+                         today: Optional[date] = None) -> List[Tuple[CubeCell, Optional[CubeCell]]]:
+        """Each month of [first, last] with the same month a year earlier (None when empty)."""
+        cells = self.query(conn, ("month",), shift_month(first, -12), last, today=today)
+        by_month = {cell.key[0]: cell for cell in cells}
+        return [
+            (by_month.get(month) or CubeCell((month,), 0, 0.0, 0.0, 0.0, 0.0, 0, 0),
+             by_month.get(shift_month(month, -12)))
+            for month in months_between(first, min(last, month_key(today or date.today())))
+        ]
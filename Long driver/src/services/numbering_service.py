@@ -0,0 +1,252 @@
+"""
+Service layer for road-card (trip sheet) numbering.
+
+Numbers follow ``constants.TRIP_SHEET_NUMBERING`` (``KD/YYYY/NNNN``) and come
+from a per-year counter row in ``number_sequences``. A number is allocated
+by incrementing that row inside the caller's transaction, so the trip insert
+and the counter move together: a rollback returns the number, and a second
+desk blocks on SQLite's write lock instead of reading a stale ``MAX()``.
+"""
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from utils import db
+from utils.constants import TRIP_SHEET_NUMBERING
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS number_sequences (
+    series TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    -- The next value to hand out
+    next_value INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (series, year)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS number_blocks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    series TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    first_value INTEGER NOT NULL,
+    last_value INTEGER NOT NULL,
+    purpose TEXT,
+    reserved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_number_blocks_series_year ON number_blocks(series, year);
+"""
+
+
+@dataclass
+class NumberBlock:
+    """A contiguous range of numbers reserved in one step (e.g. for an import)."""
+    numbering: "RoadCardNumbering"
+    year: int
+    first_value: int
+    last_value: int
+
+    def __len__(self) -> int:
+        return self.last_value - self.first_value + 1
+
+    def __iter__(self) -> Iterator[str]:
+        for value in range(self.first_value, self.last_value + 1):
+            yield self.numbering.format_number(self.year, value)
+
+
+@dataclass
+class GapReport:
+    """Result of comparing the counter with the numbers actually in use."""
+    year: int
+    allocated: int
+    used: int
+    # Allocated but not found in the table
+    missing: List[int] = field(default_factory=list)
+    # Missing numbers that belong to a reserved block (expected, e.g. partial import)
+    reserved_unused: List[int] = field(default_factory=list)
+    # Numbers in the table beyond the counter (entered by hand / legacy data)
+    beyond_counter: List[int] = field(default_factory=list)
+
+    @property
+    def has_gaps(self) -> bool:
+        return bool(self.missing)
+
+
+class RoadCardNumbering:
+    """Allocates road-card numbers from a per-year counter."""
+
+    SERIES = "road_card"
+
+    def __init__(self, table: str = "trips", column: str = "trip_number"):
+        # Table/column holding issued numbers (used to seed and audit the counter)
+        self.table = table
+        self.column = column
+        self.prefix = TRIP_SHEET_NUMBERING['PREFIX']
+        self.separator = TRIP_SHEET_NUMBERING['SEPARATOR']
+        self.year_digits = TRIP_SHEET_NUMBERING['YEAR_DIGITS']
+        self.sequence_digits = TRIP_SHEET_NUMBERING['SEQUENCE_DIGITS']
+
+    @staticmethod
+    def ensure_schema(conn: sqlite3.Connection):
+        """Creates the counter tables if they do not exist."""
+        db.execute_schema(conn, SCHEMA)
+
+    # ------------------------------------------------------------------
+    # Format
+    # ------------------------------------------------------------------
+
+    def year_prefix(self, year: int) -> str:
+        return f"{self.prefix}{self.separator}{year:0{self.year_digits}d}{self.separator}"
+
+    def format_number(self, year: int, value: int) -> str:
+        return f"{self.year_prefix(year)}{value:0{self.sequence_digits}d}"
+
+    def parse_number(self, number: str) -> Optional[Tuple[int, int]]:
+        """Returns ``(year, value)`` or None if the text is not in our format."""
+        parts = (number or "").split(self.separator)
+        if len(parts) != 3 or parts[0] != self.prefix:
+            return None
+        try:
+            return int(parts[1]), int(parts[2])
+        except ValueError:
+            return None
+
+    # ------------------------------------------------------------------
+    # Allocation
+    # ------------------------------------------------------------------
+
+    def allocate(self, conn: sqlite3.Connection, year: Optional[int] = None) -> str:
+        """
+        Allocates the next number inside the caller's (uncommitted) transaction.
+
+        The caller commits together with the row that uses the number.
+        """
+        year = year or datetime.now().year
+        first = self._advance(conn, year, 1)
+        return self.format_number(year, first)
+
+    def reserve_block(self, conn: sqlite3.Connection, count: int,
+                      year: Optional[int] = None, purpose: Optional[str] = None) -> NumberBlock:
+        """
+        Reserves ``count`` consecutive numbers with a single counter update.
+
+        Intended for batch imports: one write-lock round trip instead of one per
+        row. Unused numbers of the block show up as ``reserved_unused`` in the audit.
+        """
+        if count < 1:
+            raise ValueError("Block size must be positive.")
+        year = year or datetime.now().year
+        first = self._advance(conn, year, count)
+        last = first + count - 1
+        conn.execute(
+            """
+            INSERT INTO number_blocks (series, year, first_value, last_value, purpose)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (self.SERIES, year, first, last, purpose),
+        )
+        return NumberBlock(self, year, first, last)
+
+    def _advance(self, conn: sqlite3.Connection, year: int, count: int) -> int:
+        """Moves the counter by ``count`` and returns the first value handed out."""
+        try:
+            return self._advance_counter(conn, year, count)
+        except sqlite3.OperationalError as e:
+            if "no such table" not in str(e):
+                raise
+            self.ensure_schema(conn)
+            return self._advance_counter(conn, year, count)
+
+    def _advance_counter(self, conn: sqlite3.Connection, year: int, count: int) -> int:
+        cursor = conn.cursor()
+        # The UPDATE takes the write lock first; concurrent desks queue up behind it
+        cursor.execute(
+            "UPDATE number_sequences SET next_value = next_value + ? WHERE series = ? AND year = ?",
+            (count, self.SERIES, year),
+        )
+        if cursor.rowcount == 0:
+            start = self._highest_issued(cursor, year) + 1
+            cursor.execute(
+                "INSERT INTO number_sequences (series, year, next_value) VALUES (?, ?, ?)",
+                (self.SERIES, year, start + count),
+            )
+            return start
+        cursor.execute(
+            "SELECT next_value FROM number_sequences WHERE series = ? AND year = ?",
+            (self.SERIES, year),
+        )
+        return cursor.fetchone()[0] - count
+
+    def _highest_issued(self, cursor: sqlite3.Cursor, year: int) -> int:
+        """
+        Highest number already stored for the year (seeds a new counter row once).
+
+        Walks the UNIQUE index backwards within the year prefix - no table scan.
+        """
+        prefix = self.year_prefix(year)
+        try:
+            cursor.execute(
+                f"""
+                SELECT {self.column} FROM {self.table}
+                WHERE {self.column} >= ? AND {self.column} < ?
+                ORDER BY {self.column} DESC LIMIT 1
+                """,
+                (prefix, prefix + "\uffff"),
+            )
+        except sqlite3.OperationalError:
+            return 0
+        row = cursor.fetchone()
+        parsed = self.parse_number(row[0]) if row else None
+        return parsed[1] if parsed else 0
+
+    # ------------------------------------------------------------------
+    # Audit
+    # ------------------------------------------------------------------
+
+    def audit_gaps(self, conn: sqlite3.Connection, year: int) -> GapReport:
+        """Lists allocated numbers for ``year`` that are not present in the table."""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT next_value FROM number_sequences WHERE series = ? AND year = ?",
+                (self.SERIES, year),
+            )
+            row = cursor.fetchone()
+        except sqlite3.OperationalError:
+            row = None
+        allocated = row[0] - 1 if row else 0
+
+        prefix = self.year_prefix(year)
+        cursor.execute(
+            f"SELECT {self.column} FROM {self.table} WHERE {self.column} >= ? AND {self.column} < ?",
+            (prefix, prefix + "\uffff"),
+        )
+        used = set()
+        for (number,) in cursor.fetchall():
+            parsed = self.parse_number(number)
+            if parsed and parsed[0] == year:
+                used.add(parsed[1])
+
+        missing = [value for value in range(1, allocated + 1) if value not in used]
+
+        blocks = []
+        try:
+            cursor.execute(
+                "SELECT first_value, last_value FROM number_blocks WHERE series = ? AND year = ?",
+                (self.SERIES, year),
+            )
+            blocks = cursor.fetchall()
+        except sqlite3.OperationalError:
+            pass
+        reserved_unused = [
+            value for value in missing
+            if any(first <= value <= last for first, last in blocks)
+        ]
+
+        return GapReport(
+            year=year,
+            allocated=allocated,
+            used=len(used),
+            missing=missing,
+            reserved_unused=reserved_unused,
+            beyond_counter=sorted(value for value in used if value > allocated),
+        )
@@ -0,0 +1,344 @@
+"""
+Fleet operations as plain commands, for scripts and the gate terminals.
+
+A command is a dict such as ``{"op": "checkout", "vehicle": "WA100",
+"employee": 5, "mileage": 12040, "fuel": 38}``; ``OPERATIONS`` lists the
+operations with their required and optional fields. Every operation goes
+through the service layer (KeyService, TripService, VehicleService) on a
+shared connection:
+
+* ``run`` applies one command in its own transaction,
+* ``run_batch`` applies newline-delimited JSON commands, ``group_size`` of
+  them per transaction. Each command runs under a SAVEPOINT, so a rejected
+  command is rolled back alone and the rest of its group is committed; with
+  ``atomic=True`` the first error rolls back the whole batch.
+
+Cache updates (fleet index, service schedule, monthly cube, reservations)
+run after the commit of the group, once per vehicle / trip.
+"""
+import json
+import logging
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from services.key_service import KeyService
+from services.maintenance_service import MaintenanceService
+from services.monthly_cube_service import MonthlyCubeService
+from services.reservation_service import ReservationService
+from services.trip_service import TripService
+from services.vehicle_service import VehicleService
+from utils import db, fleet_index
+from utils.app_logging import log_operation
+from utils.constants import BUSINESS_RULES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GROUP_SIZE = 100
+
+
+class CommandError(ValueError):
+    """Malformed command: unknown operation or field, missing or invalid value."""
+
+
+def _text(value: Any) -> str:
+    return str(value).strip()
+
+
+def _flag(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if str(value).strip().lower() in ("1", "true", "yes", "tak"):
+        return True
+    if str(value).strip().lower() in ("0", "false", "no", "nie", ""):
+        return False
+    raise ValueError(f"expected true/false, got {value!r}")
+
+
+# Field -> parser; "vehicle" is an id or a registration number
+FIELDS: Dict[str, Callable[[Any], Any]] = {
+    "vehicle": lambda v: v if isinstance(v, int) else _text(v),
+    "employee": int,
+    "driver": int,
+    "trip": int,
+    "key_log": int,
+    "mileage": float,
+    "fuel": float,
+    "liters": float,
+    "price": float,
+    "total": float,
+    "time": lambda v: v if isinstance(v, datetime) else datetime.fromisoformat(_text(v)),
+    "location": _text,
+    "notes": _text,
+    "route": _text,
+    "purpose": _text,
+    "force": _flag,
+}
+
+# Operation -> (required fields, optional fields)
+OPERATIONS: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "checkout": (("vehicle", "employee", "mileage", "fuel"), ("time", "location", "notes", "force")),
+    "return": (("mileage", "fuel"), ("key_log", "vehicle", "time", "location", "notes")),
+    "trip_start": (("vehicle", "driver", "route", "purpose"), ("time",)),
+    "trip_complete": (("trip", "mileage", "fuel"), ("time", "notes")),
+    "fuel": (("vehicle", "liters", "mileage"), ("price", "total", "time", "trip", "notes")),
+}
+
+# Echoed back in the result, never interpreted
+REF_FIELD = "ref"
+
+
+def _load(line: str) -> Any:
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        raise CommandError(f"Invalid JSON: {e.msg}") from None
+
+
+def parse_command(command: Union[str, Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Validates a command (dict or one JSON line) and converts its fields.
+
+    Raises CommandError.
+    """
+    if isinstance(command, str):
+        command = _load(command)
+    if not isinstance(command, dict):
+        raise CommandError("A command must be a JSON object.")
+    op = command.get("op")
+    if op not in OPERATIONS:
+        raise CommandError(f"Unknown operation: {op!r} (available: {', '.join(OPERATIONS)})")
+
+    required, optional = OPERATIONS[op]
+    unknown = set(command) - set(required) - set(optional) - {"op", REF_FIELD}
+    if unknown:
+        raise CommandError(f"Unknown field(s) for {op}: {', '.join(sorted(unknown))}")
+    missing = [name for name in required if command.get(name) in (None, "")]
+    if missing:
+        raise CommandError(f"Missing field(s) for {op}: {', '.join(missing)}")
+
+    args = {}
+    for name in required + optional:
+        value = command.get(name)
+        if value is None:
+            continue
+        try:
+            args[name] = FIELDS[name](value)
+        except (TypeError, ValueError) as e:
+            raise CommandError(f"Invalid value for {name}: {value!r} ({e})") from None
+    return op, args
+
+
+@dataclass
+class OperationResult:
+    """Outcome of one command; ``ok`` means committed."""
+    line: Optional[int]
+    op: Optional[str]
+    ok: bool
+    data: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    ref: Any = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"line": self.line, "op": self.op, "ok": self.ok}
+        if self.ref is not None:
+            result[REF_FIELD] = self.ref
+        result.update(self.data)
+        if self.error is not None:
+            result["error"] = self.error
+        return result
+
+
+# After-commit callbacks keyed by (kind, id), so a batch touching one
+# vehicle many times refreshes its caches once
+AfterCommit = Dict[Tuple[str, Any], Callable[[], Any]]
+
+
+class OperationsService:
+    """Applies fleet operations (single or batched) through the service layer."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self.keys = KeyService(db_path)
+        self.vehicles = VehicleService(db_path)
+        self.trips = TripService(db_path, self.vehicles)
+        self.maintenance = MaintenanceService(db_path)
+        self.cube = MonthlyCubeService(db_path)
+        self.reservations = ReservationService(db_path)
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Establishes a database connection."""
+        return db.connect(self.db_path)
+
+    # ------------------------------------------------------------------
+    # Running commands
+    # ------------------------------------------------------------------
+
+    def run(self, command: Union[str, Dict[str, Any]]) -> OperationResult:
+        """Applies one command in its own transaction."""
+        [result] = self._run([(None, command)], group_size=1, atomic=True)
+        return result
+
+    def run_batch(self, lines: Iterable[str], group_size: int = DEFAULT_GROUP_SIZE,
+                  atomic: bool = False) -> Iterator[OperationResult]:
+        """
+        Applies newline-delimited JSON commands (blank lines and lines
+        starting with # are skipped). Results are yielded after the commit
+        (or rollback) of their group, in input order.
+        """
+        numbered = ((number, line.strip()) for number, line in enumerate(lines, 1))
+        return self._run(((number, text) for number, text in numbered if text and not text.startswith("#")),
+                         group_size, atomic)
+
+    def _run(self, commands: Iterable[Tuple[Optional[int], Union[str, Dict[str, Any]]]],
+             group_size: int, atomic: bool) -> Iterator[OperationResult]:
+        # Reservations are read on their own connection - load them (and
+        # create their table) before this connection takes the write lock
+        self.reservations.sync()
+        conn = self.get_connection()
+        pending: List[OperationResult] = []
+        after: AfterCommit = {}
+        try:
+            for line, command in commands:
+                if not conn.in_transaction:
+                    conn.execute("BEGIN IMMEDIATE")
+                result = self._apply_one(conn, line, command, after)
+                pending.append(result)
+                if atomic and not result.ok:
+                    conn.rollback()
+                    for earlier in pending[:-1]:
+                        earlier.ok, earlier.error = False, "rolled back (atomic batch)"
+                    yield from pending
+                    return
+                if not atomic and len(pending) >= group_size:
+                    yield from self._commit(conn, pending, after)
+                    pending, after = [], {}
+            yield from self._commit(conn, pending, after)
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.close()
+
+    def _apply_one(self, conn: sqlite3.Connection, line: Optional[int],
+                   command: Union[str, Dict[str, Any]], after: AfterCommit) -> OperationResult:
+        ref = op = None
+        conn.execute("SAVEPOINT operation")
+        try:
+            if isinstance(command, str):
+                command = _load(command)
+            if isinstance(command, dict):
+                ref, op = command.get(REF_FIELD), command.get("op")
+            op, args = parse_command(command)
+            own_after: AfterCommit = {}
+            data = getattr(self, f"_{op}")(conn, args, own_after)
+            conn.execute("RELEASE operation")
+        except (ValueError, sqlite3.Error) as e:
+            conn.execute("ROLLBACK TO operation")
+            conn.execute("RELEASE operation")
+            return OperationResult(line, op, False, error=str(e), ref=ref)
+        after.update(own_after)
+        return OperationResult(line, op, True, data, ref=ref)
+
+    def _commit(self, conn: sqlite3.Connection, pending: List[OperationResult],
+                after: AfterCommit) -> List[OperationResult]:
+        if not pending:
+            return []
+        with log_operation("operations.commit", logger, commands=len(pending)) as op:
+            conn.commit()
+            op["failed"] = sum(1 for result in pending if not result.ok)
+        for (kind, key), callback in after.items():
+            try:
+                callback()
+            except Exception as e:
+                # Caches fall back to re-reading the database
+                logger.warning(f"After-commit update {kind} failed: {e}", extra={"key": key})
+        return pending
+
+    # ------------------------------------------------------------------
+    # Operations
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _vehicle_id(conn: sqlite3.Connection, value: Union[int, str]) -> int:
+        """Vehicle id from an id or a registration number."""
+        if isinstance(value, int) or value.isdigit():
+            return int(value)
+        row = conn.execute(
+            "SELECT id FROM vehicles WHERE UPPER(REPLACE(registration_number, ' ', '')) = ?",
+            (value.replace(" ", "").upper(),),
+        ).fetchone()
+        if not row:
+            raise ValueError(f"Vehicle {value!r} not found.")
+        return row[0]
+
+    def _touch(self, conn: sqlite3.Connection, after: AfterCommit, vehicle_id: int):
+        """Re-reads the vehicle into the fleet index after the commit (once per group)."""
+        after[("fleet_index", vehicle_id)] = lambda: fleet_index.refresh(self.db_path, conn, vehicle_id)
+
+    def _checkout(self, conn: sqlite3.Connection, args: Dict[str, Any], after: AfterCommit) -> Dict[str, Any]:
+        vehicle_id = self._vehicle_id(conn, args["vehicle"])
+        employee_id = args["employee"]
+        checkout_time = args.get("time") or datetime.now()
+
+        horizon = checkout_time + timedelta(hours=BUSINESS_RULES['RESERVATION_LOOKAHEAD_HOURS'])
+        bookings = self.reservations.conflicts(vehicle_id, checkout_time, horizon)
+        own = next((r for r in bookings if r.employee_id == employee_id and r.status == "active"), None)
+        others = [r for r in bookings if r.employee_id != employee_id]
+        if others and not args.get("force"):
+            raise ValueError(
+                f"Vehicle {vehicle_id} is reserved for another employee from "
+                f"{others[0].start_time:%Y-%m-%d %H:%M} (use force to override)."
+            )
+
+        key_log_id = self.keys.checkout(conn, vehicle_id, employee_id, args["mileage"], args["fuel"],
+                                        checkout_time, args.get("location", ""), args.get("notes", ""))
+        self._touch(conn, after, vehicle_id)
+        if own is not None:
+            after[("reservation", own.id)] = lambda: self.reservations.mark_picked_up(own.id)
+        return {"key_log_id": key_log_id, "vehicle_id": vehicle_id,
+                "reservation_id": own.id if own is not None else None}
+
+    def _return(self, conn: sqlite3.Connection, args: Dict[str, Any], after: AfterCommit) -> Dict[str, Any]:
+        key_log_id = args.get("key_log")
+        if key_log_id is None:
+            if "vehicle" not in args:
+                raise CommandError("Missing field(s) for return: key_log or vehicle")
+            vehicle = self._vehicle_id(conn, args["vehicle"])
+            key_log_id = self.keys.active_key(conn, vehicle)
+            if key_log_id is None:
+                raise ValueError(f"Vehicle {vehicle} has no issued key.")
+
+        vehicle_id = self.keys.return_key(conn, key_log_id, args["mileage"], args["fuel"],
+                                          args.get("time"), args.get("location", ""), args.get("notes", ""))
+        self._touch(conn, after, vehicle_id)
+        # New mileage - the vehicle's service schedule changes
+        after[("maintenance", vehicle_id)] = lambda: self.maintenance.on_trip_completed(vehicle_id)
+        return {"key_log_id": key_log_id, "vehicle_id": vehicle_id}
+
+    def _trip_start(self, conn: sqlite3.Connection, args: Dict[str, Any], after: AfterCommit) -> Dict[str, Any]:
+        vehicle_id = self._vehicle_id(conn, args["vehicle"])
+        trip_id, trip_number = self.trips.start(conn, vehicle_id, args["driver"], args["route"],
+                                                     args["purpose"], args.get("time"))
+        self._touch(conn, after, vehicle_id)
+        return {"trip_id": trip_id, "vehicle_id": vehicle_id, "trip_number": trip_number}
+
+    def _trip_complete(self, conn: sqlite3.Connection, args: Dict[str, Any],
+                       after: AfterCommit) -> Dict[str, Any]:
+        trip_id = args["trip"]
+        vehicle_id, distance = self.trips.complete(conn, trip_id, args["mileage"], args["fuel"],
+                                                   args.get("notes"), args.get("time"))
+        self._touch(conn, after, vehicle_id)
+        after[("maintenance", vehicle_id)] = lambda: self.maintenance.on_trip_completed(vehicle_id)
+        after[("cube", trip_id)] = lambda: self.cube.on_trip_completed(trip_id)
+        return {"trip_id": trip_id, "vehicle_id": vehicle_id, "distance": distance}
+
+    def _fuel(self, conn: sqlite3.Connection, args: Dict[str, Any], after: AfterCommit) -> Dict[str, Any]:
+        vehicle_id = self._vehicle_id(conn, args["vehicle"])
+        fueling_log_id, fuel_level = self.vehicles.record_fueling(
+            conn, vehicle_id, args["liters"], args["mileage"], args.get("time"),
+            args.get("price"), args.get("total"), args.get("trip"), args.get("notes"),
+        )
+        self._touch(conn, after, vehicle_id)
+        return {"fueling_log_id": fueling_log_id, "vehicle_id": vehicle_id, "fuel": fuel_level}
@@ -5,22 +5,19 @@ Generator PDF dla karty drogowej SM-102
 import logging
 from datetime import datetime
 from pathlib import Path
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.units import cm
-from reportlab.pdfgen import canvas
-import qrcode
 from io import BytesIO
 
-from src.models.trip_sheet import TripSheet
-from src.models.vehicle import Vehicle
-from src.models.employee import Employee
+from models.trip_sheet import TripSheet
+from models.vehicle import Vehicle
+from models.employee import Employee
+from utils.app_logging import log_operation
 
 class PDFService:
     """Usługa generowania dokumentów PDF"""
     
+    # ReportLab i qrcode są importowane dopiero przy generowaniu dokumentu,
+    # żeby samo otwarcie zakładki nie ładowało ciężkich bibliotek.
+
     def __init__(self, config):
         self.config = config
         self.logger = logging.getLogger(__name__)
@@ -29,7 +26,16 @@ class PDFService:
     
     def generate_trip_sheet_pdf(self, trip_sheet: TripSheet, vehicle: Vehicle, 
                                employee: Employee, trips: list) -> str:
-        """Generuje kartę drogową SM-102 w formacie PDF"""
+        """
+        Generuje kartę drogową SM-102 w formacie PDF.
+
+        Podsumowanie pochodzi z sum zapisanych na karcie (TripSheetService),
+        ``trips`` to wiersze tabeli przejazdów (TripSheetLine).
+        """
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.platypus import SimpleDocTemplate, Spacer
+        from reportlab.lib.units import cm
         
         # Utwórz nazwę pliku
         filename = f"karta_drogowa_{trip_sheet.sheet_number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
@@ -65,7 +71,7 @@ class PDFService:
         story.append(Spacer(1, 0.5*cm))
         
         # Podsumowanie
-        story.append(self.create_summary_table(trips, vehicle, styles))
+        story.append(self.create_summary_table(trip_sheet, vehicle, styles))
         story.append(Spacer(1, 1*cm))
         
         # Podpisy
@@ -75,13 +81,19 @@ class PDFService:
         story.append(self.create_footer(trip_sheet, styles))
         
         # Generuj PDF
-        doc.build(story)
+        with log_operation("pdf.trip_sheet", self.logger,
+                           sheet_number=trip_sheet.sheet_number, path=str(filepath)) as op:
+            doc.build(story)
+            op["rows"] = len(trips)
         
         self.logger.info(f"Wygenerowano kartę drogową PDF: {filepath}")
         return str(filepath)
     
     def add_custom_styles(self, styles):
         """Dodaje niestandardowe style do dokumentu"""
+        from reportlab.lib import colors
+        from reportlab.lib.styles import ParagraphStyle
+
         # Styl dla nagłówka
         styles.add(ParagraphStyle(
             name='CustomTitle',
@@ -110,6 +122,8 @@ class PDFService:
     
     def create_header(self, styles):
         """Tworzy nagłówek dokumentu"""
+        from reportlab.platypus import Paragraph
+
         header_elements = []
         
         # Tytuł
@@ -135,12 +149,16 @@ class PDFService:
     
     def create_basic_info_table(self, trip_sheet, vehicle, employee, styles):
         """Tworzy tabelę z informacjami podstawowymi"""
+        from reportlab.lib import colors
+        from reportlab.lib.units import cm
+        from reportlab.platypus import Table, TableStyle
+
         data = [
             ["Numer karty:", trip_sheet.sheet_number, "Data:", trip_sheet.date.strftime('%d.%m.%Y')],
             ["Pojazd:", f"{vehicle.registration_number} ({vehicle.brand} {vehicle.model})", 
              "Paliwo:", vehicle.fuel_type],
-            ["Pracownik:", f"{employee.first_name} {employee.last_name}", 
-             "Stanowisko:", employee.position],
+            ["Pracownik:", f"{employee.first_name} {employee.last_name}" if employee else "-",
+             "Stanowisko:", (employee.position if employee else "") or "-"],
             ["Przebieg początkowy:", f"{trip_sheet.start_mileage:.1f} km", 
              "Status:", self.get_polish_status(trip_sheet.status)]
         ]
@@ -162,6 +180,10 @@ class PDFService:
     
     def create_trips_table(self, trips, styles):
         """Tworzy tabelę przejazdów"""
+        from reportlab.lib import colors
+        from reportlab.lib.units import cm
+        from reportlab.platypus import Table, TableStyle
+
         # Nagłówki kolumn
         headers = ["Lp.", "Godzina rozpoczęcia", "Godzina zakończenia", 
                   "Miejsce rozpoczęcia", "Miejsce zakończenia", "Cel przejazdu", "Uwagi"]
@@ -172,8 +194,8 @@ class PDFService:
         for i, trip in enumerate(trips, 1):
             row = [
                 str(i),
-                trip.start_time.strftime('%H:%M'),
-                trip.end_time.strftime('%H:%M'),
+                trip.start_time.strftime('%H:%M') if trip.start_time else "-",
+                trip.end_time.strftime('%H:%M') if trip.end_time else "-",
                 trip.from_location,
                 trip.to_location,
                 trip.purpose,
@@ -208,17 +230,22 @@ class PDFService:
         table.setStyle(table_style)
         return table
     
-    def create_summary_table(self, trips, vehicle, styles):
-        """Tworzy tabelę podsumowującą"""
-        # Oblicz sumaryczne wartości
-        total_distance = sum(trip.distance for trip in trips if trip.distance)
-        fuel_used = vehicle.calculate_fuel_usage(total_distance)
-        
+    def create_summary_table(self, trip_sheet, vehicle, styles):
+        """Tworzy tabelę podsumowującą (sumy narastające karty - bez przeliczania przejazdów)"""
+        from reportlab.lib import colors
+        from reportlab.lib.units import cm
+        from reportlab.platypus import Table, TableStyle
+
+        average = trip_sheet.total_fuel / trip_sheet.total_km * 100 if trip_sheet.total_km else 0
+        end_mileage = trip_sheet.end_mileage if trip_sheet.end_mileage is not None else trip_sheet.start_mileage
+        closed = trip_sheet.closed_at.strftime('%d.%m.%Y') if trip_sheet.closed_at else "-"
+
         data = [
             ["PODSUMOWANIE:", "", "", ""],
-            ["Łączna odległość:", f"{total_distance:.1f} km", "Średnie spalanie:", f"{vehicle.fuel_consumption} l/100km"],
-            ["Zużyte paliwo:", f"{fuel_used:.2f} l", "Typ paliwa:", vehicle.fuel_type],
-            ["Przebieg końcowy:", f"{vehicle.current_mileage:.1f} km", "Data zamknięcia:", datetime.now().strftime('%d.%m.%Y')]
+            ["Łączna odległość:", f"{trip_sheet.total_km:.1f} km", "Średnie spalanie:", f"{average:.1f} l/100km"],
+            ["Zużyte paliwo:", f"{trip_sheet.total_fuel:.2f} l", "Typ paliwa:", vehicle.fuel_type],
+            ["Koszt paliwa:", f"{trip_sheet.total_cost:.2f} zł", "Liczba przejazdów:", str(trip_sheet.trips_count)],
+            ["Przebieg końcowy:", f"{end_mileage:.1f} km", "Data zamknięcia:", closed]
         ]
         
         table = Table(data, colWidths=[4*cm, 4*cm, 4*cm, 4*cm])
@@ -243,6 +270,10 @@ class PDFService:
     
     def create_signature_section(self, styles):
         """Tworzy sekcję podpisów"""
+        from reportlab.lib import colors
+        from reportlab.lib.units import cm
+        from reportlab.platypus import Table, TableStyle
+
         data = [
             ["", "", ""],
             ["Podpis pracownika:", "Podpis kierownika:", "Data odbioru:"],
@@ -274,6 +305,10 @@ class PDFService:
     
     def create_footer(self, trip_sheet, styles):
         """Tworzy stopkę z kodem QR"""
+        import qrcode
+        from reportlab.lib.units import cm
+        from reportlab.platypus import Table, TableStyle, Image
+
         # Generuj kod QR z numerem karty
         qr_data = f"KARTA_DROGOWA:{trip_sheet.sheet_number}:{trip_sheet.date.strftime('%Y%m%d')}"
         
@@ -292,18 +327,14 @@ class PDFService:
         qr_img.save(qr_buffer, format='PNG')
         qr_buffer.seek(0)
         
-        # Utwórz element z kodem QR
+        # Kod QR w komórce tabeli (odczytywany skanerem w trybie kiosku)
+        qr_image = Image(qr_buffer, width=3*cm, height=3*cm)
         qr_table_data = [
-            ["Kod QR karty drogowej:", ""],
-            ["", ""]
+            ["Kod QR karty drogowej:", qr_image],
         ]
         
         qr_table = Table(qr_table_data, colWidths=[10*cm, 6*cm])
         
-        # Dodaj kod QR do komórki tabeli
-        from reportlab.platypus import Image
-        qr_image = Image(qr_buffer, width=3*cm, height=3*cm)
-        
         table_style = TableStyle([
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
             ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
@@ -312,10 +343,6 @@ class PDFService:
         
         qr_table.setStyle(table_style)
         
-        # Ustaw obraz w komórce
-        qr_table._argW[1] = 3*cm
-        qr_table._argH[0] = 3*cm
-        
         return qr_table
     
     def get_polish_status(self, status: str) -> str:
@@ -0,0 +1,298 @@
+"""
+Result cache for ReportsWindow.
+
+A report result is cached under (report type, date range, options). Two
+tiers are used: an in-memory LRU for preview -> tweak -> export within one
+session, and the ``report_cache`` table, so a closed month is still cached
+after a restart.
+
+``PRAGMA data_version`` only tells one connection that *another* connection
+wrote, and it is not persisted, so it cannot version a result stored on
+disk. Triggers on the report source tables append to ``report_changes``
+instead; its sequence number is the change counter stored with each
+result. On a lookup the entry is still valid when no change since its
+sequence touches it:
+
+- dated sources (trips, key logs, services, fills) log the day of the
+  changed row, and only changes inside the report's range count;
+- inserts, deletes and renames of vehicles / employees log a ``dimension``
+  change, which invalidates every report;
+- any other vehicle / employee update (status, mileage, ...) logs a
+  ``state`` change, which only invalidates snapshot reports such as
+  "Przegląd ogólny" (``scope="snapshot"``).
+"""
+import hashlib
+import json
+import logging
+import pickle
+import sqlite3
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Callable, Dict, Optional, Set
+
+from utils import db
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    -- fact / dimension / state
+    kind TEXT NOT NULL,
+    -- Day of the changed row (facts only)
+    day TEXT
+);
+
+CREATE TABLE IF NOT EXISTS report_cache (
+    key TEXT PRIMARY KEY,
+    report_type TEXT NOT NULL,
+    date_from TEXT,
+    date_to TEXT,
+    scope TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# Dated report sources: table -> candidate date columns (first existing wins)
+FACT_TABLES = {
+    "trips": ("start_date", "start_time"),
+    "key_log": ("checkout_time",),
+    "key_logs": ("checkout_date",),
+    "service_history": ("service_date",),
+    "fueling_logs": ("fueling_time",),
+}
+
+# Dimension tables: table -> columns whose change alters report contents
+DIMENSION_TABLES = {
+    "vehicles": ("registration_number", "brand", "model"),
+    "employees": ("first_name", "last_name", "position", "department", "is_active"),
+    "drivers": ("first_name", "last_name"),
+    # "Harmonogram serwisów" - rule changes only invalidate snapshot reports
+    "service_rules": (),
+}
+
+SCOPE_RANGE = "range"
+SCOPE_SNAPSHOT = "snapshot"
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+
+
+@dataclass
+class _Entry:
+    seq: int
+    date_from: Optional[str]
+    date_to: Optional[str]
+    scope: str
+    data: Dict[str, Any]
+
+
+def _trigger_sql(conn: sqlite3.Connection) -> list:
+    """CREATE TRIGGER statements for the source tables present in the database."""
+    statements = []
+    for table, candidates in FACT_TABLES.items():
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        column = next((c for c in candidates if c in columns), None)
+        if column is None:
+            continue
+        for event, rows in (("INSERT", ("NEW",)), ("DELETE", ("OLD",)), ("UPDATE", ("OLD", "NEW"))):
+            inserts = " ".join(
+                f"INSERT INTO report_changes (table_name, kind, day) "
+                f"VALUES ('{table}', 'fact', date({row}.{column}));"
+                for row in rows
+            )
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS report_changes_{table}_{event.lower()} "
+                f"AFTER {event} ON {table} BEGIN {inserts} END"
+            )
+    for table, descriptive in DIMENSION_TABLES.items():
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if not columns:
+            continue
+        watched = ", ".join(c for c in descriptive if c in columns)
+        events = [("insert", "INSERT", "dimension"), ("delete", "DELETE", "dimension"),
+                  ("update", "UPDATE", "state")]
+        if watched:
+            events.append(("rename", f"UPDATE OF {watched}", "dimension"))
+        for name, event, kind in events:
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS report_changes_{table}_{name} AFTER {event} ON {table} "
+                f"BEGIN INSERT INTO report_changes (table_name, kind) VALUES ('{table}', '{kind}'); END"
+            )
+    return statements
+
+
+class ReportCache:
+    """Two-tier (memory LRU + database) cache of report results."""
+
+    def __init__(self, max_memory: int = 32, max_disk: int = 200):
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+        self.stats = CacheStats()
+        self._memory: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._installed: Set[str] = set()
+
+    @staticmethod
+    def ensure_schema(conn: sqlite3.Connection):
+        """Creates the cache tables and the change triggers of the source tables present."""
+        db.execute_schema(conn, SCHEMA)
+        for statement in _trigger_sql(conn):
+            conn.execute(statement)
+
+    def _install(self, conn: sqlite3.Connection, force: bool = False):
+        """ensure_schema once per database file (lookups open a new connection each time)."""
+        path = next((row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main"), "")
+        if force or path not in self._installed:
+            self.ensure_schema(conn)
+            conn.commit()
+            self._installed.add(path)
+
+    @staticmethod
+    def make_key(report_type: str, date_from: Optional[str], date_to: Optional[str],
+                 options: Optional[Dict[str, Any]] = None) -> str:
+        raw = json.dumps([report_type, date_from, date_to, options or {}], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def current_seq(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM report_changes").fetchone()[0]
+
+    @staticmethod
+    def _is_valid(conn: sqlite3.Connection, entry: _Entry, seq: int) -> bool:
+        """No change since the entry's sequence touches its range / scope."""
+        if entry.seq == seq:
+            return True
+        # Counter went back: the database was replaced (reset, restored backup)
+        if entry.scope == SCOPE_SNAPSHOT or seq < entry.seq:
+            return False
+        if entry.date_from is None or entry.date_to is None:
+            touching, params = "kind IN ('fact', 'dimension')", [entry.seq]
+        else:
+            touching = "kind = 'dimension' OR (kind = 'fact' AND (day IS NULL OR day BETWEEN ? AND ?))"
+            params = [entry.seq, entry.date_from, entry.date_to]
+        row = conn.execute(
+            f"SELECT 1 FROM report_changes WHERE seq > ? AND ({touching}) LIMIT 1", params
+        ).fetchone()
+        return row is None
+
+    def get(self, conn: sqlite3.Connection, report_type: str, date_from: Optional[str],
+            date_to: Optional[str], compute: Callable[[], Dict[str, Any]],
+            options: Optional[Dict[str, Any]] = None, scope: str = SCOPE_RANGE,
+            watch_from: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Cached result of ``compute()``; a shallow copy, so the caller may add
+        keys (period, generated date) without touching the cache.
+
+        ``watch_from`` widens the range whose changes invalidate the result
+        (e.g. the year-earlier months of a year-over-year report).
+        """
+        self._install(conn)
+        if scope == SCOPE_SNAPSHOT:
+            # Snapshots also depend on "today" (overdue returns, service due dates)
+            options = {**(options or {}), "today": date.today().isoformat()}
+        key = self.make_key(report_type, date_from, date_to, options)
+        try:
+            seq = self.current_seq(conn)
+        except sqlite3.OperationalError as e:
+            if "no such table" not in str(e):
+                raise
+            # The database was reset since the install: tables and triggers again
+            self._install(conn, force=True)
+            seq = self.current_seq(conn)
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            if self._is_valid(conn, entry, seq):
+                entry.seq = seq
+                self._memory.move_to_end(key)
+                self.stats.memory_hits += 1
+                return dict(entry.data)
+            self._drop(conn, key)
+
+        row = conn.execute(
+            "SELECT seq, date_from, date_to, scope, data FROM report_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None:
+            try:
+                entry = _Entry(row[0], row[1], row[2], row[3], pickle.loads(row[4]))
+            except Exception as e:
+                logger.warning(f"Unreadable cached report dropped: {e}", extra={"report_type": report_type})
+                entry = None
+            if entry is not None and self._is_valid(conn, entry, seq):
+                entry.seq = seq
+                conn.execute("UPDATE report_cache SET seq = ?, used_at = CURRENT_TIMESTAMP WHERE key = ?",
+                             (seq, key))
+                conn.commit()
+                self._remember(key, entry)
+                self.stats.disk_hits += 1
+                return dict(entry.data)
+            self._drop(conn, key)
+
+        self.stats.misses += 1
+        data = compute()
+        entry = _Entry(seq, min(filter(None, (watch_from, date_from)), default=None), date_to, scope, data)
+        self._remember(key, entry)
+        self._store(conn, key, report_type, entry)
+        return dict(data)
+
+    def _remember(self, key: str, entry: _Entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+    def _store(self, conn: sqlite3.Connection, key: str, report_type: str, entry: _Entry):
+        try:
+            blob = pickle.dumps(entry.data, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            # Still cached in memory for this session
+            logger.warning(f"Report result not cached on disk: {e}", extra={"report_type": report_type})
+            return
+        conn.execute(
+            "INSERT OR REPLACE INTO report_cache (key, report_type, date_from, date_to, scope, seq, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, report_type, entry.date_from, entry.date_to, entry.scope, entry.seq, blob),
+        )
+        self.prune(conn)
+        conn.commit()
+
+    def _drop(self, conn: sqlite3.Connection, key: str):
+        self.stats.invalidations += 1
+        self._memory.pop(key, None)
+        conn.execute("DELETE FROM report_cache WHERE key = ?", (key,))
+        conn.commit()
+
+    def prune(self, conn: sqlite3.Connection):
+        """Keeps the most recently used disk entries and the change log they still need."""
+        conn.execute("""
+            DELETE FROM report_cache WHERE key NOT IN (
+                SELECT key FROM report_cache ORDER BY used_at DESC, seq DESC LIMIT ?
+            )
+        """, (self.max_disk,))
+        oldest = conn.execute("SELECT MIN(seq) FROM report_cache").fetchone()[0]
+        if oldest is None:
+            oldest = self.current_seq(conn)
+        for key in [k for k, e in self._memory.items() if e.seq < oldest]:
+            del self._memory[key]
+        # AUTOINCREMENT: sequence numbers are not reused after rows are deleted
+        conn.execute("DELETE FROM report_changes WHERE seq < ?", (oldest,))
+
+    def clear(self, conn: sqlite3.Connection):
+        self._memory.clear()
+        conn.execute("DELETE FROM report_cache")
+        conn.commit()
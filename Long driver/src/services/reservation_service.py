@@ -0,0 +1,354 @@
+"""
+Service layer for vehicle reservations (bookings for future dates).
+
+Reservations live in the ``reservations`` table of ``fleet.db``. Queries are
+answered from an in-memory ``ReservationIndex``: per vehicle, the bookings
+are kept as parallel lists of start and end times sorted by start. A
+vehicle's bookings never overlap, so both lists are sorted and an interval
+query is two bisections - "which vehicles are free Tuesday 8-16" costs
+O(V log n) without touching the database.
+
+The index is rebuilt when the change counter of the ``reservations`` table
+(``db.track_changes``, bumped by triggers) moves, i.e. another connection -
+another window or desk - wrote reservations; commits to other tables do not
+count. Writes made through the service update the index in place and take
+over the counter when nobody else wrote in between.
+Conflicts are checked in SQL inside the writing transaction, after the
+INSERT has taken the write lock, so two desks cannot book the same slot.
+"""
+import logging
+import sqlite3
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from models.reservation import Reservation, reservation_from_row
+from utils import db
+from utils.app_logging import log_operation
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reservations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    vehicle_id INTEGER NOT NULL REFERENCES vehicles(id) ON DELETE CASCADE,
+    employee_id INTEGER REFERENCES employees(id),
+    start_time TIMESTAMP NOT NULL,
+    end_time TIMESTAMP NOT NULL,
+    purpose TEXT,
+    status TEXT NOT NULL DEFAULT 'active',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CHECK (end_time > start_time)
+);
+CREATE INDEX IF NOT EXISTS idx_reservations_vehicle_time
+    ON reservations(vehicle_id, start_time, end_time);
+CREATE INDEX IF NOT EXISTS idx_reservations_time ON reservations(start_time, end_time)
+"""
+
+RESERVATION_STATUSES = ("active", "picked_up", "cancelled")
+# Statuses that keep the slot booked
+BLOCKING_STATUSES = ("active", "picked_up")
+BLOCKING_SQL = "status IN ('active', 'picked_up')"
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _ts(value: datetime) -> str:
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+class ReservationConflict(ValueError):
+    """The requested interval overlaps existing bookings of the vehicle."""
+
+    def __init__(self, vehicle_id: int, conflicts: List[Reservation]):
+        self.vehicle_id = vehicle_id
+        self.conflicts = conflicts
+        spans = ", ".join(
+            f"{r.start_time:%Y-%m-%d %H:%M}-{r.end_time:%H:%M}" for r in conflicts
+        )
+        super().__init__(f"Vehicle {vehicle_id} is already reserved: {spans}")
+
+
+@dataclass
+class _VehicleBookings:
+    """Bookings of one vehicle, sorted by start (and therefore by end)."""
+    starts: List[datetime] = field(default_factory=list)
+    ends: List[datetime] = field(default_factory=list)
+    ids: List[int] = field(default_factory=list)
+
+    def span(self, start: datetime, end: datetime) -> Tuple[int, int]:
+        """Positions [lo, hi) of the bookings overlapping [start, end)."""
+        return bisect_right(self.ends, start), bisect_left(self.starts, end)
+
+
+class ReservationIndex:
+    """Sorted-endpoint index of the blocking reservations of the whole fleet."""
+
+    def __init__(self):
+        self._vehicles: Dict[int, _VehicleBookings] = {}
+        self._by_id: Dict[int, Reservation] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, reservation_id: int) -> bool:
+        return reservation_id in self._by_id
+
+    def clear(self):
+        self._vehicles.clear()
+        self._by_id.clear()
+
+    def add(self, reservation: Reservation):
+        bookings = self._vehicles.setdefault(reservation.vehicle_id, _VehicleBookings())
+        position = bisect_left(bookings.starts, reservation.start_time)
+        bookings.starts.insert(position, reservation.start_time)
+        bookings.ends.insert(position, reservation.end_time)
+        bookings.ids.insert(position, reservation.id)
+        self._by_id[reservation.id] = reservation
+
+    def remove(self, reservation_id: int) -> Optional[Reservation]:
+        reservation = self._by_id.pop(reservation_id, None)
+        if reservation is None:
+            return None
+        bookings = self._vehicles[reservation.vehicle_id]
+        position = bookings.ids.index(
+            reservation_id, bisect_left(bookings.starts, reservation.start_time)
+        )
+        del bookings.starts[position], bookings.ends[position], bookings.ids[position]
+        if not bookings.ids:
+            del self._vehicles[reservation.vehicle_id]
+        return reservation
+
+    def get(self, reservation_id: int) -> Optional[Reservation]:
+        return self._by_id.get(reservation_id)
+
+    def overlapping(self, vehicle_id: int, start: datetime, end: datetime) -> List[Reservation]:
+        bookings = self._vehicles.get(vehicle_id)
+        if bookings is None:
+            return []
+        lo, hi = bookings.span(start, end)
+        return [self._by_id[i] for i in bookings.ids[lo:hi]]
+
+    def is_free(self, vehicle_id: int, start: datetime, end: datetime) -> bool:
+        bookings = self._vehicles.get(vehicle_id)
+        if bookings is None:
+            return True
+        lo, hi = bookings.span(start, end)
+        return lo >= hi
+
+    def reserved_vehicle_ids(self, start: datetime, end: datetime) -> Set[int]:
+        reserved = set()
+        for vehicle_id, bookings in self._vehicles.items():
+            lo, hi = bookings.span(start, end)
+            if lo < hi:
+                reserved.add(vehicle_id)
+        return reserved
+
+    def in_range(self, start: datetime, end: datetime) -> Dict[int, List[Reservation]]:
+        """Bookings overlapping [start, end), grouped by vehicle."""
+        result = {}
+        for vehicle_id, bookings in self._vehicles.items():
+            lo, hi = bookings.span(start, end)
+            if lo < hi:
+                result[vehicle_id] = [self._by_id[i] for i in bookings.ids[lo:hi]]
+        return result
+
+    def next_after(self, vehicle_id: int, moment: datetime) -> Optional[Reservation]:
+        """The booking in progress at ``moment`` or the first one after it."""
+        bookings = self._vehicles.get(vehicle_id)
+        if bookings is None:
+            return None
+        position = bisect_right(bookings.ends, moment)
+        if position == len(bookings.ids):
+            return None
+        return self._by_id[bookings.ids[position]]
+
+    def free_slots(self, vehicle_id: int, start: datetime, end: datetime,
+                   min_length: timedelta = timedelta(0)) -> List[Tuple[datetime, datetime]]:
+        """Gaps of at least ``min_length`` between the bookings inside [start, end)."""
+        slots = []
+        cursor = start
+        for reservation in self.overlapping(vehicle_id, start, end):
+            if reservation.start_time - cursor >= max(min_length, timedelta.resolution):
+                slots.append((cursor, reservation.start_time))
+            cursor = max(cursor, reservation.end_time)
+        if end - cursor >= max(min_length, timedelta.resolution):
+            slots.append((cursor, end))
+        return slots
+
+
+class ReservationService:
+    """Creates, cancels and queries vehicle reservations."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self.index = ReservationIndex()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._version: Optional[int] = None
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Establishes a database connection."""
+        return db.connect(self.db_path)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+            self._version = None
+
+    @staticmethod
+    def ensure_schema(conn: sqlite3.Connection):
+        """Creates the reservations table and its change counter if they do not exist."""
+        db.execute_schema(conn, SCHEMA)
+        db.track_changes(conn, "reservations")
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = self.get_connection()
+            self.ensure_schema(self._conn)
+            self._conn.commit()
+        return self._conn
+
+    def sync(self) -> ReservationIndex:
+        """Reloads the index if another connection changed reservations."""
+        conn = self._connection()
+        version = db.change_version(conn, "reservations")
+        if version != self._version:
+            cursor = conn.cursor()
+            cursor.row_factory = reservation_from_row
+            cursor.execute(
+                f"SELECT {reservation_from_row.select} FROM reservations "
+                f"WHERE {BLOCKING_SQL} ORDER BY vehicle_id, start_time"
+            )
+            self.index.clear()
+            for reservation in cursor:
+                self.index.add(reservation)
+            self._version = version
+        return self.index
+
+    def invalidate(self):
+        self._version = None
+
+    def _take_version(self, conn: sqlite3.Connection, rows: int):
+        """
+        Called inside a write transaction after changing ``rows`` reservations:
+        when the counter moved only by them, the in-place update keeps the
+        index current. Otherwise the next ``sync`` reloads it.
+        """
+        version = db.change_version(conn, "reservations")
+        self._version = version if self._version is not None and version - rows == self._version else None
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def conflicts(self, vehicle_id: int, start: datetime, end: datetime,
+                  exclude_id: Optional[int] = None) -> List[Reservation]:
+        return [r for r in self.sync().overlapping(vehicle_id, start, end) if r.id != exclude_id]
+
+    def is_free(self, vehicle_id: int, start: datetime, end: datetime) -> bool:
+        return self.sync().is_free(vehicle_id, start, end)
+
+    def free_vehicles(self, vehicle_ids: Iterable[int], start: datetime, end: datetime) -> List[int]:
+        """Those of ``vehicle_ids`` (order kept) with no booking in [start, end)."""
+        reserved = self.sync().reserved_vehicle_ids(start, end)
+        return [vehicle_id for vehicle_id in vehicle_ids if vehicle_id not in reserved]
+
+    def in_range(self, start: datetime, end: datetime) -> Dict[int, List[Reservation]]:
+        return self.sync().in_range(start, end)
+
+    def next_reservation(self, vehicle_id: int, moment: datetime) -> Optional[Reservation]:
+        return self.sync().next_after(vehicle_id, moment)
+
+    def free_slots(self, vehicle_id: int, start: datetime, end: datetime,
+                   min_length: timedelta = timedelta(0)) -> List[Tuple[datetime, datetime]]:
+        return self.sync().free_slots(vehicle_id, start, end, min_length)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def create(self, vehicle_id: int, start: datetime, end: datetime,
+               employee_id: Optional[int] = None, purpose: str = "") -> Reservation:
+        """
+        Books ``vehicle_id`` for [start, end).
+
+        Raises ValueError for an empty interval and ReservationConflict when
+        the vehicle is already booked for part of it.
+        """
+        if end <= start:
+            raise ValueError("Reservation must end after it starts.")
+        self.sync()
+        conn = self._connection()
+        try:
+            with log_operation("reservation.create", logger, vehicle_id=vehicle_id) as op:
+                cursor = conn.execute(
+                    "INSERT INTO reservations (vehicle_id, employee_id, start_time, end_time, purpose) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (vehicle_id, employee_id, _ts(start), _ts(end), purpose),
+                )
+                reservation_id = cursor.lastrowid
+                # Checked after the INSERT: the write lock is held, so no other
+                # desk can book the same slot between the check and the commit
+                cursor = conn.cursor()
+                cursor.row_factory = reservation_from_row
+                cursor.execute(
+                    f"SELECT {reservation_from_row.select} FROM reservations "
+                    f"WHERE vehicle_id = ? AND id != ? AND {BLOCKING_SQL} "
+                    "AND start_time < ? AND end_time > ? ORDER BY start_time",
+                    (vehicle_id, reservation_id, _ts(end), _ts(start)),
+                )
+                conflicts = cursor.fetchall()
+                if conflicts:
+                    raise ReservationConflict(vehicle_id, conflicts)
+                cursor.execute(
+                    f"SELECT {reservation_from_row.select} FROM reservations WHERE id = ?",
+                    (reservation_id,),
+                )
+                reservation = cursor.fetchone()
+                self._take_version(conn, 1)
+                conn.commit()
+                op["reservation_id"] = reservation_id
+        except Exception:
+            conn.rollback()
+            raise
+        self.index.add(reservation)
+        return reservation
+
+    def _set_status(self, reservation_id: int, status: str, operation: str) -> bool:
+        conn = self._connection()
+        try:
+            with log_operation(operation, logger, reservation_id=reservation_id) as op:
+                cursor = conn.execute(
+                    "UPDATE reservations SET status = ? WHERE id = ? AND status != ?",
+                    (status, reservation_id, status),
+                )
+                self._take_version(conn, cursor.rowcount)
+                conn.commit()
+                op["rows"] = cursor.rowcount
+        except Exception:
+            conn.rollback()
+            raise
+        if status in BLOCKING_STATUSES:
+            reservation = self.index.get(reservation_id)
+            if reservation is not None:
+                reservation.status = status
+            else:
+                self.invalidate()
+        else:
+            self.index.remove(reservation_id)
+        return cursor.rowcount > 0
+
+    def cancel(self, reservation_id: int) -> bool:
+        """Frees the slot. Returns False if the reservation was already cancelled."""
+        return self._set_status(reservation_id, "cancelled", "reservation.cancel")
+
+    def mark_picked_up(self, reservation_id: int) -> bool:
+        """Records that the keys were issued against this reservation."""
+        return self._set_status(reservation_id, "picked_up", "reservation.pick_up")
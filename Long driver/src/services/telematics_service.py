@@ -0,0 +1,596 @@
+"""
+Service layer for telematics readings (odometer and fuel level from the trackers).
+
+Readings come from CSV / NDJSON files or a local TCP socket and are stored
+in ``telematics_readings``: one row per vehicle and second, integer columns
+only (seconds, metres, centilitres) in a WITHOUT ROWID table keyed by
+(vehicle_id, ts), so a reading takes a dozen bytes and a repeated reading is
+ignored by the primary key.
+
+``ReadingIngestor`` checks each reading against the vehicle's last accepted
+one (odometer never goes back, no jumps faster than ``max_speed_kmh``, fuel
+within the tank capacity) and writes ``batch_size`` readings per transaction
+with one executemany. After each batch the newest reading per vehicle moves
+``vehicles.current_mileage`` (never down - an operator's entry stays if it
+is higher) and ``current_fuel``.
+
+``downsample`` keeps one reading per vehicle and ``bucket_seconds`` for
+readings older than ``after_days``.
+
+A tracker that matches no vehicle re-reads the vehicle list (a vehicle added
+after the listener started) at most once per ``unknown_reload_seconds``;
+in between its readings are rejected from a negative cache.
+"""
+import calendar
+import functools
+import json
+import logging
+import queue
+import socketserver
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from services.import_service import iter_csv_rows, normalize_header
+from utils import db, fleet_index
+from utils.app_logging import log_operation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_MAX_SPEED_KMH = 250.0
+# Fuel gauges overshoot a little on a full tank
+FUEL_TOLERANCE = 0.05
+DEFAULT_DOWNSAMPLE_DAYS = 30
+DEFAULT_BUCKET_SECONDS = 3600
+DEFAULT_UNKNOWN_RELOAD_SECONDS = 60.0
+# Listener: failed batch writes (locked database, full disk) are retried
+# after 1, 2, 4 ... seconds; then the listener stops
+DEFAULT_FLUSH_RETRIES = 6
+FLUSH_RETRY_SECONDS = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS telematics_readings (
+    vehicle_id INTEGER NOT NULL,
+    -- seconds since 1970-01-01, wall-clock time as sent by the tracker
+    ts INTEGER NOT NULL,
+    odometer_m INTEGER,
+    fuel_cl INTEGER,
+    PRIMARY KEY (vehicle_id, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS telematics_state (
+    name TEXT PRIMARY KEY,
+    value INTEGER
+)
+"""
+
+# Accepted header / key names (after normalize_header)
+VEHICLE_KEYS = ("vehicle", "vehicle_id", "registration_number", "pojazd", "nr_rejestracyjny")
+TIME_KEYS = ("timestamp", "ts", "time", "czas")
+ODOMETER_KEYS = ("odometer", "mileage", "odometer_km", "przebieg")
+FUEL_KEYS = ("fuel", "fuel_level", "fuel_l", "paliwo")
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(value: Union[int, float, str, datetime]) -> int:
+    """Seconds since 1970-01-01 from a number, an ISO string or a datetime (no time-zone shift)."""
+    if isinstance(value, datetime):
+        return calendar.timegm(value.timetuple())
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip()
+    if text.isdigit():
+        return int(text)
+    return calendar.timegm(datetime.fromisoformat(text).timetuple())
+
+
+def from_epoch(ts: int) -> datetime:
+    return _EPOCH + timedelta(seconds=ts)
+
+
+def _number(value: Any) -> Optional[float]:
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    return float(str(value).replace(",", ".")) if isinstance(value, str) else float(value)
+
+
+# Headers repeat on every row - normalise each distinct name once
+_header = functools.lru_cache(maxsize=256)(normalize_header)
+
+
+def _pick(record: Dict[str, Any], keys: Tuple[str, ...]) -> Any:
+    for key in keys:
+        if key in record:
+            return record[key]
+    return None
+
+
+@dataclass(slots=True)
+class Reading:
+    """One tracker reading; ``vehicle`` is an id or a registration number."""
+    vehicle: Union[int, str]
+    ts: int
+    odometer: Optional[float] = None  # km
+    fuel: Optional[float] = None      # litres
+
+
+def parse_reading(record: Dict[str, Any]) -> Reading:
+    """
+    Reading from a CSV row or a JSON object (header names as in import: any
+    case, Polish names accepted).
+
+    Raises ValueError.
+    """
+    record = {_header(key): value for key, value in record.items()}
+    vehicle = _pick(record, VEHICLE_KEYS)
+    moment = _pick(record, TIME_KEYS)
+    if vehicle in (None, "") or moment in (None, ""):
+        raise ValueError("reading needs a vehicle and a timestamp")
+    if isinstance(vehicle, str):
+        vehicle = int(vehicle) if vehicle.strip().isdigit() else vehicle.strip()
+    return Reading(vehicle, to_epoch(moment), _number(_pick(record, ODOMETER_KEYS)),
+                   _number(_pick(record, FUEL_KEYS)))
+
+
+def parse_line(line: str) -> Reading:
+    """One socket / stdin line: a JSON object or ``vehicle;timestamp;odometer;fuel``."""
+    text = line.strip()
+    if text.startswith("{"):
+        return parse_reading(json.loads(text))
+    if ";" in text:
+        parts = text.split(";")
+    elif "," in text:
+        parts = text.split(",")
+    else:
+        parts = text.split()
+    parts = [part.strip() for part in parts]
+    if len(parts) < 3:
+        raise ValueError(f"expected vehicle;timestamp;odometer[;fuel], got {text!r}")
+    return parse_reading(dict(zip(("vehicle", "timestamp", "odometer", "fuel"), parts)))
+
+
+def iter_ndjson_readings(lines: Iterable[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    for number, line in enumerate(lines, 1):
+        text = line.strip()
+        if text and not text.startswith("#"):
+            yield number, json.loads(text)
+
+
+def iter_file_readings(path: Path) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """``(line, record)`` from a CSV (delimiter sniffed) or NDJSON (.ndjson / .jsonl / .json) file."""
+    path = Path(path)
+    if path.suffix.lower() in (".ndjson", ".jsonl", ".json"):
+        with open(path, encoding="utf-8-sig") as handle:
+            yield from iter_ndjson_readings(handle)
+    else:
+        yield from iter_csv_rows(path)
+
+
+@dataclass
+class IngestResult:
+    received: int = 0
+    stored: int = 0
+    duplicates: int = 0
+    rejected: Counter = field(default_factory=Counter)
+    vehicles_updated: int = 0
+    batches: int = 0
+
+    @property
+    def rejected_total(self) -> int:
+        return sum(self.rejected.values())
+
+
+class _VehicleState:
+    __slots__ = ("tank", "ts", "odometer_m", "seen", "newest")
+
+    def __init__(self, tank: Optional[float]):
+        self.tank = tank
+        self.ts: Optional[int] = None           # last accepted reading with an odometer
+        self.odometer_m: Optional[int] = None
+        self.seen: Optional[int] = None         # newest accepted reading of any kind
+        self.newest: Optional[Tuple[int, Optional[int], Optional[int]]] = None  # pending vehicle update
+
+
+class ReadingIngestor:
+    """Checks and writes readings in batches on one connection (file import or socket listener)."""
+
+    def __init__(self, service: "TelematicsService", conn: sqlite3.Connection):
+        self.service = service
+        self.conn = conn
+        self.result = IngestResult()
+        self._batch: List[Tuple[int, int, Optional[int], Optional[int]]] = []
+        self._vehicles: Dict[int, _VehicleState] = {}
+        self._registrations: Dict[str, int] = {}
+        self._unknown: Set[Union[int, str]] = set()
+        self._loaded_at = 0.0
+        self._load_vehicles()
+
+    def _load_vehicles(self):
+        self._loaded_at = time.monotonic()
+        self._unknown.clear()
+        for vehicle_id, registration, tank in self.conn.execute(
+                "SELECT id, registration_number, tank_capacity FROM vehicles"):
+            if vehicle_id not in self._vehicles:
+                state = self._vehicles[vehicle_id] = _VehicleState(tank)
+                last = self.conn.execute(
+                    "SELECT ts, odometer_m FROM telematics_readings "
+                    "WHERE vehicle_id = ? AND odometer_m IS NOT NULL ORDER BY ts DESC LIMIT 1",
+                    (vehicle_id,),
+                ).fetchone()
+                if last:
+                    state.ts, state.odometer_m = last
+                state.seen = self.conn.execute(
+                    "SELECT MAX(ts) FROM telematics_readings WHERE vehicle_id = ?", (vehicle_id,)
+                ).fetchone()[0]
+            if registration:
+                self._registrations[registration.replace(" ", "").upper()] = vehicle_id
+
+    def _lookup(self, vehicle: Union[int, str]) -> Optional[int]:
+        if isinstance(vehicle, int):
+            return vehicle if vehicle in self._vehicles else None
+        return self._registrations.get(vehicle.replace(" ", "").upper())
+
+    def _vehicle_id(self, vehicle: Union[int, str]) -> Optional[int]:
+        vehicle_id = self._lookup(vehicle)
+        if vehicle_id is not None:
+            return vehicle_id
+        stale = time.monotonic() - self._loaded_at >= self.service.unknown_reload_seconds
+        if vehicle in self._unknown and not stale:
+            return None
+        if stale:
+            # A vehicle added after the listener started
+            self._load_vehicles()
+            vehicle_id = self._lookup(vehicle)
+        if vehicle_id is None:
+            self._unknown.add(vehicle)
+        return vehicle_id
+
+    def check(self, reading: Reading) -> Tuple[Optional[int], Optional[str]]:
+        """(vehicle id, rejection reason or None)."""
+        vehicle_id = self._vehicle_id(reading.vehicle)
+        if vehicle_id is None:
+            return None, "unknown_vehicle"
+        if reading.odometer is None and reading.fuel is None:
+            return vehicle_id, "empty"
+        state = self._vehicles[vehicle_id]
+        if reading.fuel is not None:
+            if reading.fuel < 0:
+                return vehicle_id, "negative_fuel"
+            if state.tank and reading.fuel > state.tank * (1 + FUEL_TOLERANCE):
+                return vehicle_id, "fuel_over_capacity"
+        if reading.odometer is not None:
+            if reading.odometer < 0:
+                return vehicle_id, "negative_odometer"
+            if state.ts is not None:
+                odometer_m = round(reading.odometer * 1000)
+                if reading.ts > state.ts:
+                    if odometer_m < state.odometer_m:
+                        return vehicle_id, "odometer_backwards"
+                    hours = (reading.ts - state.ts) / 3600
+                    if (odometer_m - state.odometer_m) / 1000 > self.service.max_speed_kmh * hours:
+                        return vehicle_id, "odometer_jump"
+                elif odometer_m > state.odometer_m:
+                    # Late reading: may not exceed what the tracker reported later
+                    return vehicle_id, "odometer_backwards"
+        return vehicle_id, None
+
+    def add(self, reading: Reading):
+        self.result.received += 1
+        vehicle_id, reason = self.check(reading)
+        if reason is not None:
+            self.result.rejected[reason] += 1
+            return
+        odometer_m = None if reading.odometer is None else round(reading.odometer * 1000)
+        fuel_cl = None if reading.fuel is None else round(reading.fuel * 100)
+        self._batch.append((vehicle_id, reading.ts, odometer_m, fuel_cl))
+
+        state = self._vehicles[vehicle_id]
+        if odometer_m is not None and (state.ts is None or reading.ts > state.ts):
+            state.ts, state.odometer_m = reading.ts, odometer_m
+        # Only a reading newer than everything seen moves the vehicle state
+        if state.seen is None or reading.ts >= state.seen:
+            state.seen = reading.ts
+            if state.newest is not None:
+                # A reading without fuel (or odometer) keeps the pending value
+                odometer_m = state.newest[1] if odometer_m is None else odometer_m
+                fuel_cl = state.newest[2] if fuel_cl is None else fuel_cl
+            state.newest = (reading.ts, odometer_m, fuel_cl)
+        if len(self._batch) >= self.service.batch_size:
+            self.flush()
+
+    def add_record(self, line: Optional[int], record: Dict[str, Any]):
+        try:
+            reading = parse_reading(record)
+        except (TypeError, ValueError) as e:
+            self.result.received += 1
+            self.result.rejected["unreadable"] += 1
+            logger.debug(f"Unreadable reading at line {line}: {e}")
+            return
+        self.add(reading)
+
+    def flush(self):
+        """Writes the pending batch and moves the vehicle state (one transaction)."""
+        if not self._batch:
+            return
+        # Pending vehicle updates are dropped only after the commit, so a
+        # failed batch can be flushed again
+        pending = [(vehicle_id, state) for vehicle_id, state in self._vehicles.items()
+                   if state.newest is not None]
+        updates = [(vehicle_id, state.newest[1], state.newest[2]) for vehicle_id, state in pending]
+        with log_operation("telematics.batch", logger, readings=len(self._batch)) as op:
+            try:
+                before = self.conn.total_changes
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO telematics_readings (vehicle_id, ts, odometer_m, fuel_cl) "
+                    "VALUES (?, ?, ?, ?)",
+                    self._batch,
+                )
+                stored = self.conn.total_changes - before
+                updated = self.service.update_vehicles(self.conn, updates)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            op["stored"] = stored
+            op["vehicles"] = len(updated)
+        for _, state in pending:
+            state.newest = None
+        self.result.stored += stored
+        self.result.duplicates += len(self._batch) - stored
+        self.result.vehicles_updated += len(updated)
+        self.result.batches += 1
+        self._batch = []
+        for vehicle_id in updated:
+            fleet_index.refresh(self.service.db_path, self.conn, vehicle_id)
+
+
+class TelematicsService:
+    """Stores tracker readings and keeps the vehicle odometer / fuel level current."""
+
+    def __init__(self, db_path: Path, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_speed_kmh: float = DEFAULT_MAX_SPEED_KMH,
+                 unknown_reload_seconds: float = DEFAULT_UNKNOWN_RELOAD_SECONDS):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.max_speed_kmh = max_speed_kmh
+        self.unknown_reload_seconds = unknown_reload_seconds
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Establishes a database connection for bulk writes."""
+        conn = db.connect(self.db_path)
+        # Readings can be re-sent by the tracker; a lost last batch on power
+        # failure is acceptable, a sync per batch is not
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    @staticmethod
+    def ensure_schema(conn: sqlite3.Connection):
+        """Creates the telematics tables if they do not exist."""
+        db.execute_schema(conn, SCHEMA)
+
+    def ingestor(self, conn: sqlite3.Connection) -> ReadingIngestor:
+        self.ensure_schema(conn)
+        conn.commit()
+        return ReadingIngestor(self, conn)
+
+    def ingest(self, records: Iterable[Union[Reading, Tuple[int, Dict[str, Any]]]]) -> IngestResult:
+        """Ingests readings or ``(line, record)`` pairs (see iter_file_readings)."""
+        conn = self.get_connection()
+        try:
+            ingestor = self.ingestor(conn)
+            with log_operation("telematics.ingest", logger) as op:
+                for item in records:
+                    if isinstance(item, Reading):
+                        ingestor.add(item)
+                    else:
+                        ingestor.add_record(*item)
+                ingestor.flush()
+                op["received"] = ingestor.result.received
+                op["stored"] = ingestor.result.stored
+                op["rejected"] = ingestor.result.rejected_total
+            return ingestor.result
+        finally:
+            conn.close()
+
+    def ingest_file(self, path: Path) -> IngestResult:
+        return self.ingest(iter_file_readings(path))
+
+    @staticmethod
+    def update_vehicles(conn: sqlite3.Connection,
+                        updates: List[Tuple[int, Optional[int], Optional[int]]]) -> List[int]:
+        """Moves the vehicle odometer (never down) and fuel level; ids of vehicles that changed."""
+        changed = []
+        for vehicle_id, odometer_m, fuel_cl in updates:
+            mileage = None if odometer_m is None else odometer_m / 1000
+            fuel = None if fuel_cl is None else fuel_cl / 100
+            cursor = conn.execute(
+                """
+                UPDATE vehicles
+                SET current_mileage = MAX(COALESCE(current_mileage, 0), COALESCE(?1, 0)),
+                    current_fuel = COALESCE(?2, current_fuel)
+                WHERE id = ?3
+                  AND (COALESCE(current_mileage, 0) < COALESCE(?1, 0)
+                       OR current_fuel IS NOT COALESCE(?2, current_fuel))
+                """,
+                (mileage, fuel, vehicle_id),
+            )
+            if cursor.rowcount:
+                changed.append(vehicle_id)
+        return changed
+
+    # ------------------------------------------------------------------
+    # History
+    # ------------------------------------------------------------------
+
+    def readings(self, conn: sqlite3.Connection, vehicle_id: int, start: datetime,
+                 end: datetime) -> List[Tuple[datetime, Optional[float], Optional[float]]]:
+        """(time, km, litres) of one vehicle in [start, end)."""
+        self.ensure_schema(conn)
+        rows = conn.execute(
+            "SELECT ts, odometer_m, fuel_cl FROM telematics_readings "
+            "WHERE vehicle_id = ? AND ts >= ? AND ts < ? ORDER BY ts",
+            (vehicle_id, to_epoch(start), to_epoch(end)),
+        )
+        return [(from_epoch(ts), None if odo is None else odo / 1000, None if fuel is None else fuel / 100)
+                for ts, odo, fuel in rows]
+
+    def downsample(self, after_days: int = DEFAULT_DOWNSAMPLE_DAYS,
+                   bucket_seconds: int = DEFAULT_BUCKET_SECONDS, today: Optional[date] = None) -> int:
+        """
+        Keeps the last reading per vehicle and bucket for readings older than
+        ``after_days``; returns the number of deleted readings. Each run
+        continues where the previous one stopped.
+        """
+        today = today or date.today()
+        cutoff = to_epoch(datetime.combine(today - timedelta(days=after_days), datetime.min.time()))
+        cutoff -= cutoff % bucket_seconds
+        conn = self.get_connection()
+        try:
+            self.ensure_schema(conn)
+            row = conn.execute("SELECT value FROM telematics_state WHERE name = 'downsampled_until'").fetchone()
+            start = row[0] if row else 0
+            if start >= cutoff:
+                return 0
+            with log_operation("telematics.downsample", logger, bucket_seconds=bucket_seconds) as op:
+                cursor = conn.execute(
+                    """
+                    DELETE FROM telematics_readings
+                    WHERE (vehicle_id, ts) IN (
+                        SELECT vehicle_id, ts FROM (
+                            SELECT vehicle_id, ts, ROW_NUMBER() OVER (
+                                PARTITION BY vehicle_id, ts / ?3 ORDER BY ts DESC
+                            ) AS newer
+                            FROM telematics_readings
+                            WHERE ts >= ?1 AND ts < ?2
+                        )
+                        WHERE newer > 1
+                    )
+                    """,
+                    (start, cutoff, bucket_seconds),
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO telematics_state (name, value) VALUES ('downsampled_until', ?)",
+                    (cutoff,),
+                )
+                conn.commit()
+                op["rows"] = cursor.rowcount
+            return cursor.rowcount
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+# ----------------------------------------------------------------------
+# Socket listener
+# ----------------------------------------------------------------------
+
+class _ReadingHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw in self.rfile:
+            if self.server.failed:
+                return
+            line = raw.decode("utf-8", errors="replace").strip()
+            if not line:
+                continue
+            try:
+                self.server.readings.put(parse_line(line))
+            except (ValueError, json.JSONDecodeError) as e:
+                self.server.unreadable += 1
+                logger.debug(f"Unreadable reading from {self.client_address[0]}: {e}")
+
+
+class TelematicsListener(socketserver.ThreadingTCPServer):
+    """
+    Local TCP listener: one reading per line (JSON or ``vehicle;timestamp;
+    odometer;fuel``) from any number of trackers / gateways. Connections only
+    queue the readings; a single writer thread stores them in batches - a
+    full batch or ``flush_seconds`` after the first pending reading.
+
+    A batch that cannot be written is retried ``flush_retries`` times with
+    a doubling delay; after that the writer gives up, ``failed`` is set and
+    the listener shuts down instead of queueing readings nobody stores.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, service: TelematicsService, address: Tuple[str, int] = ("127.0.0.1", 5055),
+                 flush_seconds: float = 1.0, flush_retries: int = DEFAULT_FLUSH_RETRIES,
+                 retry_seconds: float = FLUSH_RETRY_SECONDS):
+        super().__init__(address, _ReadingHandler)
+        self.service = service
+        self.flush_seconds = flush_seconds
+        self.flush_retries = flush_retries
+        self.retry_seconds = retry_seconds
+        self.readings: "queue.Queue[Optional[Reading]]" = queue.Queue()
+        self.unreadable = 0
+        self.failed = False
+        self.ingestor: Optional[ReadingIngestor] = None
+        self._writer = threading.Thread(target=self._write_loop, name="telematics-writer", daemon=True)
+        self._ready = threading.Event()
+        self._writer.start()
+        self._ready.wait()
+
+    def _write_loop(self):
+        conn = self.service.get_connection()
+        try:
+            self.ingestor = self.service.ingestor(conn)
+            self._ready.set()
+            while True:
+                reading = self.readings.get()
+                if reading is None:
+                    break
+                self._write(self.ingestor.add, reading)
+                # Drain what arrived meanwhile, up to the flush deadline
+                deadline = datetime.now() + timedelta(seconds=self.flush_seconds)
+                while (wait := (deadline - datetime.now()).total_seconds()) > 0:
+                    try:
+                        reading = self.readings.get(timeout=wait)
+                    except queue.Empty:
+                        break
+                    if reading is None:
+                        self._write(self.ingestor.flush)
+                        return
+                    self._write(self.ingestor.add, reading)
+                self._write(self.ingestor.flush)
+        except Exception:
+            logger.exception("Telematics writer stopped")
+            self.failed = True
+            # shutdown() waits for serve_forever - not on the writer thread
+            threading.Thread(target=self.shutdown, name="telematics-shutdown", daemon=True).start()
+        finally:
+            self._ready.set()
+            conn.close()
+
+    def _write(self, step, *args):
+        """Runs an ingestor step (add writes a full batch); retries a failed batch with backoff."""
+        try:
+            step(*args)
+            return
+        except sqlite3.Error as e:
+            error = e
+        delay = self.retry_seconds
+        for attempt in range(1, self.flush_retries + 1):
+            logger.warning(f"Telematics batch not written ({error}), retry {attempt} in {delay:g} s")
+            time.sleep(delay)
+            delay *= 2
+            try:
+                self.ingestor.flush()
+                return
+            except sqlite3.Error as e:
+                error = e
+        raise error
+
+    def server_close(self):
+        """Stops accepting readings and writes the pending ones."""
+        super().server_close()
+        self.readings.put(None)
+        self._writer.join()
@@ -0,0 +1,378 @@
+"""
+Service layer for per-trip GPS tracks.
+
+A track is stored as one BLOB per trip in ``trip_tracks``. Coordinates are
+quantised to 1e-5 degree (about 1 m) and times to whole seconds, each column
+is delta-encoded (neighbouring points differ by a few units), the int32
+deltas are split into byte planes and the result is zlib-compressed - a
+point takes two to three bytes instead of the 24 of three floats. The point
+count, time range and GPS distance sit in their own columns before the BLOB,
+so listing tracks or cross-checking distances never reads the track data.
+
+Decoding and the haversine distance are vectorised with NumPy when it is
+installed; without it the same work is done with ``array`` /
+``itertools.accumulate`` and a plain loop.
+
+``cross_check`` compares the GPS distance of each completed trip with its
+odometer distance (``end_mileage - start_mileage``) and flags trips that
+differ by more than the tolerance.
+"""
+import functools
+import itertools
+import json
+import logging
+import math
+import sqlite3
+import struct
+import sys
+import zlib
+from array import array
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from services.import_service import iter_csv_rows, normalize_header
+from services.telematics_service import from_epoch, to_epoch
+from utils import db
+from utils.app_logging import log_operation
+
+logger = logging.getLogger(__name__)
+
+# Coordinate quantum: 1e-5 degree = 1.1 m of latitude
+SCALE = 100_000
+EARTH_RADIUS_M = 6_371_000.0
+DEFAULT_TOLERANCE_PCT = 5.0
+DEFAULT_TOLERANCE_KM = 2.0
+
+# magic, format version, point count, first timestamp
+_HEADER = struct.Struct("<2sBIq")
+_MAGIC = b"GT"
+_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trip_tracks (
+    trip_id INTEGER PRIMARY KEY REFERENCES trips(id) ON DELETE CASCADE,
+    points INTEGER NOT NULL,
+    -- seconds since 1970-01-01 (see telematics_service.to_epoch)
+    started_ts INTEGER,
+    ended_ts INTEGER,
+    distance_m INTEGER NOT NULL,
+    -- last column: summaries are read without touching the track pages
+    data BLOB NOT NULL
+)
+"""
+
+LAT_KEYS = ("lat", "latitude", "szerokosc")
+LON_KEYS = ("lon", "lng", "longitude", "dlugosc")
+TIME_KEYS = ("timestamp", "ts", "time", "czas")
+
+
+@functools.lru_cache(maxsize=None)
+def _numpy():
+    """NumPy if installed (loaded on first use, it is a costly import), else None."""
+    try:
+        import numpy
+    except ImportError:
+        logger.debug("NumPy not installed - track maths in pure Python")
+        return None
+    return numpy
+
+
+# ----------------------------------------------------------------------
+# Encoding
+# ----------------------------------------------------------------------
+
+def _shuffle(raw: bytes) -> bytes:
+    """Byte planes of int32 values: the mostly-zero high bytes end up together."""
+    return b"".join(raw[plane::4] for plane in range(4))
+
+
+def _unshuffle(data: bytes) -> bytes:
+    out = bytearray(len(data))
+    size = len(data) // 4
+    for plane in range(4):
+        out[plane::4] = data[plane * size:(plane + 1) * size]
+    return bytes(out)
+
+
+def _deltas(values: Sequence[int]) -> array:
+    result = array("i", (b - a for a, b in zip(itertools.chain((0,), values), values)))
+    if sys.byteorder == "big":
+        result.byteswap()
+    return result
+
+
+def encode_track(points: Sequence[Tuple[float, float, int]]) -> bytes:
+    """``(lat, lon, epoch seconds)`` points (time-ordered) -> track BLOB."""
+    if not points:
+        raise ValueError("track has no points")
+    np = _numpy()
+    if np is not None:
+        values = np.asarray(points, dtype=np.float64)
+        lat = np.rint(values[:, 0] * SCALE).astype("<i4")
+        lon = np.rint(values[:, 1] * SCALE).astype("<i4")
+        ts = values[:, 2].astype(np.int64)
+        t0 = int(ts[0])
+        body = b"".join(np.diff(column, prepend=0).astype("<i4").tobytes()
+                        for column in (lat, lon, (ts - t0).astype("<i4")))
+    else:
+        t0 = int(points[0][2])
+        lat = [round(p[0] * SCALE) for p in points]
+        lon = [round(p[1] * SCALE) for p in points]
+        ts = [int(p[2]) - t0 for p in points]
+        body = b"".join(_deltas(column).tobytes() for column in (lat, lon, ts))
+    return _HEADER.pack(_MAGIC, _VERSION, len(points), t0) + zlib.compress(_shuffle(body), 6)
+
+
+def decode_track(blob: bytes) -> Tuple[Sequence[float], Sequence[float], Sequence[int]]:
+    """Track BLOB -> (latitudes, longitudes, epoch seconds); NumPy arrays when available."""
+    magic, version, count, t0 = _HEADER.unpack_from(blob)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"unknown track format {magic!r} v{version}")
+    body = _unshuffle(zlib.decompress(blob[_HEADER.size:]))
+    if len(body) != 12 * count:
+        raise ValueError(f"track data has {len(body)} bytes for {count} points")
+    np = _numpy()
+    if np is not None:
+        columns = np.cumsum(np.frombuffer(body, dtype="<i4").reshape(3, count), axis=1, dtype=np.int64)
+        return columns[0] / SCALE, columns[1] / SCALE, columns[2] + t0
+    deltas = array("i")
+    deltas.frombytes(body)
+    if sys.byteorder == "big":
+        deltas.byteswap()
+    lat, lon, ts = (list(itertools.accumulate(deltas[i * count:(i + 1) * count])) for i in range(3))
+    return [v / SCALE for v in lat], [v / SCALE for v in lon], [v + t0 for v in ts]
+
+
+# ----------------------------------------------------------------------
+# Distance
+# ----------------------------------------------------------------------
+
+def _haversine_python(lats: Sequence[float], lons: Sequence[float]) -> float:
+    total = 0.0
+    radians, sin, cos = math.radians, math.sin, math.cos
+    prev_lat = prev_lon = None
+    for lat, lon in zip(lats, lons):
+        lat, lon = radians(lat), radians(lon)
+        if prev_lat is not None:
+            a = sin((lat - prev_lat) / 2) ** 2 + cos(prev_lat) * cos(lat) * sin((lon - prev_lon) / 2) ** 2
+            total += math.asin(math.sqrt(min(a, 1.0)))
+        prev_lat, prev_lon = lat, lon
+    return 2 * EARTH_RADIUS_M * total
+
+
+def haversine_distance_m(lats: Sequence[float], lons: Sequence[float]) -> float:
+    """Length of the polyline in metres (sum of great-circle segments)."""
+    np = _numpy()
+    if np is None:
+        return _haversine_python(lats, lons)
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    if lat.size < 2:
+        return 0.0
+    a = (np.sin(np.diff(lat) / 2) ** 2
+         + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2)
+    return float(2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0))).sum())
+
+
+# ----------------------------------------------------------------------
+# Track files
+# ----------------------------------------------------------------------
+
+def _pick(record: Dict[str, Any], keys: Tuple[str, ...]) -> Any:
+    for key in keys:
+        if record.get(key) not in (None, ""):
+            return record[key]
+    return None
+
+
+def parse_point(record: Dict[str, Any]) -> Tuple[float, float, int]:
+    """``(lat, lon, ts)`` from a CSV row / JSON object. Raises ValueError."""
+    record = {normalize_header(key): value for key, value in record.items()}
+    lat, lon, moment = _pick(record, LAT_KEYS), _pick(record, LON_KEYS), _pick(record, TIME_KEYS)
+    if lat is None or lon is None or moment is None:
+        raise ValueError("point needs lat, lon and time")
+    return float(str(lat).replace(",", ".")), float(str(lon).replace(",", ".")), to_epoch(moment)
+
+
+def _iter_gpx_points(path: Path) -> Iterator[Tuple[float, float, int]]:
+    import xml.etree.ElementTree as ElementTree
+
+    for _, element in ElementTree.iterparse(path):
+        if element.tag.rsplit("}", 1)[-1] != "trkpt":
+            continue
+        moment = next((child.text for child in element if child.tag.rsplit("}", 1)[-1] == "time"), None)
+        if moment is None:
+            raise ValueError("GPX point without time")
+        # GPX times are UTC with a "Z" suffix
+        yield (float(element.get("lat")), float(element.get("lon")),
+               to_epoch(moment.strip().replace("Z", "+00:00")))
+        element.clear()
+
+
+def iter_track_points(path: Path) -> Iterator[Tuple[float, float, int]]:
+    """Points of a GPX, CSV (lat;lon;time) or NDJSON file."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".gpx":
+        yield from _iter_gpx_points(path)
+    elif suffix in (".ndjson", ".jsonl", ".json"):
+        with open(path, encoding="utf-8-sig") as handle:
+            for line in handle:
+                if line.strip():
+                    yield parse_point(json.loads(line))
+    else:
+        for _, row in iter_csv_rows(path):
+            yield parse_point(row)
+
+
+# ----------------------------------------------------------------------
+# Service
+# ----------------------------------------------------------------------
+
+@dataclass
+class TrackSummary:
+    trip_id: int
+    points: int
+    started: Optional[datetime]
+    ended: Optional[datetime]
+    distance_km: float
+    size_bytes: int
+
+
+@dataclass
+class TrackCheck:
+    """GPS against odometer distance of one completed trip."""
+    trip_id: int
+    trip_number: Optional[str]
+    vehicle_id: int
+    registration_number: Optional[str]
+    trip_date: Optional[str]
+    odometer_km: float
+    gps_km: float
+    flagged: bool
+
+    @property
+    def difference_km(self) -> float:
+        return self.odometer_km - self.gps_km
+
+    @property
+    def difference_pct(self) -> Optional[float]:
+        return 100 * self.difference_km / self.odometer_km if self.odometer_km else None
+
+
+class TrackService:
+    """Stores GPS tracks of trips and checks them against the odometer."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+
+    def get_connection(self) -> sqlite3.Connection:
+        return db.connect(self.db_path)
+
+    @staticmethod
+    def ensure_schema(conn: sqlite3.Connection):
+        """Creates the track table if it does not exist."""
+        db.execute_schema(conn, SCHEMA)
+
+    def save_track(self, trip_id: int, points: Iterable[Tuple[float, float, int]]) -> TrackSummary:
+        """
+        Stores (replaces) the track of a trip. Points are sorted by time;
+        coordinates outside the valid range raise ValueError.
+        """
+        points = sorted(points, key=lambda point: point[2])
+        for lat, lon, _ in points:
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                raise ValueError(f"invalid coordinates {lat}, {lon}")
+        with log_operation("tracks.save", logger, trip_id=trip_id, points=len(points)) as op:
+            blob = encode_track(points)
+            # Distance of the stored (quantised) points, same as a later decode
+            lats, lons, _ = decode_track(blob)
+            distance_m = round(haversine_distance_m(lats, lons))
+            conn = self.get_connection()
+            try:
+                self.ensure_schema(conn)
+                if conn.execute("SELECT 1 FROM trips WHERE id = ?", (trip_id,)).fetchone() is None:
+                    raise ValueError(f"Trip {trip_id} does not exist")
+                conn.execute(
+                    "INSERT OR REPLACE INTO trip_tracks (trip_id, points, started_ts, ended_ts, distance_m, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (trip_id, len(points), points[0][2], points[-1][2], distance_m, blob),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+            op["bytes"] = len(blob)
+        return TrackSummary(trip_id, len(points), from_epoch(points[0][2]), from_epoch(points[-1][2]),
+                            distance_m / 1000, len(blob))
+
+    def load_track(self, trip_id: int) -> Optional[Tuple[Sequence[float], Sequence[float], Sequence[int]]]:
+        """(latitudes, longitudes, epoch seconds) of the trip's track, or None."""
+        conn = self.get_connection()
+        try:
+            self.ensure_schema(conn)
+            row = conn.execute("SELECT data FROM trip_tracks WHERE trip_id = ?", (trip_id,)).fetchone()
+        finally:
+            conn.close()
+        return decode_track(row[0]) if row else None
+
+    def summaries(self, conn: sqlite3.Connection) -> Dict[int, TrackSummary]:
+        self.ensure_schema(conn)
+        return {
+            trip_id: TrackSummary(trip_id, points, None if started is None else from_epoch(started),
+                                  None if ended is None else from_epoch(ended), distance_m / 1000, size)
+            for trip_id, points, started, ended, distance_m, size in conn.execute(
+                "SELECT trip_id, points, started_ts, ended_ts, distance_m, length(data) FROM trip_tracks")
+        }
+
+    def cross_check(self, date_from: Optional[date] = None, date_to: Optional[date] = None,
+                    tolerance_pct: float = DEFAULT_TOLERANCE_PCT,
+                    tolerance_km: float = DEFAULT_TOLERANCE_KM) -> List[TrackCheck]:
+        """
+        Completed trips with a track, odometer against GPS distance. A trip is
+        flagged when the difference exceeds ``tolerance_pct`` of the odometer
+        distance and at least ``tolerance_km`` (short trips, GPS start-up).
+        """
+        conn = self.get_connection()
+        try:
+            self.ensure_schema(conn)
+            trips = {row[1] for row in conn.execute("PRAGMA table_info(trips)")}
+            trip_date = "start_date" if "start_date" in trips else "start_time"
+            card = "t.trip_number" if "trip_number" in trips else "NULL"
+            where, params = ["t.status = 'completed'", "t.end_mileage IS NOT NULL"], []
+            if date_from:
+                where.append(f"date(t.{trip_date}) >= ?")
+                params.append(date_from.isoformat())
+            if date_to:
+                where.append(f"date(t.{trip_date}) <= ?")
+                params.append(date_to.isoformat())
+            rows = conn.execute(
+                f"""
+                SELECT t.id, {card}, t.vehicle_id, v.registration_number, date(t.{trip_date}),
+                       t.end_mileage - t.start_mileage, g.distance_m
+                FROM trip_tracks g
+                JOIN trips t ON t.id = g.trip_id
+                LEFT JOIN vehicles v ON v.id = t.vehicle_id
+                WHERE {" AND ".join(where)}
+                ORDER BY t.{trip_date}, t.id
+                """,
+                params,
+            ).fetchall()
+        finally:
+            conn.close()
+
+        checks = []
+        for trip_id, road_card, vehicle_id, registration, day, odometer_km, distance_m in rows:
+            gps_km = distance_m / 1000
+            difference = abs(odometer_km - gps_km)
+            flagged = difference > tolerance_km and difference > abs(odometer_km) * tolerance_pct / 100
+            checks.append(TrackCheck(trip_id, road_card, vehicle_id, registration, day,
+                                     round(odometer_km, 1), round(gps_km, 1), flagged))
+        flagged = sum(check.flagged for check in checks)
+        if flagged:
+            logger.warning(f"GPS cross-check: {flagged} of {len(checks)} trips differ from the odometer")
+        return checks
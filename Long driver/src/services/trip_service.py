@@ -5,10 +5,17 @@ This service coordinates with the VehicleService to ensure that trips
 are started and completed in a way that maintains data integrity.
 """
 import sqlite3
+import logging
 from pathlib import Path
 from datetime import datetime
-from models.trip import Trip
+from models.trip import Trip, trip_from_row
 from services.vehicle_service import VehicleService
+from services.numbering_service import RoadCardNumbering
+from services.trip_sheet_service import TripSheetService
+from utils import db, fleet_index
+from utils.app_logging import log_operation
+
+logger = logging.getLogger(__name__)
 
 class TripService:
     """Manages business logic for trips."""
@@ -16,22 +23,20 @@ class TripService:
     def __init__(self, db_path: Path, vehicle_service: VehicleService):
         self.db_path = db_path
         self.vehicle_service = vehicle_service
+        self.numbering = RoadCardNumbering()
+        self.sheets = TripSheetService(db_path)
 
     def get_connection(self) -> sqlite3.Connection:
         """Establishes a database connection."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        return db.connect(self.db_path, row_factory=sqlite3.Row)
 
     def get_trip_by_id(self, trip_id: int) -> Trip | None:
         """Retrieves a single trip by its ID."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM trips WHERE id = ?", (trip_id,))
-            row = cursor.fetchone()
-            if row:
-                return Trip(**dict(row))
-        return None
+            cursor.row_factory = trip_from_row
+            cursor.execute(f"SELECT {trip_from_row.select} FROM trips WHERE id = ?", (trip_id,))
+            return cursor.fetchone()
 
     def get_all_trips(self, limit: int = 50) -> list[Trip]:
         """
@@ -39,9 +44,11 @@ class TripService:
         """
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM trips ORDER BY start_time DESC LIMIT ?", (limit,))
-            rows = cursor.fetchall()
-            return [Trip(**dict(row)) for row in rows]
+            cursor.row_factory = trip_from_row
+            cursor.execute(
+                f"SELECT {trip_from_row.select} FROM trips ORDER BY start_time DESC LIMIT ?", (limit,)
+            )
+            return cursor.fetchall()
 
     def start_new_trip(
         self, vehicle_id: int, driver_id: int, route: str, purpose: str
@@ -49,52 +56,19 @@ class TripService:
         """
         Starts a new trip. This is a crucial transactional operation.
         """
-        vehicle = self.vehicle_service.get_vehicle_by_id(vehicle_id)
-        if not vehicle:
-            raise ValueError("Vehicle not found.")
-        if vehicle.status != 'available':
-            raise ValueError("Vehicle is not available for a new trip.")
-
-        # Transaction: Update vehicle status and create trip record together.
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        with log_operation("trip.start", logger, vehicle_id=vehicle_id, driver_id=driver_id) as op, \
+                self.get_connection() as conn:
             try:
-                # 1. Update vehicle status to 'in_trip'
-                updated = self.vehicle_service.update_vehicle_state_for_trip_start(vehicle_id)
-                if not updated:
-                    raise Exception("Failed to reserve vehicle for the trip.")
-
-                # 2. Create the new trip record with the vehicle's current state
-                start_time = datetime.now()
-                cursor.execute(
-                    """
-                    INSERT INTO trips (
-                        vehicle_id, driver_id, start_time, start_mileage,
-                        start_fuel, route, purpose, status
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, 'active')
-                    """,
-                    (
-                        vehicle_id,
-                        driver_id,
-                        start_time,
-                        vehicle.current_mileage,
-                        vehicle.current_fuel,
-                        route,
-                        purpose,
-                    ),
-                )
-                trip_id = cursor.lastrowid
+                trip_id, trip_number = self.start(conn, vehicle_id, driver_id, route, purpose)
                 conn.commit()
-
-                return self.get_trip_by_id(trip_id)
-
-            except Exception as e:
+            except Exception:
                 conn.rollback()
-                # Revert vehicle status if trip creation failed
-                self.vehicle_service.update_vehicle_state_for_trip_end(
-                    vehicle_id, vehicle.current_mileage, vehicle.current_fuel
-                )
-                raise e
+                raise
+            op["trip_id"] = trip_id
+            op["trip_number"] = trip_number
+            op["rows"] = 2
+        fleet_index.notify(self.db_path, vehicle_id, status="in_trip")
+        return self.get_trip_by_id(trip_id)
 
     def complete_trip(
         self, trip_id: int, end_mileage: float, end_fuel: float, notes: str | None = None
@@ -102,47 +76,123 @@ class TripService:
         """
         Completes an active trip. This is another crucial transactional operation.
         """
-        trip = self.get_trip_by_id(trip_id)
+        with log_operation("trip.complete", logger, trip_id=trip_id) as op, \
+                self.get_connection() as conn:
+            try:
+                vehicle_id, distance = self.complete(conn, trip_id, end_mileage, end_fuel, notes)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            op["vehicle_id"] = vehicle_id
+            op["distance"] = distance
+            op["rows"] = 2
+        fleet_index.notify(self.db_path, vehicle_id, status="available",
+                           current_mileage=end_mileage, current_fuel=end_fuel)
+        return self.get_trip_by_id(trip_id)
+
+    # ------------------------------------------------------------------
+    # Steps on the caller's connection (no commit), so several operations
+    # can share one transaction - see services.operations_service
+    # ------------------------------------------------------------------
+
+    def start(
+        self, conn: sqlite3.Connection, vehicle_id: int, driver_id: int, route: str, purpose: str,
+        start_time: datetime | None = None,
+    ) -> tuple[int, str]:
+        """
+        Reserves the vehicle and creates the trip record. Returns (trip id, road-card number).
+
+        Raises ValueError if the vehicle does not exist or is not available.
+        """
+        vehicle = conn.execute(
+            "SELECT current_mileage, current_fuel, status FROM vehicles WHERE id = ?", (vehicle_id,)
+        ).fetchone()
+        if not vehicle:
+            raise ValueError("Vehicle not found.")
+        current_mileage, current_fuel, status = tuple(vehicle)
+        if status != 'available':
+            raise ValueError("Vehicle is not available for a new trip.")
+
+        start_time = start_time or datetime.now()
+        # Conditional update: a desk that reserved the vehicle first wins
+        cursor = conn.execute(
+            """
+            UPDATE vehicles
+            SET status = 'in_trip', last_updated = ?
+            WHERE id = ? AND status = 'available'
+            """,
+            (datetime.now(), vehicle_id),
+        )
+        if not cursor.rowcount:
+            raise ValueError("Failed to reserve vehicle for the trip.")
+
+        # The road-card number comes from the same transaction, so a rollback
+        # gives it back and no two desks can get the same one.
+        trip_number = self.numbering.allocate(conn, start_time.year)
+        cursor = conn.execute(
+            """
+            INSERT INTO trips (
+                trip_number, vehicle_id, driver_id, start_time, start_mileage,
+                start_fuel, route, purpose, status
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'active')
+            """,
+            (trip_number, vehicle_id, driver_id, start_time, current_mileage, current_fuel,
+             route, purpose),
+        )
+        trip_id = cursor.lastrowid
+        # The day's trip sheet (opened on the first trip) - same transaction
+        self.sheets.record_trip(conn, trip_id)
+        return trip_id, trip_number
+
+    def complete(
+        self, conn: sqlite3.Connection, trip_id: int, end_mileage: float, end_fuel: float,
+        notes: str | None = None, end_time: datetime | None = None,
+    ) -> tuple[int, float]:
+        """
+        Closes an active trip and releases its vehicle. Returns (vehicle id, distance).
+
+        Raises ValueError if the trip is missing or not active, or the
+        mileage goes backwards.
+        """
+        trip = conn.execute(
+            "SELECT vehicle_id, start_mileage, status FROM trips WHERE id = ?", (trip_id,)
+        ).fetchone()
         if not trip:
             raise ValueError("Trip not found.")
-        if trip.status != 'active':
+        vehicle_id, start_mileage, status = tuple(trip)
+        if status != 'active':
             raise ValueError("Trip is not active and cannot be completed.")
 
-        # Calculations
-        distance = end_mileage - trip.start_mileage
-        vehicle = self.vehicle_service.get_vehicle_by_id(trip.vehicle_id)
-        fuel_consumed = (distance / 100) * vehicle.normative_consumption if vehicle else None
+        vehicle = conn.execute(
+            "SELECT current_mileage, normative_consumption FROM vehicles WHERE id = ?", (vehicle_id,)
+        ).fetchone()
+        if vehicle and end_mileage < (vehicle[0] or 0):
+            raise ValueError("End mileage cannot be less than the current mileage.")
 
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            try:
-                # 1. Update the trip record
-                cursor.execute(
-                    """
-                    UPDATE trips
-                    SET end_time = ?, end_mileage = ?, end_fuel = ?,
-                        distance = ?, fuel_consumed_calculated = ?,
-                        status = 'completed', notes = ?
-                    WHERE id = ?
-                    """,
-                    (
-                        datetime.now(),
-                        end_mileage,
-                        end_fuel,
-                        distance,
-                        fuel_consumed,
-                        notes,
-                        trip_id,
-                    ),
-                )
-
-                # 2. Update the vehicle's master state
-                self.vehicle_service.update_vehicle_state_for_trip_end(
-                    trip.vehicle_id, end_mileage, end_fuel
-                )
-                conn.commit()
-                return self.get_trip_by_id(trip_id)
-
-            except Exception as e:
-                conn.rollback()
-                raise e
+        # Calculations
+        distance = end_mileage - start_mileage
+        fuel_consumed = (distance / 100) * vehicle[1] if vehicle else None
+
+        conn.execute(
+            """
+            UPDATE trips
+            SET end_time = ?, end_mileage = ?, end_fuel = ?,
+                distance = ?, fuel_consumed_calculated = ?,
+                status = 'completed', notes = ?
+            WHERE id = ?
+            """,
+            (end_time or datetime.now(), end_mileage, end_fuel, distance, fuel_consumed, notes, trip_id),
+        )
+        # The vehicle's master state
+        conn.execute(
+            """
+            UPDATE vehicles
+            SET current_mileage = ?, current_fuel = ?, status = 'available', last_updated = ?
+            WHERE id = ? AND status = 'in_trip'
+            """,
+            (end_mileage, end_fuel, datetime.now(), vehicle_id),
+        )
+        # Running totals of the trip sheet: only this trip's difference
+        self.sheets.record_trip(conn, trip_id)
+        return vehicle_id, distance
@@ -0,0 +1,422 @@
+"""
+Service layer for daily trip sheets (karta drogowa SM-102).
+
+A sheet groups the trips of one vehicle on one day (and one key checkout,
+where the database links trips to key logs). Its totals - trips, km, litres,
+cost, first / last odometer reading - are running sums kept in the
+``trip_sheets`` row. ``trip_sheet_trips`` stores what every trip contributed,
+so recording a trip again (started -> completed) adds only the difference:
+printing or listing sheets never re-reads the trips.
+
+Sheets move ``otwarta`` -> ``zamknięta`` -> ``archiwum``; a closed sheet can
+be reopened, an archived one is final. Trips started with TripService are
+recorded in the same transaction; trips entered by other paths (legacy
+windows, imports) are picked up by ``sync`` for the period being viewed.
+"""
+import logging
+import sqlite3
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from models.employee import Employee
+from models.rows import to_datetime
+from models.trip_sheet import TripSheet, TripSheetLine, trip_sheet_from_row
+from models.vehicle import Vehicle
+from services.cost_service import CostService
+from services.numbering_service import RoadCardNumbering
+from utils import db
+from utils.app_logging import log_operation
+from utils.constants import TRIP_SHEET_STATUS
+
+logger = logging.getLogger(__name__)
+
+OPEN = TRIP_SHEET_STATUS['OPEN']
+CLOSED = TRIP_SHEET_STATUS['CLOSED']
+ARCHIVED = TRIP_SHEET_STATUS['ARCHIVED']
+
+# Allowed status changes
+TRANSITIONS = {
+    OPEN: {CLOSED},
+    CLOSED: {OPEN, ARCHIVED},
+    ARCHIVED: set(),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trip_sheets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sheet_number TEXT NOT NULL UNIQUE,
+    sheet_date DATE NOT NULL,
+    vehicle_id INTEGER NOT NULL,
+    employee_id INTEGER,
+    key_log_id INTEGER,
+    -- otwarta, zamknięta, archiwum
+    status TEXT NOT NULL DEFAULT 'otwarta',
+    start_mileage REAL,
+    end_mileage REAL,
+    trips_count INTEGER NOT NULL DEFAULT 0,
+    total_km REAL NOT NULL DEFAULT 0,
+    total_fuel REAL NOT NULL DEFAULT 0,
+    total_cost REAL NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    closed_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_trip_sheets_vehicle_date ON trip_sheets(vehicle_id, sheet_date);
+CREATE INDEX IF NOT EXISTS idx_trip_sheets_date ON trip_sheets(sheet_date);
+CREATE INDEX IF NOT EXISTS idx_trip_sheets_key_log ON trip_sheets(key_log_id);
+
+CREATE TABLE IF NOT EXISTS trip_sheet_trips (
+    trip_id INTEGER PRIMARY KEY,
+    sheet_id INTEGER NOT NULL REFERENCES trip_sheets(id),
+    -- 0 while the trip is active (its contribution still changes)
+    completed INTEGER NOT NULL DEFAULT 0,
+    start_mileage REAL,
+    end_mileage REAL,
+    km REAL NOT NULL DEFAULT 0,
+    fuel REAL NOT NULL DEFAULT 0,
+    cost REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_trip_sheet_trips_sheet ON trip_sheet_trips(sheet_id, completed)
+"""
+
+# Positional: sheet_date is the model's ``date``
+SHEET_SELECT = ("id, key_log_id, sheet_number, sheet_date, status, created_at, vehicle_id, employee_id, "
+                "start_mileage, end_mileage, trips_count, total_km, total_fuel, total_cost, closed_at")
+
+
+class SheetNumbering(RoadCardNumbering):
+    """Sheet numbers (``KDS/YYYY/NNNN``) - a counter of their own, next to road cards."""
+
+    SERIES = "trip_sheet"
+
+    def __init__(self):
+        super().__init__(table="trip_sheets", column="sheet_number")
+        self.prefix = f"{self.prefix}S"
+
+
+class TripSheetService:
+    """Keeps daily trip sheets and their running totals."""
+
+    def __init__(self, db_path: Path, fuel_prices: Optional[Dict[str, float]] = None):
+        self.db_path = db_path
+        self.costs = CostService(db_path, fuel_prices)
+        self.numbering = SheetNumbering()
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Establishes a database connection."""
+        return db.connect(self.db_path)
+
+    @staticmethod
+    def ensure_schema(conn: sqlite3.Connection):
+        """Creates the sheet tables if they do not exist."""
+        db.execute_schema(conn, SCHEMA)
+
+    # ------------------------------------------------------------------
+    # Recording trips (caller's transaction, no commit)
+    # ------------------------------------------------------------------
+
+    def record_trip(self, conn: sqlite3.Connection, trip_id: int) -> int:
+        """
+        Puts the trip on its sheet (opening one if needed) or updates its
+        contribution. Returns the sheet id. Raises ValueError when the
+        contribution would change on a closed (reopen it first) or archived
+        sheet.
+        """
+        try:
+            return self._record_trip(conn, trip_id, self.costs.layout(conn))
+        except sqlite3.OperationalError as e:
+            if "no such table" not in str(e):
+                raise
+            self.ensure_schema(conn)
+            return self._record_trip(conn, trip_id, self.costs.layout(conn))
+
+    def _record_trip(self, conn: sqlite3.Connection, trip_id: int, layout: Dict[str, object]) -> int:
+        trips = layout["trips"]
+        litres, recorded, estimated = self.costs.trip_fuel_sql(layout)
+        key_log = "t.key_log_id" if "key_log_id" in trips else "NULL"
+        trip = conn.execute(
+            f"""
+            SELECT t.vehicle_id, t.{layout['trip_employee']}, t.{layout['trip_date']}, t.status,
+                   t.start_mileage, t.end_mileage,
+                   COALESCE(t.distance, t.end_mileage - t.start_mileage, 0),
+                   {litres}, COALESCE({recorded}, {estimated}, 0), {key_log}
+            FROM trips t
+            LEFT JOIN vehicles v ON v.id = t.vehicle_id
+            WHERE t.id = :trip_id
+            """,
+            {"trip_id": trip_id, **self.costs.price_params()},
+        ).fetchone()
+        if trip is None:
+            raise ValueError(f"Trip {trip_id} does not exist.")
+        (vehicle_id, employee_id, started, status, start_mileage, end_mileage,
+         km, fuel, cost, key_log_id) = trip
+        if started is None:
+            raise ValueError(f"Trip {trip_id} has no start date.")
+        completed = int(status != "active")
+        if status == "cancelled":
+            km = fuel = cost = 0
+
+        link = conn.execute(
+            "SELECT sheet_id, km, fuel, cost FROM trip_sheet_trips WHERE trip_id = ?", (trip_id,)
+        ).fetchone()
+        if link is None:
+            if key_log_id is None and not completed:
+                key_log_id = self._open_key_log(conn, vehicle_id)
+            sheet_id = self._open_sheet(conn, vehicle_id, employee_id, key_log_id, str(started)[:10])
+            old_km = old_fuel = old_cost = 0
+            new_trips = 1
+        else:
+            sheet_id, old_km, old_fuel, old_cost = link
+            new_trips = 0
+            changed = (km, fuel, cost) != (old_km, old_fuel, old_cost)
+            number, sheet_status = conn.execute(
+                "SELECT sheet_number, status FROM trip_sheets WHERE id = ?", (sheet_id,)
+            ).fetchone()
+            if changed and sheet_status == ARCHIVED:
+                raise ValueError(f"Trip sheet {number} is archived; trip {trip_id} cannot change its totals.")
+            if changed and sheet_status != OPEN:
+                raise ValueError(f"Trip sheet {number} is {sheet_status}; reopen it before changing trip {trip_id}.")
+
+        conn.execute(
+            """
+            INSERT INTO trip_sheet_trips (trip_id, sheet_id, completed, start_mileage, end_mileage, km, fuel, cost)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(trip_id) DO UPDATE SET
+                completed = excluded.completed, start_mileage = excluded.start_mileage,
+                end_mileage = excluded.end_mileage, km = excluded.km, fuel = excluded.fuel, cost = excluded.cost
+            """,
+            (trip_id, sheet_id, completed, start_mileage, end_mileage, km, fuel, cost),
+        )
+        # Only the difference: the sheet total never re-reads its trips
+        conn.execute(
+            """
+            UPDATE trip_sheets SET
+                trips_count = trips_count + :new_trips,
+                total_km = total_km + :km,
+                total_fuel = total_fuel + :fuel,
+                total_cost = total_cost + :cost,
+                start_mileage = COALESCE(MIN(start_mileage, :start), start_mileage, :start),
+                end_mileage = COALESCE(MAX(end_mileage, :end), end_mileage, :end),
+                employee_id = COALESCE(employee_id, :employee)
+            WHERE id = :sheet_id
+            """,
+            {"new_trips": new_trips, "km": km - old_km, "fuel": fuel - old_fuel, "cost": cost - old_cost,
+             "start": start_mileage, "end": end_mileage, "employee": employee_id, "sheet_id": sheet_id},
+        )
+        return sheet_id
+
+    @staticmethod
+    def _open_key_log(conn: sqlite3.Connection, vehicle_id: int) -> Optional[int]:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'key_log'").fetchone():
+            return None
+        row = conn.execute(
+            "SELECT id FROM key_log WHERE vehicle_id = ? AND status = 'out' ORDER BY checkout_time DESC LIMIT 1",
+            (vehicle_id,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _open_sheet(self, conn: sqlite3.Connection, vehicle_id: int, employee_id: Optional[int],
+                    key_log_id: Optional[int], day: str) -> int:
+        """The vehicle's open sheet for the day and key checkout, or a new one."""
+        row = conn.execute(
+            """
+            SELECT id FROM trip_sheets
+            WHERE vehicle_id = ? AND sheet_date = ? AND status = ? AND key_log_id IS ?
+            ORDER BY id DESC LIMIT 1
+            """,
+            (vehicle_id, day, OPEN, key_log_id),
+        ).fetchone()
+        if row:
+            return row[0]
+        number = self.numbering.allocate(conn, int(day[:4]))
+        cursor = conn.execute(
+            """
+            INSERT INTO trip_sheets (sheet_number, sheet_date, vehicle_id, employee_id, key_log_id, status)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (number, day, vehicle_id, employee_id, key_log_id, OPEN),
+        )
+        logger.info(f"Trip sheet {number} opened", extra={"vehicle_id": vehicle_id, "day": day})
+        return cursor.lastrowid
+
+    def sync(self, conn: sqlite3.Connection, date_from: date, date_to: date) -> int:
+        """
+        Records trips of [date_from, date_to] that are not on a sheet yet or
+        were still active when last recorded. Returns the number of trips.
+        """
+        self.ensure_schema(conn)
+        layout = self.costs.layout(conn)
+        column = layout["trip_date"]
+        with log_operation("trip_sheets.sync", logger, date_from=date_from, date_to=date_to) as op:
+            pending = [row[0] for row in conn.execute(
+                f"""
+                SELECT t.id FROM trips t
+                LEFT JOIN trip_sheet_trips s ON s.trip_id = t.id
+                WHERE t.{column} >= ? AND t.{column} < ?
+                  AND (s.trip_id IS NULL OR (s.completed = 0 AND t.status != 'active'))
+                ORDER BY t.{column}, t.id
+                """,
+                (date_from.isoformat(), (date_to + timedelta(days=1)).isoformat()),
+            ).fetchall()]
+            for trip_id in pending:
+                self._record_trip(conn, trip_id, layout)
+            op["rows"] = len(pending)
+        return len(pending)
+
+    # ------------------------------------------------------------------
+    # Status
+    # ------------------------------------------------------------------
+
+    def set_status(self, conn: sqlite3.Connection, sheet_id: int, status: str) -> TripSheet:
+        """
+        Moves the sheet to ``status`` (see TRANSITIONS). A sheet with an
+        active trip cannot be closed. Raises ValueError.
+        """
+        sheet = self.get(conn, sheet_id)
+        if sheet is None:
+            raise ValueError(f"Trip sheet {sheet_id} does not exist.")
+        if status not in TRANSITIONS.get(sheet.status, set()):
+            raise ValueError(f"Trip sheet {sheet.sheet_number} cannot change from {sheet.status} to {status}.")
+        if status == CLOSED:
+            self._refresh_active(conn, sheet_id)
+            active = conn.execute(
+                "SELECT COUNT(*) FROM trip_sheet_trips WHERE sheet_id = ? AND completed = 0", (sheet_id,)
+            ).fetchone()[0]
+            if active:
+                raise ValueError(f"Trip sheet {sheet.sheet_number} has {active} active trip(s).")
+        closed_at = {CLOSED: datetime.now(), OPEN: None}.get(status, sheet.closed_at)
+        with log_operation("trip_sheets.status", logger, sheet_id=sheet_id, status=status):
+            conn.execute("UPDATE trip_sheets SET status = ?, closed_at = ? WHERE id = ?",
+                         (status, closed_at, sheet_id))
+        return self.get(conn, sheet_id)
+
+    def close(self, conn: sqlite3.Connection, sheet_id: int) -> TripSheet:
+        return self.set_status(conn, sheet_id, CLOSED)
+
+    def reopen(self, conn: sqlite3.Connection, sheet_id: int) -> TripSheet:
+        return self.set_status(conn, sheet_id, OPEN)
+
+    def archive(self, conn: sqlite3.Connection, sheet_id: int) -> TripSheet:
+        return self.set_status(conn, sheet_id, ARCHIVED)
+
+    def archive_closed(self, conn: sqlite3.Connection, before: date) -> int:
+        """Archives all closed sheets dated before ``before``. Returns their number."""
+        cursor = conn.execute(
+            "UPDATE trip_sheets SET status = ? WHERE status = ? AND sheet_date < ?",
+            (ARCHIVED, CLOSED, before.isoformat()),
+        )
+        return cursor.rowcount
+
+    def _refresh_active(self, conn: sqlite3.Connection, sheet_id: int):
+        """Re-records trips of the sheet that were active (completed elsewhere since)."""
+        layout = self.costs.layout(conn)
+        for (trip_id,) in conn.execute(
+            "SELECT trip_id FROM trip_sheet_trips WHERE sheet_id = ? AND completed = 0", (sheet_id,)
+        ).fetchall():
+            self._record_trip(conn, trip_id, layout)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def get(self, conn: sqlite3.Connection, sheet_id: int) -> Optional[TripSheet]:
+        cursor = conn.cursor()
+        cursor.row_factory = trip_sheet_from_row
+        return cursor.execute(f"SELECT {SHEET_SELECT} FROM trip_sheets WHERE id = ?", (sheet_id,)).fetchone()
+
+    def find(self, conn: sqlite3.Connection, sheet_number: str) -> Optional[TripSheet]:
+        cursor = conn.cursor()
+        cursor.row_factory = trip_sheet_from_row
+        return cursor.execute(f"SELECT {SHEET_SELECT} FROM trip_sheets WHERE sheet_number = ?",
+                              (sheet_number,)).fetchone()
+
+    def sheets(self, conn: sqlite3.Connection, date_from: date, date_to: date,
+               vehicle_id: Optional[int] = None, status: Optional[str] = None) -> List[TripSheet]:
+        """Sheets of [date_from, date_to] - stored totals only, no trip is read."""
+        sql = f"SELECT {SHEET_SELECT} FROM trip_sheets WHERE sheet_date BETWEEN ? AND ?"
+        params: list = [date_from.isoformat(), date_to.isoformat()]
+        if vehicle_id is not None:
+            sql += " AND vehicle_id = ?"
+            params.append(vehicle_id)
+        if status is not None:
+            sql += " AND status = ?"
+            params.append(status)
+        cursor = conn.cursor()
+        cursor.row_factory = trip_sheet_from_row
+        return cursor.execute(sql + " ORDER BY sheet_date, sheet_number", params).fetchall()
+
+    def lines(self, conn: sqlite3.Connection, sheet_id: int) -> List[TripSheetLine]:
+        """Trips of the sheet, in order (table of the printed sheet)."""
+        layout = self.costs.layout(conn)
+        trips = layout["trips"]
+        origin = next((f"t.{c}" for c in ("start_location", "route") if c in trips), "''")
+        target = [f"t.{c}" for c in ("end_location", "destination") if c in trips]
+        target_sql = f"COALESCE({', '.join(target)}, '')" if target else "''"
+        rows = conn.execute(
+            f"""
+            SELECT t.id, t.{layout['trip_date']}, t.{layout['trip_end']}, {origin}, {target_sql},
+                   t.purpose, s.km, t.notes
+            FROM trip_sheet_trips s
+            JOIN trips t ON t.id = s.trip_id
+            WHERE s.sheet_id = ?
+            ORDER BY t.{layout['trip_date']}, t.id
+            """,
+            (sheet_id,),
+        ).fetchall()
+        return [TripSheetLine(trip_id, to_datetime(start), to_datetime(end), origin or "", target or "",
+                              purpose or "", km, notes)
+                for trip_id, start, end, origin, target, purpose, km, notes in rows]
+
+    def parties(self, conn: sqlite3.Connection, sheet: TripSheet) -> Tuple[Vehicle, Optional[Employee]]:
+        """Vehicle and driver of the sheet, as the PDF header needs them."""
+        layout = self.costs.layout(conn)
+        fuel_type = "fuel_type" if layout["vehicle_fuel_type"] else "NULL"
+        row = conn.execute(
+            f"""
+            SELECT id, registration_number, brand, model, {layout['consumption']}, {fuel_type}, current_mileage
+            FROM vehicles WHERE id = ?
+            """,
+            (sheet.vehicle_id,),
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Vehicle {sheet.vehicle_id} of trip sheet {sheet.sheet_number} does not exist.")
+        vehicle_id, registration, brand, model, consumption, fuel, mileage = row
+        vehicle = Vehicle(vehicle_id, registration or "", brand or "", model or "", consumption or 0,
+                          fuel_type=fuel or "-", current_mileage=mileage or 0)
+
+        people = layout["people"]
+        position = "position" if "position" in self.costs._columns(conn, people) else "''"
+        row = conn.execute(f"SELECT id, first_name, last_name, {position} FROM {people} WHERE id = ?",
+                           (sheet.employee_id,)).fetchone()
+        try:
+            employee = Employee(row[0], row[1], row[2], row[3] or "") if row else None
+        except ValueError:
+            employee = None
+        return vehicle, employee
+
+    def verify(self, conn: sqlite3.Connection, fix: bool = False) -> List[Tuple[int, str]]:
+        """
+        Sheets whose running totals differ from the sum of their trips'
+        contributions, as (sheet id, number). ``fix`` rewrites them.
+        """
+        drifted = conn.execute(
+            """
+            SELECT ts.id, ts.sheet_number, COUNT(s.trip_id), COALESCE(SUM(s.km), 0),
+                   COALESCE(SUM(s.fuel), 0), COALESCE(SUM(s.cost), 0)
+            FROM trip_sheets ts
+            LEFT JOIN trip_sheet_trips s ON s.sheet_id = ts.id
+            GROUP BY ts.id
+            HAVING ts.trips_count != COUNT(s.trip_id)
+                OR ABS(ts.total_km - COALESCE(SUM(s.km), 0)) > 0.001
+                OR ABS(ts.total_fuel - COALESCE(SUM(s.fuel), 0)) > 0.001
+                OR ABS(ts.total_cost - COALESCE(SUM(s.cost), 0)) > 0.001
+            """
+        ).fetchall()
+        if fix:
+            conn.executemany(
+                "UPDATE trip_sheets SET trips_count = ?, total_km = ?, total_fuel = ?, total_cost = ? WHERE id = ?",
+                [(count, km, fuel, cost, sheet_id) for sheet_id, _, count, km, fuel, cost in drifted],
+            )
+        if drifted:
+            logger.warning(f"Trip sheet totals differ on {len(drifted)} sheet(s)")
+        return [(sheet_id, number) for sheet_id, number, *_ in drifted]
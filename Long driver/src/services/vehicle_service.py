@@ -6,9 +6,14 @@ mileage, fuel, or status. It ensures that all operations are valid
 and that the vehicle's state remains consistent.
 """
 import sqlite3
+import logging
 from pathlib import Path
 from datetime import datetime
-from models.vehicle import Vehicle
+from models.vehicle import Vehicle, vehicle_from_row
+from utils import db, fleet_index
+from utils.app_logging import log_operation
+
+logger = logging.getLogger(__name__)
 
 class VehicleService:
     """Manages business logic for vehicles."""
@@ -18,19 +23,15 @@ class VehicleService:
 
     def get_connection(self) -> sqlite3.Connection:
         """Establishes a database connection."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        return db.connect(self.db_path, row_factory=sqlite3.Row)
 
     def get_vehicle_by_id(self, vehicle_id: int) -> Vehicle | None:
         """Retrieves a single vehicle by its ID."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM vehicles WHERE id = ?", (vehicle_id,))
-            row = cursor.fetchone()
-            if row:
-                return Vehicle(**dict(row))
-        return None
+            cursor.row_factory = vehicle_from_row
+            cursor.execute(f"SELECT {vehicle_from_row.select} FROM vehicles WHERE id = ?", (vehicle_id,))
+            return cursor.fetchone()
 
     def get_all_vehicles(self, status_filter: str | None = None) -> list[Vehicle]:
         """
@@ -38,15 +39,15 @@ class VehicleService:
         """
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            query = "SELECT * FROM vehicles ORDER BY registration_number"
+            cursor.row_factory = vehicle_from_row
+            query = f"SELECT {vehicle_from_row.select} FROM vehicles"
             params = []
             if status_filter:
-                query = "SELECT * FROM vehicles WHERE status = ? ORDER BY registration_number"
+                query += " WHERE status = ?"
                 params.append(status_filter)
 
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            return [Vehicle(**dict(row)) for row in rows]
+            cursor.execute(query + " ORDER BY registration_number", params)
+            return cursor.fetchall()
 
     def update_vehicle_state_for_trip_start(self, vehicle_id: int) -> bool:
         """
@@ -65,6 +66,8 @@ class VehicleService:
                 (datetime.now(), vehicle_id),
             )
             conn.commit()
+            if cursor.rowcount:
+                fleet_index.notify(self.db_path, vehicle_id, status="in_trip")
             return cursor.rowcount > 0
 
     def update_vehicle_state_for_trip_end(
@@ -92,6 +95,9 @@ class VehicleService:
                 (end_mileage, end_fuel, datetime.now(), vehicle_id),
             )
             conn.commit()
+            if cursor.rowcount:
+                fleet_index.notify(self.db_path, vehicle_id, status="available",
+                                   current_mileage=end_mileage, current_fuel=end_fuel)
             return cursor.rowcount > 0
 
     def add_fuel_to_vehicle(
@@ -110,9 +116,13 @@ class VehicleService:
         new_fuel_level = vehicle.current_fuel + liters_added
         if vehicle.tank_capacity and new_fuel_level > vehicle.tank_capacity:
             # Maybe just warn instead of raising an error
-            print(f"Warning: Fuel level ({new_fuel_level}L) exceeds tank capacity ({vehicle.tank_capacity}L).")
+            logger.warning(
+                f"Fuel level ({new_fuel_level}L) exceeds tank capacity ({vehicle.tank_capacity}L).",
+                extra={"vehicle_id": vehicle_id},
+            )
 
-        with self.get_connection() as conn:
+        with log_operation("vehicle.fuel", logger, vehicle_id=vehicle_id, liters=liters_added) as op, \
+                self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """
@@ -123,4 +133,63 @@ class VehicleService:
                 (mileage_at_fueling, new_fuel_level, datetime.now(), vehicle_id),
             )
             conn.commit()
+            op["rows"] = cursor.rowcount
+            if cursor.rowcount:
+                fleet_index.notify(self.db_path, vehicle_id, current_mileage=mileage_at_fueling,
+                                   current_fuel=new_fuel_level)
             return cursor.rowcount > 0
+
+    def record_fueling(
+        self, conn: sqlite3.Connection, vehicle_id: int, liters_added: float, mileage_at_fueling: float,
+        fueling_time: datetime | None = None, price_per_liter: float | None = None,
+        total_cost: float | None = None, trip_id: int | None = None, notes: str | None = None,
+    ) -> tuple[int, float]:
+        """
+        Records a fueling event (fueling_logs entry + vehicle fuel and mileage)
+        on the caller's connection, without committing.
+
+        Returns (fueling log id, new fuel level). The caller notifies the
+        fleet index after the commit.
+        """
+        if liters_added <= 0:
+            raise ValueError("Liters added must be positive.")
+        vehicle = conn.execute(
+            "SELECT current_mileage, current_fuel, tank_capacity FROM vehicles WHERE id = ?", (vehicle_id,)
+        ).fetchone()
+        if not vehicle:
+            raise ValueError("Vehicle not found.")
+        current_mileage, current_fuel, tank_capacity = tuple(vehicle)
+        if mileage_at_fueling < (current_mileage or 0):
+            raise ValueError("Mileage at fueling cannot be less than current mileage.")
+
+        new_fuel_level = (current_fuel or 0) + liters_added
+        if tank_capacity and new_fuel_level > tank_capacity:
+            logger.warning(
+                f"Fuel level ({new_fuel_level}L) exceeds tank capacity ({tank_capacity}L).",
+                extra={"vehicle_id": vehicle_id},
+            )
+        if total_cost is None and price_per_liter is not None:
+            total_cost = round(price_per_liter * liters_added, 2)
+
+        with log_operation("vehicle.fuel", logger, vehicle_id=vehicle_id, liters=liters_added) as op:
+            cursor = conn.execute(
+                """
+                INSERT INTO fueling_logs (
+                    vehicle_id, trip_id, fueling_time, mileage_at_fueling, liters_added,
+                    price_per_liter, total_cost, notes
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (vehicle_id, trip_id, fueling_time or datetime.now(), mileage_at_fueling, liters_added,
+                 price_per_liter, total_cost, notes),
+            )
+            op["fueling_log_id"] = fueling_log_id = cursor.lastrowid
+            conn.execute(
+                """
+                UPDATE vehicles
+                SET current_mileage = ?, current_fuel = ?, last_updated = ?
+                WHERE id = ?
+                """,
+                (mileage_at_fueling, new_fuel_level, datetime.now(), vehicle_id),
+            )
+            op["rows"] = 2
+        return fueling_log_id, new_fuel_level
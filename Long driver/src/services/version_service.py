@@ -0,0 +1,197 @@
+"""
+Service layer for optimistic concurrency control of record edits.
+
+Vehicles, employees and key logs carry a ``version`` column. An edit form
+remembers the row as it was loaded (values + version) and saves with a
+conditional ``UPDATE ... SET ..., version = version + 1 WHERE id = ? AND
+version = ?``. When no row matches, someone else changed (or deleted) the
+record in the meantime and ``EditConflict`` is raised with a field-level
+diff of the loaded, entered and current values - nothing is locked while a
+form is open, so desks never wait for each other.
+
+Writers that do not know about versions (trip completion, key checkout,
+batch operations, imports) are covered by an AFTER UPDATE trigger that bumps
+the version whenever an update leaves it unchanged, so an open form cannot
+silently roll back, e.g., the odometer written by a completed trip.
+"""
+import logging
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils import db
+from utils.app_logging import log_operation
+
+logger = logging.getLogger(__name__)
+
+VERSIONED_TABLES = ("vehicles", "employees", "key_log")
+VERSION_COLUMN = "version"
+TRIGGER_PREFIX = "version_"
+
+
+def _same(a: Any, b: Any) -> bool:
+    """Form and database values compare equal (empty text is NULL, 1 == 1.0)."""
+    if a == "":
+        a = None
+    if b == "":
+        b = None
+    return a == b
+
+
+def bump_trigger_sql(table: str) -> str:
+    """Trigger raising the version after updates that did not set it themselves."""
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS {TRIGGER_PREFIX}{table}_bump AFTER UPDATE ON \"{table}\"\n"
+        f"    WHEN NEW.{VERSION_COLUMN} IS OLD.{VERSION_COLUMN}\n"
+        f"BEGIN\n"
+        f"    UPDATE \"{table}\" SET {VERSION_COLUMN} = OLD.{VERSION_COLUMN} + 1 WHERE rowid = NEW.rowid;\n"
+        f"END"
+    )
+
+
+class StaleVersion(ValueError):
+    """The row was changed or deleted since it was read (version mismatch)."""
+
+    def __init__(self, table: str, row_id: int, expected: int, current: Optional[int]):
+        self.table = table
+        self.row_id = row_id
+        self.expected = expected
+        self.current = current
+        if current is None:
+            message = f"{table} {row_id} was deleted in the meantime."
+        else:
+            message = f"{table} {row_id} was changed in the meantime (read version {expected}, now {current})."
+        super().__init__(message)
+
+    @property
+    def deleted(self) -> bool:
+        return self.current is None
+
+
+@dataclass
+class FieldDiff:
+    """One column of a conflicting edit."""
+    column: str
+    base: Any    # value when the form was loaded
+    mine: Any    # value being saved
+    theirs: Any  # value in the database now
+
+    @property
+    def changed_by_me(self) -> bool:
+        return not _same(self.mine, self.base)
+
+    @property
+    def changed_by_them(self) -> bool:
+        return not _same(self.theirs, self.base)
+
+    @property
+    def conflicting(self) -> bool:
+        """Both sides changed the column, to different values."""
+        return self.changed_by_me and self.changed_by_them and not _same(self.mine, self.theirs)
+
+
+class EditConflict(StaleVersion):
+    """A conditional update lost the race; carries the field-level diff."""
+
+    def __init__(self, table: str, row_id: int, expected: int, current_row: Optional[Dict[str, Any]],
+                 fields: List[FieldDiff]):
+        super().__init__(table, row_id, expected, current_row[VERSION_COLUMN] if current_row else None)
+        self.current_row = current_row
+        self.fields = fields
+
+    @property
+    def changed(self) -> List[FieldDiff]:
+        """Columns changed by either side."""
+        return [f for f in self.fields if f.changed_by_me or f.changed_by_them]
+
+    @property
+    def conflicting(self) -> List[FieldDiff]:
+        return [f for f in self.fields if f.conflicting]
+
+    def merged(self, keep_mine: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        Values to save on top of the current row: my changes where only I
+        changed a column, the current values where only they did, and for
+        conflicting columns mine only if listed in ``keep_mine``.
+        """
+        keep_mine = set(keep_mine)
+        values = {}
+        for diff in self.fields:
+            if diff.conflicting:
+                values[diff.column] = diff.mine if diff.column in keep_mine else diff.theirs
+            elif diff.changed_by_me:
+                values[diff.column] = diff.mine
+            else:
+                values[diff.column] = diff.theirs
+        return values
+
+
+class VersionService:
+    """Row versions and conditional updates of edited records."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Establishes a database connection."""
+        return db.connect(self.db_path)
+
+    @staticmethod
+    def ensure_schema(conn: sqlite3.Connection, tables: Iterable[str] = VERSIONED_TABLES) -> List[str]:
+        """
+        Adds the version column and its bump trigger to the tables that exist.
+        Idempotent. Returns the tables that got the column now.
+        """
+        added = []
+        for table in tables:
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info(\"{table}\")")}
+            if not columns:
+                continue
+            if VERSION_COLUMN not in columns:
+                conn.execute(f"ALTER TABLE \"{table}\" ADD COLUMN {VERSION_COLUMN} INTEGER NOT NULL DEFAULT 1")
+                added.append(table)
+            conn.execute(bump_trigger_sql(table))
+        if added:
+            logger.info(f"Row versions added to: {', '.join(added)}")
+        return added
+
+    @staticmethod
+    def load(conn: sqlite3.Connection, table: str, row_id: int,
+             columns: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """``columns`` and the version of one row (the base of an edit), None if missing."""
+        names = list(columns) + [VERSION_COLUMN]
+        row = conn.execute(
+            f"SELECT {', '.join(names)} FROM \"{table}\" WHERE id = ?", (row_id,)
+        ).fetchone()
+        return dict(zip(names, row)) if row else None
+
+    def update(self, conn: sqlite3.Connection, table: str, row_id: int, base: Dict[str, Any],
+               values: Dict[str, Any]) -> int:
+        """
+        Saves ``values`` if the row still has the version of ``base`` (as
+        returned by ``load``). Returns the new version; does not commit.
+
+        Raises EditConflict (with the diff of ``values`` against ``base`` and
+        the current row) when the row was changed or deleted in the meantime.
+        """
+        if not values:
+            raise ValueError("Nothing to save.")
+        expected = base[VERSION_COLUMN]
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        with log_operation("version.update", logger, table=table, row_id=row_id) as op:
+            cursor = conn.execute(
+                f"UPDATE \"{table}\" SET {assignments}, {VERSION_COLUMN} = {VERSION_COLUMN} + 1 "
+                f"WHERE id = ? AND {VERSION_COLUMN} = ?",
+                (*values.values(), row_id, expected),
+            )
+            op["rows"] = cursor.rowcount
+            if cursor.rowcount:
+                return expected + 1
+            current = self.load(conn, table, row_id, values)
+            op["conflict"] = "deleted" if current is None else current[VERSION_COLUMN]
+        fields = [
+            FieldDiff(column, base.get(column), mine, current[column] if current else None)
+            for column, mine in values.items()
+        ]
+        raise EditConflict(table, row_id, expected, current, fields)
@@ -0,0 +1,185 @@
+"""
+Podsystem logowania aplikacji.
+
+- Wątek wywołujący tylko wrzuca rekord do kolejki (QueueHandler); zapis do
+  pliku i na konsolę wykonuje QueueListener w osobnym wątku.
+- Plik logu jest rotowany po przekroczeniu rozmiaru (RotatingFileHandler)
+  i zapisywany w formacie JSON lines (jeden obiekt JSON na linię).
+- Dodatkowe pliki jednego loggera (np. log wolnych zapytań) dołącza
+  ``add_logger_handler`` - też zapisywane w wątku kolejki.
+- ``log_operation`` mierzy czas operacji biznesowej i loguje go razem z
+  liczbą wierszy oraz dodatkowymi polami.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Atrybuty standardowego LogRecord - wszystko poza nimi to pola z ``extra``
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+CONSOLE_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+# Loggery z własnym QueueHandlerem (propagate = False), patrz add_logger_handler
+_routed_loggers: Dict[str, logging.Handler] = {}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formatuje rekord jako pojedynczą linię JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(log_file: str = "logs/app.log", level: str = "INFO",
+                  max_bytes: int = 5 * 1024 * 1024, backup_count: int = 5,
+                  console: bool = True) -> logging.Logger:
+    """
+    Konfiguruje asynchroniczne logowanie (kolejka + wątek zapisujący).
+
+    Args:
+        log_file: Ścieżka pliku logu (JSON lines)
+        level: Poziom logowania
+        max_bytes: Rozmiar pliku, po którym następuje rotacja
+        backup_count: Liczba zachowywanych plików archiwalnych
+        console: Czy wypisywać logi również na konsolę
+
+    Returns:
+        logging.Logger: Logger modułu
+    """
+    global _listener, _queue_handler
+    shutdown_logging()
+
+    handlers = []
+    log_path = Path(log_file)
+    try:
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+        )
+        file_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(file_handler)
+    except OSError as e:
+        sys.stderr.write(f"Nie można otworzyć pliku logu {log_path}: {e}\n")
+
+    if console:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        handlers.append(console_handler)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    root.addHandler(_queue_handler)
+    _listener.start()
+    return logging.getLogger(__name__)
+
+
+def add_logger_handler(logger_name: str, handler: logging.Handler):
+    """
+    Zapisuje rekordy loggera ``logger_name`` także przez ``handler``.
+
+    Przy działającym wątku zapisującym handler trafia do QueueListenera (z
+    filtrem na ten logger), a logger dostaje własny QueueHandler i
+    ``propagate = False`` - wątek wywołujący tylko wrzuca rekord do kolejki,
+    który jak dotąd trafia też do pliku logu i na konsolę. Bez
+    ``setup_logging`` handler jest dołączany do loggera bezpośrednio.
+    """
+    logger = logging.getLogger(logger_name)
+    if _listener is None:
+        logger.addHandler(handler)
+        return
+    handler.addFilter(logging.Filter(logger_name))
+    _listener.handlers = _listener.handlers + (handler,)
+    if logger_name not in _routed_loggers:
+        logger.addHandler(_queue_handler)
+        logger.propagate = False
+        _routed_loggers[logger_name] = _queue_handler
+
+
+def remove_logger_handler(logger_name: str, handler: logging.Handler):
+    """Odłącza i zamyka handler dodany przez ``add_logger_handler``."""
+    logging.getLogger(logger_name).removeHandler(handler)
+    if _listener is not None and handler in _listener.handlers:
+        _listener.handlers = tuple(h for h in _listener.handlers if h is not handler)
+    handler.close()
+
+
+def shutdown_logging():
+    """Opróżnia kolejkę i zatrzymuje wątek zapisujący."""
+    global _listener, _queue_handler
+    for name, routed in _routed_loggers.items():
+        logger = logging.getLogger(name)
+        logger.removeHandler(routed)
+        logger.propagate = True
+    _routed_loggers.clear()
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+@contextmanager
+def log_operation(operation: str, logger: Optional[logging.Logger] = None, **fields):
+    """
+    Mierzy czas operacji i loguje go po jej zakończeniu.
+
+    Przykład::
+
+        with log_operation("trip.start", vehicle_id=vid) as op:
+            ...
+            op["rows"] = cursor.rowcount
+
+    Args:
+        operation: Nazwa operacji (np. "trip.start", "key.checkout")
+        logger: Logger docelowy (domyślnie logger tego modułu)
+        **fields: Dodatkowe pola zapisywane w logu
+
+    Yields:
+        dict: Słownik, do którego można dopisać pola (np. ``rows``)
+    """
+    logger = logger or logging.getLogger(__name__)
+    details: Dict[str, Any] = dict(fields)
+    start = time.perf_counter()
+    try:
+        yield details
+    except Exception as e:
+        details["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        logger.error(f"{operation} nieudane: {e}",
+                     extra={"operation": operation, "status": "error", **details})
+        raise
+    details["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    logger.info(f"{operation} ({details['duration_ms']:.1f} ms)",
+                extra={"operation": operation, "status": "ok", **details})
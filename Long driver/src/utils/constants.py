@@ -39,6 +39,13 @@ DEFAULT_FUEL_PRICES = {
     'Elektryk': 0.0   # do obliczeń
 }
 
+# Progi poziomu paliwa [% baku] - kolory FuelProgressBar i tablica stanu floty
+FUEL_LEVEL_THRESHOLDS = {
+    'GOOD': 70,     # >= zielony
+    'MEDIUM': 40,   # >= pomarańczowy
+    'LOW': 20,      # >= żółty, poniżej - czerwony (niski poziom paliwa)
+}
+
 # ============================================================================
 # UPRAWNIENIA PRACOWNIKÓW
 # ============================================================================
@@ -80,6 +87,21 @@ TRIP_SHEET_STATUS_DISPLAY = {
     'archiwum': 'Archiwum'
 }
 
+# ============================================================================
+# HARMONOGRAM SERWISÓW
+# ============================================================================
+SERVICE_STATUS_DISPLAY = {
+    'overdue': 'Po terminie',
+    'due': 'Wkrótce',
+    'ok': 'OK'
+}
+
+SERVICE_STATUS_COLORS = {
+    'overdue': '#e74c3c',
+    'due': '#f39c12',
+    'ok': '#27ae60'
+}
+
 # ============================================================================
 # ŚCIEŻKI DO FOLDERÓW
 # ============================================================================
@@ -140,6 +162,7 @@ BUSINESS_RULES = {
     'MAX_FUEL_CONSUMPTION': 30.0,         # Maksymalne spalanie [l/100km]
     'MIN_EMPLOYEE_AGE': 18,               # Minimalny wiek pracownika
     'MAX_HOURS_PER_DAY': 12,              # Maksymalna liczba godzin pracy dziennie
+    'RESERVATION_LOOKAHEAD_HOURS': 12,    # Rezerwacje sprawdzane przy wydaniu kluczyka
 }
 
 # ============================================================================
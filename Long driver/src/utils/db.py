@@ -0,0 +1,466 @@
+"""
+Fabryka połączeń SQLite z instrumentacją zapytań.
+
+Każde połączenie otwierane przez ``connect()`` używa kursora, który mierzy
+czas wykonania i liczbę wierszy każdej instrukcji (łącznie z pobieraniem
+wyników). Pomiary trafiają do rejestru ``stats``:
+
+- zapytania są grupowane po znormalizowanym SQL (literały zastąpione ``?``),
+- dla każdego zapytania trzymany jest histogram czasów (kubełki w ms),
+- instrukcje wolniejsze niż próg są zapisywane w logu wolnych zapytań
+  razem z wynikiem ``EXPLAIN QUERY PLAN``.
+
+Gdy instrumentacja jest wyłączona (``database.instrumentation: false``),
+``connect()`` zwraca zwykłe połączenie sqlite3.
+"""
+import bisect
+import logging
+import logging.handlers
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+slow_logger = logging.getLogger("long_driver.slow_sql")
+
+# Górne granice kubełków histogramu [ms]; ostatni kubełek jest otwarty
+BUCKET_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Ten sam plan nie jest ponownie pobierany częściej niż co tyle sekund
+EXPLAIN_INTERVAL_S = 60.0
+
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(sql: str) -> str:
+    """
+    Sprowadza instrukcję do postaci kanonicznej (do grupowania statystyk).
+
+    Usuwa komentarze, zastępuje literały tekstowe i liczbowe znakiem ``?``,
+    zwija listy ``IN (?, ?, ?)`` i nadmiarowe białe znaki.
+    """
+    text = _COMMENT_RE.sub(" ", sql)
+    text = _STRING_RE.sub("?", text)
+    text = _NUMBER_RE.sub("?", text)
+    text = _IN_LIST_RE.sub("(?, ...)", text)
+    return _SPACE_RE.sub(" ", text).strip().rstrip(";").strip()
+
+
+class LatencyHistogram:
+    """Histogram czasów wykonania jednego (znormalizowanego) zapytania."""
+
+    __slots__ = ("count", "total_ms", "min_ms", "max_ms", "rows", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = float("inf")
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+
+    def add(self, duration_ms: float, rows: int):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.min_ms = min(self.min_ms, duration_ms)
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.rows += max(rows, 0)
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS_MS, duration_ms)] += 1
+
+    @property
+    def avg_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """Szacuje percentyl (0-100) jako górną granicę kubełka."""
+        if not self.count:
+            return 0.0
+        threshold = self.count * p / 100.0
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= threshold:
+                if index < len(BUCKET_BOUNDS_MS):
+                    return min(BUCKET_BOUNDS_MS[index], self.max_ms)
+                return self.max_ms
+        return self.max_ms
+
+
+class QueryStats:
+    """Rejestr statystyk zapytań współdzielony przez wszystkie połączenia."""
+
+    def __init__(self, slow_query_ms: float = 100.0, explain_slow: bool = True):
+        self.slow_query_ms = slow_query_ms
+        self.explain_slow = explain_slow
+        self.slow_count = 0
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._explained_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, sql: str, duration_ms: float, rows: int,
+               connection: Optional[sqlite3.Connection] = None, params: Any = None):
+        """Dodaje pomiar; wolne zapytania trafiają do logu z planem wykonania."""
+        normalized = normalize_sql(sql)
+        with self._lock:
+            histogram = self._histograms.get(normalized)
+            if histogram is None:
+                histogram = self._histograms[normalized] = LatencyHistogram()
+            histogram.add(duration_ms, rows)
+            is_slow = duration_ms >= self.slow_query_ms
+            if is_slow:
+                self.slow_count += 1
+
+        if is_slow:
+            self._log_slow(sql, normalized, duration_ms, rows, connection, params)
+
+    def _log_slow(self, sql, normalized, duration_ms, rows, connection, params):
+        plan = None
+        if self.explain_slow and connection is not None:
+            now = time.monotonic()
+            with self._lock:
+                last = self._explained_at.get(normalized)
+                due = last is None or now - last >= EXPLAIN_INTERVAL_S
+                if due:
+                    self._explained_at[normalized] = now
+            if due:
+                plan = explain_query_plan(connection, sql, params)
+        slow_logger.warning(
+            f"Wolne zapytanie ({duration_ms:.1f} ms): {normalized}",
+            extra={"sql": normalized, "duration_ms": round(duration_ms, 2),
+                   "rows": rows, "plan": plan},
+        )
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Zwraca statystyki posortowane malejąco po łącznym czasie."""
+        with self._lock:
+            items = list(self._histograms.items())
+            result = [
+                {
+                    "sql": sql,
+                    "count": h.count,
+                    "total_ms": h.total_ms,
+                    "avg_ms": h.avg_ms,
+                    "min_ms": h.min_ms,
+                    "max_ms": h.max_ms,
+                    "p50_ms": h.percentile(50),
+                    "p95_ms": h.percentile(95),
+                    "rows": h.rows,
+                    "buckets": list(h.buckets),
+                }
+                for sql, h in items
+            ]
+        result.sort(key=lambda item: item["total_ms"], reverse=True)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._explained_at.clear()
+            self.slow_count = 0
+
+
+def explain_query_plan(connection: sqlite3.Connection, sql: str, params: Any = None) -> Optional[str]:
+    """Zwraca ``EXPLAIN QUERY PLAN`` instrukcji jako tekst (drzewo z wcięciami)."""
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    try:
+        # Bezpośrednio przez klasę bazową - plan nie może trafić do statystyk
+        cursor = sqlite3.Connection.execute(
+            connection, "EXPLAIN QUERY PLAN " + sql, params if params is not None else ()
+        )
+        rows = cursor.fetchall()
+    except sqlite3.Error:
+        return None
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _unused, detail in (tuple(row) for row in rows):
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + str(detail))
+    return "\n".join(lines)
+
+
+stats = QueryStats()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Kursor mierzący czas instrukcji.
+
+    Pomiar obejmuje ``execute`` oraz pobieranie wyników; jest zamykany przy
+    wyczerpaniu wyników, kolejnym ``execute``, ``close()`` lub zamknięciu
+    połączenia.
+    """
+
+    _pending = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            self._begin(sql, parameters, time.perf_counter() - start)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        if not isinstance(seq_of_parameters, (list, tuple)):
+            seq_of_parameters = list(seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        finally:
+            first = seq_of_parameters[0] if seq_of_parameters else ()
+            self._begin(sql, first, time.perf_counter() - start)
+        return self
+
+    def executescript(self, sql_script):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            super().executescript(sql_script)
+        finally:
+            stats.record(sql_script, (time.perf_counter() - start) * 1000, 0)
+        return self
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._add_fetch(time.perf_counter() - start, 0 if row is None else 1, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add_fetch(time.perf_counter() - start, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._add_fetch(time.perf_counter() - start, len(rows), True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._add_fetch(time.perf_counter() - start, 0, True)
+            raise
+        self._add_fetch(time.perf_counter() - start, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+    # ------------------------------------------------------------------
+
+    def _begin(self, sql, parameters, elapsed):
+        is_query = self.description is not None
+        rows = 0 if is_query else self.rowcount
+        self._pending = [sql, parameters, elapsed, rows]
+        if not is_query:
+            self._finish()
+
+    def _add_fetch(self, elapsed, rows, exhausted):
+        pending = self._pending
+        if pending is None:
+            return
+        pending[2] += elapsed
+        pending[3] += rows
+        if exhausted:
+            self._finish()
+
+    def _finish(self):
+        pending = self._pending
+        if pending is None:
+            return
+        self._pending = None
+        sql, parameters, elapsed, rows = pending
+        stats.record(sql, elapsed * 1000, rows, self.connection, parameters)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Połączenie, którego kursory (także z ``execute``) są instrumentowane."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cursors = weakref.WeakSet()
+
+    def cursor(self, factory=InstrumentedCursor):
+        cursor = super().cursor(factory)
+        self._cursors.add(cursor)
+        return cursor
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def close(self):
+        # Domknij pomiary, póki można jeszcze pobrać plan zapytania
+        for cursor in list(self._cursors):
+            cursor._finish()
+        super().close()
+
+
+_instrumentation_enabled = True
+
+# Plik bazy -> {nazwa: funkcja(conn)} wołana dla każdego nowego połączenia
+_connect_hooks: Dict[str, Dict[str, Callable[[sqlite3.Connection], None]]] = {}
+
+
+def on_connect(db_path, name: str, hook: Optional[Callable[[sqlite3.Connection], None]]):
+    """
+    Rejestruje funkcję wołaną dla każdego połączenia, które ``connect()``
+    otworzy z plikiem ``db_path`` (np. ustawienia sesji: operator dziennika
+    zmian). Ponowna rejestracja pod tą samą nazwą zastępuje poprzednią,
+    ``hook=None`` ją usuwa.
+    """
+    hooks = _connect_hooks.setdefault(str(Path(db_path).resolve()), {})
+    if hook is None:
+        hooks.pop(name, None)
+    else:
+        hooks[name] = hook
+
+
+def connect(db_path, row_factory=None, **kwargs) -> sqlite3.Connection:
+    """
+    Otwiera połączenie z bazą (instrumentowane, jeśli włączone).
+
+    Args:
+        db_path: Ścieżka do pliku bazy (lub ":memory:")
+        row_factory: Opcjonalna fabryka wierszy (np. sqlite3.Row)
+        **kwargs: Dodatkowe argumenty sqlite3.connect
+
+    Returns:
+        sqlite3.Connection: Połączenie z bazą
+    """
+    if _instrumentation_enabled:
+        kwargs.setdefault("factory", InstrumentedConnection)
+    conn = sqlite3.connect(db_path, **kwargs)
+    if row_factory is not None:
+        conn.row_factory = row_factory
+    if _connect_hooks and db_path != ":memory:":
+        for hook in list(_connect_hooks.get(str(Path(db_path).resolve()), {}).values()):
+            hook(conn)
+    return conn
+
+
+def execute_schema(conn: sqlite3.Connection, sql: str):
+    """
+    Wykonuje skrypt DDL (``CREATE ... IF NOT EXISTS``) instrukcja po instrukcji.
+
+    W odróżnieniu od ``executescript`` nie zatwierdza w połowie otwartej
+    transakcji wywołującego. Skrypt dzielony jest po ";", więc komentarze w
+    nim nie mogą zawierać średnika (a wyzwalacze trzeba wykonywać osobno).
+    """
+    for statement in sql.split(";"):
+        if statement.strip():
+            conn.execute(statement)
+
+
+CHANGES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS table_changes (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+) WITHOUT ROWID
+"""
+
+
+def track_changes(conn: sqlite3.Connection, table: str):
+    """
+    Zakłada licznik zmian tabeli ``table`` w ``table_changes``.
+
+    Wyzwalacze podbijają licznik przy każdym wstawionym, zmienionym i
+    usuniętym wierszu, niezależnie od połączenia, które zapisuje. W
+    odróżnieniu od ``PRAGMA data_version`` licznik nie zmienia się przy
+    zapisach do innych tabel. Nie zatwierdza transakcji; brak tabeli
+    ``table`` jest pomijany.
+    """
+    if not conn.execute(f"PRAGMA table_info({table})").fetchall():
+        return
+    execute_schema(conn, CHANGES_SCHEMA)
+    present = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        name = f"table_changes_{table}_{event.lower()}"
+        if name not in present:
+            conn.execute(
+                f"CREATE TRIGGER {name} AFTER {event} ON {table} BEGIN "
+                f"INSERT INTO table_changes (table_name, version) VALUES ('{table}', 1) "
+                f"ON CONFLICT(table_name) DO UPDATE SET version = version + 1; END"
+            )
+
+
+def change_version(conn: sqlite3.Connection, table: str) -> int:
+    """Bieżąca wartość licznika zmian tabeli (0, gdy jeszcze nie zmieniana)."""
+    try:
+        row = conn.execute("SELECT version FROM table_changes WHERE table_name = ?", (table,)).fetchone()
+    except sqlite3.OperationalError:
+        # Licznik jeszcze nie założony
+        return 0
+    return row[0] if row else 0
+
+
+_slow_log_handler: Optional[logging.Handler] = None
+
+
+def configure(settings: Optional[Dict[str, Any]] = None, base_dir: Optional[Path] = None):
+    """
+    Konfiguruje instrumentację na podstawie sekcji 'database' konfiguracji.
+
+    Args:
+        settings: Słownik z kluczami instrumentation, slow_query_ms,
+            explain_slow_queries, slow_query_log
+        base_dir: Katalog, względem którego rozwiązywana jest ścieżka logu
+    """
+    global _instrumentation_enabled, _slow_log_handler
+    settings = settings or {}
+    _instrumentation_enabled = bool(settings.get("instrumentation", True))
+    stats.slow_query_ms = float(settings.get("slow_query_ms", 100))
+    stats.explain_slow = bool(settings.get("explain_slow_queries", True))
+
+    from .app_logging import JsonLinesFormatter, add_logger_handler, remove_logger_handler
+
+    if _slow_log_handler is not None:
+        remove_logger_handler(slow_logger.name, _slow_log_handler)
+        _slow_log_handler = None
+
+    log_path = settings.get("slow_query_log")
+    if log_path:
+
+        log_path = Path(log_path)
+        if base_dir is not None and not log_path.is_absolute():
+            log_path = Path(base_dir) / log_path
+        try:
+            log_path.parent.mkdir(parents=True, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                log_path, maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8"
+            )
+        except OSError as e:
+            logging.getLogger(__name__).error(f"Nie można otworzyć logu wolnych zapytań {log_path}: {e}")
+            return
+        handler.setFormatter(JsonLinesFormatter())
+        # Zapis pliku w wątku kolejki logów, nie w wątku wykonującym zapytanie
+        add_logger_handler(slow_logger.name, handler)
+        _slow_log_handler = handler
@@ -0,0 +1,333 @@
+"""
+Indeks stanu floty w pamięci procesu.
+
+Listy dostępnych pojazdów w comboboxach oraz przebieg / paliwo wybranego
+pojazdu nie wymagają już zapytania do bazy ani budowania obiektów
+``Vehicle``. Indeks trzyma potrzebne dane w płaskich tablicach (``array``,
+jeden slot na pojazd) oraz po jednym bitsecie (``int``) na status, więc
+"wszystkie dostępne pojazdy" to przejście po ustawionych bitach jednej liczby.
+
+Indeks jest ładowany raz na plik bazy, a potem aktualizowany przez ścieżki
+zapisu (serwisy i okna po ``commit`` wołają ``notify`` / ``refresh`` /
+``remove``). Operacje masowe wołają ``invalidate`` - następny odczyt
+przeładuje wszystko jednym zapytaniem. Każdy odczyt porównuje też licznik
+zmian tabeli ``vehicles`` (``db.track_changes``, podbijany wyzwalaczami):
+zmiana pojazdów spoza ścieżek zapisu - inne stanowisko, skrypt CLI -
+przeładowuje indeks, a zapisy do innych tabel nie. Powiadomienia z procesu
+są wiarygodne: po ``notify`` / ``refresh`` / ``remove`` indeks przyjmuje
+bieżącą wartość licznika zamiast przeładowywać się po własnym zapisie.
+"""
+import math
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from utils import db
+
+LOAD_SQL = """
+    SELECT id, registration_number, brand, model, status,
+           current_mileage, current_fuel, tank_capacity
+    FROM vehicles
+"""
+
+_NO_STATUS = -1
+
+
+class VehicleState(NamedTuple):
+    """Stan jednego pojazdu odczytany z indeksu."""
+    id: int
+    registration_number: str
+    brand: str
+    model: str
+    status: str
+    current_mileage: float
+    current_fuel: float
+    tank_capacity: Optional[float]
+
+    @property
+    def fuel_percent(self) -> Optional[float]:
+        if not self.tank_capacity:
+            return None
+        return min(100.0, max(0.0, self.current_fuel * 100.0 / self.tank_capacity))
+
+
+def _float(value) -> float:
+    return float(value) if value is not None else 0.0
+
+
+class FleetStateIndex:
+    """Tablice: id, status, przebieg, paliwo i pojemność baku pojazdów."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._conn = None
+        self._version: Optional[int] = None
+        self._clear()
+
+    def _clear(self):
+        self._ids = array("q")
+        self._mileage = array("d")
+        self._fuel = array("d")
+        self._tank = array("d")      # NaN = pojemność nieznana
+        self._status = array("h")    # indeks w self._status_names, -1 = wolny slot
+        self._labels: List[tuple] = []   # (nr rej., marka, model) dla slotu
+        self._slot_of: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._status_names: List[str] = []
+        self._status_codes: Dict[str, int] = {}
+        self._bits: List[int] = []   # bitset slotów dla każdego kodu statusu
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def get_connection(self):
+        """Połączenie z bazą"""
+        return db.connect(self.db_path)
+
+    def _connection(self):
+        """Własne, długo żyjące połączenie indeksu (odczyt i licznik zmian)."""
+        if self._conn is None:
+            self._conn = db.connect(self.db_path, check_same_thread=False)
+            db.track_changes(self._conn, "vehicles")
+            self._conn.commit()
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._version = None
+
+    def load(self, conn=None):
+        """Buduje cały indeks jednym zapytaniem."""
+        with self._lock:
+            own = conn is None
+            if own:
+                conn = self._connection()
+                self._version = db.change_version(conn, "vehicles")
+            rows = conn.execute(LOAD_SQL).fetchall()
+            self._clear()
+            for row in rows:
+                self._store(*row)
+            self._loaded = True
+
+    def invalidate(self):
+        """Wymusza pełne przeładowanie przy następnym odczycie (po zmianach masowych)."""
+        with self._lock:
+            self._loaded = False
+
+    def _ensure_loaded(self):
+        if self._loaded and db.change_version(self._connection(), "vehicles") == self._version:
+            return
+        self.load()
+
+    def _adopt_version(self):
+        """Zmiana naniesiona z procesu: bieżący licznik nie wymaga przeładowania."""
+        if self._loaded and self._conn is not None:
+            self._version = db.change_version(self._conn, "vehicles")
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    # ------------------------------------------------------------------
+    # Write side
+    # ------------------------------------------------------------------
+
+    def _code(self, status: str) -> int:
+        code = self._status_codes.get(status)
+        if code is None:
+            code = len(self._status_names)
+            self._status_names.append(status)
+            self._status_codes[status] = code
+            self._bits.append(0)
+        return code
+
+    def _store(self, vehicle_id, registration, brand, model, status, mileage, fuel, tank):
+        slot = self._slot_of.get(vehicle_id)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+                self._ids[slot] = vehicle_id
+            else:
+                slot = len(self._ids)
+                self._ids.append(vehicle_id)
+                self._mileage.append(0.0)
+                self._fuel.append(0.0)
+                self._tank.append(math.nan)
+                self._status.append(_NO_STATUS)
+                self._labels.append(("", "", ""))
+            self._slot_of[vehicle_id] = slot
+        self._set_status(slot, status or "")
+        self._mileage[slot] = _float(mileage)
+        self._fuel[slot] = _float(fuel)
+        self._tank[slot] = float(tank) if tank else math.nan
+        self._labels[slot] = (registration or "", brand or "", model or "")
+
+    def _set_status(self, slot: int, status: str):
+        old = self._status[slot]
+        new = self._code(status)
+        if old == new:
+            return
+        if old != _NO_STATUS:
+            self._bits[old] &= ~(1 << slot)
+        self._bits[new] |= 1 << slot
+        self._status[slot] = new
+
+    def update(self, vehicle_id: int, status: Optional[str] = None,
+               current_mileage: Optional[float] = None, current_fuel: Optional[float] = None,
+               tank_capacity: Optional[float] = None):
+        """
+        Nanosi zatwierdzoną zmianę jednego pojazdu.
+
+        Nieznane id (np. pojazd dodany w innym oknie) unieważnia indeks
+        zamiast zgadywać brakujące kolumny.
+        """
+        with self._lock:
+            if not self._loaded:
+                return
+            slot = self._slot_of.get(vehicle_id)
+            if slot is None:
+                self._loaded = False
+                return
+            if status is not None:
+                self._set_status(slot, status)
+            if current_mileage is not None:
+                self._mileage[slot] = float(current_mileage)
+            if current_fuel is not None:
+                self._fuel[slot] = float(current_fuel)
+            if tank_capacity is not None:
+                self._tank[slot] = float(tank_capacity) if tank_capacity else math.nan
+            self._adopt_version()
+
+    def update_many(self, vehicle_ids, **changes):
+        for vehicle_id in vehicle_ids:
+            self.update(vehicle_id, **changes)
+
+    def refresh_vehicle(self, conn, vehicle_id: int):
+        """Czyta ponownie jeden pojazd (edycja, nowy wiersz, przywrócenie)."""
+        with self._lock:
+            if not self._loaded:
+                return
+            row = conn.execute(LOAD_SQL + " WHERE id = ?", (vehicle_id,)).fetchone()
+            if row is None:
+                self.remove(vehicle_id)
+            else:
+                self._store(*row)
+                self._adopt_version()
+
+    def remove(self, vehicle_id: int):
+        with self._lock:
+            slot = self._slot_of.pop(vehicle_id, None)
+            if slot is None:
+                return
+            code = self._status[slot]
+            if code != _NO_STATUS:
+                self._bits[code] &= ~(1 << slot)
+            self._status[slot] = _NO_STATUS
+            self._free.append(slot)
+            self._adopt_version()
+
+    # ------------------------------------------------------------------
+    # Read side
+    # ------------------------------------------------------------------
+
+    def _state(self, slot: int) -> VehicleState:
+        tank = self._tank[slot]
+        registration, brand, model = self._labels[slot]
+        return VehicleState(
+            self._ids[slot], registration, brand, model,
+            self._status_names[self._status[slot]],
+            self._mileage[slot], self._fuel[slot],
+            None if math.isnan(tank) else tank,
+        )
+
+    @staticmethod
+    def _slots(bits: int) -> Iterator[int]:
+        while bits:
+            low = bits & -bits
+            yield low.bit_length() - 1
+            bits ^= low
+
+    def get(self, vehicle_id: int) -> Optional[VehicleState]:
+        with self._lock:
+            self._ensure_loaded()
+            slot = self._slot_of.get(vehicle_id)
+            return None if slot is None else self._state(slot)
+
+    def count(self, status: str) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            code = self._status_codes.get(status)
+            return 0 if code is None else bin(self._bits[code]).count("1")
+
+    def with_status(self, status: str) -> List[VehicleState]:
+        """Pojazdy o danym statusie, posortowane wg nr rejestracyjnego."""
+        with self._lock:
+            self._ensure_loaded()
+            code = self._status_codes.get(status)
+            if code is None:
+                return []
+            states = [self._state(slot) for slot in self._slots(self._bits[code])]
+        states.sort(key=lambda s: s.registration_number)
+        return states
+
+    def available(self) -> List[VehicleState]:
+        return self.with_status("available")
+
+    def all(self) -> List[VehicleState]:
+        """Wszystkie pojazdy, posortowane wg nr rejestracyjnego."""
+        with self._lock:
+            self._ensure_loaded()
+            states = [self._state(slot) for slot in self._slot_of.values()]
+        states.sort(key=lambda s: s.registration_number)
+        return states
+
+    def fuel_percent(self, vehicle_id: int) -> Optional[float]:
+        state = self.get(vehicle_id)
+        return state.fuel_percent if state else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._slot_of)
+
+
+_indexes: Dict[str, FleetStateIndex] = {}
+_registry_lock = threading.Lock()
+
+
+def get_index(db_path: Path) -> FleetStateIndex:
+    """Wspólny indeks dla pliku bazy (tworzony leniwie, ładowany przy pierwszym odczycie)."""
+    key = str(Path(db_path).resolve())
+    with _registry_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = FleetStateIndex(db_path)
+        return index
+
+
+def notify(db_path: Path, vehicle_id: int, **changes):
+    """Ścieżka zapisu: nanosi zmianę pojazdu, jeśli indeks dla ``db_path`` istnieje."""
+    index = _indexes.get(str(Path(db_path).resolve()))
+    if index is not None:
+        index.update(vehicle_id, **changes)
+
+
+def refresh(db_path: Path, conn, vehicle_id: int):
+    """Ścieżka zapisu: ponowny odczyt pojazdu na połączeniu ``conn`` (po commit)."""
+    index = _indexes.get(str(Path(db_path).resolve()))
+    if index is not None:
+        index.refresh_vehicle(conn, vehicle_id)
+
+
+def invalidate(db_path: Path):
+    """Ścieżka zapisu dla zmian masowych."""
+    index = _indexes.get(str(Path(db_path).resolve()))
+    if index is not None:
+        index.invalidate()
@@ -8,17 +8,29 @@ import logging
 from pathlib import Path
 from typing import Dict, Any
 
-def setup_logging():
-    """Konfiguruje system logowania"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('app.log', encoding='utf-8'),
-            logging.StreamHandler(sys.stdout)
-        ]
+def setup_logging(config: Dict[str, Any] = None):
+    """
+    Konfiguruje system logowania (asynchronicznie, z rotacją, JSON lines).
+
+    Args:
+        config: Konfiguracja aplikacji (sekcja 'logging'); domyślnie z load_config()
+    """
+    from .app_logging import setup_logging as setup_async_logging
+
+    if config is None:
+        config = load_config()
+    log_config = config.get('logging', {})
+    log_file = Path(log_config.get('path', 'logs/app.log'))
+    if not log_file.is_absolute():
+        log_file = get_project_root() / log_file
+
+    return setup_async_logging(
+        log_file=str(log_file),
+        level=log_config.get('level', 'INFO'),
+        max_bytes=int(log_config.get('max_bytes', 5 * 1024 * 1024)),
+        backup_count=int(log_config.get('backup_count', 5)),
+        console=log_config.get('console', True),
     )
-    return logging.getLogger(__name__)
 
 def setup_directories():
     """
@@ -71,16 +83,38 @@ def load_config(config_path: str = "config.yaml") -> Dict[str, Any]:
             'path': 'database/fleet.db',
             'backup_path': 'backup/',
             'backup_interval_hours': 24,
-            'max_backup_files': 30
+            'max_backup_files': 30,
+            'instrumentation': True,
+            'slow_query_ms': 100,
+            'explain_slow_queries': True,
+            'slow_query_log': 'logs/slow_queries.log'
         },
         'pdf': {
             'output_path': 'reports/pdf/',
             'default_font': 'Helvetica',
             'font_size': 10
         },
+        'logging': {
+            'path': 'logs/app.log',
+            'level': 'INFO',
+            'max_bytes': 5 * 1024 * 1024,
+            'backup_count': 5,
+            'console': True
+        },
+        'profiling': {
+            'enabled': False,
+            'overlay': False,
+            'stall_ms': 100,
+            'cprofile_slowest': 5,
+            'dump_dir': 'logs/profiles'
+        },
         'ui': {
             'theme': 'light',
-            'font_size': 12
+            'font_size': 12,
+            'prewarm_tabs': True,
+            'prewarm_order': ['keys', 'trips', 'employees', 'reports'],
+            'prewarm_delay_ms': 800,
+            'prewarm_modules': []
         }
     }
     
@@ -0,0 +1,188 @@
+"""
+Profiler czasu uruchamiania aplikacji (tryb --profile-startup).
+
+Mierzy czas importu każdego modułu (podobnie jak ``python -X importtime``)
+oraz czas poszczególnych etapów inicjalizacji (QApplication, MainWindow,
+pierwsza zakładka). Gdy profiler nie jest włączony, ``stage()`` nic nie robi.
+"""
+import sys
+import time
+from contextlib import contextmanager
+from typing import List, Optional, TextIO
+
+
+class _ImportRecord:
+    """Pomiar pojedynczego importu."""
+
+    __slots__ = ("name", "depth", "start", "cumulative", "children")
+
+    def __init__(self, name: str, depth: int, start: float):
+        self.name = name
+        self.depth = depth
+        self.start = start
+        self.cumulative = 0.0
+        self.children = 0.0
+
+    @property
+    def self_time(self) -> float:
+        return max(0.0, self.cumulative - self.children)
+
+
+class _TimingLoader:
+    """Opakowuje loader modułu i mierzy czas wykonania exec_module."""
+
+    def __init__(self, loader, profiler: "StartupProfiler", record: _ImportRecord):
+        self._loader = loader
+        self._profiler = profiler
+        self._record = record
+
+    def create_module(self, spec):
+        create = getattr(self._loader, "create_module", None)
+        return create(spec) if create else None
+
+    def exec_module(self, module):
+        # Przywróć oryginalny loader, żeby moduł nie zależał od profilera
+        module.__loader__ = self._loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self._loader
+        self._profiler._push(self._record)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._pop(self._record)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class _TimingFinder:
+    """Finder w sys.meta_path, który podstawia _TimingLoader."""
+
+    def __init__(self, profiler: "StartupProfiler"):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path=None, target=None):
+        start = time.perf_counter()
+        for finder in sys.meta_path:
+            if finder is self:
+                continue
+            find_spec = getattr(finder, "find_spec", None)
+            if find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader is None or not hasattr(spec.loader, "exec_module"):
+                return spec
+            record = _ImportRecord(fullname, len(self._profiler._stack), start)
+            spec.loader = _TimingLoader(spec.loader, self._profiler, record)
+            return spec
+        return None
+
+
+class StartupProfiler:
+    """Zbiera czasy importów i etapów inicjalizacji."""
+
+    def __init__(self):
+        self.imports: List[_ImportRecord] = []
+        self.stages: List[tuple] = []
+        self._stack: List[_ImportRecord] = []
+        self._finder = _TimingFinder(self)
+        self._started = time.perf_counter()
+
+    def install(self):
+        """Rejestruje finder mierzący importy."""
+        if self._finder not in sys.meta_path:
+            sys.meta_path.insert(0, self._finder)
+
+    def uninstall(self):
+        """Usuwa finder z sys.meta_path."""
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+
+    def _push(self, record: _ImportRecord):
+        self._stack.append(record)
+
+    def _pop(self, record: _ImportRecord):
+        if self._stack and self._stack[-1] is record:
+            self._stack.pop()
+        record.cumulative = time.perf_counter() - record.start
+        if self._stack:
+            self._stack[-1].children += record.cumulative
+        self.imports.append(record)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mierzy czas etapu inicjalizacji."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, start - self._started, time.perf_counter() - start))
+
+    def format_report(self, min_ms: float = 1.0, top: int = 25) -> str:
+        """Zwraca raport tekstowy: importy (drzewo + najwolniejsze) i etapy."""
+        lines = ["=" * 70, "PROFIL URUCHAMIANIA", "=" * 70]
+        lines.append("import time:  self [ms] | cumulative [ms] | moduł")
+        for rec in self.imports:
+            if rec.cumulative * 1000 < min_ms:
+                continue
+            lines.append(
+                f"import time: {rec.self_time * 1000:9.1f} | {rec.cumulative * 1000:15.1f} | "
+                f"{'  ' * rec.depth}{rec.name}"
+            )
+
+        lines.append("-" * 70)
+        lines.append(f"Najwolniejsze moduły (self, top {top}):")
+        for rec in sorted(self.imports, key=lambda r: r.self_time, reverse=True)[:top]:
+            lines.append(f"  {rec.self_time * 1000:9.1f} ms  {rec.name}")
+
+        total_imports = sum(r.cumulative for r in self.imports if r.depth == 0)
+        lines.append("-" * 70)
+        lines.append("Etapy inicjalizacji:   start [ms] | czas [ms] | etap")
+        for name, offset, duration in self.stages:
+            lines.append(f"  {offset * 1000:20.1f} | {duration * 1000:9.1f} | {name}")
+        lines.append("-" * 70)
+        lines.append(f"Importy łącznie: {total_imports * 1000:.1f} ms "
+                     f"({len(self.imports)} modułów)")
+        lines.append(f"Od startu profilera: {(time.perf_counter() - self._started) * 1000:.1f} ms")
+        lines.append("=" * 70)
+        return "\n".join(lines)
+
+
+_active: Optional[StartupProfiler] = None
+
+
+def enable() -> StartupProfiler:
+    """Włącza profilowanie uruchamiania (idempotentne)."""
+    global _active
+    if _active is None:
+        _active = StartupProfiler()
+        _active.install()
+    return _active
+
+
+def is_enabled() -> bool:
+    return _active is not None
+
+
+@contextmanager
+def stage(name: str):
+    """Mierzy etap inicjalizacji, jeśli profiler jest włączony."""
+    if _active is None:
+        yield
+        return
+    with _active.stage(name):
+        yield
+
+
+def finish(stream: Optional[TextIO] = None) -> Optional[str]:
+    """Wypisuje raport, wyłącza profiler i zwraca tekst raportu."""
+    global _active
+    if _active is None:
+        return None
+    profiler, _active = _active, None
+    profiler.uninstall()
+    report = profiler.format_report()
+    (stream or sys.stderr).write(report + "\n")
+    return report
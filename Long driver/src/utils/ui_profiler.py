@@ -0,0 +1,175 @@
+"""
+Profilowanie gorących ścieżek GUI (bez zależności od Qt).
+
+- ``@profile_slot`` mierzy czas wywołania slotu (np. ``load_vehicles``) i
+  zapisuje go w histogramie per slot,
+- najwolniejsze N wywołań może być dodatkowo nagranych przez cProfile
+  (``profiling.cprofile_slowest``) i zapisanych do plików .prof,
+- ``record_stall`` przyjmuje przestoje pętli zdarzeń wykryte przez
+  ``gui.stall_monitor`` (wraz ze slotem/zdarzeniem, które wtedy trwało).
+
+Gdy profilowanie jest wyłączone, dekorator wywołuje funkcję bezpośrednio.
+"""
+import cProfile
+import functools
+import heapq
+import io
+import itertools
+import logging
+import pstats
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .db import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+
+class UiProfiler:
+    """Rejestr czasów slotów, przestojów i nagranych profili."""
+
+    def __init__(self):
+        self.enabled = False
+        self.stall_ms = 100.0
+        self.cprofile_slowest = 0
+        self.slots: Dict[str, LatencyHistogram] = {}
+        self.stalls: List[Dict[str, Any]] = []
+        self.max_stalls = 200
+        # (nazwa, czas [ms], moment zakończenia wg perf_counter)
+        self.last_slot: Optional[tuple] = None
+        # Stos aktualnie wykonywanych slotów (wątek GUI)
+        self.active: List[str] = []
+        # Kopiec (czas, nr, nazwa, profil) - najwolniejsze wywołania
+        self._captures: List[tuple] = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def configure(self, settings: Optional[Dict[str, Any]] = None):
+        """Ustawia profiler z sekcji 'profiling' konfiguracji."""
+        settings = settings or {}
+        self.enabled = bool(settings.get("enabled", False))
+        self.stall_ms = float(settings.get("stall_ms", 100))
+        self.cprofile_slowest = int(settings.get("cprofile_slowest", 0))
+
+    @property
+    def current_activity(self) -> Optional[str]:
+        return self.active[-1] if self.active else None
+
+    def record_slot(self, name: str, duration_ms: float, profile: Optional[cProfile.Profile] = None):
+        with self._lock:
+            histogram = self.slots.get(name)
+            if histogram is None:
+                histogram = self.slots[name] = LatencyHistogram()
+            histogram.add(duration_ms, 0)
+            self.last_slot = (name, duration_ms, time.perf_counter())
+            if profile is not None:
+                entry = (duration_ms, next(self._counter), name, profile)
+                if len(self._captures) < self.cprofile_slowest:
+                    heapq.heappush(self._captures, entry)
+                elif self._captures and duration_ms > self._captures[0][0]:
+                    heapq.heapreplace(self._captures, entry)
+        if duration_ms >= self.stall_ms:
+            logger.warning(f"Wolny slot {name}: {duration_ms:.1f} ms",
+                           extra={"slot": name, "duration_ms": round(duration_ms, 2)})
+
+    def record_stall(self, duration_ms: float, activity: Optional[str] = None,
+                     stack: Optional[str] = None):
+        """Zapisuje przestój pętli zdarzeń (wywoływane przez monitor GUI)."""
+        stall = {
+            "at": time.time(),
+            "duration_ms": round(duration_ms, 2),
+            "activity": activity,
+            "stack": stack,
+        }
+        with self._lock:
+            self.stalls.append(stall)
+            del self.stalls[:-self.max_stalls]
+        logger.warning(f"Przestój GUI {duration_ms:.0f} ms ({activity or 'nieznane'})",
+                       extra={"stall_ms": stall["duration_ms"], "activity": activity,
+                              "stack": stack})
+
+    def slowest_captures(self) -> List[tuple]:
+        """Nagrane profile (czas, nazwa, profil) od najwolniejszego."""
+        with self._lock:
+            captures = sorted(self._captures, reverse=True)
+        return [(ms, name, profile) for ms, _n, name, profile in captures]
+
+    def dump_profiles(self, directory, top_functions: int = 15) -> List[Path]:
+        """Zapisuje nagrane profile do plików .prof i loguje skrót każdego."""
+        captures = self.slowest_captures()
+        if not captures:
+            return []
+        out_dir = Path(directory)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        paths = []
+        for index, (duration_ms, name, profile) in enumerate(captures, start=1):
+            path = out_dir / f"{stamp}_{index:02d}_{name.replace('.', '_')}.prof"
+            profile.dump_stats(str(path))
+            paths.append(path)
+            text = io.StringIO()
+            pstats.Stats(profile, stream=text).sort_stats("cumulative").print_stats(top_functions)
+            logger.info(f"Profil {name} ({duration_ms:.1f} ms) zapisany: {path}",
+                        extra={"slot": name, "duration_ms": round(duration_ms, 2),
+                               "profile": text.getvalue()})
+        return paths
+
+    def summary(self) -> Dict[str, Any]:
+        """Krótki stan do wyświetlenia w pasku statusu."""
+        with self._lock:
+            worst_stall = max((s["duration_ms"] for s in self.stalls), default=0.0)
+            return {
+                "last_slot": self.last_slot,
+                "stall_count": len(self.stalls),
+                "worst_stall_ms": worst_stall,
+                "slots": {name: (h.count, h.avg_ms, h.max_ms) for name, h in self.slots.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self.slots.clear()
+            self.stalls.clear()
+            self._captures.clear()
+            self.last_slot = None
+
+
+profiler = UiProfiler()
+
+
+def profile_slot(func=None, *, name: Optional[str] = None):
+    """
+    Dekorator slotu GUI: mierzy czas wywołania (gdy profilowanie włączone).
+
+    Użycie::
+
+        @profile_slot
+        def load_vehicles(self): ...
+
+        @profile_slot(name="TripWindow.refresh")
+        def refresh_trips_table(self): ...
+    """
+    if func is None:
+        return functools.partial(profile_slot, name=name)
+
+    slot_name = name or func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not profiler.enabled:
+            return func(*args, **kwargs)
+        # cProfile tylko dla najbardziej zewnętrznego slotu (profile się nie zagnieżdżają)
+        profile = cProfile.Profile() if profiler.cprofile_slowest > 0 and not profiler.active else None
+        profiler.active.append(slot_name)
+        start = time.perf_counter()
+        try:
+            if profile is not None:
+                return profile.runcall(func, *args, **kwargs)
+            return func(*args, **kwargs)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            profiler.active.pop()
+            profiler.record_slot(slot_name, duration_ms, profile)
+
+    return wrapper
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Odczyty z lokalizatorów (licznik, poziom paliwa) - import i nasłuch - oraz
+ślady GPS przejazdów.
+
+Przykłady:
+    python telematics.py ingest odczyty.csv odczyty_2.ndjson
+    python telematics.py ingest - < odczyty.ndjson          # NDJSON ze stdin
+    python telematics.py listen --port 5055                 # linie JSON lub pojazd;czas;licznik;paliwo
+    python telematics.py downsample --days 30
+    python telematics.py track-import --trip 41 przejazd_41.gpx      # także CSV: lat;lon;czas
+    python telematics.py track-check --from 2026-05-01 --to 2026-05-31
+
+Ustawienia domyślne: sekcja telematics w config.yaml.
+"""
+
+import argparse
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+# Dodaj ścieżkę src do PYTHONPATH
+sys.path.append(str(Path(__file__).parent / 'src'))
+
+from services.import_service import ImportFileError  # noqa: E402
+from services.telematics_service import (  # noqa: E402
+    DEFAULT_BATCH_SIZE, DEFAULT_BUCKET_SECONDS, DEFAULT_DOWNSAMPLE_DAYS, DEFAULT_FLUSH_RETRIES,
+    DEFAULT_MAX_SPEED_KMH, DEFAULT_UNKNOWN_RELOAD_SECONDS, IngestResult, TelematicsListener, TelematicsService, iter_file_readings, iter_ndjson_readings,
+)
+from services.track_service import (  # noqa: E402
+    DEFAULT_TOLERANCE_KM, DEFAULT_TOLERANCE_PCT, TrackService, iter_track_points,
+)
+from utils import db  # noqa: E402
+from utils.helpers import load_config, setup_logging  # noqa: E402
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Odczyty telematyczne: licznik i paliwo pojazdów")
+    parser.add_argument("--db", type=Path, default=Path(__file__).parent / "database" / "fleet.db",
+                        help="ścieżka do bazy danych")
+    parser.add_argument("--batch-size", type=int, help="odczytów na transakcję (telematics.batch_size)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="import z plików CSV / NDJSON")
+    ingest.add_argument("files", nargs="+", help="pliki (.csv, .ndjson, .jsonl); '-' = NDJSON ze stdin")
+
+    listen = commands.add_parser("listen", help="nasłuch TCP (jeden odczyt na linię)")
+    listen.add_argument("--host", help="adres (telematics.listen_host)")
+    listen.add_argument("--port", type=int, help="port (telematics.listen_port)")
+
+    downsample = commands.add_parser("downsample", help="przerzedź stare odczyty")
+    downsample.add_argument("--days", type=int, help="starsze niż tyle dni (telematics.downsample_after_days)")
+    downsample.add_argument("--bucket", type=int, help="jeden odczyt na tyle sekund (telematics.bucket_seconds)")
+
+    track_import = commands.add_parser("track-import", help="zapisz ślad GPS przejazdu (GPX, CSV, NDJSON)")
+    track_import.add_argument("--trip", type=int, required=True, help="id przejazdu")
+    track_import.add_argument("file", type=Path, help="plik śladu")
+
+    track_check = commands.add_parser("track-check", help="porównaj dystans GPS z licznikiem")
+    track_check.add_argument("--from", dest="date_from", type=date.fromisoformat, help="od dnia (RRRR-MM-DD)")
+    track_check.add_argument("--to", dest="date_to", type=date.fromisoformat, help="do dnia (RRRR-MM-DD)")
+    track_check.add_argument("--all", action="store_true", help="pokaż też przejazdy bez rozbieżności")
+    return parser.parse_args(argv)
+
+
+def print_result(label: str, result: IngestResult, seconds: float):
+    rate = result.received / seconds if seconds > 0 else 0
+    print(f"{label}: odczytów {result.received}, zapisano {result.stored}, "
+          f"powtórzonych {result.duplicates}, odrzucono {result.rejected_total}, "
+          f"pojazdów zaktualizowano {result.vehicles_updated} ({rate:,.0f} odczytów/s)")
+    for reason, count in result.rejected.most_common():
+        print(f"   ⚠️ {reason}: {count}")
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    config = load_config(str(Path(__file__).parent / "config.yaml"))
+    setup_logging(config)
+    db.configure(config.get("database"), base_dir=Path(__file__).parent)
+    settings = config.get("telematics") or {}
+
+    if not args.db.exists():
+        print(f"❌ Baza nie istnieje: {args.db}")
+        return 2
+
+    service = TelematicsService(
+        args.db,
+        batch_size=args.batch_size or int(settings.get("batch_size", DEFAULT_BATCH_SIZE)),
+        max_speed_kmh=float(settings.get("max_speed_kmh", DEFAULT_MAX_SPEED_KMH)),
+        unknown_reload_seconds=float(settings.get("unknown_reload_seconds", DEFAULT_UNKNOWN_RELOAD_SECONDS)),
+    )
+
+    if args.command == "ingest":
+        failed = False
+        for name in args.files:
+            started = time.perf_counter()
+            try:
+                records = iter_ndjson_readings(sys.stdin) if name == "-" else iter_file_readings(Path(name))
+                result = service.ingest(records)
+            except (ImportFileError, OSError, ValueError) as e:
+                print(f"❌ {name}: {e}")
+                failed = True
+                continue
+            print_result(f"✅ {name}", result, time.perf_counter() - started)
+        return 1 if failed else 0
+
+    if args.command == "track-import":
+        started = time.perf_counter()
+        try:
+            summary = TrackService(args.db).save_track(args.trip, iter_track_points(args.file))
+        except (ImportFileError, OSError, ValueError) as e:
+            print(f"❌ {args.file}: {e}")
+            return 1
+        print(f"✅ Przejazd {summary.trip_id}: punktów {summary.points}, {summary.distance_km:.1f} km, "
+              f"{summary.size_bytes} B ({time.perf_counter() - started:.2f} s)")
+        return 0
+
+    if args.command == "track-check":
+        checks = TrackService(args.db).cross_check(
+            args.date_from, args.date_to,
+            tolerance_pct=float(settings.get("track_tolerance_pct", DEFAULT_TOLERANCE_PCT)),
+            tolerance_km=float(settings.get("track_tolerance_km", DEFAULT_TOLERANCE_KM)),
+        )
+        flagged = [check for check in checks if check.flagged]
+        for check in checks if args.all else flagged:
+            percent = "" if check.difference_pct is None else f" ({check.difference_pct:+.1f}%)"
+            print(f"{'⚠️' if check.flagged else '✅'} {check.trip_date} {check.trip_number or check.trip_id} "
+                  f"{check.registration_number or check.vehicle_id}: licznik {check.odometer_km:.1f} km, "
+                  f"GPS {check.gps_km:.1f} km, różnica {check.difference_km:+.1f} km{percent}")
+        print(f"Sprawdzono przejazdów: {len(checks)}, rozbieżności: {len(flagged)}")
+        return 1 if flagged else 0
+
+    if args.command == "downsample":
+        deleted = service.downsample(
+            after_days=args.days or int(settings.get("downsample_after_days", DEFAULT_DOWNSAMPLE_DAYS)),
+            bucket_seconds=args.bucket or int(settings.get("bucket_seconds", DEFAULT_BUCKET_SECONDS)),
+        )
+        print(f"✅ Usunięto odczytów: {deleted}")
+        return 0
+
+    address = (args.host or settings.get("listen_host", "127.0.0.1"),
+               args.port or int(settings.get("listen_port", 5055)))
+    listener = TelematicsListener(service, address, float(settings.get("flush_seconds", 1.0)),
+                                  flush_retries=int(settings.get("flush_retries", DEFAULT_FLUSH_RETRIES)))
+    print(f"📡 Nasłuch odczytów na {address[0]}:{address[1]} (Ctrl+C kończy)")
+    started = time.perf_counter()
+    with listener:
+        try:
+            listener.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    if listener.failed:
+        print_result("❌ Zapis odczytów nie powiódł się, nasłuch zatrzymany", listener.ingestor.result,
+                     time.perf_counter() - started)
+        return 1
+    print_result("✅ Zakończono", listener.ingestor.result, time.perf_counter() - started)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
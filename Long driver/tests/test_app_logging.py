@@ -0,0 +1,91 @@
+"""
+Tests for the asynchronous JSON-lines logging setup.
+"""
+import json
+import logging
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils import app_logging, db
+from utils.app_logging import log_operation, setup_logging, shutdown_logging
+
+
+class TestAppLogging(unittest.TestCase):
+    """Queue-based logging and operation timing."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.log_file = Path(self.tmp.name) / "logs" / "app.log"
+
+        root = logging.getLogger()
+        saved_handlers, saved_level = root.handlers[:], root.level
+        root.handlers = []
+
+        def restore():
+            shutdown_logging()
+            root.handlers = saved_handlers
+            root.setLevel(saved_level)
+        self.addCleanup(restore)
+
+        setup_logging(str(self.log_file), level="INFO", console=False)
+
+    def read_entries(self):
+        shutdown_logging()  # flushes the queue and closes the file
+        with open(self.log_file, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def test_operation_is_logged_as_json_line(self):
+        logger = logging.getLogger("test.ops")
+        with log_operation("trip.start", logger, vehicle_id=7) as op:
+            op["rows"] = 1
+
+        entries = self.read_entries()
+        self.assertEqual(len(entries), 1)
+        entry = entries[0]
+        self.assertEqual(entry["operation"], "trip.start")
+        self.assertEqual(entry["status"], "ok")
+        self.assertEqual(entry["vehicle_id"], 7)
+        self.assertEqual(entry["rows"], 1)
+        self.assertGreaterEqual(entry["duration_ms"], 0)
+        self.assertEqual(entry["logger"], "test.ops")
+
+    def test_failed_operation_is_logged_and_reraised(self):
+        with self.assertRaises(ValueError):
+            with log_operation("key.return", logging.getLogger("test.ops")):
+                raise ValueError("brak wpisu")
+
+        entry = self.read_entries()[0]
+        self.assertEqual(entry["status"], "error")
+        self.assertEqual(entry["level"], "ERROR")
+        self.assertIn("brak wpisu", entry["msg"])
+
+    def test_setup_replaces_previous_listener(self):
+        """Calling setup twice must not duplicate handlers on the root logger."""
+        setup_logging(str(self.log_file), console=False)
+        queue_handlers = [h for h in logging.getLogger().handlers
+                          if h is app_logging._queue_handler]
+        self.assertEqual(len(queue_handlers), 1)
+        logging.getLogger("test.ops").info("jeden wpis")
+        self.assertEqual(len(self.read_entries()), 1)
+
+    def test_slow_query_log_written_by_listener(self):
+        slow_file = Path(self.tmp.name) / "logs" / "slow.log"
+        db.configure({"slow_query_log": str(slow_file)})
+        self.addCleanup(db.configure, {})
+        self.assertFalse(db.slow_logger.propagate)
+        self.assertNotIn(db._slow_log_handler, db.slow_logger.handlers)
+        self.assertIn(db._slow_log_handler, app_logging._listener.handlers)
+
+        db.slow_logger.warning("Wolne zapytanie", extra={"sql": "SELECT 1"})
+        logging.getLogger("test.ops").info("zwykły wpis")
+        entries = self.read_entries()
+        self.assertEqual([e["msg"] for e in entries], ["Wolne zapytanie", "zwykły wpis"])
+        with open(slow_file, encoding="utf-8") as f:
+            self.assertEqual([json.loads(line)["sql"] for line in f], ["SELECT 1"])
+        self.assertTrue(db.slow_logger.propagate)
+
+
+if __name__ == '__main__':
+    unittest.main()
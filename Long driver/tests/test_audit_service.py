@@ -0,0 +1,143 @@
+"""
+Tests for the trigger-based change audit log.
+"""
+import sqlite3
+import tempfile
+import unittest
+from datetime import date, datetime
+from pathlib import Path
+
+from services.audit_service import APPEND_ONLY, AuditService, format_changes
+from services.key_service import KeyService
+from utils import db
+
+
+class TestAuditService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = Path(self.tmp.name) / "fleet.db"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE vehicles (
+                    id INTEGER PRIMARY KEY, registration_number TEXT, current_mileage REAL,
+                    current_fuel REAL, tank_capacity REAL, status TEXT, last_updated TIMESTAMP
+                );
+                CREATE TABLE key_log (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, vehicle_id INTEGER, employee_id INTEGER,
+                    checkout_time TIMESTAMP, return_time TIMESTAMP, checkout_mileage REAL,
+                    return_mileage REAL, checkout_fuel REAL, return_fuel REAL,
+                    storage_location TEXT, status TEXT DEFAULT 'out', notes TEXT
+                );
+                INSERT INTO vehicles VALUES (1, 'WA 100', 1000, 40, 60, 'available', NULL);
+            """)
+        self.service = AuditService(self.db_path)
+        self.conn = db.connect(self.db_path)
+        self.addCleanup(self.conn.close)
+        self.assertEqual(self.service.install(self.conn), ["vehicles", "key_log"])
+        self.service.set_operator(self.conn, "jan")
+        self.conn.commit()
+
+    def test_changes_are_recorded(self):
+        keys = KeyService(self.db_path)
+        key_log_id = keys.checkout(self.conn, 1, 7, 1000, 40, datetime(2026, 5, 4, 7))
+        self.conn.commit()
+        self.service.set_operator(self.conn, "anna")
+        keys.return_key(self.conn, key_log_id, 1120, 25, datetime(2026, 5, 4, 15), "A1")
+        self.conn.commit()
+        # Nothing audited changed / rolled back: no entries
+        self.conn.execute("UPDATE vehicles SET last_updated = '2026-05-05' WHERE id = 1")
+        self.conn.execute("UPDATE vehicles SET current_fuel = 0 WHERE id = 1")
+        self.conn.rollback()
+
+        history = self.service.vehicle_history(self.conn, 1)
+        self.assertEqual([(e.table_name, e.action, e.operator) for e in history],
+                         [("vehicles", "U", "anna"), ("key_log", "U", "anna"),
+                          ("vehicles", "U", "jan"), ("key_log", "I", "jan")])
+        returned = history[0]
+        self.assertEqual(returned.changes["current_mileage"], (1000, 1120))
+        self.assertEqual(returned.changes["status"], ("in_use", "available"))
+        self.assertNotIn("registration_number", returned.changes)
+        self.assertIn("current_mileage: 1000.0 → 1120.0", format_changes(returned.changes))
+        self.assertEqual(self.service.history(self.conn, "key_log", key_log_id)[1].changes["vehicle_id"], (None, 1))
+
+        self.assertEqual(len(self.service.search(self.conn, column="current_mileage")), 1)
+        self.assertEqual(len(self.service.search(self.conn, table="key_log", operator="jan")), 1)
+        self.assertEqual(self.service.search(self.conn, date_to=date(2000, 1, 1)), [])
+        page = self.service.vehicle_history(self.conn, 1, limit=3)
+        self.assertEqual(len(self.service.vehicle_history(self.conn, 1, before_id=page[-1].id)), 1)
+
+    def test_append_only(self):
+        self.conn.execute("DELETE FROM vehicles WHERE id = 1")
+        self.conn.commit()
+        [deleted] = self.service.vehicle_history(self.conn, 1)
+        self.assertEqual((deleted.action, deleted.changes["registration_number"]), ("D", ("WA 100", None)))
+        with self.assertRaises(sqlite3.DatabaseError):
+            self.conn.execute("DELETE FROM audit_log")
+        with self.assertRaises(sqlite3.DatabaseError):
+            self.conn.execute("UPDATE audit_log SET operator = 'x'")
+
+    def test_operator_per_desk(self):
+        # Two desks on one file: each write keeps the operator of the desk that made it
+        desk = db.connect(self.db_path)
+        self.addCleanup(desk.close)
+        self.service.set_operator(desk, "anna")
+        self.conn.execute("UPDATE vehicles SET current_fuel = 30 WHERE id = 1")
+        self.conn.commit()
+        desk.execute("UPDATE vehicles SET current_fuel = 20 WHERE id = 1")
+        desk.commit()
+        self.conn.execute("UPDATE vehicles SET current_fuel = 10 WHERE id = 1")
+        self.conn.commit()
+        self.assertEqual([e.operator for e in self.service.vehicle_history(self.conn, 1)], ["jan", "anna", "jan"])
+
+        # register_operator: every connection the application opens
+        self.service.register_operator("ewa")
+        self.addCleanup(self.service.register_operator, None)
+        with db.connect(self.db_path) as other:
+            other.execute("UPDATE vehicles SET current_fuel = 5 WHERE id = 1")
+        other.close()
+        self.assertEqual(self.service.vehicle_history(self.conn, 1)[0].operator, "ewa")
+        # Guards are stored as defined, so ensure_schema leaves them alone
+        stored = dict(self.conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'audit_log'"))
+        self.assertEqual(stored, APPEND_ONLY)
+
+    def test_plain_connections_and_archive(self):
+        # Scripts / external tools that do not use db.connect still write (operator unknown)
+        self.service.set_operator(self.conn, None)
+        self.conn.commit()
+        with sqlite3.connect(self.db_path) as plain:
+            plain.execute("UPDATE vehicles SET current_fuel = 10 WHERE id = 1")
+        plain.close()
+        [entry] = self.service.vehicle_history(self.conn, 1)
+        self.assertIsNone(entry.operator)
+
+        archive = Path(self.tmp.name) / "archive.db"
+        self.assertEqual(self.service.archive(self.conn, date(2000, 1, 1), archive), 0)
+        self.assertEqual(self.service.archive(self.conn, date(2100, 1, 1), archive), 1)
+        self.assertEqual(self.service.vehicle_history(self.conn, 1), [])
+        with sqlite3.connect(archive) as archived:
+            self.assertEqual(archived.execute("SELECT changes FROM audit_log").fetchall(),
+                             [('{"current_fuel":[40.0,10.0]}',)])
+        archived.close()
+        # Append-only again afterwards
+        self.conn.execute("UPDATE vehicles SET current_fuel = 20 WHERE id = 1")
+        with self.assertRaises(sqlite3.DatabaseError):
+            self.conn.execute("DELETE FROM audit_log")
+
+    def test_install_follows_columns(self):
+        self.service.install(self.conn)
+        count = self.conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'").fetchone()[0]
+        self.assertEqual(count, 9)                       # 2 tables x 3 + 3 append-only
+        self.conn.execute("ALTER TABLE vehicles ADD COLUMN vin TEXT")
+        self.service.install(self.conn)
+        self.conn.execute("UPDATE vehicles SET vin = 'VF1' WHERE id = 1")
+        self.assertEqual(self.service.vehicle_history(self.conn, 1)[0].changes, {"vin": (None, "VF1")})
+        self.assertEqual(self.service.uninstall(self.conn), 6)
+        self.conn.execute("UPDATE vehicles SET vin = 'VF2' WHERE id = 1")
+        self.assertEqual(len(self.service.vehicle_history(self.conn, 1)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Tests for batch (multi-select) operations and their undo snapshots.
+"""
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from services.batch_service import BatchService
+
+
+class TestBatchService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = Path(self.tmp.name) / "fleet.db"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE vehicles (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, registration_number TEXT UNIQUE,
+                    fuel_type TEXT, fuel_consumption REAL, status TEXT
+                );
+                CREATE TABLE employees (id INTEGER PRIMARY KEY AUTOINCREMENT, last_name TEXT, is_active INTEGER);
+            """)
+            conn.executemany(
+                "INSERT INTO vehicles (registration_number, fuel_type, fuel_consumption, status) VALUES (?, ?, ?, ?)",
+                [(f"WA{i}", "Diesel", 7.0, "available") for i in range(1, 1201)],
+            )
+        self.service = BatchService(self.db_path)
+
+    def query(self, sql):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def test_status_change_for_large_selection(self):
+        ids = list(range(1, 1101))  # more than SQLite's host parameter limit
+        snapshot = self.service.update("vehicles", ids, {"status": "service"})
+        self.assertEqual(len(snapshot.rows), 1100)
+        self.assertEqual(self.query("SELECT status, COUNT(*) FROM vehicles GROUP BY status"),
+                         [("available", 100), ("service", 1100)])
+
+    def test_status_change_skips_vehicles_out_on_the_road(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE key_log (id INTEGER PRIMARY KEY, vehicle_id INTEGER, status TEXT);
+                CREATE TABLE trips (id INTEGER PRIMARY KEY, vehicle_id INTEGER, status TEXT);
+                INSERT INTO key_log (vehicle_id, status) VALUES (1, 'out'), (2, 'returned');
+                INSERT INTO trips (vehicle_id, status) VALUES (3, 'active'), (4, 'completed');
+                UPDATE vehicles SET status = 'in_use' WHERE id IN (1, 3);
+            """)
+        snapshot = self.service.update("vehicles", [1, 2, 3, 4], {"status": "available"})
+        self.assertEqual((snapshot.ids, snapshot.skipped), ([2, 4], [1, 3]))
+        self.assertEqual(self.query("SELECT id, status FROM vehicles WHERE id <= 4"),
+                         [(1, "in_use"), (2, "available"), (3, "in_use"), (4, "available")])
+        # Other columns are still changed in bulk
+        self.assertEqual(self.service.update("vehicles", [1, 3], {"fuel_type": "LPG"}).skipped, [])
+
+    def test_undo_update_skips_rows_changed_since(self):
+        self.service.update("vehicles", [1, 2], {"status": "service"})  # earlier state: service
+        snapshot = self.service.update("vehicles", [1, 2, 3], {"fuel_type": "LPG", "fuel_consumption": 9.5})
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE vehicles SET fuel_consumption = 8 WHERE id = 3")
+
+        self.assertEqual(self.service.undo(snapshot), [1, 2])
+        self.assertEqual(self.query("SELECT id, fuel_type, fuel_consumption, status FROM vehicles WHERE id <= 3"),
+                         [(1, "Diesel", 7.0, "service"), (2, "Diesel", 7.0, "service"), (3, "LPG", 8.0, "available")])
+
+    def test_delete_and_undo_restores_ids(self):
+        snapshot = self.service.delete("vehicles", [5, 6, 999])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM vehicles"), [(1197,)])
+        self.assertEqual(sorted(self.service.undo(snapshot)), [5, 6, 999])
+        self.assertEqual(self.query("SELECT registration_number FROM vehicles WHERE id = 999"), [("WA999",)])
+
+    def test_rejects_columns_and_values(self):
+        with self.assertRaises(ValueError):
+            self.service.update("vehicles", [1], {"registration_number": "X"})
+        with self.assertRaises(ValueError):
+            self.service.update("vehicles", [1], {"status": "lost"})
+        with self.assertRaises(ValueError):
+            self.service.delete("trips", [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -55,7 +55,7 @@ class TestCoreLogic(unittest.TestCase):
                 CREATE TABLE trips (
                     id INTEGER PRIMARY KEY, vehicle_id INTEGER NOT NULL, driver_id INTEGER NOT NULL,
                     start_time TEXT NOT NULL, start_mileage REAL NOT NULL, start_fuel REAL NOT NULL,
-                    route TEXT NOT NULL, purpose TEXT, status TEXT NOT NULL, road_card_number TEXT,
+                    route TEXT NOT NULL, purpose TEXT, status TEXT NOT NULL, trip_number TEXT,
                     end_time TEXT, end_mileage REAL, end_fuel REAL,
                     distance REAL, fuel_consumed_calculated REAL, notes TEXT
                 );
@@ -95,6 +95,9 @@ class TestCoreLogic(unittest.TestCase):
         self.assertEqual(new_trip.start_mileage, initial_mileage)
         self.assertEqual(new_trip.start_fuel, initial_fuel)
 
+        # Assert that a road-card number was allocated in the same transaction
+        self.assertRegex(new_trip.trip_number, r"^KD/\d{4}/0001$")
+
         # Assert that the vehicle's status was updated
         updated_vehicle = self.vehicle_service.get_vehicle_by_id(1)
         self.assertIsNotNone(updated_vehicle)
@@ -0,0 +1,110 @@
+"""
+Tests for the operating cost engine.
+"""
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+
+from services.cost_service import CostService, month_ranges
+
+TODAY = date(2026, 6, 15)
+
+
+class TestCostService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = Path(self.tmp.name) / "fleet.db"
+        # fleet.db layout after update_schema.py (toll / other costs on trips)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE vehicles (
+                    id INTEGER PRIMARY KEY, registration_number TEXT, fuel_type TEXT, fuel_consumption REAL
+                );
+                CREATE TABLE employees (
+                    id INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT, department TEXT
+                );
+                CREATE TABLE trips (
+                    id INTEGER PRIMARY KEY, vehicle_id INTEGER, employee_id INTEGER, start_date TIMESTAMP,
+                    distance REAL, fuel_used REAL, calculated_fuel REAL, fuel_cost REAL, fuel_type TEXT,
+                    avg_consumption REAL, status TEXT, toll_costs REAL, other_costs REAL
+                );
+                INSERT INTO vehicles VALUES (1, 'WA100', 'Diesel', 6.0), (2, 'WB200', 'Benzyna', 8.0);
+                INSERT INTO employees VALUES (1, 'Jan', 'Nowak', 'Handel'), (2, 'Anna', 'Kowal', NULL);
+                INSERT INTO trips (vehicle_id, employee_id, start_date, distance, fuel_used, fuel_cost,
+                                   status, toll_costs, other_costs) VALUES
+                    -- recorded cost
+                    (1, 1, '2026-05-03 08:00:00', 100, 6, 40.0, 'completed', 12.5, 0),
+                    -- no cost, 10 l used -> 10 x 6.20
+                    (1, 2, '2026-05-20 08:00:00', 150, 10, NULL, 'completed', 0, 8),
+                    -- no cost, no litres -> 200 km x 8 l/100 km x 6.50
+                    (2, 1, '2026-06-02 08:00:00', 200, NULL, NULL, 'completed', 0, 0),
+                    (2, 1, '2026-06-03 08:00:00', 500, NULL, 999, 'cancelled', 0, 0);
+            """)
+        self.service = CostService(self.db_path)
+
+    def test_month_ranges(self):
+        self.assertEqual(month_ranges(date(2026, 4, 10), date(2026, 6, 30)), [
+            ("2026-04", date(2026, 4, 10), date(2026, 5, 1), False),
+            ("2026-05", date(2026, 5, 1), date(2026, 6, 1), True),
+            ("2026-06", date(2026, 6, 1), date(2026, 7, 1), True),
+        ])
+
+    def test_report_rollups(self):
+        report = self.service.report(date(2026, 5, 1), date(2026, 6, 30), today=TODAY)
+        fleet = report.fleet
+        self.assertAlmostEqual(fleet.fuel, 40 + 62 + 104)
+        self.assertAlmostEqual(fleet.estimated, 62 + 104)
+        self.assertAlmostEqual(fleet.tolls, 12.5)
+        self.assertAlmostEqual(fleet.other, 8)
+        self.assertEqual(fleet.km, 450)
+
+        vehicles = {t.label: t for t in report.by_vehicle}
+        self.assertAlmostEqual(vehicles["WA100"].total, 122.5)
+        self.assertAlmostEqual(vehicles["WA100"].cost_per_km, 122.5 / 250)
+        employees = {t.label: t for t in report.by_employee}
+        self.assertAlmostEqual(employees["Jan Nowak"].total, 156.5)
+        departments = {t.label: t.total for t in report.by_department}
+        self.assertAlmostEqual(departments["Handel"], 156.5)
+        self.assertAlmostEqual(departments["(bez działu)"], 70)
+        self.assertEqual([t.label for t in report.by_month], ["2026-05", "2026-06"])
+
+    def test_closed_month_is_cached(self):
+        first = self.service.report(date(2026, 5, 1), date(2026, 6, 30), today=TODAY)
+        self.assertEqual(first.cached_months, [])
+        second = self.service.report(date(2026, 5, 1), date(2026, 6, 30), today=TODAY)
+        self.assertEqual(second.cached_months, ["2026-05"])
+        self.assertAlmostEqual(second.fleet.total, first.fleet.total)
+
+        # A correction in place recomputes the month; June stays cached
+        self.service.report(date(2026, 6, 1), date(2026, 6, 30), today=date(2026, 7, 15))
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE trips SET toll_costs = 100 WHERE id = 1")
+        third = self.service.report(date(2026, 5, 1), date(2026, 6, 30), today=date(2026, 7, 15))
+        self.assertEqual(third.cached_months, ["2026-06"])
+        self.assertAlmostEqual(third.fleet.tolls, 100)
+
+        # So does a cancellation, a late trip and moving a trip to another month
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE trips SET status = 'cancelled' WHERE id = 1")
+        self.assertAlmostEqual(self.service.report(date(2026, 5, 1), date(2026, 5, 31), today=TODAY).fleet.fuel, 62)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("INSERT INTO trips (vehicle_id, employee_id, start_date, distance, fuel_cost, status) "
+                         "VALUES (1, 1, '2026-05-30 08:00:00', 10, 5, 'completed')")
+        fourth = self.service.report(date(2026, 5, 1), date(2026, 5, 31), today=TODAY)
+        self.assertEqual(fourth.cached_months, [])
+        self.assertAlmostEqual(fourth.fleet.fuel, 62 + 5)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE trips SET start_date = '2026-04-30 08:00:00' WHERE id = 2")
+        self.assertAlmostEqual(self.service.report(date(2026, 5, 1), date(2026, 5, 31), today=TODAY).fleet.fuel, 5)
+
+        self.service.invalidate(["2026-05"])
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM cost_periods WHERE month = '2026-05'").fetchone()[0],
+                             0)
+
+if __name__ == "__main__":
+    unittest.main()
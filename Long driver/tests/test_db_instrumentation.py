@@ -0,0 +1,103 @@
+"""
+Tests for the instrumented SQLite connection factory.
+"""
+import logging
+import sqlite3
+import unittest
+
+from utils import db
+from utils.db import LatencyHistogram, normalize_sql
+
+
+class TestNormalizeSql(unittest.TestCase):
+
+    def test_literals_and_whitespace(self):
+        sql = """
+            SELECT * FROM vehicles  -- komentarz
+            WHERE status = 'available' AND id IN (1, 2, 3) AND mileage > 10.5
+        """
+        self.assertEqual(
+            normalize_sql(sql),
+            "SELECT * FROM vehicles WHERE status = ? AND id IN (?, ...) AND mileage > ?",
+        )
+
+    def test_identifiers_with_digits_are_kept(self):
+        self.assertEqual(normalize_sql("SELECT t1.id FROM t1;"), "SELECT t1.id FROM t1")
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for _ in range(99):
+            histogram.add(0.3, 1)
+        histogram.add(300.0, 1)
+        self.assertEqual(histogram.count, 100)
+        # Górna granica kubełka (0.25, 0.5]
+        self.assertEqual(histogram.percentile(50), 0.5)
+        self.assertEqual(histogram.percentile(100), 300.0)
+        self.assertEqual(histogram.rows, 100)
+
+
+class TestInstrumentedConnection(unittest.TestCase):
+
+    def setUp(self):
+        db.stats.reset()
+        self.addCleanup(db.stats.reset)
+        self.conn = db.connect(":memory:", row_factory=sqlite3.Row)
+        self.addCleanup(self.conn.close)
+        self.conn.execute("CREATE TABLE vehicles (id INTEGER PRIMARY KEY, status TEXT)")
+        self.conn.executemany("INSERT INTO vehicles (status) VALUES (?)",
+                              [("available",), ("in_use",), ("available",)])
+
+    def by_sql(self):
+        return {item["sql"]: item for item in db.stats.snapshot()}
+
+    def test_select_rows_counted_on_fetch(self):
+        for status in ("available", "in_use"):
+            self.conn.execute("SELECT * FROM vehicles WHERE status = ?", (status,)).fetchall()
+
+        entry = self.by_sql()["SELECT * FROM vehicles WHERE status = ?"]
+        self.assertEqual(entry["count"], 2)
+        self.assertEqual(entry["rows"], 3)
+        self.assertEqual(self.by_sql()["INSERT INTO vehicles (status) VALUES (?)"]["rows"], 3)
+
+    def test_unfinished_cursor_recorded_on_close(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM vehicles")
+        self.assertEqual(cursor.fetchone()[0], 3)
+        self.assertNotIn("SELECT COUNT(*) FROM vehicles", self.by_sql())
+        self.conn.close()
+        self.assertEqual(self.by_sql()["SELECT COUNT(*) FROM vehicles"]["count"], 1)
+
+    def test_slow_query_logged_with_plan(self):
+        db.stats.slow_query_ms = 0
+        self.addCleanup(setattr, db.stats, "slow_query_ms", 100.0)
+        with self.assertLogs("long_driver.slow_sql", level=logging.WARNING) as logs:
+            self.conn.execute("SELECT * FROM vehicles WHERE id = ?", (1,)).fetchall()
+        record = logs.records[-1]
+        self.assertEqual(record.sql, "SELECT * FROM vehicles WHERE id = ?")
+        self.assertIn("vehicles", record.plan)
+        self.assertGreaterEqual(db.stats.slow_count, 1)
+
+
+class TestExecuteSchema(unittest.TestCase):
+
+    def test_runs_statements_inside_callers_transaction(self):
+        conn = sqlite3.connect(":memory:")
+        self.addCleanup(conn.close)
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+        db.execute_schema(conn, """
+            CREATE TABLE IF NOT EXISTS a (id INTEGER);
+            CREATE INDEX IF NOT EXISTS idx_a ON a(id);
+        """)
+        self.assertTrue(conn.in_transaction)
+        # Nothing was committed half-way: the rollback undoes the insert and the DDL
+        conn.rollback()
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM t").fetchone()[0], 0)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'a'").fetchone()[0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Tests for the in-memory fleet state index.
+"""
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from services.batch_service import BatchService
+from utils import fleet_index
+from utils.fleet_index import FleetStateIndex
+
+
+class TestFleetStateIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = Path(self.tmp.name) / "fleet.db"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE vehicles (
+                    id INTEGER PRIMARY KEY, registration_number TEXT, brand TEXT, model TEXT,
+                    status TEXT, current_mileage REAL, current_fuel REAL, tank_capacity REAL
+                );
+                INSERT INTO vehicles VALUES
+                    (1, 'WB200', 'Ford', 'Focus', 'available', 1000, 30, 60),
+                    (2, 'WA100', 'Skoda', 'Octavia', 'available', 2000, 10, NULL),
+                    (3, 'WC300', 'Opel', 'Astra', 'service', 3000, 45, 50);
+            """)
+        self.index = FleetStateIndex(self.db_path)
+        self.addCleanup(self.index.close)
+
+    def test_status_lists_and_details(self):
+        self.assertEqual([s.registration_number for s in self.index.available()], ["WA100", "WB200"])
+        self.assertEqual(self.index.count("service"), 1)
+        self.assertEqual(self.index.count("broken"), 0)
+        state = self.index.get(1)
+        self.assertEqual((state.current_mileage, state.current_fuel), (1000.0, 30.0))
+        self.assertEqual(self.index.fuel_percent(1), 50.0)
+        self.assertIsNone(self.index.fuel_percent(2))
+
+    def test_updates_move_vehicle_between_bitsets(self):
+        self.index.available()
+        self.index.update(1, status="in_use", current_mileage=1100, current_fuel=25)
+        self.assertEqual([s.id for s in self.index.available()], [2])
+        self.assertEqual([s.id for s in self.index.with_status("in_use")], [1])
+        self.assertEqual(self.index.get(1).current_mileage, 1100.0)
+
+    def test_removed_slot_is_reused(self):
+        self.index.available()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DELETE FROM vehicles WHERE id = 2")
+        self.index.remove(2)
+        self.assertIsNone(self.index.get(2))
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("INSERT INTO vehicles VALUES (4, 'WD400', 'Kia', 'Ceed', 'available', 0, 0, 45)")
+            self.index.refresh_vehicle(conn, 4)
+        self.assertEqual([s.id for s in self.index.available()], [1, 4])
+        self.assertEqual(len(self.index), 3)
+
+    def test_unknown_id_and_batch_write_path(self):
+        shared = fleet_index.get_index(self.db_path)
+        self.assertIs(shared, fleet_index.get_index(str(self.db_path)))
+        self.assertEqual(shared.count("available"), 2)
+
+        BatchService(self.db_path).update("vehicles", [1, 2, 3], {"status": "service"})
+        self.assertEqual(shared.count("service"), 3)
+
+        shared.update(99, status="available")   # not in the index - reload on next read
+        self.assertFalse(shared.loaded)
+        self.assertEqual(shared.count("service"), 3)
+        shared.close()
+
+    def test_reloads_after_commit_by_another_connection(self):
+        self.assertEqual(self.index.count("available"), 2)
+        # A write that bypassed notify / refresh (another desk, a CLI script)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE vehicles SET status = 'service', current_mileage = 1500 WHERE id = 1")
+        self.assertEqual(self.index.count("available"), 1)
+        self.assertEqual(self.index.get(1).current_mileage, 1500.0)
+
+    def test_only_vehicle_changes_reload(self):
+        loads = []
+        load = self.index.load
+        self.index.load = lambda conn=None: (loads.append(1), load(conn))
+        self.assertEqual(self.index.count("available"), 2)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE notes (id INTEGER PRIMARY KEY, text TEXT)")
+        for number in range(100):
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("INSERT INTO notes (text) VALUES (?)", (f"note {number}",))
+        self.assertEqual(self.index.count("available"), 2)
+        self.assertEqual(len(loads), 1)
+
+        # A write announced through notify does not reload either
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE vehicles SET status = 'in_use' WHERE id = 1")
+        self.index.update(1, status="in_use")
+        self.assertEqual(self.index.count("available"), 1)
+        self.assertEqual(len(loads), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Tests for the fleet status snapshot used by the dashboard panel.
+"""
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from services.fleet_status_service import FleetStatusService
+
+SCHEMA = """
+CREATE TABLE employees (id INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT, is_active INTEGER DEFAULT 1);
+CREATE TABLE vehicles (
+    id INTEGER PRIMARY KEY, registration_number TEXT, status TEXT,
+    current_fuel REAL, tank_capacity REAL
+);
+CREATE TABLE key_log (
+    id INTEGER PRIMARY KEY, vehicle_id INTEGER, employee_id INTEGER,
+    checkout_time TIMESTAMP, return_time TIMESTAMP, status TEXT DEFAULT 'out'
+);
+CREATE TABLE trips (id INTEGER PRIMARY KEY, vehicle_id INTEGER, start_date TIMESTAMP, end_date TIMESTAMP);
+"""
+
+
+class TestFleetStatusService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = Path(self.tmp.name) / "fleet.db"
+        self.writer = sqlite3.connect(self.db_path)
+        self.addCleanup(self.writer.close)
+        self.writer.executescript(SCHEMA)
+
+        old = (datetime.now() - timedelta(hours=30)).strftime("%Y-%m-%d %H:%M:%S")
+        recent = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.writer.executescript(f"""
+            INSERT INTO employees (is_active) VALUES (1), (1), (0);
+            INSERT INTO vehicles (registration_number, status, current_fuel, tank_capacity) VALUES
+                ('WA1', 'available', 50, 60),
+                ('WA2', 'in_use', 5, 60),
+                ('WA3', 'in_use', 30, 60),
+                ('WA4', 'broken', 1, NULL),
+                ('WA5', 'inuse', 40, 60),
+                ('WA6', 'in_trip', 40, 60);
+            INSERT INTO key_log (vehicle_id, employee_id, checkout_time, status) VALUES
+                (2, 1, '{old}', 'out'),
+                (3, 2, '{recent}', 'out'),
+                (1, 1, '{old}', 'returned');
+            INSERT INTO trips (vehicle_id, start_date, end_date) VALUES
+                (2, '{old}', NULL), (1, '{old}', '{recent}');
+        """)
+        self.service = FleetStatusService(self.db_path, overdue_hours=12)
+        self.addCleanup(self.service.close)
+
+    def test_snapshot_counters(self):
+        snapshot = self.service.get_snapshot()
+        self.assertEqual(snapshot.vehicles_by_status,
+                         {"available": 1, "in_use": 2, "in_trip": 1, "service": 0, "broken": 1})
+        self.assertEqual(snapshot.vehicles_total, 6)
+        self.assertEqual(snapshot.vehicles_other, 1)
+        self.assertEqual(snapshot.low_fuel, 1)  # 5/60 L; WA4 has no tank capacity
+        self.assertEqual(snapshot.open_key_logs, 2)
+        self.assertEqual(snapshot.overdue_returns, 1)
+        self.assertEqual(snapshot.active_trips, 1)
+        self.assertEqual((snapshot.employees_active, snapshot.employees_inactive), (2, 1))
+        # Open trips come from the partial index created on connect
+        with sqlite3.connect(self.db_path) as conn:
+            plan = " ".join(row[-1] for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT COUNT(*) FROM trips WHERE end_date IS NULL"))
+        conn.close()
+        self.assertIn("idx_trips_open", plan)
+
+    def test_refresh_only_after_commit_elsewhere(self):
+        self.assertIsNotNone(self.service.refresh())
+        self.assertIsNone(self.service.refresh())
+
+        self.writer.execute("UPDATE vehicles SET status = 'service' WHERE id = 1")
+        self.writer.commit()
+
+        snapshot = self.service.refresh()
+        self.assertIsNotNone(snapshot)
+        self.assertEqual(snapshot.vehicles_by_status["service"], 1)
+
+    def test_refresh_when_snapshot_is_old(self):
+        self.service.refresh()
+        self.service.max_age_seconds = 0
+        self.assertIsNotNone(self.service.refresh())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Tests for fuel card statement import and reconciliation.
+"""
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+
+from services.fuel_card_service import FuelCardService, _merge_by_vehicle
+from services.import_service import ImportFileError
+
+
+class TestFuelCardService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        self.db_path = self.root / "fleet.db"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE vehicles (id INTEGER PRIMARY KEY, registration_number TEXT, tank_capacity REAL);
+                CREATE TABLE trips (
+                    id INTEGER PRIMARY KEY, vehicle_id INTEGER, start_time TIMESTAMP, end_time TIMESTAMP,
+                    status TEXT
+                );
+                CREATE TABLE fueling_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, vehicle_id INTEGER NOT NULL, trip_id INTEGER,
+                    fueling_time TIMESTAMP NOT NULL, mileage_at_fueling REAL NOT NULL,
+                    liters_added REAL NOT NULL, price_per_liter REAL, total_cost REAL, notes TEXT
+                );
+                INSERT INTO vehicles VALUES (1, 'WA 100', 60), (2, 'WB200', 50);
+                INSERT INTO trips VALUES
+                    (1, 1, '2026-05-04 07:00:00', '2026-05-04 18:00:00', 'completed'),
+                    (2, 2, '2026-05-05 07:00:00', NULL, 'active');
+                INSERT INTO fueling_logs (vehicle_id, fueling_time, mileage_at_fueling, liters_added) VALUES
+                    (1, '2026-05-04 10:40:00', 1000, 40.2),
+                    (1, '2026-05-10 12:00:00', 1500, 30.0),
+                    (2, '2026-05-05 09:00:00', 5000, 45.0),
+                    (2, '2026-05-20 09:00:00', 5500, 20.0);
+            """)
+        self.service = FuelCardService(self.db_path)
+
+    def query(self, sql):
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(sql).fetchall()
+
+    def statement(self, name, text):
+        path = self.root / name
+        path.write_text(text, encoding="utf-8")
+        return path
+
+    def test_import(self):
+        path = self.statement("wyciag.csv", (
+            "Data;Godzina;Nr karty;Nr rejestracyjny;Produkt;Ilość;Kwota brutto\n"
+            "04.05.2026;10:35;7001;WA 100;ON;40,0;260,00\n"
+            "05.05.2026;09:20;7002;WB200;ON;44,9;291,85\n"
+            "05.05.2026;09:25;7002;WB200;Myjnia;;30,00\n"
+            "06.05.2026;14:00;7001;;Pb95;10;65,00\n"           # pojazd z karty
+            "06.05.2026;15:00;7009;XX 999;ON;20;130,00\n"
+            "07.05.2026;08:00;7001;WA 100;ON;-5;-32,50\n"
+            "04.05.2026;10:35;7001;WA 100;ON;40,0;260,00\n"
+        ))
+        result = self.service.import_file(path)
+        self.assertEqual((result.total, result.imported, result.repeated, result.non_fuel, result.unknown_vehicle),
+                         (7, 4, 1, 1, 1))
+        self.assertEqual([e.line for e in result.errors], [7])
+        self.assertEqual(self.query("SELECT vehicle_id, tx_time, liters FROM fuel_card_transactions ORDER BY id"),
+                         [(1, "2026-05-04 10:35:00", 40.0), (2, "2026-05-05 09:20:00", 44.9),
+                          (1, "2026-05-06 14:00:00", 10.0), (None, "2026-05-06 15:00:00", 20.0)])
+        # An overlapping statement adds nothing twice
+        self.assertEqual(self.service.import_file(path).imported, 0)
+
+        with self.assertRaises(ImportFileError):
+            self.service.import_file(self.statement("zly.csv", "Karta;Kwota\n7001;10\n"))
+
+    def test_reconcile(self):
+        self.service.import_file(self.statement("wyciag.csv", (
+            "Nr transakcji;Data transakcji;Nr rejestracyjny;Ilość\n"
+            "T1;2026-05-04 10:35;WA100;40,0\n"         # wpis 40,2 l o 10:40, w trakcie przejazdu 1
+            "T2;2026-05-04 10:50;WA100;15,0\n"         # drugie tankowanie w 15 min
+            "T3;2026-05-05 09:20;WB200;44,9\n"         # przejazd 2 jeszcze trwa
+            "T4;2026-05-06 14:00;WB200;70,0\n"         # ponad bak 50 l, bez wpisu, przejazd 2
+            "T5;2026-05-10 18:00;WA100;30,0\n"         # wpis o 12:00 - poza oknem 2 h
+            "T6;2026-05-06 15:00;XX999;20\n"
+            "T7;2026-06-02 10:00;WA100;20\n"           # inny okres
+        )))
+        result = self.service.reconcile(date(2026, 5, 1), date(2026, 5, 31))
+        self.assertEqual((result.transactions, result.matched, result.within_trip), (6, 2, 4))
+        found = sorted((i.issue, i.transaction_id) for i in result.issues if i.transaction_id)
+        self.assertEqual(found, [("duplicate", 2), ("over_capacity", 4), ("unknown_vehicle", 6),
+                                 ("unmatched", 2), ("unmatched", 4), ("unmatched", 5)])
+        self.assertEqual(sorted(i.fueling_log_id for i in result.of("log_without_transaction")), [2, 4])
+        self.assertEqual(result.counts()["log_without_transaction"], 2)
+
+        stored = self.query("SELECT id, fueling_log_id, trip_id, issue FROM fuel_card_transactions ORDER BY id")
+        self.assertEqual(stored, [(1, 1, 1, None), (2, None, 1, "duplicate"), (3, 3, 2, None),
+                                  (4, None, 2, "over_capacity"), (5, None, None, "unmatched"),
+                                  (6, None, None, "unknown_vehicle"), (7, None, None, None)])
+
+        # A log entered later changes the result on the next run
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("INSERT INTO fueling_logs (vehicle_id, fueling_time, mileage_at_fueling, liters_added) "
+                         "VALUES (1, '2026-05-10 17:30:00', 1500, 29.8)")
+        self.service.reconcile(date(2026, 5, 1), date(2026, 5, 31))
+        self.assertEqual(self.query("SELECT fueling_log_id, issue FROM fuel_card_transactions WHERE id = 5"),
+                         [(5, None)])
+
+    def test_merge_by_vehicle(self):
+        merged = list(_merge_by_vehicle(iter([(1, "a"), (1, "b"), (3, "c")]), iter([(2, "x"), (3, "y")])))
+        self.assertEqual(merged, [(1, [[(1, "a"), (1, "b")], []]), (2, [[], [(2, "x")]]),
+                                  (3, [[(3, "c")], [(3, "y")]])])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+"""
+Tests for the bulk CSV import (vehicles, employees, trips).
+"""
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from services.import_service import ImportFileError, ImportService, normalize_header
+
+SCHEMA = """
+CREATE TABLE employees (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, first_name TEXT NOT NULL, last_name TEXT NOT NULL,
+    position TEXT, department TEXT, permissions TEXT DEFAULT 'pracownik', email TEXT,
+    phone TEXT, is_active INTEGER DEFAULT 1, notes TEXT
+);
+CREATE TABLE vehicles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, registration_number TEXT UNIQUE NOT NULL,
+    brand TEXT NOT NULL, model TEXT NOT NULL, fuel_type TEXT NOT NULL,
+    fuel_consumption REAL, current_mileage REAL, current_fuel REAL, status TEXT,
+    tank_capacity REAL, vin TEXT, production_year INTEGER, notes TEXT
+);
+CREATE TABLE trips (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, trip_number TEXT UNIQUE,
+    vehicle_id INTEGER NOT NULL, employee_id INTEGER NOT NULL,
+    start_date TIMESTAMP NOT NULL, end_date TIMESTAMP, start_location TEXT, end_location TEXT,
+    destination TEXT, purpose TEXT, ordered_by TEXT, start_mileage REAL, end_mileage REAL,
+    distance REAL, start_fuel REAL, end_fuel REAL, fuel_used REAL, fuel_cost REAL,
+    fuel_type TEXT, status TEXT DEFAULT 'active', notes TEXT
+);
+"""
+
+
+class TestImportService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.dir = Path(self.tmp.name)
+        self.db_path = self.dir / "fleet.db"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript(SCHEMA)
+        self.service = ImportService(self.db_path)
+
+    def write_csv(self, text, name="data.csv"):
+        path = self.dir / name
+        path.write_text(text, encoding="utf-8")
+        return path
+
+    def query(self, sql, params=()):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def test_normalize_header(self):
+        self.assertEqual(normalize_header(" Nr rejestracyjny "), "nr_rejestracyjny")
+        self.assertEqual(normalize_header("Pojemność baku"), "pojemnosc_baku")
+        self.assertEqual(normalize_header("Dział"), "dzial")
+
+    def test_vehicles_with_row_errors_across_chunks(self):
+        path = self.write_csv(
+            "Nr rejestracyjny;Marka;Model;Paliwo;Stan paliwa;Pojemność baku\n"
+            "wa 1234;Skoda;Octavia;diesel;40;50\n"
+            "WA5678;Ford;;Benzyna;10;50\n"
+            "WB1111;Opel;Astra;Węgiel;10;50\n"
+            "WB2222;Opel;Astra;LPG;80;50\n"
+            "WA1234;Skoda;Fabia;Diesel;1;40\n"
+            "WC3333;Kia;Ceed;;5,5;45\n"
+        )
+        progress = []
+        result = self.service.import_file(path, "vehicles", chunk_size=2, progress=progress.append)
+
+        self.assertEqual(progress, [2, 4, 6])
+        self.assertEqual((result.total, result.inserted, result.skipped), (6, 2, 4))
+        self.assertEqual([(e.line, e.field) for e in result.errors],
+                         [(3, "model"), (4, "fuel_type"), (5, "current_fuel"), (6, "registration_number")])
+        rows = self.query("SELECT registration_number, fuel_type, current_fuel, status FROM vehicles ORDER BY id")
+        self.assertEqual(rows, [("WA1234", "Diesel", 40.0, "available"),
+                                ("WC3333", "Benzyna", 5.5, "available")])
+
+    def test_insert_rejects_existing_upsert_updates_present_columns(self):
+        self.service.import_file(self.write_csv(
+            "registration_number,brand,model,current_mileage,notes\n"
+            "WA1,Skoda,Octavia,1000,stary\n"), "vehicles")
+        path = self.write_csv(
+            "registration_number,brand,model,current_mileage\n"
+            "WA1,Skoda,Octavia RS,1500\n"
+            "WA2,Ford,Focus,10\n", "second.csv")
+
+        result = self.service.import_file(path, "vehicles")
+        self.assertEqual((result.inserted, len(result.errors)), (1, 1))
+        self.assertIn("już istnieje", result.errors[0].message)
+
+        result = self.service.import_file(path, "vehicles", mode="upsert")
+        self.assertEqual((result.inserted, result.updated), (0, 2))
+        self.assertEqual(self.query("SELECT model, current_mileage, notes FROM vehicles WHERE registration_number = 'WA1'"),
+                         [("Octavia RS", 1500.0, "stary")])
+
+    def test_dry_run_changes_nothing(self):
+        path = self.write_csv("imie;nazwisko;stanowisko;nr prawa jazdy\n"
+                              "Jan;Kowalski;Kierowca;ab 123\nAnna;Nowak;Kierowca;CD 456\n")
+        result = self.service.import_file(path, "employees", dry_run=True, chunk_size=1)
+        self.assertEqual((result.inserted, result.ok), (2, True))
+        self.assertEqual(self.query("SELECT COUNT(*) FROM employees"), [(0,)])
+        # The licence column the real import adds: a note, not a schema change
+        self.assertEqual(len(result.notes), 1)
+        self.assertIn("license_number", result.notes[0])
+        self.assertNotIn("license_number", [row[1] for row in self.query("PRAGMA table_info(employees)")])
+        self.assertEqual(self.query("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'"), [])
+
+        self.assertEqual(self.service.import_file(path, "employees").notes, [])
+        self.assertEqual(self.service.import_file(path, "employees", dry_run=True, mode="upsert").notes, [])
+
+    def test_employees_upsert_by_license(self):
+        self.service.import_file(self.write_csv(
+            "imie;nazwisko;stanowisko;nr prawa jazdy\nJan;Kowalski;Kierowca;AB123\n"), "employees")
+        result = self.service.import_file(self.write_csv(
+            "imie;nazwisko;stanowisko;nr prawa jazdy;aktywny\nJan;Kowalski;Kierownik;AB 123;nie\n", "b.csv"),
+            "employees", mode="upsert")
+        self.assertEqual(result.updated, 1)
+        self.assertEqual(self.query("SELECT position, is_active, license_number FROM employees"),
+                         [("Kierownik", 0, "AB123")])
+
+    def test_trips_resolve_references_and_number_sheets(self):
+        self.service.import_file(self.write_csv("registration_number,brand,model\nWA1,Skoda,Octavia\n"), "vehicles")
+        self.service.import_file(self.write_csv(
+            "imie;nazwisko;stanowisko\nJan;Kowalski;Kierowca\n", "e.csv"), "employees")
+        path = self.write_csv(
+            "nr rejestracyjny;kierowca;data wyjazdu;data powrotu;przebieg poczatkowy;przebieg koncowy\n"
+            "WA1;Jan Kowalski;2025-03-01 08:00;2025-03-01 16:00;1000;1120\n"
+            "WA9;Jan Kowalski;2025-03-02;;;\n"
+            "WA1;Anna Nowak;2025-03-03;;;\n"
+            "WA1;jan kowalski;03.03.2025;;;\n", "t.csv")
+        result = self.service.import_file(path, "trips")
+
+        self.assertEqual(result.inserted, 2)
+        self.assertEqual([e.line for e in result.errors], [3, 4])
+        rows = self.query("SELECT trip_number, distance, status FROM trips ORDER BY id")
+        self.assertEqual(rows, [("KD/2025/0001", 120.0, "completed"), ("KD/2025/0002", None, "active")])
+
+    def test_missing_required_header(self):
+        with self.assertRaises(ImportFileError), self.assertLogs("services.import_service"):
+            self.service.import_file(self.write_csv("marka,model\nSkoda,Octavia\n"), "vehicles")
+        with self.assertRaises(ImportFileError):
+            self.service.import_file(self.dir / "data.ods", "vehicles")
+
+
+if __name__ == '__main__':
+    unittest.main()
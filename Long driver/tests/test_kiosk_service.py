@@ -0,0 +1,146 @@
+"""
+Tests for scanned code parsing and the kiosk key return lookup.
+"""
+import ast
+import importlib
+import sqlite3
+import sys
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+
+from services.kiosk_service import KioskService, ScanError, parse_scan
+from services.version_service import VersionService
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def gui_imported(window: str, name: str):
+    """``name`` as src/gui/<window>.py imports it - the class its except clauses catch."""
+    tree = ast.parse((ROOT / "src" / "gui" / f"{window}.py").read_text(encoding="utf-8"))
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and any(alias.name == name for alias in node.names):
+            package = ["src", "gui"][:3 - node.level] if node.level else []
+            if str(ROOT) not in sys.path:
+                sys.path.append(str(ROOT))
+            return getattr(importlib.import_module(".".join(package + [node.module])), name)
+    raise AssertionError(f"{window} does not import {name}")
+
+
+class TestParseScan(unittest.TestCase):
+
+    def test_codes(self):
+        code = parse_scan("KARTA_DROGOWA:KD/2026/0007:20260504\n")
+        self.assertEqual((code.kind, code.value, code.day), ("road_card", "KD/2026/0007", date(2026, 5, 4)))
+        # Scanner on another keyboard layout
+        self.assertEqual(parse_scan("karta_drogowa;KD/2026/0007;20260504").value, "KD/2026/0007")
+        self.assertEqual(parse_scan("KLUCZ:wa 100").value, "WA100")
+        self.assertEqual(parse_scan("kd/2026/0007").kind, "road_card")
+        self.assertEqual(parse_scan("WB200").kind, "key_tag")
+        for text in ("", "KARTA_DROGOWA:KD/2026/0007:2026-13", "FAKTURA:12"):
+            with self.assertRaises(ScanError) as raised:
+                parse_scan(text)
+            self.assertEqual(raised.exception.reason, "format")
+
+
+class TestKioskService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = Path(self.tmp.name) / "fleet.db"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE vehicles (
+                    id INTEGER PRIMARY KEY, registration_number TEXT, brand TEXT, model TEXT,
+                    current_mileage REAL, current_fuel REAL, status TEXT
+                );
+                CREATE TABLE employees (id INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT);
+                CREATE TABLE key_log (
+                    id INTEGER PRIMARY KEY, vehicle_id INTEGER, employee_id INTEGER,
+                    checkout_time TIMESTAMP, return_time TIMESTAMP, checkout_mileage REAL,
+                    return_mileage REAL, checkout_fuel REAL, return_fuel REAL,
+                    storage_location TEXT, status TEXT, notes TEXT
+                );
+                CREATE TABLE trips (
+                    id INTEGER PRIMARY KEY, trip_number TEXT, vehicle_id INTEGER, key_log_id INTEGER,
+                    start_date TIMESTAMP, status TEXT
+                );
+                INSERT INTO vehicles VALUES
+                    (1, 'WA 100', 'Skoda', 'Octavia', 1250, 30, 'in_use'),
+                    (2, 'WB200', 'Ford', 'Transit', 8000, 50, 'available');
+                INSERT INTO employees VALUES (1, 'Jan', 'Kowalski');
+                INSERT INTO key_log VALUES
+                    (1, 1, 1, '2026-05-03 07:00:00', '2026-05-03 16:00:00', 1000, 1100, 40, 35, 'A1',
+                     'returned', NULL),
+                    (2, 1, 1, '2026-05-04 07:00:00', NULL, 1100, NULL, 35, NULL, 'A1', 'out', NULL),
+                    (3, 2, 1, '2026-05-02 07:00:00', '2026-05-02 15:00:00', 7900, 8000, 50, 50, 'B2',
+                     'returned', NULL);
+                INSERT INTO trips VALUES
+                    (1, 'KD/2025/0001', 1, 1, '2025-05-03 07:00:00', 'completed'),
+                    (2, 'KD/2025/0001', 1, 2, '2026-05-04 07:00:00', 'active');
+            """)
+        self.service = KioskService(self.db_path)
+        with sqlite3.connect(self.db_path) as conn:
+            KioskService.ensure_schema(conn)
+            KioskService.ensure_schema(conn)
+
+    def resolve(self, text):
+        return self.service.resolve_text(text)
+
+    def test_schema(self):
+        with sqlite3.connect(self.db_path) as conn:
+            names = {row[1] for row in conn.execute("PRAGMA index_list(key_log)")}
+            self.assertIn("idx_key_log_open", names)
+            plan = " ".join(row[3] for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM key_log WHERE vehicle_id = 1 AND status = 'out'"))
+            self.assertIn("idx_key_log_open", plan)
+            self.assertIn("idx_trips_trip_number", {row[1] for row in conn.execute("PRAGMA index_list(trips)")})
+
+    def test_resolve(self):
+        # The date on the card picks the trip when the number repeats
+        target = self.resolve("KARTA_DROGOWA:KD/2025/0001:20260504")
+        self.assertEqual((target.key_log_id, target.trip_id, target.trip_number), (2, 2, "KD/2025/0001"))
+        self.assertEqual((target.registration_number, target.employee_name), ("WA 100", "Jan Kowalski"))
+        # Odometer already ahead of the checkout (tracker readings)
+        self.assertEqual(target.suggested_mileage, 1250)
+        # Older trip of the same vehicle: its key log is closed -> the open one
+        self.assertEqual(self.resolve("KARTA_DROGOWA:KD/2025/0001:20250503").key_log_id, 2)
+        self.assertEqual(self.resolve("KLUCZ:wa100").key_log_id, 2)
+        self.assertEqual(self.resolve("KLUCZ:1").key_log_id, 2)
+
+        for text, reason in (("KLUCZ:WB200", "not_out"), ("KLUCZ:XX999", "not_found"),
+                             ("KD/2026/0099", "not_found")):
+            with self.assertRaises(ScanError) as raised:
+                self.resolve(text)
+            self.assertEqual(raised.exception.reason, reason)
+
+    def test_return_key(self):
+        target = self.resolve("KLUCZ:WA100")
+        self.service.return_key(target, 1260, 28, storage_location="A2")
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute("SELECT status, return_mileage, storage_location FROM key_log "
+                                          "WHERE id = 2").fetchone(), ("returned", 1260, "A2"))
+            self.assertEqual(conn.execute("SELECT status, current_mileage FROM vehicles WHERE id = 1").fetchone(),
+                             ("available", 1260))
+        with self.assertRaises(ValueError):
+            self.service.return_key(target, 1270, 20)
+        with self.assertRaises(ScanError):
+            self.resolve("KLUCZ:WA100")
+
+    def test_window_catches_the_exceptions_the_service_raises(self):
+        with sqlite3.connect(self.db_path) as conn:
+            VersionService.ensure_schema(conn)
+        target = self.resolve("KLUCZ:WA100")
+        with self.assertRaises(gui_imported("kiosk_window", "MileageDecrease")):
+            self.service.return_key(target, 900, 28)
+        # Returned at the desk after the scan
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE key_log SET notes = 'biurko' WHERE id = 2")
+        with self.assertRaises(gui_imported("kiosk_window", "StaleVersion")):
+            self.service.return_key(target, 1260, 28)
+
+
+if __name__ == "__main__":
+    unittest.main()
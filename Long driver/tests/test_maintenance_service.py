@@ -0,0 +1,75 @@
+"""
+Tests for the service schedule engine.
+"""
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+
+from services.maintenance_service import MaintenanceService
+
+TODAY = date(2026, 6, 1)
+
+
+class TestMaintenanceService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = Path(self.tmp.name) / "fleet.db"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE vehicles (
+                    id INTEGER PRIMARY KEY, registration_number TEXT, brand TEXT, model TEXT,
+                    current_mileage REAL, created_at TIMESTAMP
+                );
+                CREATE TABLE trips (
+                    id INTEGER PRIMARY KEY, vehicle_id INTEGER, end_date TIMESTAMP, distance REAL
+                );
+                INSERT INTO vehicles VALUES
+                    (1, 'WA100', 'Skoda', 'Octavia', 14500, '2025-01-10 09:00:00'),
+                    (2, 'WB200', 'Ford', 'Transit', 20000, '2025-09-01 09:00:00');
+                -- vehicle 1 drives 50 km a day
+                INSERT INTO trips (vehicle_id, end_date, distance) VALUES (1, '2026-05-10 16:00:00', 3000);
+            """)
+        self.service = MaintenanceService(self.db_path)
+        self.service.add_rule("Olej", interval_km=15000, warn_km=1000)
+        self.service.add_rule("Przegląd", interval_days=365, warn_days=30)
+
+    def items(self, vehicle_id):
+        return {i.rule_name: i for i in self.service.schedule([vehicle_id], today=TODAY)}
+
+    def test_due_by_mileage_and_time(self):
+        octavia = self.items(1)
+        self.assertEqual(octavia["Olej"].km_remaining, 500)
+        self.assertEqual(octavia["Olej"].status(TODAY), "due")
+        self.assertEqual(octavia["Olej"].projected_date, date(2026, 6, 11))
+        self.assertEqual(octavia["Przegląd"].due_date, date(2026, 1, 10))
+        self.assertEqual(octavia["Przegląd"].status(TODAY), "overdue")
+
+        transit = self.items(2)
+        self.assertEqual(transit["Olej"].status(TODAY), "overdue")
+        self.assertIsNone(transit["Olej"].projected_date)  # no recent trips
+        self.assertEqual(transit["Przegląd"].status(TODAY), "ok")
+
+    def test_history_and_specific_rule(self):
+        self.service.record_service(1, "Olej", date(2026, 5, 20), mileage=14400)
+        self.service.add_rule("Olej", interval_km=30000, brand="Ford", model="Transit")
+        self.assertEqual(self.items(1)["Olej"].due_mileage, 29400)
+        self.assertEqual(self.items(2)["Olej"].due_mileage, 30000)
+        self.assertEqual(self.service.history(1)[0][:3], ("2026-05-20", "Olej", 14400))
+
+    def test_only_changed_vehicles_are_recomputed(self):
+        with sqlite3.connect(self.db_path) as conn:
+            self.service.query_schedule(conn, today=TODAY)
+            self.assertEqual(self.service.refresh_stale(conn, TODAY), 0)
+            conn.execute("UPDATE vehicles SET current_mileage = 16000 WHERE id = 1")
+            self.assertEqual(self.service.stale_vehicle_ids(conn, TODAY), [1])
+            items = self.service.query_schedule(conn, today=TODAY)
+        self.assertEqual((items[0].registration_number, items[0].status(TODAY)), ("WA100", "overdue"))
+        self.assertEqual(set(self.service.vehicle_status(TODAY)), {1, 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Tests for the monthly fleet cube.
+"""
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+
+from services.monthly_cube_service import MonthlyCubeService, months_between, shift_month
+
+TODAY = date(2026, 6, 15)
+
+
+class TestMonthlyCubeService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = Path(self.tmp.name) / "fleet.db"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE vehicles (
+                    id INTEGER PRIMARY KEY, registration_number TEXT, fuel_type TEXT, fuel_consumption REAL
+                );
+                CREATE TABLE employees (
+                    id INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT, department TEXT
+                );
+                CREATE TABLE trips (
+                    id INTEGER PRIMARY KEY, vehicle_id INTEGER, employee_id INTEGER,
+                    start_date TIMESTAMP, end_date TIMESTAMP, distance REAL, fuel_used REAL,
+                    fuel_cost REAL, status TEXT
+                );
+                INSERT INTO vehicles VALUES (1, 'WA100', 'Diesel', 5.0), (2, 'WB200', 'Diesel', 10.0);
+                INSERT INTO employees VALUES (1, 'Jan', 'Nowak', 'Handel'), (2, 'Anna', 'Kowal', 'Serwis');
+                INSERT INTO trips (vehicle_id, employee_id, start_date, end_date, distance, fuel_used,
+                                   fuel_cost, status) VALUES
+                    (1, 1, '2025-05-10 08:00:00', '2025-05-10 10:00:00', 80, 4, 25, 'completed'),
+                    (1, 1, '2026-05-03 08:00:00', '2026-05-03 12:00:00', 100, 5, 31, 'completed'),
+                    (2, 2, '2026-05-04 08:00:00', '2026-05-04 09:30:00', 200, NULL, NULL, 'completed'),
+                    (1, 2, '2026-06-01 08:00:00', '2026-06-01 11:00:00', 50, 2.5, 16, 'completed'),
+                    -- still driving: not in the cube yet
+                    (2, 1, '2026-06-10 08:00:00', NULL, NULL, NULL, NULL, 'active');
+            """)
+        self.service = MonthlyCubeService(self.db_path)
+
+    def query(self, *args, **kwargs):
+        with sqlite3.connect(self.db_path) as conn:
+            return self.service.query(conn, *args, today=TODAY, **kwargs)
+
+    def test_month_helpers(self):
+        self.assertEqual(months_between("2025-11", "2026-02"), ["2025-11", "2025-12", "2026-01", "2026-02"])
+        self.assertEqual(shift_month("2026-01", -12), "2025-01")
+        self.assertEqual(shift_month("2026-01", -1), "2025-12")
+
+    def test_slices(self):
+        months = {cell.key[0]: cell for cell in self.query(("month",), "2026-05", "2026-06")}
+        may = months["2026-05"]
+        self.assertEqual((may.trips, may.km, may.vehicles, may.employees), (2, 300, 2, 2))
+        # 200 km x 10 l/100 km x 6.20 zł estimated for the trip without a cost
+        self.assertAlmostEqual(may.litres, 25)
+        self.assertAlmostEqual(may.cost, 31 + 124)
+        self.assertAlmostEqual(may.hours, 5.5)
+
+        departments = {cell.key[0]: cell.km for cell in self.query(("department",))}
+        self.assertEqual(departments, {"Handel": 180, "Serwis": 250})
+        years = {cell.key[0]: cell.trips for cell in self.query(("year",), vehicle_ids=[1])}
+        self.assertEqual(years, {"2025": 1, "2026": 2})
+        with self.assertRaises(ValueError):
+            self.query(("colour",))
+
+    def test_changed_cells_are_refilled_in_any_month(self):
+        with sqlite3.connect(self.db_path) as conn:
+            overview = self.service.monthly_overview(conn, "2026-05", "2026-06", today=TODAY)
+            self.assertEqual([(c.key[0], y.key[0] if y else None) for c, y in overview],
+                             [("2026-05", "2025-05"), ("2026-06", None)])
+            self.assertEqual(self.service.refresh(conn, "2025-05", "2026-06", TODAY), [])
+
+            # A correction in a closed month, a finished trip and an imported old trip
+            conn.execute("UPDATE trips SET distance = 999 WHERE id = 2")
+            conn.execute("UPDATE trips SET end_date = '2026-06-10 09:00:00', distance = 40 WHERE id = 5")
+            conn.execute("INSERT INTO trips (vehicle_id, employee_id, start_date, end_date, distance, status) "
+                         "VALUES (2, 1, '2025-05-20 08:00:00', '2025-05-20 09:00:00', 30, 'completed')")
+            conn.commit()
+            self.assertEqual(self.service.refresh(conn, "2025-05", "2026-06", TODAY),
+                             ["2025-05", "2026-05", "2026-06"])
+            months = {cell.key[0]: (cell.trips, cell.km)
+                      for cell in self.service.query(conn, ("month",), "2025-05", "2026-06", today=TODAY)}
+            self.assertEqual(months, {"2025-05": (2, 110), "2026-05": (2, 1199), "2026-06": (2, 90)})
+
+            # Moving a trip to another month, and deleting one
+            conn.execute("UPDATE trips SET start_date = '2026-04-03 08:00:00', "
+                         "end_date = '2026-04-03 12:00:00' WHERE id = 2")
+            conn.execute("DELETE FROM trips WHERE id = 1")
+            conn.commit()
+            months = {cell.key[0]: (cell.trips, cell.km)
+                      for cell in self.service.query(conn, ("month",), "2025-05", "2026-06", today=TODAY)}
+            self.assertEqual(months, {"2025-05": (1, 30), "2026-04": (1, 999), "2026-05": (1, 200),
+                                      "2026-06": (2, 90)})
+
+    def test_trip_completion_updates_its_cell(self):
+        self.query(("month",), "2026-05", "2026-06")
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE trips SET distance = 999 WHERE id = 2")
+        self.service.on_trip_completed(2)
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM monthly_cube_dirty").fetchone()[0], 0)
+            self.assertEqual(self.service.refresh(conn, "2026-05", "2026-06", TODAY), [])
+        may = self.query(("vehicle",), "2026-05", "2026-05", vehicle_ids=[1])[0]
+        self.assertEqual(may.km, 999)
+
+
+if __name__ == "__main__":
+    unittest.main()
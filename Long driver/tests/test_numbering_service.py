@@ -0,0 +1,98 @@
+"""
+Tests for the road-card number allocator.
+"""
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from services.numbering_service import RoadCardNumbering
+
+
+class TestRoadCardNumbering(unittest.TestCase):
+    """Per-year counters, block reservation and gap audit."""
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("""
+            CREATE TABLE trips (
+                id INTEGER PRIMARY KEY, trip_number TEXT UNIQUE, route TEXT
+            )
+        """)
+        self.numbering = RoadCardNumbering()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def insert_trip(self, number):
+        self.conn.execute("INSERT INTO trips (trip_number, route) VALUES (?, 'x')", (number,))
+
+    def test_format_and_parse(self):
+        self.assertEqual(self.numbering.format_number(2025, 7), "KD/2025/0007")
+        self.assertEqual(self.numbering.parse_number("KD/2025/0007"), (2025, 7))
+        self.assertIsNone(self.numbering.parse_number("KD-00007"))
+
+    def test_sequential_per_year(self):
+        numbers = [self.numbering.allocate(self.conn, 2025) for _ in range(3)]
+        self.assertEqual(numbers, ["KD/2025/0001", "KD/2025/0002", "KD/2025/0003"])
+        self.assertEqual(self.numbering.allocate(self.conn, 2026), "KD/2026/0001")
+
+    def test_rollback_returns_the_number(self):
+        self.insert_trip(self.numbering.allocate(self.conn, 2025))
+        self.conn.commit()
+        self.insert_trip(self.numbering.allocate(self.conn, 2025))
+        self.conn.rollback()
+        self.assertEqual(self.numbering.allocate(self.conn, 2025), "KD/2025/0002")
+
+    def test_new_counter_continues_after_existing_numbers(self):
+        self.insert_trip("KD/2025/0041")
+        self.insert_trip("KD/2024/0900")
+        self.assertEqual(self.numbering.allocate(self.conn, 2025), "KD/2025/0042")
+
+    def test_block_reservation_and_gap_audit(self):
+        self.insert_trip(self.numbering.allocate(self.conn, 2025))          # 1
+        self.numbering.allocate(self.conn, 2025)                             # 2 - lost
+        block = self.numbering.reserve_block(self.conn, 3, 2025, purpose="import")
+        self.assertEqual(list(block), ["KD/2025/0003", "KD/2025/0004", "KD/2025/0005"])
+        self.insert_trip(next(iter(block)))                                  # 3 used, 4-5 unused
+        self.insert_trip("KD/2025/0100")                                     # entered by hand
+
+        report = self.numbering.audit_gaps(self.conn, 2025)
+        self.assertEqual(report.allocated, 5)
+        self.assertEqual(report.missing, [2, 4, 5])
+        self.assertEqual(report.reserved_unused, [4, 5])
+        self.assertEqual(report.beyond_counter, [100])
+        self.assertTrue(report.has_gaps)
+
+
+class TestConcurrentDesks(unittest.TestCase):
+    """Two connections to one file never receive the same number."""
+
+    def test_second_desk_waits_for_the_first(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "fleet.db"
+            desk_a = sqlite3.connect(path, timeout=0)
+            desk_b = sqlite3.connect(path, timeout=0)
+            try:
+                desk_a.execute("CREATE TABLE trips (id INTEGER PRIMARY KEY, trip_number TEXT UNIQUE)")
+                desk_a.commit()
+                numbering = RoadCardNumbering()
+
+                first = numbering.allocate(desk_a, 2025)
+                # Desk A has not committed yet: desk B cannot read a stale counter
+                with self.assertRaises(sqlite3.OperationalError):
+                    numbering.allocate(desk_b, 2025)
+                desk_b.rollback()
+
+                desk_a.execute("INSERT INTO trips (trip_number) VALUES (?)", (first,))
+                desk_a.commit()
+                second = numbering.allocate(desk_b, 2025)
+                desk_b.commit()
+                self.assertEqual((first, second), ("KD/2025/0001", "KD/2025/0002"))
+            finally:
+                desk_a.close()
+                desk_b.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+"""
+Tests for fleet operations as commands (single, batched, atomic).
+"""
+import json
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from services.key_service import KeyAlreadyOut, KeyService
+from services.operations_service import CommandError, OperationsService, parse_command
+
+
+class TestOperationsService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = Path(self.tmp.name) / "fleet.db"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE vehicles (
+                    id INTEGER PRIMARY KEY, registration_number TEXT, brand TEXT, model TEXT,
+                    normative_consumption REAL, current_mileage REAL, current_fuel REAL,
+                    tank_capacity REAL, status TEXT, last_updated TIMESTAMP, created_at TIMESTAMP
+                );
+                CREATE TABLE key_log (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, vehicle_id INTEGER, employee_id INTEGER,
+                    checkout_time TIMESTAMP, return_time TIMESTAMP, checkout_mileage REAL,
+                    return_mileage REAL, checkout_fuel REAL, return_fuel REAL,
+                    storage_location TEXT, status TEXT DEFAULT 'out', notes TEXT
+                );
+                CREATE TABLE trips (
+                    id INTEGER PRIMARY KEY, trip_number TEXT, vehicle_id INTEGER, driver_id INTEGER,
+                    start_time TIMESTAMP, end_time TIMESTAMP, start_mileage REAL, end_mileage REAL,
+                    start_fuel REAL, end_fuel REAL, route TEXT, purpose TEXT, distance REAL,
+                    fuel_consumed_calculated REAL, status TEXT, notes TEXT
+                );
+                CREATE TABLE fueling_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, vehicle_id INTEGER NOT NULL, trip_id INTEGER,
+                    fueling_time TIMESTAMP NOT NULL, mileage_at_fueling REAL NOT NULL,
+                    liters_added REAL NOT NULL, price_per_liter REAL, total_cost REAL, notes TEXT
+                );
+                INSERT INTO vehicles VALUES
+                    (1, 'WA 100', 'Ford', 'Transit', 8.0, 1000, 40, 70, 'available', NULL, NULL),
+                    (2, 'WB200', 'Skoda', 'Octavia', 6.0, 5000, 30, 50, 'available', NULL, NULL);
+            """)
+        self.service = OperationsService(self.db_path)
+
+    def query(self, sql, params=()):
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def batch(self, *commands, **kwargs):
+        lines = [c if isinstance(c, str) else json.dumps(c) for c in commands]
+        return list(self.service.run_batch(lines, **kwargs))
+
+    def test_checkout_and_return(self):
+        result = self.service.run({"op": "checkout", "vehicle": "wa100", "employee": 5,
+                                   "mileage": "1010", "fuel": 38, "time": "2026-05-04T07:12:00"})
+        self.assertTrue(result.ok, result.error)
+        self.assertEqual(result.data["vehicle_id"], 1)
+        self.assertEqual(self.query("SELECT status, current_mileage FROM vehicles WHERE id = 1"),
+                         [("in_use", 1010.0)])
+
+        again = self.service.run({"op": "checkout", "vehicle": 1, "employee": 6, "mileage": 1010, "fuel": 38})
+        self.assertFalse(again.ok)
+        self.assertIn("already has an issued key", again.error)
+        with sqlite3.connect(self.db_path) as conn, self.assertRaises(KeyAlreadyOut):
+            KeyService(self.db_path).checkout(conn, 1, 6, 1010, 38)
+
+        # Return by vehicle; mileage may not go backwards
+        self.assertFalse(self.service.run({"op": "return", "vehicle": 1, "mileage": 900, "fuel": 20}).ok)
+        returned = self.service.run({"op": "return", "vehicle": "WA 100", "mileage": 1120, "fuel": 20})
+        self.assertTrue(returned.ok, returned.error)
+        self.assertEqual(self.query("SELECT status, return_time IS NOT NULL FROM key_log"), [("returned", 1)])
+        self.assertEqual(self.query("SELECT status, current_mileage, current_fuel FROM vehicles WHERE id = 1"),
+                         [("available", 1120.0, 20.0)])
+
+    def test_batch_rolls_back_only_rejected_commands(self):
+        results = self.batch(
+            {"op": "checkout", "vehicle": 1, "employee": 5, "mileage": 1000, "fuel": 40, "ref": "brama/1"},
+            "# komentarz",
+            "",
+            "{not json",
+            {"op": "checkout", "vehicle": 2, "employee": 6, "mileage": 4000, "fuel": 30},  # licznik wstecz
+            {"op": "checkout", "vehicle": 2, "employee": 6, "mileage": 5000, "fuel": 30, "colour": "red"},
+            {"op": "checkout", "vehicle": 2, "employee": 6, "mileage": 5001, "fuel": 30},
+            group_size=2,
+        )
+        self.assertEqual([r.line for r in results], [1, 4, 5, 6, 7])
+        self.assertEqual([r.ok for r in results], [True, False, False, False, True])
+        self.assertEqual(results[0].to_dict()["ref"], "brama/1")
+        self.assertEqual(self.query("SELECT vehicle_id, checkout_mileage FROM key_log ORDER BY id"),
+                         [(1, 1000.0), (2, 5001.0)])
+
+    def test_atomic_batch_rolls_back_everything(self):
+        results = self.batch(
+            {"op": "checkout", "vehicle": 1, "employee": 5, "mileage": 1000, "fuel": 40},
+            {"op": "return", "key_log": 99, "mileage": 1000, "fuel": 40},
+            {"op": "checkout", "vehicle": 2, "employee": 6, "mileage": 5000, "fuel": 30},
+            atomic=True,
+        )
+        # Stops at the first error; nothing is committed
+        self.assertEqual([r.ok for r in results], [False, False])
+        self.assertEqual(results[0].error, "rolled back (atomic batch)")
+        self.assertEqual(self.query("SELECT COUNT(*) FROM key_log"), [(0,)])
+        self.assertEqual(self.query("SELECT status FROM vehicles WHERE id = 1"), [("available",)])
+
+    def test_trip_and_fueling_in_one_transaction(self):
+        results = self.batch(
+            {"op": "trip_start", "vehicle": "WB200", "driver": 3, "route": "A-B", "purpose": "Dostawa",
+             "time": "2026-05-04 08:00"},
+            {"op": "fuel", "vehicle": 2, "liters": 20, "mileage": 5100, "price": 6.5, "trip": 1},
+            {"op": "trip_complete", "trip": 1, "mileage": 5200, "fuel": 38},
+        )
+        self.assertTrue(all(r.ok for r in results), [r.error for r in results])
+        self.assertEqual(results[0].data["trip_number"], "KD/2026/0001")
+        self.assertEqual(results[2].data["distance"], 200.0)
+        self.assertEqual(self.query("SELECT liters_added, total_cost FROM fueling_logs"), [(20.0, 130.0)])
+        self.assertEqual(self.query("SELECT status, start_mileage, fuel_consumed_calculated FROM trips"),
+                         [("completed", 5000.0, 12.0)])
+        self.assertEqual(self.query("SELECT status, current_mileage FROM vehicles WHERE id = 2"),
+                         [("available", 5200.0)])
+
+    def test_parse_command(self):
+        self.assertEqual(parse_command('{"op": "fuel", "vehicle": 2, "liters": "20", "mileage": 5100}'),
+                         ("fuel", {"vehicle": 2, "liters": 20.0, "mileage": 5100.0}))
+        for bad in ('{"op": "teleport"}', '[1, 2]', '{"op": "fuel", "vehicle": 2}',
+                    '{"op": "fuel", "vehicle": 2, "liters": "dużo", "mileage": 1}'):
+            with self.assertRaises(CommandError):
+                parse_command(bad)
+
+
+if __name__ == "__main__":
+    unittest.main()
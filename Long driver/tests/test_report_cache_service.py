@@ -0,0 +1,106 @@
+"""
+Tests for the report result cache.
+"""
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from services.report_cache_service import SCOPE_SNAPSHOT, ReportCache
+
+
+class TestReportCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = Path(self.tmp.name) / "fleet.db"
+        self.conn = sqlite3.connect(self.db_path)
+        self.addCleanup(self.conn.close)
+        self.conn.executescript("""
+            CREATE TABLE vehicles (id INTEGER PRIMARY KEY, registration_number TEXT, status TEXT);
+            CREATE TABLE trips (id INTEGER PRIMARY KEY, vehicle_id INTEGER, start_date TIMESTAMP, distance REAL);
+            INSERT INTO vehicles VALUES (1, 'WA100', 'available');
+            INSERT INTO trips (vehicle_id, start_date, distance) VALUES (1, '2026-05-10 08:00:00', 50);
+        """)
+        self.cache = ReportCache()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        total = self.conn.execute(
+            "SELECT TOTAL(distance) FROM trips WHERE start_date BETWEEN '2026-05-01' AND '2026-05-31 23:59'"
+        ).fetchone()[0]
+        return {"km": total}
+
+    def may(self, cache=None, **kwargs):
+        return (cache or self.cache).get(self.conn, "Raport przejazdów", "2026-05-01", "2026-05-31",
+                                         self.compute, **kwargs)
+
+    def test_hits_and_range_aware_invalidation(self):
+        self.assertEqual(self.may()["km"], 50)
+        self.may()["extra"] = "caller may add keys"
+        self.assertEqual(self.may(), {"km": 50})
+        self.assertEqual((self.calls, self.cache.stats.memory_hits), (1, 2))
+
+        # Outside the range, or only the vehicle's state: still valid
+        self.conn.execute("INSERT INTO trips (vehicle_id, start_date, distance) VALUES (1, '2026-06-02', 10)")
+        self.conn.execute("UPDATE vehicles SET status = 'in_use'")
+        self.conn.commit()
+        self.assertEqual(self.may()["km"], 50)
+        self.assertEqual(self.calls, 1)
+
+        # A trip of the period changes
+        self.conn.execute("UPDATE trips SET distance = 70 WHERE id = 1")
+        self.conn.commit()
+        self.assertEqual(self.may()["km"], 70)
+        self.assertEqual((self.calls, self.cache.stats.invalidations), (2, 1))
+
+        # A renamed vehicle invalidates every report
+        self.conn.execute("UPDATE vehicles SET registration_number = 'WA101'")
+        self.conn.commit()
+        self.may()
+        self.assertEqual(self.calls, 3)
+
+    def test_disk_tier_survives_restart(self):
+        self.may()
+        restarted = ReportCache()
+        self.assertEqual(self.may(restarted)["km"], 50)
+        self.assertEqual((self.calls, restarted.stats.disk_hits), (1, 1))
+
+        self.conn.execute("INSERT INTO trips (vehicle_id, start_date, distance) VALUES (1, '2026-05-20', 5)")
+        self.conn.commit()
+        self.assertEqual(self.may(ReportCache())["km"], 55)
+        self.assertEqual(self.calls, 2)
+
+    def test_snapshot_invalidated_by_any_change(self):
+        self.may(scope=SCOPE_SNAPSHOT)
+        self.conn.execute("UPDATE vehicles SET status = 'in_use'")
+        self.conn.commit()
+        self.may(scope=SCOPE_SNAPSHOT)
+        self.assertEqual(self.calls, 2)
+
+    def test_schema_installed_once_and_after_reset(self):
+        triggers = "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'"
+        self.may()
+        installed = self.conn.execute(triggers).fetchone()[0]
+        self.conn.execute("DROP TRIGGER report_changes_trips_update")
+        self.conn.commit()
+        self.may()                                  # a lookup does not re-run the DDL
+        self.assertEqual(self.conn.execute(triggers).fetchone()[0], installed - 1)
+
+        # A reset database (tables gone) is installed again on the next lookup
+        self.conn.executescript("DROP TABLE report_changes; DROP TABLE report_cache;")
+        self.assertEqual(self.may()["km"], 50)
+        self.assertEqual(self.conn.execute(triggers).fetchone()[0], installed)
+
+    def test_memory_lru_and_prune(self):
+        cache = ReportCache(max_memory=2, max_disk=2)
+        for month in ("03", "04", "05"):
+            cache.get(self.conn, "Raport", f"2026-{month}-01", f"2026-{month}-28", self.compute)
+        self.assertEqual(len(cache._memory), 2)
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM report_cache").fetchone()[0], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
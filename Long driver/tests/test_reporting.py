@@ -0,0 +1,111 @@
+"""
+Tests for the GUI-free reporting package (engine, CSV export, scheduler).
+"""
+import csv
+import sqlite3
+import tempfile
+import unittest
+from datetime import date, datetime
+from pathlib import Path
+
+from reporting import ReportEngine, ScheduledReport, export_report, period_range, resolve_report_type, run_jobs
+from reporting.scheduler import NightlyScheduler
+
+
+class TestReporting(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        self.db_path = self.root / "fleet.db"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE vehicles (
+                    id INTEGER PRIMARY KEY, registration_number TEXT, fuel_type TEXT, fuel_consumption REAL
+                );
+                CREATE TABLE employees (
+                    id INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT, department TEXT
+                );
+                CREATE TABLE trips (
+                    id INTEGER PRIMARY KEY, vehicle_id INTEGER, employee_id INTEGER, start_date TIMESTAMP,
+                    end_date TIMESTAMP, distance REAL, fuel_cost REAL, status TEXT, purpose TEXT, notes TEXT
+                );
+                INSERT INTO vehicles VALUES (1, 'WA100', 'Diesel', 6.0);
+                INSERT INTO employees VALUES (1, 'Jan', 'Nowak', 'Handel');
+                INSERT INTO trips (vehicle_id, employee_id, start_date, end_date, distance, fuel_cost, status)
+                VALUES (1, 1, '2026-05-03 08:00:00', '2026-05-03 10:00:00', 100, 40, 'completed');
+            """)
+
+    def test_report_types_and_periods(self):
+        self.assertEqual(resolve_report_type("costs"), "💰 Koszty eksploatacji")
+        self.assertEqual(resolve_report_type("koszty eksploatacji"), "💰 Koszty eksploatacji")
+        with self.assertRaises(ValueError):
+            resolve_report_type("horoskop")
+        self.assertEqual(period_range("previous_month", date(2026, 3, 1)), (date(2026, 2, 1), date(2026, 2, 28)))
+        self.assertEqual(period_range("previous_week", date(2026, 6, 17)), (date(2026, 6, 8), date(2026, 6, 14)))
+
+    def test_generate_and_export_csv(self):
+        engine = ReportEngine(self.db_path)
+        data = engine.generate("trips", date(2026, 5, 1), date(2026, 5, 31))
+        self.assertEqual(data['period'], "2026-05-01 - 2026-05-31")
+        self.assertEqual(len(data['trips_report']), 1)
+        engine.generate("trips", "2026-05-01", "2026-05-31")
+        self.assertEqual(engine.report_cache.stats.memory_hits, 1)
+
+        costs = engine.generate("costs", date(2026, 5, 1), date(2026, 5, 31))
+        [path] = export_report(costs, ["csv"], self.root / "out")
+        self.assertEqual(path.name, "raport_costs_2026-05-01_2026-05-31.csv")
+        with open(path, encoding="utf-8-sig", newline="") as handle:
+            rows = list(csv.reader(handle, delimiter=";"))
+        self.assertEqual(rows[0][0], "Pojazd / pracownik")
+        self.assertEqual([r[0] for r in rows[1:]], ["WA100", "Pracownik: Jan Nowak"])
+        with self.assertRaises(ValueError):
+            export_report(costs, ["docx"], self.root / "out")
+
+    def test_jobs_in_worker_processes(self):
+        jobs = [ScheduledReport(resolve_report_type(t), "previous_month", ["csv"]) for t in ("costs", "trips")]
+        results = run_jobs(jobs, self.db_path, self.root / "out", date(2026, 6, 1), workers=2)
+        self.assertTrue(all(r.ok for r in results), results)
+        self.assertEqual(len(list((self.root / "out").glob("*.csv"))), 2)
+
+    def test_scheduler_runs_once_per_day(self):
+        scheduler = NightlyScheduler({
+            "save_location": "out", "schedule_time": "02:00", "workers": 1,
+            "scheduled": [{"type": "costs", "period": "previous_month", "every": "monthly", "formats": ["csv"]}],
+        }, self.db_path, self.root)
+        # Missed run (started after 02:00, nothing generated today) - right away
+        now = datetime(2026, 6, 1, 9, 30)
+        self.assertEqual(scheduler.next_run(now), now)
+        [result] = scheduler.run_due(now.date())
+        self.assertTrue(result.ok, result.error)
+        self.assertEqual(scheduler.next_run(now), datetime(2026, 6, 2, 2, 0))
+        # Monthly report: nothing due the next day
+        self.assertEqual(scheduler.run_due(date(2026, 6, 2)), [])
+
+    def test_scheduler_catches_up_and_retries(self):
+        scheduler = NightlyScheduler({
+            "save_location": "out", "workers": 1,
+            "scheduled": [
+                {"type": "costs", "period": "previous_month", "every": "monthly", "formats": ["csv"]},
+                {"type": "trips", "period": "previous_week", "every": "weekly", "formats": ["csv"]},
+                {"type": "trips", "period": "yesterday", "every": "daily", "formats": ["docx"]},
+            ],
+        }, self.db_path, self.root)
+        results = scheduler.run_due(date(2026, 6, 1))       # Monday, 1st
+        self.assertEqual([r.ok for r in results], [True, True, False])
+        # Off from June 2nd until July 3rd: July 1st and four Mondays are made up,
+        # the failing daily report is retried from June 1st
+        pending = scheduler.pending(date(2026, 7, 3))
+        self.assertEqual([(job.every, day) for job, day in pending if job.every != "daily"],
+                         [("monthly", date(2026, 7, 1)), ("weekly", date(2026, 6, 8)),
+                          ("weekly", date(2026, 6, 15)), ("weekly", date(2026, 6, 22)),
+                          ("weekly", date(2026, 6, 29))])
+        daily = [day for job, day in pending if job.every == "daily"]
+        self.assertEqual((daily[0], daily[-1]), (date(2026, 6, 3), date(2026, 7, 3)))
+        self.assertEqual(scheduler.job_markers()["trips/previous_week/weekly"], date(2026, 6, 1))
+        self.assertEqual(scheduler.job_markers()["trips/yesterday/daily"], date(2026, 5, 31))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Tests for vehicle reservations and the interval index behind them.
+"""
+import sqlite3
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from services.reservation_service import ReservationConflict, ReservationService
+
+
+def at(day, hour, minute=0):
+    return datetime(2026, 11, day, hour, minute)
+
+
+class TestReservationService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = Path(self.tmp.name) / "fleet.db"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE vehicles (id INTEGER PRIMARY KEY, registration_number TEXT)")
+            conn.executemany("INSERT INTO vehicles VALUES (?, ?)", [(i, f"WA{i}") for i in range(1, 4)])
+        self.service = ReservationService(self.db_path)
+        self.addCleanup(self.service.close)
+
+    def test_conflicting_booking_is_rejected(self):
+        first = self.service.create(1, at(3, 8), at(3, 16), purpose="Klient")
+        self.service.create(1, at(3, 16), at(3, 18))  # back-to-back is fine
+        with self.assertLogs("services.reservation_service"):
+            with self.assertRaises(ReservationConflict) as ctx:
+                self.service.create(1, at(3, 12), at(3, 17))
+        self.assertEqual([r.id for r in ctx.exception.conflicts][0], first.id)
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM reservations").fetchone(), (2,))
+
+        self.service.cancel(first.id)
+        self.assertTrue(self.service.is_free(1, at(3, 8), at(3, 12)))
+
+    def test_free_vehicles_and_slots(self):
+        self.service.create(1, at(3, 8), at(3, 10))
+        self.service.create(1, at(3, 14), at(3, 16))
+        self.service.create(2, at(2, 20), at(4, 6))
+        self.assertEqual(self.service.free_vehicles([1, 2, 3], at(3, 10), at(3, 14)), [1, 3])
+        self.assertEqual(self.service.free_vehicles([1, 2, 3], at(3, 8), at(3, 16)), [3])
+        self.assertEqual(self.service.free_slots(1, at(3, 6), at(3, 18), timedelta(hours=3)),
+                         [(at(3, 10), at(3, 14))])
+        self.assertEqual(self.service.next_reservation(1, at(3, 11)).start_time, at(3, 14))
+        self.assertEqual(sorted(self.service.in_range(at(3, 0), at(4, 0))), [1, 2])
+
+    def test_index_reloads_after_foreign_commit(self):
+        self.service.create(3, at(5, 8), at(5, 12))
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE reservations SET status = 'cancelled'")
+            conn.execute("INSERT INTO reservations (vehicle_id, start_time, end_time) "
+                         "VALUES (3, '2026-11-05 13:00:00', '2026-11-05 15:00:00')")
+        self.assertTrue(self.service.is_free(3, at(5, 8), at(5, 12)))
+        self.assertFalse(self.service.is_free(3, at(5, 14), at(5, 14, 30)))
+
+    def test_only_reservation_changes_reload(self):
+        reloads = []
+        clear = self.service.index.clear
+        self.service.index.clear = lambda: (reloads.append(1), clear())
+        self.service.sync()
+        first = self.service.create(1, at(3, 8), at(3, 10))
+        self.service.cancel(first.id)
+        for number in range(100):
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("UPDATE vehicles SET registration_number = ? WHERE id = 1", (f"WA{number}",))
+        self.assertTrue(self.service.is_free(1, at(3, 8), at(3, 10)))
+        self.assertEqual(len(reloads), 1)
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("INSERT INTO reservations (vehicle_id, start_time, end_time) "
+                         "VALUES (1, '2026-11-03 08:00:00', '2026-11-03 09:00:00')")
+        self.service.create(2, at(3, 8), at(3, 10))  # syncs first and picks up the foreign booking
+        self.assertFalse(self.service.is_free(1, at(3, 8), at(3, 10)))
+        self.assertEqual(len(reloads), 2)
+
+    def test_fleet_wide_query_is_fast(self):
+        with sqlite3.connect(self.db_path) as conn:
+            self.service.ensure_schema(conn)
+            conn.executemany(
+                "INSERT INTO reservations (vehicle_id, start_time, end_time) VALUES (?, ?, ?)",
+                [(vehicle, f"2026-11-{day:02d} {hour:02d}:00:00", f"2026-11-{day:02d} {hour + 2:02d}:00:00")
+                 for vehicle in range(1, 501) for day in range(8, 15) for hour in (6, 10, 14)],
+            )
+        self.service.sync()
+        started = time.perf_counter()
+        for _ in range(20):
+            free = self.service.free_vehicles(range(1, 601), at(10, 8), at(10, 16))
+        self.assertEqual(free, list(range(501, 601)))
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+Tests for the positional row factories and the slotted models.
+"""
+import sqlite3
+import unittest
+from datetime import date, datetime
+from pathlib import Path
+
+from models.driver import Driver
+from models.rows import row_factory
+from models.trip import trip_from_row
+from models.vehicle import Vehicle
+from services.driver_service import DriverService
+
+
+class TestRowFactories(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row  # the services' own setting; the cursor factory wins
+        self.conn.execute("""
+            CREATE TABLE drivers (
+                id INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT, license_number TEXT,
+                license_category TEXT, license_expiry DATE, phone_number TEXT, status TEXT
+            )
+        """)
+        self.conn.executemany(
+            "INSERT INTO drivers VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(1, "Jan", "Nowak", "AB123", "B", "2027-05-31", None, "active"),
+             (2, "Anna", "Kowalska", "CD456", "C", "2026-01-15", "500100200", "inactive")],
+        )
+        self.service = DriverService(Path(":memory:"))
+        self.service.get_connection = lambda: self.conn
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_driver_rows_are_built_with_id_and_date(self):
+        drivers = self.service.get_all_active_drivers()
+        self.assertEqual(drivers, [Driver(1, "Jan", "Nowak", "AB123", "B", date(2027, 5, 31))])
+        self.assertEqual(self.service.get_driver_by_id(2).phone_number, "500100200")
+        self.assertIsNone(self.service.get_driver_by_id(99))
+
+    def test_timestamps_are_converted(self):
+        row = (7, 1, 2, "2026-03-01 08:15:00", 1000.0, 40.0, "A-B", None, "KD/2026/0001",
+               "2026-03-01T17:40:30.250000", None, None, None, None, "in_progress", None)
+        trip = trip_from_row(None, row)
+        self.assertEqual(trip.start_time, datetime(2026, 3, 1, 8, 15))
+        self.assertEqual(trip.end_time, datetime(2026, 3, 1, 17, 40, 30, 250000))
+        self.assertEqual(trip.trip_number, "KD/2026/0001")
+
+    def test_unknown_column_is_rejected(self):
+        with self.assertRaises(ValueError):
+            row_factory(Vehicle, ("id", "fuel_consumption"))
+
+    def test_models_use_slots(self):
+        driver = Driver(None, "Jan", "Nowak", "AB123", "B", date(2027, 5, 31))
+        self.assertFalse(hasattr(driver, "__dict__"))
+        with self.assertRaises(AttributeError):
+            driver.nickname = "Janek"
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+Tests for the startup profiler used by ``main.py --profile-startup``.
+"""
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils import startup_profiler
+from utils.startup_profiler import StartupProfiler
+
+
+class TestStartupProfiler(unittest.TestCase):
+    """Import timing and stage measurement."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        pkg = Path(self.tmp.name) / "profiled_pkg"
+        pkg.mkdir()
+        (pkg / "__init__.py").write_text("from . import child\n", encoding="utf-8")
+        (pkg / "child.py").write_text("VALUE = sum(range(1000))\n", encoding="utf-8")
+        sys.path.insert(0, self.tmp.name)
+        self.addCleanup(sys.path.remove, self.tmp.name)
+        self.addCleanup(sys.modules.pop, "profiled_pkg", None)
+        self.addCleanup(sys.modules.pop, "profiled_pkg.child", None)
+
+    def test_records_nested_imports(self):
+        """Each module gets a record and the parent includes the child's time."""
+        profiler = StartupProfiler()
+        profiler.install()
+        try:
+            import profiled_pkg  # noqa: F401
+        finally:
+            profiler.uninstall()
+
+        records = {r.name: r for r in profiler.imports}
+        self.assertIn("profiled_pkg", records)
+        self.assertIn("profiled_pkg.child", records)
+        parent, child = records["profiled_pkg"], records["profiled_pkg.child"]
+        self.assertEqual(child.depth, parent.depth + 1)
+        self.assertGreaterEqual(parent.cumulative, child.cumulative)
+        # The loader is restored so the module does not keep the profiler alive
+        self.assertNotIn("_TimingLoader", type(sys.modules["profiled_pkg"].__loader__).__name__)
+
+    def test_stage_is_noop_when_disabled(self):
+        """Module-level stage() works without an active profiler."""
+        self.assertFalse(startup_profiler.is_enabled())
+        with startup_profiler.stage("nothing"):
+            pass
+        self.assertIsNone(startup_profiler.finish())
+
+    def test_report_contains_stages(self):
+        profiler = StartupProfiler()
+        with profiler.stage("MainWindow.__init__"):
+            pass
+        report = profiler.format_report()
+        self.assertIn("MainWindow.__init__", report)
+
+
+if __name__ == '__main__':
+    unittest.main()
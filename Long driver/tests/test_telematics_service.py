@@ -0,0 +1,174 @@
+"""
+Tests for telematics reading ingestion (plausibility, vehicle state, downsampling, socket).
+"""
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date, datetime
+from pathlib import Path
+
+from services.telematics_service import (
+    Reading, TelematicsListener, TelematicsService, iter_file_readings, parse_line, to_epoch,
+)
+
+T0 = to_epoch(datetime(2026, 6, 1, 8, 0))
+
+
+class TestTelematicsService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        self.db_path = self.root / "fleet.db"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE vehicles (
+                    id INTEGER PRIMARY KEY, registration_number TEXT, tank_capacity REAL,
+                    current_mileage REAL, current_fuel REAL, status TEXT
+                );
+                INSERT INTO vehicles VALUES (1, 'WA 100', 60, 1000, 30, 'available'),
+                                            (2, 'WB200', NULL, 5000, 20, 'in_use');
+            """)
+        self.service = TelematicsService(self.db_path, batch_size=3)
+
+    def query(self, sql):
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(sql).fetchall()
+
+    def test_plausibility_and_vehicle_state(self):
+        result = self.service.ingest([
+            Reading("wa100", T0, 1001.5, 40.0),
+            Reading(1, T0 + 60, 1002.5, 39.9),
+            Reading(1, T0 + 120, 1001.0, 39.8),       # licznik wstecz
+            Reading(1, T0 + 180, 1500.0, 39.7),       # 500 km w 2 minuty
+            Reading(1, T0 + 240, 1003.0, 80.0),       # ponad bak
+            Reading(1, T0 + 60, 1002.5, 39.9),        # powtórzony
+            Reading("XX999", T0, 10.0, 1.0),
+            Reading(2, T0, 4990.0, 19.0),              # poniżej wpisu operatora
+        ])
+        self.assertEqual(result.received, 8)
+        self.assertEqual(result.stored, 3)
+        self.assertEqual(result.duplicates, 1)
+        self.assertEqual(dict(result.rejected), {"odometer_backwards": 1, "odometer_jump": 1,
+                                                 "fuel_over_capacity": 1, "unknown_vehicle": 1})
+        self.assertEqual(self.query("SELECT ts - ?, odometer_m, fuel_cl FROM telematics_readings "
+                                    "WHERE vehicle_id = 1".replace("?", str(T0))),
+                         [(0, 1001500, 4000), (60, 1002500, 3990)])
+        # Odometer never moves down; the fuel level follows the tracker
+        self.assertEqual(self.query("SELECT id, current_mileage, current_fuel FROM vehicles ORDER BY id"),
+                         [(1, 1002.5, 39.9), (2, 5000.0, 19.0)])
+
+        # Next run continues from the stored history; a late reading stays history only
+        result = self.service.ingest([Reading(1, T0 + 30, 1002.0, 50.0), Reading(1, T0 + 300, 1002.0, 39.0)])
+        self.assertEqual(dict(result.rejected), {"odometer_backwards": 1})
+        self.assertEqual(result.stored, 1)
+        self.assertEqual(self.query("SELECT current_fuel FROM vehicles WHERE id = 1"), [(39.9,)])
+
+    def test_file_formats(self):
+        csv_path = self.root / "odczyty.csv"
+        csv_path.write_text("Pojazd;Czas;Przebieg;Paliwo\nWB200;2026-06-01T08:00:00;5010,5;18,5\n"
+                            "WB200;2026-06-01T08:01:00;5011;\n", encoding="utf-8")
+        ndjson_path = self.root / "odczyty.ndjson"
+        ndjson_path.write_text('{"vehicle_id": 2, "timestamp": "2026-06-01T08:02:00", "odometer": 5012}\n'
+                               '\n{"vehicle_id": 2}\n', encoding="utf-8")
+        self.assertEqual(self.service.ingest_file(csv_path).stored, 2)
+        result = self.service.ingest_file(ndjson_path)
+        self.assertEqual((result.stored, dict(result.rejected)), (1, {"unreadable": 1}))
+        self.assertEqual(self.query("SELECT current_mileage, current_fuel FROM vehicles WHERE id = 2"),
+                         [(5012.0, 18.5)])
+        self.assertEqual(len(list(iter_file_readings(csv_path))), 2)
+        self.assertEqual(parse_line("WA 100, 1780000000, 1200.5"), Reading("WA 100", 1780000000, 1200.5, None))
+
+    def test_downsample_keeps_last_reading_per_bucket(self):
+        self.service.ingest([Reading(1, T0 + minute * 60, 1000 + minute, None) for minute in range(180)])
+        deleted = self.service.downsample(after_days=30, bucket_seconds=3600, today=date(2026, 8, 1))
+        self.assertEqual(deleted, 177)
+        self.assertEqual([row[0] for row in self.query("SELECT odometer_m FROM telematics_readings")],
+                         [1059000, 1119000, 1179000])
+        # Already processed range is not scanned again
+        self.assertEqual(self.service.downsample(after_days=30, today=date(2026, 8, 1)), 0)
+
+    def test_unknown_tracker_reloads_vehicles_at_most_every_interval(self):
+        conn = self.service.get_connection()
+        self.addCleanup(conn.close)
+        ingestor = self.service.ingestor(conn)
+        self.assertEqual(ingestor.check(Reading("WC300", T0, 100.0))[1], "unknown_vehicle")
+        conn.execute("INSERT INTO vehicles VALUES (3, 'WC 300', 50, 100, 10, 'available')")
+        conn.commit()
+        # Within the interval the miss comes from the negative cache
+        self.assertEqual(ingestor.check(Reading("WC300", T0, 100.0))[1], "unknown_vehicle")
+        self.assertEqual(ingestor.check(Reading(3, T0, 100.0))[1], "unknown_vehicle")
+        ingestor._loaded_at -= self.service.unknown_reload_seconds
+        self.assertEqual(ingestor.check(Reading("WC300", T0, 100.0)), (3, None))
+
+    def serve(self, listener):
+        thread = threading.Thread(target=listener.serve_forever)
+        thread.start()
+        with socket.create_connection(listener.server_address) as client:
+            client.sendall(b'WB200;1780000000;5100;15\n')
+        return thread
+
+    def test_listener_retries_failed_batch(self):
+        listener = TelematicsListener(self.service, ("127.0.0.1", 0), flush_seconds=0.01, retry_seconds=0.01)
+        flush, failures = listener.ingestor.flush, []
+
+        def locked_once():
+            if not failures:
+                failures.append(1)
+                raise sqlite3.OperationalError("database is locked")
+            flush()
+
+        listener.ingestor.flush = locked_once
+        thread = self.serve(listener)
+        try:
+            deadline = time.monotonic() + 5
+            while listener.ingestor.result.stored < 1 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            listener.shutdown()
+            listener.server_close()
+            thread.join()
+        self.assertEqual((failures, listener.ingestor.result.stored, listener.failed), ([1], 1, False))
+        self.assertEqual(self.query("SELECT current_mileage FROM vehicles WHERE id = 2"), [(5100.0,)])
+
+    def test_listener_stops_when_batches_keep_failing(self):
+        listener = TelematicsListener(self.service, ("127.0.0.1", 0), flush_seconds=0.01,
+                                      flush_retries=2, retry_seconds=0.01)
+
+        def locked():
+            raise sqlite3.OperationalError("database is locked")
+
+        listener.ingestor.flush = locked
+        thread = self.serve(listener)
+        thread.join(5)                      # the writer shuts the server down
+        listener.server_close()
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(listener.failed)
+
+    def test_socket_listener(self):
+        listener = TelematicsListener(self.service, ("127.0.0.1", 0), flush_seconds=0.05)
+        thread = threading.Thread(target=listener.serve_forever)
+        thread.start()
+        try:
+            with socket.create_connection(listener.server_address) as client:
+                client.sendall(b'WB200;1780000000;5100;15\n'
+                               b'{"vehicle": 2, "ts": 1780000060, "odometer": 5101}\n'
+                               b'nonsense\n')
+            deadline = time.monotonic() + 5
+            while listener.unreadable < 1 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            listener.shutdown()
+            listener.server_close()
+            thread.join()
+        self.assertEqual(listener.ingestor.result.stored, 2)
+        self.assertEqual(listener.unreadable, 1)
+        self.assertEqual(self.query("SELECT current_mileage FROM vehicles WHERE id = 2"), [(5101.0,)])
+
+
+if __name__ == "__main__":
+    unittest.main()
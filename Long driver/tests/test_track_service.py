@@ -0,0 +1,103 @@
+"""
+Tests for compact GPS track storage and the odometer cross-check.
+"""
+import math
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from services.track_service import (
+    EARTH_RADIUS_M, TrackService, _haversine_python, decode_track, encode_track, haversine_distance_m,
+    iter_track_points,
+)
+
+T0 = 1780000000
+
+
+def straight_track(lat0, lon0, points, step_deg=0.0001):
+    """Northbound track, one point per second."""
+    return [(lat0 + i * step_deg, lon0, T0 + i) for i in range(points)]
+
+
+class TestTrackService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        self.db_path = self.root / "fleet.db"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE vehicles (id INTEGER PRIMARY KEY, registration_number TEXT);
+                CREATE TABLE trips (
+                    id INTEGER PRIMARY KEY, trip_number TEXT, vehicle_id INTEGER,
+                    start_time TIMESTAMP, start_mileage REAL, end_mileage REAL, status TEXT
+                );
+                INSERT INTO vehicles VALUES (1, 'WA 100');
+                INSERT INTO trips VALUES
+                    (1, 'KD/2026/0001', 1, '2026-05-04 08:00:00', 1000, 1111.2, 'completed'),
+                    (2, 'KD/2026/0002', 1, '2026-05-05 08:00:00', 1111.2, 1200, 'completed'),
+                    (3, 'KD/2026/0003', 1, '2026-05-06 08:00:00', 1200, NULL, 'active');
+            """)
+        self.service = TrackService(self.db_path)
+
+    def test_encoding_round_trip(self):
+        points = [(52.2297 + 0.00013 * i, 21.0122 - 0.00021 * i + (i % 7) * 1e-5, T0 + 2 * i)
+                  for i in range(20000)]
+        blob = encode_track(points)
+        # Delta-encoded, quantised columns: far below 24 bytes per point
+        self.assertLess(len(blob), 2 * len(points))
+        lats, lons, times = decode_track(blob)
+        self.assertEqual(len(lats), len(points))
+        self.assertLessEqual(max(abs(a - p[0]) for a, p in zip(lats, points)), 0.5e-5 + 1e-9)
+        self.assertLessEqual(max(abs(a - p[1]) for a, p in zip(lons, points)), 0.5e-5 + 1e-9)
+        self.assertEqual([int(t) for t in times[:3]], [T0, T0 + 2, T0 + 4])
+        with self.assertRaises(ValueError):
+            decode_track(b"XX" + blob[2:])
+
+    def test_haversine(self):
+        # One degree along a meridian
+        expected = EARTH_RADIUS_M * math.pi / 180
+        self.assertAlmostEqual(haversine_distance_m([52.0, 53.0], [21.0, 21.0]), expected, delta=0.01)
+        self.assertAlmostEqual(_haversine_python([52.0, 52.5, 53.0], [21.0] * 3), expected, delta=0.01)
+        self.assertEqual(haversine_distance_m([52.0], [21.0]), 0.0)
+
+    def test_save_and_cross_check(self):
+        # ~111.2 km matches the odometer, ~60 km against 88.8 km does not
+        summary = self.service.save_track(1, straight_track(51.0, 20.0, 10001))
+        self.assertAlmostEqual(summary.distance_km, 111.2, delta=0.1)
+        self.service.save_track(2, straight_track(52.0, 20.0, 5401))
+        self.service.save_track(3, straight_track(53.0, 20.0, 10))
+        with self.assertRaises(ValueError):
+            self.service.save_track(99, straight_track(51.0, 20.0, 10))
+        with self.assertRaises(ValueError):
+            self.service.save_track(1, [(91.0, 20.0, T0)])
+
+        checks = self.service.cross_check()
+        self.assertEqual([(c.trip_id, c.flagged) for c in checks], [(1, False), (2, True)])
+        self.assertEqual(checks[1].trip_number, "KD/2026/0002")
+        self.assertAlmostEqual(checks[1].difference_km, 28.8, delta=0.2)
+
+        lats, lons, times = self.service.load_track(2)
+        self.assertEqual(len(lats), 5401)
+        self.assertIsNone(self.service.load_track(42))
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(sorted(self.service.summaries(conn)), [1, 2, 3])
+
+    def test_track_files(self):
+        gpx = self.root / "slad.gpx"
+        gpx.write_text(
+            '<?xml version="1.0"?><gpx xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>'
+            '<trkpt lat="52.1" lon="21.0"><ele>100</ele><time>2026-05-04T08:00:00Z</time></trkpt>'
+            '<trkpt lat="52.2" lon="21.0"><time>2026-05-04T08:05:00Z</time></trkpt>'
+            '</trkseg></trk></gpx>', encoding="utf-8")
+        self.assertEqual([p[:2] for p in iter_track_points(gpx)], [(52.1, 21.0), (52.2, 21.0)])
+        csv_path = self.root / "slad.csv"
+        csv_path.write_text("Szerokość;Długość;Czas\n52,1;21,0;2026-05-04 08:00:00\n", encoding="utf-8")
+        [(lat, lon, ts)] = iter_track_points(csv_path)
+        self.assertEqual((lat, lon), (52.1, 21.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+"""
+Tests for daily trip sheets and their running totals.
+"""
+import sqlite3
+import tempfile
+import unittest
+from datetime import date, datetime
+from pathlib import Path
+
+from services.cost_service import FALLBACK_PRICE
+from services.trip_service import TripService
+from services.trip_sheet_service import ARCHIVED, CLOSED, OPEN, TripSheetService
+from services.vehicle_service import VehicleService
+
+
+class TestTripSheetService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = Path(self.tmp.name) / "fleet.db"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE vehicles (
+                    id INTEGER PRIMARY KEY, registration_number TEXT, brand TEXT, model TEXT,
+                    normative_consumption REAL, current_mileage REAL, current_fuel REAL,
+                    status TEXT, last_updated TIMESTAMP
+                );
+                CREATE TABLE drivers (id INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT);
+                CREATE TABLE trips (
+                    id INTEGER PRIMARY KEY, trip_number TEXT, vehicle_id INTEGER, driver_id INTEGER,
+                    start_time TIMESTAMP, end_time TIMESTAMP, start_mileage REAL, end_mileage REAL,
+                    start_fuel REAL, end_fuel REAL, route TEXT, purpose TEXT, distance REAL,
+                    fuel_consumed_calculated REAL, status TEXT, notes TEXT
+                );
+                INSERT INTO vehicles VALUES (1, 'WA 100', 'Ford', 'Transit', 8.0, 1000, 40, 'available', NULL);
+                INSERT INTO drivers VALUES (7, 'Jan', 'Kowalski');
+            """)
+        self.trips = TripService(self.db_path, VehicleService(self.db_path))
+        self.service = TripSheetService(self.db_path)
+        self.conn = sqlite3.connect(self.db_path)
+        self.addCleanup(self.conn.close)
+
+    def trip(self, start, end, mileage):
+        trip_id, _ = self.trips.start(self.conn, 1, 7, "Warszawa - Radom", "Dostawa", start_time=start)
+        if end is not None:
+            self.trips.complete(self.conn, trip_id, mileage, 30, end_time=end)
+        self.conn.commit()
+        return trip_id
+
+    def sheets(self):
+        return self.service.sheets(self.conn, date(2026, 5, 1), date(2026, 5, 31))
+
+    def test_running_totals(self):
+        first = self.trip(datetime(2026, 5, 4, 7), None, None)
+        [sheet] = self.sheets()
+        self.assertEqual((sheet.sheet_number, sheet.status, sheet.trips_count, sheet.total_km),
+                         ("KDS/2026/0001", OPEN, 1, 0))
+        self.trips.complete(self.conn, first, 1100, 30, end_time=datetime(2026, 5, 4, 9))
+        self.trip(datetime(2026, 5, 4, 10), datetime(2026, 5, 4, 12), 1150)
+        self.trip(datetime(2026, 5, 5, 8), datetime(2026, 5, 5, 9), 1200)
+        self.conn.commit()
+
+        day_one, day_two = self.sheets()
+        self.assertEqual((day_one.trips_count, day_one.start_mileage, day_one.end_mileage), (2, 1000, 1150))
+        self.assertAlmostEqual(day_one.total_km, 150)
+        self.assertAlmostEqual(day_one.total_fuel, 12)            # 8 l/100 km
+        self.assertAlmostEqual(day_one.total_cost, 12 * FALLBACK_PRICE)
+        self.assertEqual((day_two.sheet_number, day_two.total_km, day_two.employee_id), ("KDS/2026/0002", 50, 7))
+        lines = self.service.lines(self.conn, day_one.id)
+        self.assertEqual([(line.trip_id, line.from_location, line.distance) for line in lines],
+                         [(1, "Warszawa - Radom", 100), (2, "Warszawa - Radom", 50)])
+        vehicle, employee = self.service.parties(self.conn, day_one)
+        self.assertEqual((vehicle.registration_number, employee.full_name), ("WA 100", "Jan Kowalski"))
+
+        # The totals are the sum of the trips' contributions
+        self.assertEqual(self.service.verify(self.conn), [])
+        self.conn.execute("UPDATE trip_sheets SET total_km = 1 WHERE id = ?", (day_one.id,))
+        self.assertEqual(self.service.verify(self.conn, fix=True), [(day_one.id, "KDS/2026/0001")])
+        self.assertAlmostEqual(self.sheets()[0].total_km, 150)
+
+    def test_status(self):
+        trip_id = self.trip(datetime(2026, 5, 4, 7), None, None)
+        [sheet] = self.sheets()
+        with self.assertRaises(ValueError):
+            self.service.close(self.conn, sheet.id)                 # trip still active
+        self.trips.complete(self.conn, trip_id, 1100, 30, end_time=datetime(2026, 5, 4, 9))
+        closed = self.service.close(self.conn, sheet.id)
+        self.assertEqual(closed.status, CLOSED)
+        self.assertIsNotNone(closed.closed_at)
+
+        # A closed sheet takes no more trips: the next one opens a new sheet
+        self.trip(datetime(2026, 5, 4, 15), datetime(2026, 5, 4, 16), 1120)
+        self.assertEqual([(s.sheet_number, s.trips_count) for s in self.sheets()],
+                         [("KDS/2026/0001", 1), ("KDS/2026/0002", 1)])
+
+        # A corrected trip changes a closed sheet only after reopening it
+        self.conn.execute("UPDATE trips SET end_mileage = 1110, distance = 110 WHERE id = ?", (trip_id,))
+        with self.assertRaises(ValueError):
+            self.service.record_trip(self.conn, trip_id)
+        self.assertEqual(self.service.reopen(self.conn, sheet.id).closed_at, None)
+        self.service.record_trip(self.conn, trip_id)
+        self.assertEqual(self.sheets()[0].total_km, 110)
+        self.service.close(self.conn, sheet.id)
+        self.service.record_trip(self.conn, trip_id)                # unchanged: nothing to refuse
+        self.assertEqual(self.service.archive(self.conn, sheet.id).status, ARCHIVED)
+        with self.assertRaises(ValueError):
+            self.service.reopen(self.conn, sheet.id)
+        self.conn.execute("UPDATE trips SET end_mileage = 1120, distance = 120 WHERE id = ?", (trip_id,))
+        with self.assertRaises(ValueError):
+            self.service.record_trip(self.conn, trip_id)
+        self.assertEqual(self.sheets()[0].total_km, 110)
+        self.assertEqual(self.service.archive_closed(self.conn, date(2026, 6, 1)), 0)
+
+    def test_sync_trips_from_other_paths(self):
+        self.service.ensure_schema(self.conn)
+        self.conn.executescript("""
+            INSERT INTO trips (id, vehicle_id, driver_id, start_time, start_mileage, status)
+                VALUES (10, 1, 7, '2026-05-06 08:00:00', 1000, 'active');
+            INSERT INTO trips (id, vehicle_id, driver_id, start_time, start_mileage, end_mileage, distance, status)
+                VALUES (11, 1, 7, '2026-06-01 08:00:00', 1000, 1010, 10, 'completed');
+        """)
+        self.assertEqual(self.service.sync(self.conn, date(2026, 5, 1), date(2026, 5, 31)), 1)
+        self.assertEqual(self.service.sync(self.conn, date(2026, 5, 1), date(2026, 5, 31)), 0)
+        # Completed outside TripService - picked up again by the next sync
+        self.conn.execute("UPDATE trips SET end_mileage = 1040, distance = 40, status = 'completed' WHERE id = 10")
+        self.assertEqual(self.service.sync(self.conn, date(2026, 5, 1), date(2026, 5, 31)), 1)
+        [sheet] = self.sheets()
+        self.assertEqual((sheet.trips_count, sheet.total_km, sheet.end_mileage), (1, 40, 1040))
+
+
+if __name__ == "__main__":
+    unittest.main()
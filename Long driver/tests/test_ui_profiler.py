@@ -0,0 +1,73 @@
+"""
+Tests for the GUI slot profiler (Qt-free part).
+"""
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from utils.ui_profiler import UiProfiler, profile_slot, profiler
+
+
+class Window:
+
+    @profile_slot
+    def load_rows(self, delay=0.0):
+        time.sleep(delay)
+        return "ok"
+
+    @profile_slot(name="Window.outer")
+    def outer(self):
+        return self.load_rows()
+
+
+class TestUiProfiler(unittest.TestCase):
+
+    def setUp(self):
+        profiler.reset()
+        profiler.configure({"enabled": True, "stall_ms": 1000, "cprofile_slowest": 2})
+        self.addCleanup(profiler.configure, {})
+        self.addCleanup(profiler.reset)
+
+    def test_disabled_decorator_records_nothing(self):
+        profiler.configure({"enabled": False})
+        self.assertEqual(Window().load_rows(), "ok")
+        self.assertEqual(profiler.slots, {})
+
+    def test_slot_timings_per_name(self):
+        window = Window()
+        window.load_rows()
+        window.outer()
+        summary = profiler.summary()
+        self.assertEqual(summary["slots"]["Window.load_rows"][0], 2)
+        self.assertEqual(summary["slots"]["Window.outer"][0], 1)
+        self.assertEqual(summary["last_slot"][0], "Window.outer")
+        self.assertEqual(profiler.active, [])
+
+    def test_keeps_only_slowest_captures(self):
+        window = Window()
+        for delay in (0.0, 0.02, 0.0, 0.01):
+            window.load_rows(delay)
+        captures = profiler.slowest_captures()
+        self.assertEqual(len(captures), 2)
+        self.assertGreaterEqual(captures[0][0], 20)
+        self.assertGreaterEqual(captures[1][0], 10)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = profiler.dump_profiles(tmp)
+            self.assertEqual(len(paths), 2)
+            self.assertTrue(all(Path(p).stat().st_size > 0 for p in paths))
+
+    def test_stalls_are_bounded(self):
+        local = UiProfiler()
+        local.max_stalls = 3
+        with self.assertLogs("utils.ui_profiler", level="WARNING"):
+            for ms in (150, 200, 250, 300):
+                local.record_stall(ms, "VehicleWindow.load_vehicles")
+        summary = local.summary()
+        self.assertEqual(summary["stall_count"], 3)
+        self.assertEqual(summary["worst_stall_ms"], 300)
+
+
+if __name__ == '__main__':
+    unittest.main()
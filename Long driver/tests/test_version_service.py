@@ -0,0 +1,122 @@
+"""
+Tests for row versions and conditional (optimistic) updates.
+"""
+import ast
+import importlib
+import sqlite3
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+from services.audit_service import AuditService
+from services.key_service import KeyService
+from services.version_service import EditConflict, StaleVersion, VersionService
+from utils import db
+
+FIELDS = ("registration_number", "current_mileage", "current_fuel", "status", "notes")
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def gui_imported(window: str, name: str):
+    """``name`` as src/gui/<window>.py imports it - the class its except clauses catch."""
+    tree = ast.parse((ROOT / "src" / "gui" / f"{window}.py").read_text(encoding="utf-8"))
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and any(alias.name == name for alias in node.names):
+            package = ["src", "gui"][:3 - node.level] if node.level else []
+            if str(ROOT) not in sys.path:
+                sys.path.append(str(ROOT))
+            return getattr(importlib.import_module(".".join(package + [node.module])), name)
+    raise AssertionError(f"{window} does not import {name}")
+
+
+class TestVersionService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = Path(self.tmp.name) / "fleet.db"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE vehicles (
+                    id INTEGER PRIMARY KEY, registration_number TEXT, current_mileage REAL,
+                    current_fuel REAL, tank_capacity REAL, status TEXT, notes TEXT
+                );
+                CREATE TABLE key_log (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, vehicle_id INTEGER, employee_id INTEGER,
+                    checkout_time TIMESTAMP, return_time TIMESTAMP, checkout_mileage REAL,
+                    return_mileage REAL, checkout_fuel REAL, return_fuel REAL,
+                    storage_location TEXT, status TEXT DEFAULT 'out', notes TEXT
+                );
+                INSERT INTO vehicles VALUES (1, 'WA 100', 1000, 40, 60, 'available', '');
+            """)
+        self.service = VersionService(self.db_path)
+        self.conn = db.connect(self.db_path)
+        self.addCleanup(self.conn.close)
+        self.assertEqual(self.service.ensure_schema(self.conn), ["vehicles", "key_log"])
+        self.assertEqual(self.service.ensure_schema(self.conn), [])
+        self.conn.commit()
+
+    def test_conditional_update_and_bump_trigger(self):
+        base = self.service.load(self.conn, "vehicles", 1, FIELDS)
+        self.assertEqual(base["version"], 1)
+        values = dict(base, notes="nowe opony")
+        del values["version"]
+        self.assertEqual(self.service.update(self.conn, "vehicles", 1, base, values), 2)
+        # A writer unaware of versions (trip completion) still moves the version on
+        self.conn.execute("UPDATE vehicles SET current_mileage = 1200 WHERE id = 1")
+        self.conn.commit()
+        self.assertEqual(self.service.load(self.conn, "vehicles", 1, ())["version"], 3)
+
+    def test_conflict_diff_and_merge(self):
+        base = self.service.load(self.conn, "vehicles", 1, FIELDS)
+        # Meanwhile: a trip writes the odometer, another desk the status
+        self.conn.execute("UPDATE vehicles SET current_mileage = 1250, status = 'in_use' WHERE id = 1")
+        self.conn.commit()
+        mine = {"registration_number": "WA 100", "current_mileage": 1000.0, "current_fuel": 40,
+                "status": "service", "notes": "przegląd"}
+        with self.assertRaises(EditConflict) as raised:
+            self.service.update(self.conn, "vehicles", 1, base, mine)
+        self.conn.rollback()
+        conflict = raised.exception
+        self.assertFalse(conflict.deleted)
+        self.assertEqual((conflict.expected, conflict.current), (1, 2))
+        self.assertEqual({d.column for d in conflict.changed}, {"current_mileage", "status", "notes"})
+        self.assertEqual([d.column for d in conflict.conflicting], ["status"])
+
+        merged = conflict.merged()
+        self.assertEqual((merged["current_mileage"], merged["status"], merged["notes"]),
+                         (1250, "in_use", "przegląd"))
+        self.assertEqual(conflict.merged(keep_mine=["status"])["status"], "service")
+
+        self.assertEqual(self.service.update(self.conn, "vehicles", 1, conflict.current_row, merged), 3)
+        self.conn.commit()
+        self.assertEqual(self.conn.execute("SELECT current_mileage FROM vehicles").fetchone()[0], 1250)
+
+        self.conn.execute("DELETE FROM vehicles WHERE id = 1")
+        with self.assertRaises(EditConflict) as raised:
+            self.service.update(self.conn, "vehicles", 1, conflict.current_row, merged)
+        self.assertTrue(raised.exception.deleted)
+
+    def test_key_return_version_and_audit(self):
+        AuditService(self.db_path).install(self.conn)
+        keys = KeyService(self.db_path)
+        key_log_id = keys.checkout(self.conn, 1, 7, 1000, 40, datetime(2026, 5, 4, 7))
+        self.conn.commit()
+        version = self.service.load(self.conn, "key_log", key_log_id, ())["version"]
+        # Stale version (returned from the kiosk meanwhile) and a second return
+        with self.assertRaises(gui_imported("key_return_window", "StaleVersion")):
+            keys.return_key(self.conn, key_log_id, 1100, 30, version=version + 1)
+        keys.return_key(self.conn, key_log_id, 1100, 30, version=version)
+        self.conn.commit()
+        with self.assertRaises(ValueError):
+            keys.return_key(self.conn, key_log_id, 1100, 30, version=version)
+        # Version bumps are not audited on their own
+        changes = [e.changes for e in AuditService(self.db_path).vehicle_history(self.conn, 1)]
+        self.assertTrue(all("version" not in c for c in changes))
+        self.assertEqual(len(changes), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()